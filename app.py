@@ -1,41 +1,57 @@
 import os
-import hashlib
-from datetime import datetime
+from datetime import datetime, timedelta
 from functools import wraps
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Response, stream_with_context, make_response
 from dotenv import load_dotenv
 
+from notificacoes import central_notificacoes, FiltroAgenda, LimiteLigacoes
+from autenticacao import gerar_hash_senha, verificar_senha, simular_verificacao
+
 # --- IMPORTS DA CAMADA DE PERSISTÊNCIA ---
-from persistence.session import get_db_connection 
-from persistence.dashboard import obter_totais_dashboard, listar_proximas_consultas
+from persistence.session import get_db_connection, init_app as init_db, estatisticas_pool
+from persistence.cache import cache_referencia, cache_dashboard
+from persistence.salas import obter_ocupacao_salas_dia
+from persistence.pesquisa import pesquisar_relatorios, estatisticas_indice
+from persistence.indice_pacientes import pesquisar_pacientes, estatisticas_indice_pacientes
+from persistence.paralelo import executar_em_paralelo
+from persistence.sincronizacao import (
+    obter_marcador_alteracoes, calcular_etag, codificar_token, descodificar_token, delta_valido
+)
+from persistence.metricas import init_app as init_metricas, metricas_rotas, metricas_procedimentos
+from persistence.dashboard import carregar_dashboard
 from persistence.atendimentos import (
-    obter_horarios_livres, listar_eventos_calendario, obter_detalhes_atendimento, 
-    editar_agendamento, cancelar_agendamento
+    obter_horarios_livres, obter_horarios_livres_lote, listar_eventos_calendario, listar_eventos_alterados,
+    obter_detalhes_atendimento,
+    criar_agendamento as criar_agendamento_bd, criar_agendamentos_lote, editar_agendamento, cancelar_agendamento,
+    agenda_alterada
 )
 # NOVOS IMPORTS
 from persistence.pacientes import (
     contar_pacientes, criar_paciente_via_agenda, 
-    listar_pacientes_geral, listar_pacientes_dropdown_agenda, listar_pacientes_arquivo,
+    listar_pacientes_pagina, listar_pacientes_dropdown_agenda, listar_pacientes_arquivo_pagina,
     criar_paciente_completo, obter_detalhes_paciente, atualizar_observacoes_paciente,
     eliminar_paciente_fisico, desativar_paciente_logico, ativar_paciente_logico,
-    editar_dados_paciente
+    editar_dados_paciente, invalidar_pacientes_agenda
 )
 from persistence.trabalhadores import (
-    obter_dados_login, medicos_agenda_dropdown, obter_nome_trabalhador,
-    listar_equipa_ativa, listar_equipa_arquivo, listar_medicos_para_modal_pacientes,
+    obter_dados_login, atualizar_hash_senha, medicos_agenda_dropdown, obter_nome_trabalhador,
+    listar_equipa_pagina, listar_equipa_arquivo, listar_medicos_para_modal_pacientes,
     obter_perfil_trabalhador, listar_pacientes_do_medico, listar_equipa_do_paciente,
     criar_novo_funcionario, desativar_trabalhador, ativar_trabalhador, 
-    eliminar_trabalhador_fisico, editar_ficha_trabalhador
+    eliminar_trabalhador_fisico, editar_ficha_trabalhador, invalidar_medicos
 )
+from persistence.exportacao import EXPORTACOES, executar_exportacao, gerar_csv, gerar_json
 from persistence.relatorios import (
     listar_relatorios_dashboard, obter_nome_paciente_simples, 
-    carregar_historico_relatorios, guardar_relatorio_clinico
+    carregar_historico_relatorios, obter_relatorio, guardar_relatorio_clinico, relatorio_guardado
 )
 
 load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY')
+init_db(app)
+init_metricas(app)
 
 # ==============================================================================
 # DECORATORS (Segurança e Modularidade)
@@ -61,6 +77,74 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def ler_data_iso(valor):
+    """Converte 'YYYY-MM-DD[THH:MM:SS[+HH:MM|Z]]' em datetime sem fuso. Inválido (ou não texto) -> None."""
+    if not valor or not isinstance(valor, str):
+        return None
+    try:
+        return datetime.fromisoformat(valor.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+def data_iso(valor):
+    """Data para JSON em ISO 8601: aceita date/datetime ou o texto 'dd/mm/aaaa' formatado pelas SPs."""
+    if not valor:
+        return None
+    if isinstance(valor, str):
+        return datetime.strptime(valor, '%d/%m/%Y').date().isoformat()
+    return (valor.date() if isinstance(valor, datetime) else valor).isoformat()
+
+@app.template_filter('data_hora')
+def formatar_data_hora(valor, formato='%d/%m/%Y %H:%M'):
+    """Formatação das datas na aplicação (evita FORMAT() nas SPs)."""
+    return valor.strftime(formato) if valor else ''
+
+def resposta_condicional(cursor, construir, *partes):
+    """
+    Resposta JSON com ETag derivado do marcador de alterações da BD.
+    Se o cliente já tem a versão atual (If-None-Match) responde 304 sem executar
+    a consulta; caso contrário chama construir(marcador) para gerar a resposta.
+    """
+    marcador = obter_marcador_alteracoes(cursor)
+    if marcador is None:
+        return construir(None)
+
+    etag = calcular_etag(marcador, session['user_id'], session.get('perfil'), request.full_path, *partes)
+    if etag in request.if_none_match:
+        resposta = Response(status=304)
+    else:
+        resposta = make_response(construir(marcador))
+        if resposta.status_code != 200:
+            return resposta
+    resposta.set_etag(etag)
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta
+
+def resposta_json_com_etag(dados):
+    """Para respostas que não vêm da BD (ex.: cache em memória): ETag calculado do conteúdo."""
+    resposta = jsonify(dados)
+    resposta.add_etag()
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta.make_conditional(request)
+
+def ler_paginacao():
+    """Parâmetros de paginação/pesquisa das listagens: ?q=&ordem=nome|-nome&apos=&tamanho="""
+    ordem = request.args.get('ordem', 'nome')
+    return {
+        'q': request.args.get('q', '').strip(),
+        'ordem': '-nome' if ordem == '-nome' else 'nome',
+        'apos': request.args.get('apos'),
+        'tamanho': request.args.get('tamanho'),
+    }
+
+def paginar(func, *args):
+    """Chama uma listagem paginada da persistência e devolve (linhas, contexto 'pag' para o template)."""
+    pag = ler_paginacao()
+    linhas, proximo = func(*args, tamanho=pag['tamanho'], pesquisa=pag['q'],
+                           descendente=pag['ordem'] == '-nome', apos=pag['apos'])
+    pag.update(proximo=proximo, primeira=not pag['apos'])
+    return linhas, pag
+
 # ==============================================================================
 # AUTENTICAÇÃO
 # ==============================================================================
@@ -76,17 +160,28 @@ def login():
             return render_template('login.html')
 
         conn = get_db_connection()
-        user = obter_dados_login(conn.cursor(), nif)
-        conn.close()
+        cursor = conn.cursor()
+        user = obter_dados_login(cursor, nif)
 
         if user:
-            hash_introduzido = hashlib.sha256(senha.encode()).hexdigest()
-            if hash_introduzido == user[1]:
+            valida, precisa_rehash = verificar_senha(senha, user[1])
+            if valida:
+                if precisa_rehash:
+                    # Hash antigo (SHA-256) ou custo desatualizado: converte agora que temos a senha
+                    try:
+                        atualizar_hash_senha(cursor, user[0], gerar_hash_senha(senha))
+                        conn.commit()
+                    except Exception as e:
+                        print(f"Erro ao atualizar hash: {e}")
+                conn.close()
                 session['user_id'] = user[0]
                 session['perfil'] = user[2]
                 session['user_name'] = user[3]
                 session['user_id_interno'] = user[0] 
                 return redirect(url_for('dashboard'))
+        else:
+            simular_verificacao(senha)
+        conn.close()
 
         flash('NIF ou palavra-passe incorretos.', 'danger')
 
@@ -111,17 +206,19 @@ def dashboard():
     user_id = session.get('user_id')
     perfil = session.get('perfil')
     
-    nome_user = session.get('nome_user') or obter_nome_trabalhador(cursor, user_id)
+    # O nome fica na sessão desde o login; só vai à BD se faltar
+    nome_user = session.get('user_name') or obter_nome_trabalhador(cursor, user_id)
     session['user_name'] = nome_user
 
-    totais = obter_totais_dashboard(cursor, user_id, perfil)
-    proximas = listar_proximas_consultas(cursor, user_id, perfil)
+    dados = carregar_dashboard(cursor, user_id, perfil)
     
     conn.close()
     
     return render_template('dashboard.html', 
-                           totais=totais,
-                           proximas_consultas=proximas,
+                           totais=dados['totais'],
+                           proximas_consultas=dados['proximas_consultas'],
+                           consultas_hoje=dados['consultas_hoje'],
+                           salas_livres=dados['salas_livres'],
                            nome_user=nome_user)
 
 @app.route('/pacientes')
@@ -131,14 +228,14 @@ def pacientes():
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # 1. Lista principal (Tuplos)
-        lista = listar_pacientes_geral(cursor, session['user_id'], session['perfil'])
+        # 1. Lista principal (Tuplos), paginada
+        lista, pag = paginar(listar_pacientes_pagina, cursor, session['user_id'], session['perfil'])
 
         # 2. Lista dropdown (Dicionários com 'id_trabalhador' para o HTML)
         lista_trabalhadores = listar_medicos_para_modal_pacientes(cursor)
 
         conn.close()
-        return render_template('pacientes.html', pacientes=lista, trabalhadores=lista_trabalhadores, nome_user=session.get('user_name'))
+        return render_template('pacientes.html', pacientes=lista, trabalhadores=lista_trabalhadores, pag=pag, nome_user=session.get('user_name'))
     except Exception as e:
         flash(f"Erro ao listar: {e}", "danger")
         return redirect(url_for('dashboard'))
@@ -149,13 +246,13 @@ def equipa():
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        # Lista principal (Tuplos)
-        lista = listar_equipa_ativa(cursor)
+        # Lista principal (Tuplos), paginada
+        lista, pag = paginar(listar_equipa_pagina, cursor)
         conn.close()
     except Exception as e:
         flash(f'Erro ao carregar equipa: {e}', 'danger')
-        lista = []
-    return render_template('equipa.html', equipa=lista, nome_user=session.get('user_name'),
+        lista, pag = [], {'q': '', 'ordem': 'nome', 'proximo': None, 'primeira': True}
+    return render_template('equipa.html', equipa=lista, pag=pag, nome_user=session.get('user_name'),
                            now_date=datetime.now().strftime('%Y-%m-%d'))
 
 # ==============================================================================
@@ -165,25 +262,21 @@ def equipa():
 @app.route('/agenda')
 @login_required
 def agenda():
-    conn = get_db_connection()
-    cursor = conn.cursor()
     lista_medicos = []
-    lista_pacientes = []
 
     try:
-        # 1. Carregar Médicos (Para o Admin) - usa a função original que devolve 'id'
-        lista_medicos = medicos_agenda_dropdown(cursor)
-        
-        # 2. Carregar Pacientes - usa a nova função que devolve 'nif' e 'nome'
-        lista_pacientes = listar_pacientes_dropdown_agenda(cursor, session['user_id'], session['perfil'])
-
+        # Médicos (para o Admin, devolve 'id'). Os pacientes são pesquisados à medida
+        # que se escreve (/api/pacientes/pesquisa), não vão na página.
+        conn = get_db_connection()
+        lista_medicos = medicos_agenda_dropdown(conn.cursor())
+        conn.close()
     except Exception as e:
         print(f"Erro agenda: {e}")
-    finally:
-        conn.close()
 
-    return render_template('agenda.html', nome_user=session.get('user_name'),
-                           medicos=lista_medicos, pacientes=lista_pacientes)
+    return render_template('agenda.html', nome_user=session.get('user_name'), medicos=lista_medicos)
+
+# Limite de sessões numa marcação em série (um ano de sessões semanais)
+MAX_OCORRENCIAS_LOTE = 52
 
 @app.route('/criar_agendamento', methods=['POST'])
 @login_required
@@ -205,25 +298,104 @@ def criar_agendamento():
         flash('Preencha todos os campos obrigatórios.', 'warning')
         return redirect(url_for('agenda'))
 
+    repeticoes = min(max(request.form.get('repeticoes', 1, type=int), 1), MAX_OCORRENCIAS_LOTE)
+
     try:
         data_completa = f"{data_str} {hora_str}:00"
+        if repeticoes > 1:
+            # Série semanal: uma só transação, tudo ou nada
+            inicio = datetime.strptime(data_completa, '%Y-%m-%d %H:%M:%S')
+            datas = [inicio + timedelta(weeks=i) for i in range(repeticoes)]
+            criados, conflitos = marcar_lote(nif_paciente, id_medico, datas, preferencia_online, duracao)
+            if conflitos:
+                detalhe = '; '.join(f"{c['inicio'].strftime('%d/%m %H:%M')}: {c['motivo']}" for c in conflitos)
+                flash(f'Nenhuma sessão foi marcada. Conflitos: {detalhe}', 'danger')
+            else:
+                flash(f'{len(criados)} sessões agendadas com sucesso!', 'success')
+            return redirect(url_for('agenda'))
+
         conn = get_db_connection()
         cursor = conn.cursor()
-        # Aqui podemos manter o EXEC direto ou mover para persistence/atendimentos.py se já lá estiver
-        cursor.execute("EXEC sp_criarAgendamento ?, ?, ?, ?, ?", 
-                       (nif_paciente, id_medico, data_completa, preferencia_online, duracao))
+        novo_id = criar_agendamento_bd(cursor, nif_paciente, id_medico, data_completa, preferencia_online, duracao)
         conn.commit()
         conn.close()
+        agenda_alterada(vinculos=True)
+        central_notificacoes.publicar('criado', novo_id, id_medico, nif_paciente)
         flash('Consulta agendada com sucesso!', 'success')
     except Exception as e:
-        msg = str(e)
-        if "50009" in msg: msg = "Paciente não encontrado."
-        elif "50010" in msg: msg = "Médico ocupado nessa hora."
-        elif "50011" in msg: msg = "Não há salas disponíveis."
-        flash(f'Erro: {msg}', 'danger')
+        flash(f'Erro: {mensagem_erro_agendamento(e)}', 'danger')
 
     return redirect(url_for('agenda'))
 
+def mensagem_erro_agendamento(e):
+    msg = str(e)
+    if "50009" in msg: msg = "Paciente não encontrado."
+    elif "50010" in msg: msg = "Médico ocupado nessa hora."
+    elif "50011" in msg: msg = "Não há salas disponíveis."
+    elif "50013" in msg: msg = "Lista de datas inválida."
+    return msg
+
+def marcar_lote(nif_paciente, id_medico, datas, preferencia_online, duracao):
+    """Marca as sessões (tudo ou nada) e notifica os calendários abertos."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    criados, conflitos = criar_agendamentos_lote(cursor, nif_paciente, id_medico, datas, preferencia_online, duracao)
+    conn.commit()
+    conn.close()
+    if criados:
+        agenda_alterada(vinculos=True)
+    for o in criados:
+        central_notificacoes.publicar('criado', o['num_atendimento'], id_medico, nif_paciente)
+    return criados, conflitos
+
+@app.route('/api/agendamentos/lote', methods=['POST'])
+@login_required
+def api_agendamentos_lote():
+    """
+    Marca várias sessões de uma vez. JSON:
+      {"nif_paciente", "id_medico" (admin), "duracao", "is_online",
+       "datas": ["2026-03-02T10:00", ...]}  ou  {"data", "hora", "repeticoes", "intervalo_dias"}
+    201 com as sessões criadas, ou 409 com os conflitos (nada é marcado).
+    """
+    dados = request.get_json(silent=True) or {}
+    nif_paciente = dados.get('nif_paciente')
+    id_medico = session['user_id'] if session['perfil'] == 'colaborador' else dados.get('id_medico')
+    preferencia_online = 1 if dados.get('is_online') else 0
+    # O limite é verificado antes de gerar as datas: 'repeticoes' vem do cliente
+    excesso = False
+    try:
+        duracao = int(dados.get('duracao', 60))
+        if dados.get('datas'):
+            excesso = len(dados['datas']) > MAX_OCORRENCIAS_LOTE
+            datas = [ler_data_iso(d) for d in dados['datas']] if not excesso else []
+        elif dados.get('data') and dados.get('hora'):
+            inicio = ler_data_iso(f"{dados['data']}T{dados['hora']}")
+            intervalo = timedelta(days=int(dados.get('intervalo_dias', 7)))
+            repeticoes = int(dados.get('repeticoes', 1))
+            excesso = repeticoes > MAX_OCORRENCIAS_LOTE
+            datas = [inicio + intervalo * i for i in range(repeticoes)] if inicio and not excesso else [None]
+        else:
+            datas = []
+    except (TypeError, ValueError, OverflowError):
+        datas = []
+
+    if excesso:
+        return jsonify({'erro': f'Máximo de {MAX_OCORRENCIAS_LOTE} sessões por pedido.'}), 400
+    if not nif_paciente or not id_medico or not datas or None in datas:
+        return jsonify({'erro': 'Indique nif_paciente, id_medico e datas válidas.'}), 400
+
+    def serializar(ocorrencias):
+        return [{**o, 'inicio': o['inicio'].isoformat(), 'fim': o['fim'].isoformat()} for o in ocorrencias]
+
+    try:
+        criados, conflitos = marcar_lote(nif_paciente, id_medico, datas, preferencia_online, duracao)
+    except Exception as e:
+        return jsonify({'erro': mensagem_erro_agendamento(e)}), 400
+
+    if conflitos:
+        return jsonify({'criados': [], 'conflitos': serializar(conflitos)}), 409
+    return jsonify({'criados': serializar(criados), 'conflitos': []}), 201
+
 # ==============================================================================
 # DETALHES E RELATÓRIOS
 # ==============================================================================
@@ -232,13 +404,10 @@ def criar_agendamento():
 @login_required
 def equipa_detalhes(id_trabalhador):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        trabalhador = obter_perfil_trabalhador(cursor, id_trabalhador, session['perfil'])
-        lista_pacientes = listar_pacientes_do_medico(cursor, id_trabalhador)
-
-        conn.close()
+        trabalhador, lista_pacientes = executar_em_paralelo(
+            (obter_perfil_trabalhador, id_trabalhador, session['perfil']),
+            (listar_pacientes_do_medico, id_trabalhador),
+        )
         return render_template('equipa_detalhes.html', t=trabalhador, pacientes=lista_pacientes, nome_user=session['user_name'])
     except Exception as e:
         flash(f"Acesso Negado: {e}", "danger")
@@ -270,10 +439,48 @@ def detalhes_relatorio_unificado(id_paciente):
     nome_p = obter_nome_paciente_simples(cursor, id_paciente)
 
     user_id_interno = session.get('user_id_interno', session['user_id'])
-    notas = carregar_historico_relatorios(cursor, id_paciente, user_id_interno)
+    apos = request.args.get('apos')
+    notas, proximo = carregar_historico_relatorios(cursor, id_paciente, user_id_interno, apos=apos)
     
     conn.close()
-    return render_template('relatorio_detalhes.html', paciente_id=id_paciente, nome_p=nome_p, notas=notas, nome_user=session.get('user_name'))
+    pag = {'proximo': proximo, 'primeira': not apos}
+    return render_template('relatorio_detalhes.html', paciente_id=id_paciente, nome_p=nome_p, notas=notas, pag=pag, nome_user=session.get('user_name'))
+
+@app.route('/api/relatorios/<int:id_relatorio>')
+@login_required
+def api_obter_relatorio(id_relatorio):
+    """Conteúdo de um relatório, carregado quando a nota é aberta ou editada."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    user_id_interno = session.get('user_id_interno', session['user_id'])
+    relatorio = obter_relatorio(cursor, id_relatorio, user_id_interno)
+    conn.close()
+
+    if relatorio is None:
+        return jsonify({'erro': 'Relatório não encontrado.'}), 404
+    relatorio['data'] = formatar_data_hora(relatorio['data'])
+    return jsonify(relatorio)
+
+@app.route('/api/relatorios/pesquisa')
+@login_required
+def api_pesquisa_relatorios():
+    """Pesquisa por palavras-chave nos relatórios do próprio autor (?q=&id_paciente=&limite=)."""
+    texto = request.args.get('q', '').strip()
+    id_paciente = request.args.get('id_paciente', type=int)
+    limite = max(1, min(request.args.get('limite', 20, type=int), 100))
+    if len(texto) < 2:
+        return jsonify({'motor': None, 'resultados': []})
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    user_id_interno = session.get('user_id_interno', session['user_id'])
+    motor, resultados = pesquisar_relatorios(cursor, user_id_interno, texto, id_paciente, limite)
+    conn.close()
+
+    for r in resultados:
+        r['data'] = formatar_data_hora(r['data']) or None
+        r['url'] = url_for('detalhes_relatorio_unificado', id_paciente=r['id_paciente'])
+    return jsonify({'motor': motor, 'resultados': resultados})
 
 @app.route('/relatorios/salvar', methods=['POST'])
 @login_required
@@ -288,10 +495,11 @@ def salvar_relatorio():
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        guardar_relatorio_clinico(cursor, id_rel if id_rel else None, id_pac, user_id_interno, conteudo, tipo)
+        novo_id = guardar_relatorio_clinico(cursor, id_rel if id_rel else None, id_pac, user_id_interno, conteudo, tipo)
         
         conn.commit()
         conn.close()
+        relatorio_guardado(novo_id, id_pac, user_id_interno, conteudo)
         flash("Processo clínico atualizado.", "success")
     except Exception as e:
         flash(f"Erro ao gravar: {e}", "danger")
@@ -321,6 +529,7 @@ def criar_paciente():
         
         conn.commit()
         conn.close()
+        invalidar_pacientes_agenda()
         flash("Paciente registado e associado com sucesso!", "success")
     except Exception as e:
         flash(f"Erro ao criar: {e}", "danger")
@@ -331,13 +540,10 @@ def criar_paciente():
 @login_required
 def pacientes_detalhes(id_paciente):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        detalhes = obter_detalhes_paciente(cursor, id_paciente, session['user_id'], session['perfil'])
-        equipa_vinculada = listar_equipa_do_paciente(cursor, id_paciente)
-
-        conn.close()
+        detalhes, equipa_vinculada = executar_em_paralelo(
+            (obter_detalhes_paciente, id_paciente, session['user_id'], session['perfil']),
+            (listar_equipa_do_paciente, id_paciente),
+        )
         return render_template('pacientes_detalhes.html', p=detalhes, equipa=equipa_vinculada, nome_user=session.get('user_name'))
     except Exception as e:
         flash(f"Erro: {e}", "danger")
@@ -368,6 +574,7 @@ def eliminar_paciente(id_paciente):
         eliminar_paciente_fisico(cursor, id_paciente)
         conn.commit()
         conn.close()
+        invalidar_pacientes_agenda()
         flash("Paciente e dados associados eliminados com sucesso.", "success")
     except Exception as e:
         flash(f"{e}", "danger")
@@ -385,6 +592,8 @@ def eliminar_trabalhador(id_trabalhador):
         eliminar_trabalhador_fisico(cursor, id_trabalhador)
         conn.commit()
         conn.close()
+        invalidar_medicos()
+        invalidar_pacientes_agenda()
         flash("Funcionário removido permanentemente.", "success")
     except Exception as e:
         flash(f"{e}", "danger")
@@ -399,7 +608,7 @@ def criar_funcionario():
         flash('NIF inválido.', 'danger')
         return redirect(url_for('equipa'))
 
-    hash_pw = hashlib.sha256(request.form.get('senha').encode()).hexdigest()
+    hash_pw = gerar_hash_senha(request.form.get('senha'))
     remuneracao = request.form.get('remuneracao')
     remuneracao = float(remuneracao) if remuneracao and remuneracao.strip() else None
 
@@ -413,6 +622,7 @@ def criar_funcionario():
                         request.form.get('ordem') or None, remuneracao)
         conn.commit()
         conn.close()
+        invalidar_medicos()
         flash('Profissional registado!', 'success')
     except Exception as e:
         flash(f'Erro na BD: {e}', 'danger')
@@ -427,6 +637,7 @@ def remover_funcionario(id_trabalhador):
         desativar_trabalhador(cursor, id_trabalhador)
         conn.commit()
         conn.close()
+        invalidar_medicos()
         flash('Acesso desativado.', 'success')
     except Exception as e:
         flash(f'Erro ao desativar: {e}', 'danger')
@@ -441,6 +652,7 @@ def ativar_funcionario(id_trabalhador):
         ativar_trabalhador(cursor, id_trabalhador)
         conn.commit()
         conn.close()
+        invalidar_medicos()
         flash('Funcionário reativado.', 'success')
     except Exception as e:
         flash(f'Erro: {e}', 'danger')
@@ -459,6 +671,83 @@ def equipa_arquivo():
         lista = []
     return render_template('equipa_arquivo.html', equipa=lista, nome_user=session.get('user_name'))
 
+@app.route('/admin/estatisticas')
+@admin_required
+def admin_estatisticas():
+    return jsonify({
+        'pool': estatisticas_pool(),
+        'cache_referencia': cache_referencia.estatisticas(),
+        'cache_dashboard': cache_dashboard.estatisticas(),
+        'notificacoes': central_notificacoes.estatisticas(),
+        'pesquisa_relatorios': estatisticas_indice(),
+        'pesquisa_pacientes': estatisticas_indice_pacientes(),
+    })
+
+@app.route('/admin/metricas')
+@admin_required
+def admin_metricas():
+    """Latência (p50/p95/p99) por rota e por stored procedure desde o arranque do processo."""
+    if request.args.get('limpar') == '1':
+        metricas_rotas.limpar()
+        metricas_procedimentos.limpar()
+    return jsonify({
+        'rotas': metricas_rotas.resumo(),
+        'procedimentos': metricas_procedimentos.resumo(),
+    })
+
+@app.route('/admin/exportar/<entidade>.<formato>')
+@admin_required
+def exportar(entidade, formato):
+    """
+    Exporta pacientes, atendimentos ou relatórios em CSV/JSON, em streaming.
+    ?inicio=&fim= (ISO) limitam atendimentos/relatórios a um intervalo de datas.
+    """
+    if entidade not in EXPORTACOES or formato not in ('csv', 'json'):
+        return jsonify({'erro': 'Exportação desconhecida.'}), 404
+
+    data_inicio = ler_data_iso(request.args.get('inicio'))
+    data_fim = ler_data_iso(request.args.get('fim'))
+
+    def gerar():
+        # A conexão vive enquanto o ficheiro é enviado e é devolvida no fim
+        conn = get_db_connection()
+        try:
+            colunas, linhas = executar_exportacao(conn.cursor(), entidade, data_inicio, data_fim)
+            gerador = gerar_csv if formato == 'csv' else gerar_json
+            yield from gerador(colunas, linhas)
+        finally:
+            conn.close()
+
+    nome_ficheiro = f"sga_{entidade}_{datetime.now():%Y%m%d_%H%M}.{formato}"
+    mimetype = 'text/csv' if formato == 'csv' else 'application/json'
+    return Response(stream_with_context(gerar()), mimetype=f'{mimetype}; charset=utf-8',
+                    headers={'Content-Disposition': f'attachment; filename={nome_ficheiro}'})
+
+@app.route('/admin/importar/<entidade>', methods=['POST'])
+@admin_required
+def importar(entidade):
+    """
+    Importação em massa de pacientes/trabalhadores a partir de um CSV (campo 'ficheiro').
+    Retorna o relatório: contagens, débito e o motivo de cada linha rejeitada.
+    """
+    # Import tardio: o módulo (csv, decimal, threads de hash) só é preciso nesta rota de admin
+    from importacao import ENTIDADES as ENTIDADES_IMPORTACAO, importar_csv
+    if entidade not in ENTIDADES_IMPORTACAO:
+        return jsonify({'erro': 'Importação desconhecida.'}), 404
+    ficheiro = request.files.get('ficheiro')
+    if not ficheiro or not ficheiro.filename:
+        return jsonify({'erro': 'Nenhum ficheiro enviado.'}), 400
+
+    conn = get_db_connection()
+    try:
+        relatorio = importar_csv(conn, entidade, ficheiro.stream)
+    except ValueError as e:
+        # Cabeçalho inválido ou ficheiro que não é texto UTF-8
+        return jsonify({'erro': str(e)}), 400
+    finally:
+        conn.close()
+    return jsonify(relatorio)
+
 @app.route('/admin/remover_paciente/<int:id_paciente>', methods=['POST'])
 @admin_required
 def remover_paciente(id_paciente):
@@ -468,6 +757,7 @@ def remover_paciente(id_paciente):
         desativar_paciente_logico(cursor, id_paciente)
         conn.commit()
         conn.close()
+        invalidar_pacientes_agenda()
         flash('Paciente desativado.', 'success')
     except Exception as e:
         flash(f'Erro: {e}', 'danger')
@@ -482,6 +772,7 @@ def ativar_paciente(id_paciente):
         ativar_paciente_logico(cursor, id_paciente)
         conn.commit()
         conn.close()
+        invalidar_pacientes_agenda()
         flash('Paciente reativado.', 'success')
     except Exception as e:
         flash(f"Erro: {e}", "danger")
@@ -493,51 +784,166 @@ def pacientes_arquivo():
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        lista = listar_pacientes_arquivo(cursor)
+        lista, pag = paginar(listar_pacientes_arquivo_pagina, cursor)
         conn.close()
     except Exception as e:
         flash(f"Erro ao carregar arquivo: {e}", "danger")
-        lista = []
-    return render_template('pacientes_arquivo.html', pacientes=lista, nome_user=session.get('user_name'))
+        lista, pag = [], {'q': '', 'ordem': 'nome', 'proximo': None, 'primeira': True}
+    return render_template('pacientes_arquivo.html', pacientes=lista, pag=pag, nome_user=session.get('user_name'))
 
 # ==============================================================================
 # API JSON (MANTIDA IGUAL, apenas adaptada importação se necessário)
 # ==============================================================================
 
+def evento_json(row, perfil):
+    titulo = row[1]
+    if perfil == 'admin':
+        titulo = f"[{row[5]}] {row[1]}"
+    return {
+        'id': row[0],
+        'num_atendimento': row[0],
+        'title': titulo,
+        'start': row[2].isoformat(),
+        'end': row[3].isoformat(),
+        'color': '#198754' if row[4] == 'finalizado' else ('#dc3545' if row[4] == 'falta' else '#0d6efd')
+    }
+
 @app.route('/api/eventos')
 @login_required
 def api_eventos():
+    """
+    Eventos da janela visível. Com ?desde=<token> devolve só o que mudou desde esse
+    token: {'token', 'eventos', 'removidos'} ou {'completo': true} se for preciso
+    recarregar tudo. A listagem completa devolve o token no cabeçalho X-Sync-Token.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
     
+    perfil = session.get('perfil')
     filtro_medico = request.args.get('filtro_medico')
     filtro_paciente_nif = request.args.get('filtro_paciente')
-    
-    rows = listar_eventos_calendario(
-        cursor, 
-        session['user_id'], 
-        session.get('perfil'),
-        filtro_medico_id=filtro_medico,
-        filtro_paciente_nif=filtro_paciente_nif
-    )
+    # O FullCalendar envia a janela visível em start/end (ISO 8601)
+    data_inicio = ler_data_iso(request.args.get('start'))
+    data_fim = ler_data_iso(request.args.get('end'))
+    desde = request.args.get('desde')
+
+    def listar_tudo(marcador):
+        rows = listar_eventos_calendario(
+            cursor, 
+            session['user_id'], 
+            perfil,
+            filtro_medico_id=filtro_medico,
+            filtro_paciente_nif=filtro_paciente_nif,
+            data_inicio=data_inicio,
+            data_fim=data_fim
+        )
+        resposta = jsonify([evento_json(row, perfil) for row in rows])
+        if marcador:
+            resposta.headers['X-Sync-Token'] = codificar_token(marcador)
+        return resposta
+
+    def listar_alterados(marcador):
+        token = descodificar_token(desde)
+        if marcador is None or token is None or not delta_valido(token, marcador):
+            return jsonify({'completo': True})
+        try:
+            rows = listar_eventos_alterados(
+                cursor, session['user_id'], perfil, token[0],
+                filtro_medico_id=filtro_medico, filtro_paciente_nif=filtro_paciente_nif,
+                data_inicio=data_inicio, data_fim=data_fim
+            )
+        except Exception as e:
+            print(f"Erro no delta de eventos: {e}")
+            return jsonify({'completo': True})
+
+        eventos, removidos = [], []
+        for row in rows:
+            visivel = (row[4] != 'cancelado'
+                       and (data_inicio is None or row[3] > data_inicio)
+                       and (data_fim is None or row[2] < data_fim))
+            if visivel:
+                eventos.append(evento_json(row, perfil))
+            else:
+                removidos.append(row[0])
+        return jsonify({'token': codificar_token(marcador), 'eventos': eventos, 'removidos': removidos})
+
+    resposta = resposta_condicional(cursor, listar_alterados if desde else listar_tudo)
     conn.close()
-    
-    eventos = []
-    for row in rows:
-        titulo = row[1]
-        if session.get('perfil') == 'admin':
-            titulo = f"[{row[5]}] {row[1]}"
-
-        eventos.append({
-            'id': row[0],
-            'num_atendimento': row[0],
-            'title': titulo,
-            'start': row[2].isoformat(),
-            'end': row[3].isoformat(),
-            'color': '#198754' if row[4] == 'finalizado' else ('#dc3545' if row[4] == 'falta' else '#0d6efd')
-        })
-        
-    return jsonify(eventos)
+    return resposta
+
+@app.route('/api/eventos/stream')
+@login_required
+def api_eventos_stream():
+    """Stream SSE com as alterações da agenda visíveis para este utilizador/filtros."""
+    filtro = FiltroAgenda(session['user_id'], session.get('perfil'),
+                          request.args.get('filtro_medico', type=int), request.args.get('filtro_paciente'))
+    ultimo_id = request.headers.get('Last-Event-ID', type=int)
+    try:
+        stream = central_notificacoes.subscrever(filtro, ultimo_id)
+    except LimiteLigacoes as e:
+        return jsonify({'erro': str(e)}), 503
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # nginx: não acumular o stream
+    })
+
+@app.route('/api/salas/disponibilidade')
+@login_required
+def api_salas_disponibilidade():
+    """Ocupação e intervalos livres de cada sala física num dia (?data=YYYY-MM-DD, omissão: hoje)."""
+    dia = ler_data_iso(request.args.get('data'))
+    dia = dia.date() if dia else datetime.now().date()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    salas = obter_ocupacao_salas_dia(cursor, dia)
+    conn.close()
+
+    def hora(d):
+        return d.strftime('%H:%M') if d.date() == dia else d.isoformat()
+
+    return jsonify({
+        'data': dia.isoformat(),
+        'salas': [{
+            'id_sala': sala['id_sala'],
+            'nome': sala['nome'],
+            'gabinete_de': sala['id_dono'],
+            'ocupado': [{'inicio': hora(i), 'fim': hora(f), 'num_atendimento': n} for i, f, n in sala['ocupado']],
+            'livre': [{'inicio': hora(i), 'fim': hora(f)} for i, f in sala['livre']],
+        } for sala in salas],
+    })
+
+@app.route('/api/pacientes')
+@login_required
+def api_pacientes():
+    """Listagem paginada em JSON. ?arquivo=1 (admin) lista os pacientes inativos."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        if request.args.get('arquivo') == '1' and session.get('perfil') == 'admin':
+            linhas, pag = paginar(listar_pacientes_arquivo_pagina, cursor)
+            itens = [{'id': r[0], 'nome': r[1], 'nif': r[2], 'telefone': r[3],
+                      'data_inscricao': data_iso(r[4])} for r in linhas]
+        else:
+            linhas, pag = paginar(listar_pacientes_pagina, cursor, session['user_id'], session['perfil'])
+            itens = [{'id': r[0], 'nome': r[1], 'nif': r[2], 'telefone': r[3], 'email': r[4],
+                      'data_inscricao': data_iso(r[5]), 'observacoes': r[6]} for r in linhas]
+    finally:
+        conn.close()
+    return jsonify({'itens': itens, 'proximo': pag['proximo']})
+
+@app.route('/api/equipa')
+@login_required
+def api_equipa():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        linhas, pag = paginar(listar_equipa_pagina, cursor)
+    finally:
+        conn.close()
+    itens = [{'id': r[6], 'nome': r[0], 'email': r[1], 'telefone': r[2], 'perfil': r[3],
+              'cedula': r[4], 'nif': r[5]} for r in linhas]
+    return jsonify({'itens': itens, 'proximo': pag['proximo']})
 
 @app.route('/api/lista_pacientes')
 @login_required
@@ -565,13 +971,41 @@ def api_lista_pacientes():
         # Reutilizamos a função de persistência que já tens
         pacientes = listar_pacientes_dropdown_agenda(cursor, target_id, target_perfil)
         
-        return jsonify(pacientes)
+        # Vem da cache de referência: ETag do conteúdo, sem ida extra à BD
+        return resposta_json_com_etag(pacientes)
     except Exception as e:
         print(f"Erro API Pacientes: {e}")
         return jsonify([])
     finally:
         conn.close()
         
+@app.route('/api/pacientes/pesquisa')
+@login_required
+def api_pesquisa_pacientes():
+    """
+    Pesquisa rápida de pacientes ativos por prefixo do nome ou do NIF (?q=&medico_id=&limite=).
+    Mesmo âmbito de /api/lista_pacientes: o colaborador só vê os seus pacientes; o admin vê
+    todos ou, com medico_id, os desse médico.
+    """
+    texto = request.args.get('q', '').strip()
+    limite = max(1, min(request.args.get('limite', 10, type=int), 50))
+    if not texto:
+        return jsonify([])
+
+    if session['perfil'] == 'admin':
+        id_medico = request.args.get('medico_id', type=int)
+    else:
+        id_medico = session['user_id']
+
+    conn = get_db_connection()
+    try:
+        return jsonify(pesquisar_pacientes(conn.cursor(), texto, id_medico, limite))
+    except Exception as e:
+        print(f"Erro na pesquisa de pacientes: {e}")
+        return jsonify([])
+    finally:
+        conn.close()
+
 @app.route('/api/criar_paciente_rapido', methods=['POST'])
 @login_required
 def criar_paciente_rapido():
@@ -588,6 +1022,7 @@ def criar_paciente_rapido():
         # Usa a função existente
         new_id = criar_paciente_via_agenda(cursor, nif, nome, telemovel, data_nasc)
         conn.commit()
+        invalidar_pacientes_agenda()
         return jsonify({'sucesso': True, 'id': new_id, 'nif': nif, 'nome': nome})
     except Exception as e:
         conn.rollback()
@@ -599,20 +1034,29 @@ def criar_paciente_rapido():
         conn.close()
 
 @app.route('/api/horarios-disponiveis')
+@login_required
 def api_horarios():
-    id_medico = request.args.get('medico')
+    # O colaborador só vê (e marca) a sua própria agenda, como em api_agendamentos_lote
+    id_medico = session['user_id'] if session['perfil'] == 'colaborador' else request.args.get('medico')
     data = request.args.get('data')
     is_online_raw = request.args.get('is_online')
     is_online = 1 if is_online_raw == '1' else 0
     duracao = request.args.get('duracao', 60, type=int)
     ignorar_id = request.args.get('ignorar_id', type=int)
+    granularidade = request.args.get('granularidade', 60, type=int)
+    if granularidade not in (15, 30, 60): granularidade = 60
+
+    # Modo lote: vários médicos e/ou vários dias numa só chamada
+    # ?medicos=1,2,3&data=2025-01-06&data_fim=2025-01-10
+    if request.args.get('medicos') is not None or request.args.get('data_fim'):
+        return api_horarios_lote(data, request.args.get('data_fim') or data, is_online, duracao, granularidade)
 
     if not id_medico or not data: return jsonify([])
 
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        slots = obter_horarios_livres(cursor, id_medico, data, is_online, duracao, ignorar_id)
+        slots = obter_horarios_livres(cursor, id_medico, data, is_online, duracao, ignorar_id, granularidade)
     except Exception as e:
         print(f"Erro api horarios: {e}")
         slots = []
@@ -620,20 +1064,53 @@ def api_horarios():
         conn.close()
     return jsonify(slots)
 
+def api_horarios_lote(data_inicio, data_fim, is_online, duracao, granularidade):
+    """Responde {id_medico: {'slots': {dia: [horas]}, 'proximo': {'data', 'hora'} | None}}."""
+    if not data_inicio: return jsonify({})
+
+    if session['perfil'] == 'colaborador':
+        ids_medicos = [int(session['user_id'])]
+    else:
+        ids_raw = request.args.get('medicos') or request.args.get('medico') or ''
+        ids_medicos = [int(i) for i in ids_raw.split(',') if i.strip().isdigit()]
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        livres = obter_horarios_livres_lote(cursor, ids_medicos, data_inicio, data_fim,
+                                            is_online, duracao, granularidade)
+    finally:
+        conn.close()
+
+    # O próximo horário não pode ser uma hora de hoje que já passou
+    agora = datetime.now()
+    agora = (agora.date().isoformat(), agora.strftime('%H:%M'))
+    resposta = {}
+    for id_medico in (ids_medicos or livres.keys()):
+        slots = livres.get(id_medico, {})
+        proximo = next(({'data': dia, 'hora': hora} for dia in sorted(slots) for hora in slots[dia]
+                        if (dia, hora) > agora), None)
+        resposta[str(id_medico)] = {'slots': slots, 'proximo': proximo}
+    return jsonify(resposta)
+
 @app.route('/api/atendimento/<int:id_atendimento>')
 @login_required
 def api_detalhes_atendimento(id_atendimento):
     conn = get_db_connection()
     cursor = conn.cursor()
-    detalhes = obter_detalhes_atendimento(cursor, id_atendimento)
+
+    def construir(marcador):
+        detalhes = obter_detalhes_atendimento(cursor, id_atendimento)
+        if detalhes:
+            detalhes['inicio_iso'] = detalhes['inicio'].strftime('%Y-%m-%dT%H:%M')
+            detalhes['data_iso'] = detalhes['inicio'].strftime('%Y-%m-%d')
+            detalhes['hora_iso'] = detalhes['inicio'].strftime('%H:%M')
+            return jsonify(detalhes)
+        return jsonify({'erro': 'Não encontrado'}), 404
+
+    resposta = resposta_condicional(cursor, construir)
     conn.close()
-    
-    if detalhes:
-        detalhes['inicio_iso'] = detalhes['inicio'].strftime('%Y-%m-%dT%H:%M')
-        detalhes['data_iso'] = detalhes['inicio'].strftime('%Y-%m-%d')
-        detalhes['hora_iso'] = detalhes['inicio'].strftime('%H:%M')
-        return jsonify(detalhes)
-    return jsonify({'erro': 'Não encontrado'}), 404
+    return resposta
 
 @app.route('/editar_agendamento', methods=['POST'])
 @login_required
@@ -649,8 +1126,11 @@ def rota_editar_agendamento():
         conn = get_db_connection()
         cursor = conn.cursor()
         editar_agendamento(cursor, id_atendimento, data_completa, duracao)
+        detalhes = obter_detalhes_atendimento(cursor, id_atendimento) or {}
         conn.commit()
         conn.close()
+        agenda_alterada()
+        central_notificacoes.publicar('editado', int(id_atendimento), detalhes.get('id_medico'), detalhes.get('nif_paciente'))
         flash('Agendamento atualizado com sucesso!', 'success')
     except Exception as e:
         flash(f'Erro ao atualizar: {e}', 'danger')
@@ -664,8 +1144,11 @@ def rota_cancelar_agendamento(id_atendimento):
         conn = get_db_connection()
         cursor = conn.cursor()
         cancelar_agendamento(cursor, id_atendimento)
+        detalhes = obter_detalhes_atendimento(cursor, id_atendimento) or {}
         conn.commit()
         conn.close()
+        agenda_alterada()
+        central_notificacoes.publicar('cancelado', id_atendimento, detalhes.get('id_medico'), detalhes.get('nif_paciente'))
         flash('Consulta cancelada com sucesso.', 'success')
     except Exception as e:
         flash(f'Erro ao cancelar: {e}', 'danger')
@@ -684,6 +1167,7 @@ def editar_paciente_post():
              request.form.get('email'), request.form.get('observacoes'))
         conn.commit()
         conn.close()
+        invalidar_pacientes_agenda()
         flash("Ficha do paciente atualizada!", "success")
     except Exception as e:
         flash(f"Erro ao editar: {e}", "danger")
@@ -704,6 +1188,7 @@ def editar_trabalhador_post():
              request.form.get('campo_extra'))
         conn.commit()
         conn.close()
+        invalidar_medicos()
         flash("Dados do funcionário atualizados!", "success")
     except Exception as e:
         flash(f"Erro ao editar: {e}", "danger")
@@ -711,4 +1196,6 @@ def editar_trabalhador_post():
     return redirect(request.referrer)
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # Só para desenvolvimento (FLASK_DEBUG=1 liga o debugger e o reloader);
+    # em produção: gunicorn -c gunicorn.conf.py wsgi:app
+    app.run(debug=os.getenv('FLASK_DEBUG') == '1', port=int(os.getenv('PORT', 5000)))
\ No newline at end of file
@@ -0,0 +1,71 @@
+"""
+Hash de palavras-passe dos trabalhadores.
+
+Formato guardado em SGA_TRABALHADOR.senha_hash:
+    scrypt$<n>$<r>$<p>$<salt base64>$<hash base64>
+Hashes antigos (SHA-256 hex, sem salt) continuam a ser aceites e são
+convertidos no login seguinte (ver verificar_senha).
+
+O custo (SENHA_SCRYPT_N/R/P) deve ser escolhido com benchmarks/bench_hash_senha.py:
+o login é CPU-bound em cada worker, por isso o valor tem de ser medido.
+"""
+import base64
+import hashlib
+import hmac
+import os
+
+SCRYPT_N = int(os.getenv("SENHA_SCRYPT_N", 2 ** 14))
+SCRYPT_R = int(os.getenv("SENHA_SCRYPT_R", 8))
+SCRYPT_P = int(os.getenv("SENHA_SCRYPT_P", 1))
+TAMANHO_SALT = 16
+TAMANHO_HASH = 32
+
+
+def _b64(dados):
+    return base64.b64encode(dados).decode('ascii')
+
+
+def _scrypt(senha, salt, n, r, p):
+    # maxmem por omissão (32 MiB) não chega para n >= 2**15
+    return hashlib.scrypt(senha.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r * p + 2 ** 20, dklen=TAMANHO_HASH)
+
+
+def gerar_hash_senha(senha, n=None, r=None, p=None):
+    n, r, p = n or SCRYPT_N, r or SCRYPT_R, p or SCRYPT_P
+    salt = os.urandom(TAMANHO_SALT)
+    return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(_scrypt(senha, salt, n, r, p))}"
+
+
+def _e_sha256_legado(hash_guardado):
+    return len(hash_guardado) == 64 and all(c in '0123456789abcdef' for c in hash_guardado.lower())
+
+
+def verificar_senha(senha, hash_guardado):
+    """
+    Retorna (valida, precisa_rehash).
+    precisa_rehash é True para hashes SHA-256 antigos ou scrypt com custo diferente do atual.
+    """
+    if not senha or not hash_guardado:
+        return False, False
+
+    if _e_sha256_legado(hash_guardado):
+        calculado = hashlib.sha256(senha.encode()).hexdigest()
+        return hmac.compare_digest(calculado, hash_guardado.lower()), True
+
+    try:
+        algoritmo, n, r, p, salt, esperado = hash_guardado.split('$')
+        n, r, p = int(n), int(r), int(p)
+        salt, esperado = base64.b64decode(salt), base64.b64decode(esperado)
+    except ValueError:
+        return False, False
+    if algoritmo != 'scrypt':
+        return False, False
+
+    valida = hmac.compare_digest(_scrypt(senha, salt, n, r, p), esperado)
+    return valida, valida and (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+def simular_verificacao(senha):
+    """Gasta o mesmo tempo que uma verificação real (NIF inexistente não se distingue pelo tempo)."""
+    _scrypt(senha or '', b'\0' * TAMANHO_SALT, SCRYPT_N, SCRYPT_R, SCRYPT_P)
@@ -0,0 +1,364 @@
+"""
+BD em memória para o teste de carga (benchmarks/carga.py, --alvo memoria).
+
+Implementa sobre dicts os procedimentos do fluxo da agenda (login, dashboard,
+médicos, eventos e delta, pesquisa de pacientes, horários livres, criar, editar
+e cancelar marcações) com os mesmos result sets das SPs de stored_procedures.sql.
+A app e a camada de persistência correm sem alterações: o pool recebe
+BaseMemoria.ligar como fábrica de conexões (persistence.session.definir_pool).
+
+Serve para medir o custo da própria app (Flask, templates, JSON, caches) sem a BD.
+Não reproduz planos, locks nem rede: cada execute() pode esperar latencia_ms para
+simular a ida à BD. Os procedimentos correm em série (um lock para a base toda).
+Médicos e pacientes usam os NIFs de benchmarks/gerar_dados.py (o primeiro médico
+é admin), por isso as mesmas credenciais servem para os dois alvos.
+"""
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from autenticacao import gerar_hash_senha
+from benchmarks.gerar_dados import HORAS, DURACAO, PREFIXO_MEDICOS, PREFIXO_PACIENTES, nif_gerado, pessoa
+from persistence.sqlite import ProgrammingError
+
+PADRAO_EXEC = re.compile(r'\bexec\s+(\w+)([^;]*)', re.IGNORECASE)
+
+
+def _erro(numero, mensagem):
+    # Mesmo formato das mensagens do driver: as rotas procuram o número do THROW no texto
+    return ProgrammingError('42000', f"[42000] {mensagem} ({numero}) (SQLExecDirectW)")
+
+
+def _data_hora(valor):
+    if valor is None or isinstance(valor, datetime):
+        return valor
+    if isinstance(valor, date):
+        return datetime.combine(valor, datetime.min.time())
+    return datetime.fromisoformat(str(valor))
+
+
+class BaseMemoria:
+    """Médicos com gabinete, pacientes com vínculo e as consultas das semanas à volta de hoje."""
+
+    def __init__(self, medicos=20, pacientes=5000, semanas=4, ocupacao=0.6, semente=42,
+                 senha='gerado123', latencia_ms=0.0):
+        aleatorio = random.Random(semente)
+        senha_hash = gerar_hash_senha(senha)
+        self.latencia = latencia_ms / 1000
+        self._lock = threading.RLock()
+        self.versao = 1
+
+        self.nomes = {}                      # NIF -> nome
+        self.trabalhadores = {}              # id -> [NIF, perfil, senha_hash, ativo]
+        self.por_nif = {}                    # NIF -> id_trabalhador
+        self.pacientes = {}                  # NIF -> [id_paciente, ativo, versao]
+        self.nif_paciente = {}               # id_paciente -> NIF
+        self.medicos_de = defaultdict(set)   # NIF paciente -> {id_trabalhador}
+        self.pacientes_de = defaultdict(list)  # id_trabalhador -> [NIF paciente]
+        self.gabinete = {}                   # id_trabalhador -> id_sala
+        self.sala_online = medicos + 1
+        self.atendimentos = {}               # num -> [inicio, fim, estado, id_sala, id_medico, id_paciente, versao]
+        self.agenda = defaultdict(list)      # (id_medico, dia) -> [num]
+
+        for i in range(medicos):
+            id_trabalhador = i + 1
+            nif, nome, *_ = pessoa(aleatorio, nif_gerado(PREFIXO_MEDICOS, i), None, 1960, 1998)
+            self.nomes[nif] = nome
+            self.trabalhadores[id_trabalhador] = [nif, 'admin' if i == 0 else 'colaborador', senha_hash, True]
+            self.por_nif[nif] = id_trabalhador
+            self.gabinete[id_trabalhador] = id_trabalhador
+        for i in range(pacientes):
+            nif, nome, *_ = pessoa(aleatorio, nif_gerado(PREFIXO_PACIENTES, i), None, 1940, 2018)
+            self.nomes[nif] = nome
+            self.pacientes[nif] = [i + 1, True, self.versao]
+            self.nif_paciente[i + 1] = nif
+            self._vincular(nif, aleatorio.randrange(medicos) + 1)
+
+        hoje = date.today()
+        segunda = hoje - timedelta(days=hoje.weekday())
+        agora = datetime.now()
+        for n in range(-7 * semanas, 7 * semanas):
+            dia = segunda + timedelta(days=n)
+            if dia.weekday() >= 5:
+                continue
+            for id_medico, doentes in self.pacientes_de.items():
+                for hora in HORAS:
+                    if not doentes or aleatorio.random() >= ocupacao:
+                        continue
+                    inicio = datetime(dia.year, dia.month, dia.day, hora)
+                    if inicio < agora:
+                        estado = 'finalizado' if aleatorio.random() < 0.9 else 'falta'
+                    else:
+                        estado = 'agendado'
+                    sala = self.sala_online if aleatorio.random() < 0.2 else self.gabinete[id_medico]
+                    self._inserir(inicio, inicio + DURACAO, estado, sala, id_medico,
+                                  self.pacientes[aleatorio.choice(doentes)][0])
+
+    # --- Conexões (fábrica do pool) ---
+
+    def ligar(self):
+        return ConexaoMemoria(self)
+
+    def executar(self, nome, argumentos):
+        """Corre um procedimento; retorna a lista de result sets (listas de tuplos)."""
+        procedimento = getattr(self, nome.lower(), None)
+        if procedimento is None or not nome.lower().startswith('sp_'):
+            raise _erro(2812, f"Could not find stored procedure '{nome}' (BD em memória).")
+        with self._lock:
+            return procedimento(*argumentos)
+
+    # --- Auxiliares ---
+
+    def _nova_versao(self):
+        self.versao += 1
+        return self.versao
+
+    def _vincular(self, nif_paciente, id_trabalhador):
+        if id_trabalhador not in self.medicos_de[nif_paciente]:
+            self.medicos_de[nif_paciente].add(id_trabalhador)
+            self.pacientes_de[id_trabalhador].append(nif_paciente)
+            self.pacientes[nif_paciente][2] = self._nova_versao()
+
+    def _inserir(self, inicio, fim, estado, id_sala, id_medico, id_paciente):
+        num = len(self.atendimentos) + 1
+        self.atendimentos[num] = [inicio, fim, estado, id_sala, id_medico, id_paciente, self._nova_versao()]
+        self.agenda[(id_medico, inicio.date())].append(num)
+        return num
+
+    def _colide(self, id_medico, inicio, fim, ignorar=None):
+        return any(num != ignorar and a[2] != 'cancelado' and a[0] < fim and a[1] > inicio
+                   for num in self.agenda[(id_medico, inicio.date())]
+                   for a in (self.atendimentos[num],))
+
+    def _medicos_visiveis(self, id_user, perfil, filtro_medico=None):
+        if perfil == 'colaborador':
+            return [int(id_user)]
+        if filtro_medico:
+            return [int(filtro_medico)]
+        return list(self.trabalhadores)
+
+    def _consultas_do_dia(self, medicos, dia):
+        for id_medico in medicos:
+            for num in self.agenda.get((id_medico, dia), ()):
+                yield num, self.atendimentos[num]
+
+    def _evento(self, num, a):
+        return (num, self.nomes[self.nif_paciente[a[5]]], a[0], a[1], a[2],
+                self.nomes[self.trabalhadores[a[4]][0]])
+
+    def _eventos(self, id_user, perfil, filtro_medico, filtro_paciente, inicio, fim, aceitar):
+        medicos = self._medicos_visiveis(id_user, perfil, filtro_medico)
+        id_paciente = self.pacientes[filtro_paciente][0] if filtro_paciente in self.pacientes else None
+        if inicio is not None and fim is not None:
+            dias = [(inicio - timedelta(days=1)).date() + timedelta(days=n)
+                    for n in range((fim.date() - inicio.date()).days + 2)]
+            candidatos = (c for dia in dias for c in self._consultas_do_dia(medicos, dia))
+        else:
+            visiveis = set(medicos)
+            candidatos = ((num, a) for num, a in self.atendimentos.items() if a[4] in visiveis)
+        return [self._evento(num, a) for num, a in candidatos
+                if (not filtro_paciente or a[5] == id_paciente) and aceitar(a)]
+
+    # --- Procedimentos ---
+
+    def sp_obterlogin(self, nif):
+        id_trabalhador = self.por_nif.get(nif)
+        if id_trabalhador is None or not self.trabalhadores[id_trabalhador][3]:
+            return [[]]
+        nif, perfil, senha_hash, _ = self.trabalhadores[id_trabalhador]
+        return [[(id_trabalhador, senha_hash, perfil, self.nomes[nif], nif)]]
+
+    def sp_atualizarsenhatrabalhador(self, id_trabalhador, senha_hash):
+        self.trabalhadores[id_trabalhador][2] = senha_hash
+        return []
+
+    def sp_listarmedicosagenda(self):
+        return [[(i, self.nomes[t[0]]) for i, t in self.trabalhadores.items() if t[3]]]
+
+    def sp_obterdashboardtotais(self, id_trabalhador, perfil):
+        hoje = date.today()
+        medicos = self._medicos_visiveis(id_trabalhador, perfil)
+        if perfil == 'admin':
+            pacientes = sum(1 for p in self.pacientes.values() if p[1])
+        else:
+            pacientes = sum(1 for nif in self.pacientes_de[int(id_trabalhador)] if self.pacientes[nif][1])
+        equipa = sum(1 for t in self.trabalhadores.values() if t[3])
+        consultas = sum(1 for _, a in self._consultas_do_dia(medicos, hoje) if a[2] != 'cancelado')
+        return [[(pacientes, equipa, consultas)]]
+
+    def sp_obterproximasconsultas(self, id_trabalhador, perfil):
+        medicos = self._medicos_visiveis(id_trabalhador, perfil)
+        proximas = []
+        dia = date.today()
+        for _ in range(60):
+            proximas.extend(sorted((a[0], num, a) for num, a in self._consultas_do_dia(medicos, dia)
+                                   if a[2] != 'cancelado'))
+            if len(proximas) >= 5:
+                break
+            dia += timedelta(days=1)
+        return [[(num, self.nomes[self.nif_paciente[a[5]]], a[0], a[2], self.nomes[self.trabalhadores[a[4]][0]])
+                 for _, num, a in proximas[:5]]]
+
+    def sp_countconsultashoje(self):
+        consultas = [a for _, a in self._consultas_do_dia(self.trabalhadores, date.today()) if a[2] != 'cancelado']
+        online = sum(1 for a in consultas if a[3] == self.sala_online)
+        return [[(len(consultas), online, len(consultas) - online)]]
+
+    def sp_contarsalaslivresagora(self):
+        agora = datetime.now()
+        ocupadas = {a[3] for _, a in self._consultas_do_dia(self.trabalhadores, agora.date())
+                    if a[2] != 'cancelado' and a[0] <= agora < a[1]}
+        return [[(sum(1 for sala in self.gabinete.values() if sala not in ocupadas),)]]
+
+    def sp_obtermarcadoralteracoes(self):
+        vinculos = sum(len(m) for m in self.medicos_de.values())
+        total = len(self.atendimentos)
+        return [[(self.versao, self.versao, total, total, len(self.pacientes) + vinculos + total)]]
+
+    def sp_listareventoscalendario(self, id_user, perfil, filtro_medico=None, filtro_paciente=None,
+                                   data_inicio=None, data_fim=None):
+        inicio, fim = _data_hora(data_inicio), _data_hora(data_fim)
+        return [self._eventos(id_user, perfil, filtro_medico, filtro_paciente, inicio, fim,
+                              lambda a: a[2] != 'cancelado'
+                              and (fim is None or a[0] < fim) and (inicio is None or a[1] > inicio))]
+
+    def sp_listareventosalterados(self, id_user, perfil, filtro_medico, filtro_paciente,
+                                  data_inicio, data_fim, desde):
+        # Só as próprias consultas mudam nesta base: devolvidas mesmo fora da janela
+        return [self._eventos(id_user, perfil, filtro_medico, filtro_paciente, None, None,
+                              lambda a: a[6] > int(desde))]
+
+    def sp_listarpacientesindicealterados(self, desde=0):
+        ativos = [nif for nif, p in self.pacientes.items() if p[1]]
+        contagem = (len(ativos), sum(len(self.medicos_de[nif]) for nif in ativos), self.versao)
+        linhas = []
+        for nif, (id_paciente, ativo, versao) in self.pacientes.items():
+            if (not desde and ativo) or (desde and versao > int(desde)):
+                for id_medico in self.medicos_de[nif] or [None]:
+                    linhas.append((id_paciente, self.nomes[nif], nif, ativo, id_medico))
+        return [[contagem], linhas]
+
+    def sp_obterhorarioslivres(self, id_medico, data_consulta, is_online=0, duracao=60,
+                               ignorar=None, granularidade=60):
+        if granularidade not in (15, 30, 60):
+            granularidade = 60
+        dia = _data_hora(data_consulta)
+        if dia.weekday() >= 5:
+            return [[]]
+        livres = []
+        for minuto in range(540, 1080, granularidade):
+            if not (minuto + duracao <= 780 or (minuto >= 840 and minuto + duracao <= 1080)):
+                continue
+            inicio = dia + timedelta(minutes=minuto)
+            if not self._colide(int(id_medico), inicio, inicio + timedelta(minutes=duracao), ignorar):
+                livres.append((inicio.strftime('%H:%M'),))
+        return [livres]
+
+    def sp_criaragendamento(self, nif_paciente, id_medico, data_inicio, preferencia_online, duracao=60):
+        paciente = self.pacientes.get(nif_paciente)
+        if paciente is None or not paciente[1]:
+            raise _erro(50009, 'Paciente não encontrado.')
+        id_medico = int(id_medico)
+        inicio = _data_hora(data_inicio)
+        fim = inicio + timedelta(minutes=int(duracao))
+        if self._colide(id_medico, inicio, fim):
+            raise _erro(50010, 'O médico já tem consulta marcada a essa hora.')
+        sala = self.sala_online if int(preferencia_online) else self.gabinete.get(id_medico)
+        if sala is None:
+            raise _erro(50011, 'Não foi possível alocar sala.')
+        self._vincular(nif_paciente, id_medico)
+        return [[(self._inserir(inicio, fim, 'agendado', sala, id_medico, paciente[0]),)]]
+
+    def sp_obterdetalhesatendimento(self, id_atendimento):
+        a = self.atendimentos.get(int(id_atendimento))
+        if a is None:
+            return [[]]
+        nif_paciente, nif_medico = self.nif_paciente[a[5]], self.trabalhadores[a[4]][0]
+        return [[(int(id_atendimento), self.nomes[nif_paciente], nif_paciente, self.nomes[nif_medico],
+                  a[4], a[0], a[1], a[2])]]
+
+    def sp_editaragendamento(self, id_atendimento, nova_data, nova_duracao):
+        num = int(id_atendimento)
+        a = self.atendimentos[num]
+        inicio = _data_hora(nova_data)
+        fim = inicio + timedelta(minutes=int(nova_duracao))
+        if self._colide(a[4], inicio, fim, ignorar=num):
+            raise _erro(50012, 'O médico já tem consulta marcada nesse horário.')
+        self.agenda[(a[4], a[0].date())].remove(num)
+        self.agenda[(a[4], inicio.date())].append(num)
+        a[0], a[1], a[6] = inicio, fim, self._nova_versao()
+        return []
+
+    def sp_cancelaragendamento(self, id_atendimento):
+        a = self.atendimentos[int(id_atendimento)]
+        a[2], a[6] = 'cancelado', self._nova_versao()
+        return []
+
+
+class ConexaoMemoria:
+    def __init__(self, base):
+        self._base = base
+
+    def cursor(self):
+        return CursorMemoria(self._base)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class CursorMemoria:
+    """Cursor com a interface usada pela persistência (execute, fetch*, nextset)."""
+
+    def __init__(self, base):
+        self._base = base
+        self._resultados = []
+        self.description = None
+        self.fast_executemany = False
+
+    def execute(self, sql, *params):
+        if len(params) == 1 and isinstance(params[0], (tuple, list)):
+            params = tuple(params[0])
+        if self._base.latencia:
+            time.sleep(self._base.latencia)
+        if sql.strip().upper() == 'SELECT 1':
+            resultados = [[(1,)]]
+        else:
+            chamadas = PADRAO_EXEC.findall(sql)
+            if not chamadas:
+                raise _erro(40000, f"Instrução não suportada pela BD em memória: {sql.strip()[:60]}")
+            resultados, usados = [], 0
+            for nome, argumentos in chamadas:
+                n = argumentos.count('?')
+                resultados.extend(self._base.executar(nome, params[usados:usados + n]))
+                usados += n
+        self._resultados = [list(r) for r in resultados]
+        self.description = [('coluna',)] if self._resultados else None
+        return self
+
+    def fetchone(self):
+        atual = self._resultados[0] if self._resultados else []
+        return atual.pop(0) if atual else None
+
+    def fetchall(self):
+        if not self._resultados:
+            return []
+        linhas, self._resultados[0] = self._resultados[0], []
+        return linhas
+
+    def nextset(self):
+        if self._resultados:
+            self._resultados.pop(0)
+        self.description = [('coluna',)] if self._resultados else None
+        return bool(self._resultados)
+
+    def close(self):
+        self._resultados = []
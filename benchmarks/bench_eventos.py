@@ -0,0 +1,59 @@
+"""
+Benchmark do /api/eventos: histórico completo vs. janela do FullCalendar.
+
+Corre a rota real através do test client do Flask contra a BD configurada no .env
+e mede latência e tamanho da resposta. Com a janela (start/end) ambos devem manter-se
+estáveis à medida que SGA_ATENDIMENTO cresce; sem janela crescem com o histórico.
+
+    python -m benchmarks.bench_eventos --user 1 --perfil admin --repeticoes 20
+"""
+import argparse
+import statistics
+import time
+from datetime import date, timedelta
+
+from app import app
+
+
+def medir(cliente, query, repeticoes):
+    tempos, tamanho, n_eventos = [], 0, 0
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resposta = cliente.get(f'/api/eventos?{query}')
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        tamanho = len(resposta.data)
+        n_eventos = len(resposta.get_json() or [])
+    tempos.sort()
+    return {
+        'eventos': n_eventos,
+        'bytes': tamanho,
+        'p50_ms': round(statistics.median(tempos), 2),
+        'p95_ms': round(tempos[int(len(tempos) * 0.95) - 1], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--user', type=int, required=True, help='id_trabalhador usado na sessão')
+    parser.add_argument('--perfil', default='admin', choices=['admin', 'colaborador'])
+    parser.add_argument('--repeticoes', type=int, default=20)
+    args = parser.parse_args()
+
+    segunda = date.today() - timedelta(days=date.today().weekday())
+    semana = f'start={segunda.isoformat()}T00:00:00&end={(segunda + timedelta(days=7)).isoformat()}T00:00:00'
+    mes = f'start={segunda.replace(day=1).isoformat()}T00:00:00&end={(segunda + timedelta(days=42)).isoformat()}T00:00:00'
+
+    with app.test_client() as cliente:
+        with cliente.session_transaction() as s:
+            s['user_id'] = args.user
+            s['perfil'] = args.perfil
+            s['user_name'] = 'benchmark'
+
+        for nome, query in (('historico', ''), ('mes', mes), ('semana', semana)):
+            r = medir(cliente, query, args.repeticoes)
+            print(f"{nome:<10} eventos={r['eventos']:<8} bytes={r['bytes']:<10} "
+                  f"p50={r['p50_ms']}ms p95={r['p95_ms']}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Escolha do custo do scrypt para o login.
+
+Para cada N mede a latência de uma verificação com W workers a fazer login em
+simultâneo (um processo por worker, como no servidor de produção) e indica o
+maior N cujo p95 fica abaixo do alvo.
+
+    python -m benchmarks.bench_hash_senha --workers 4 --alvo-ms 250
+"""
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from autenticacao import gerar_hash_senha, verificar_senha
+
+
+def _medir_logins(args):
+    n, r, p, repeticoes = args
+    hash_guardado = gerar_hash_senha('benchmark-senha', n=n, r=r, p=p)
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        verificar_senha('benchmark-senha', hash_guardado)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='logins em simultâneo')
+    parser.add_argument('--alvo-ms', type=float, default=250, help='p95 máximo aceitável por login')
+    parser.add_argument('--repeticoes', type=int, default=10)
+    parser.add_argument('-r', type=int, default=8)
+    parser.add_argument('-p', type=int, default=1)
+    parser.add_argument('--n-max', type=int, default=17, help='expoente máximo de N (2**n)')
+    args = parser.parse_args()
+
+    escolhido = None
+    print(f"workers={args.workers} r={args.r} p={args.p} alvo_p95={args.alvo_ms}ms")
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for expoente in range(12, args.n_max + 1):
+            n = 2 ** expoente
+            inicio = time.perf_counter()
+            resultados = pool.map(_medir_logins, [(n, args.r, args.p, args.repeticoes)] * args.workers)
+            tempos = sorted(t for lista in resultados for t in lista)
+            duracao = time.perf_counter() - inicio
+            p95 = tempos[int(len(tempos) * 0.95) - 1]
+            print(f"N=2**{expoente:<3} p50={statistics.median(tempos):8.1f}ms  p95={p95:8.1f}ms  "
+                  f"logins/s={len(tempos) / duracao:7.1f}")
+            if p95 <= args.alvo_ms:
+                escolhido = n
+            else:
+                break
+
+    if escolhido:
+        print(f"\nRecomendado: SENHA_SCRYPT_N={escolhido}")
+    else:
+        print("\nNenhum N cumpre o alvo; aumentar o alvo ou o nº de CPUs.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark da importação de pacientes: uma chamada criar_paciente_completo por
+paciente (sp_guardarPessoa + sp_inserirPaciente, como no formulário) vs.
+importar_csv (lotes com fast_executemany + sp_importarPacientes).
+
+Gera um CSV sintético com NIFs válidos (semente fixa), corre os dois caminhos
+dentro de uma transação e faz ROLLBACK no fim (a BD fica como estava).
+O caminho antigo é medido numa amostra (--amostra) por ser lento.
+
+    python -m benchmarks.bench_importacao --linhas 20000 --amostra 500 --lotes 500,1000,5000
+"""
+import argparse
+import io
+import random
+import time
+from datetime import date, timedelta
+
+from importacao import digito_controlo_nif, importar_csv
+from persistence.pacientes import criar_paciente_completo
+from persistence.session import get_db_connection
+
+NOMES = ['Ana', 'João', 'Maria', 'Pedro', 'Inês', 'Rui', 'Sofia', 'Tiago', 'Beatriz', 'Miguel']
+APELIDOS = ['Silva', 'Santos', 'Ferreira', 'Pereira', 'Oliveira', 'Costa', 'Rodrigues', 'Martins']
+
+
+def gerar_pacientes(total, semente, id_medico):
+    """Linhas (nif, nome, data_nascimento, telefone, email, observacoes, id_medico) com NIFs únicos."""
+    aleatorio = random.Random(semente)
+    vistos = set()
+    linhas = []
+    while len(linhas) < total:
+        base = '29' + ''.join(aleatorio.choice('0123456789') for _ in range(6))
+        if base in vistos:
+            continue
+        vistos.add(base)
+        nome = f"{aleatorio.choice(NOMES)} {aleatorio.choice(APELIDOS)}"
+        nascimento = date(1940, 1, 1) + timedelta(days=aleatorio.randrange(365 * 80))
+        telefone = '9' + ''.join(aleatorio.choice('0123456789') for _ in range(8))
+        linhas.append((base + digito_controlo_nif(base), nome, nascimento.isoformat(), telefone,
+                       f"p{len(linhas)}@exemplo.pt", 'Importação de teste', id_medico))
+    return linhas
+
+
+def para_csv(linhas):
+    texto = 'nif;nome;data_nascimento;telefone;email;observacoes;id_medico\n'
+    texto += ''.join(';'.join(str(v) for v in linha) + '\n' for linha in linhas)
+    return texto.encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', type=int, default=20000)
+    parser.add_argument('--amostra', type=int, default=500)
+    parser.add_argument('--lotes', default='500,1000,5000')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT TOP 1 id_trabalhador FROM SGA_TRABALHADOR WHERE ativo = 1 ORDER BY id_trabalhador")
+        row = cursor.fetchone()
+        if not row:
+            print("Sem trabalhadores ativos: nada a medir.")
+            return
+        linhas = gerar_pacientes(args.linhas + args.amostra, args.semente, row[0])
+        amostra, restantes = linhas[:args.amostra], linhas[args.amostra:]
+
+        t = time.perf_counter()
+        for nif, nome, nascimento, telefone, email, obs, id_medico in amostra:
+            criar_paciente_completo(cursor, nif, nome, nascimento, telefone, email, obs, id_medico)
+        duracao = time.perf_counter() - t
+        print(f"criar_paciente_completo  {len(amostra)} linhas em {duracao:.2f}s "
+              f"-> {len(amostra) / duracao:.0f} linhas/s")
+        conn.rollback()
+
+        for tamanho in [int(x) for x in args.lotes.split(',')]:
+            relatorio = importar_csv(conn, 'pacientes', io.BytesIO(para_csv(restantes)),
+                                     tamanho_lote=tamanho, confirmar=False)
+            print(f"importar_csv lote={tamanho:<5}  {relatorio['importadas']}/{relatorio['lidas']} linhas em "
+                  f"{relatorio['segundos']:.2f}s -> {relatorio['linhas_por_segundo']:.0f} linhas/s "
+                  f"({relatorio['rejeitadas']} rejeitadas)")
+            conn.rollback()
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
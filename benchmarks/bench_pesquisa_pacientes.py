@@ -0,0 +1,87 @@
+"""
+Benchmark do índice de pesquisa rápida de pacientes (persistence/indice_pacientes.py).
+
+Não precisa da BD: gera N pacientes sintéticos (semente fixa) distribuídos por
+médicos, carrega o índice e mede a latência de pesquisas por prefixo do nome e
+do NIF, na partição do admin (todos) e na de um médico, e o custo de uma
+atualização incremental (ativar/desativar um paciente).
+
+    python -m benchmarks.bench_pesquisa_pacientes --pacientes 100000 --medicos 50
+"""
+import argparse
+import random
+import statistics
+import time
+
+from persistence.indice_pacientes import IndicePacientes, TODOS
+
+NOMES = ['Ana', 'João', 'Maria', 'Pedro', 'Inês', 'Rui', 'Sofia', 'Tiago', 'Beatriz', 'Miguel',
+         'Catarina', 'Luís', 'Marta', 'André', 'Rita', 'Gonçalo', 'Joana', 'Diogo', 'Carla', 'Nuno']
+APELIDOS = ['Silva', 'Santos', 'Ferreira', 'Pereira', 'Oliveira', 'Costa', 'Rodrigues', 'Martins',
+            'Jesus', 'Sousa', 'Fernandes', 'Gonçalves', 'Gomes', 'Lopes', 'Marques', 'Alves',
+            'Almeida', 'Ribeiro', 'Pinto', 'Carvalho', 'Teixeira', 'Moreira', 'Correia', 'Mendes']
+
+
+def gerar(total, medicos, semente):
+    aleatorio = random.Random(semente)
+    pacientes = []
+    for i in range(total):
+        nome = ' '.join([aleatorio.choice(NOMES)] + aleatorio.sample(APELIDOS, 2))
+        nif = f"2{i:08d}"
+        vinculos = {aleatorio.randrange(1, medicos + 1) for _ in range(aleatorio.choice((1, 1, 2)))}
+        pacientes.append((nif, i + 1, nome, vinculos))
+    return pacientes
+
+
+def medir(funcao, consultas):
+    tempos = []
+    for consulta in consultas:
+        t = time.perf_counter()
+        funcao(consulta)
+        tempos.append((time.perf_counter() - t) * 1000)
+    tempos.sort()
+    return round(statistics.median(tempos), 3), round(tempos[int(len(tempos) * 0.95) - 1], 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pacientes', type=int, default=100000)
+    parser.add_argument('--medicos', type=int, default=50)
+    parser.add_argument('--consultas', type=int, default=2000)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    pacientes = gerar(args.pacientes, args.medicos, args.semente)
+    indice = IndicePacientes()
+    t = time.perf_counter()
+    indice.carregar(pacientes)
+    print(f"{len(indice)} pacientes / {indice.vinculos} vínculos carregados em {time.perf_counter() - t:.2f}s")
+
+    aleatorio = random.Random(args.semente + 1)
+    nomes = [aleatorio.choice(pacientes)[2] for _ in range(args.consultas)]
+    prefixos = [n.split()[aleatorio.randrange(3)][:aleatorio.randint(2, 5)] for n in nomes]
+    dois_termos = [f"{n.split()[0][:3]} {n.split()[1][:3]}" for n in nomes]
+    nifs = [aleatorio.choice(pacientes)[0][:aleatorio.randint(3, 7)] for _ in range(args.consultas)]
+    medico = 1
+
+    for rotulo, consultas, particao in [
+        ('nome (1 termo), admin', prefixos, TODOS),
+        ('nome (2 termos), admin', dois_termos, TODOS),
+        ('NIF, admin', nifs, TODOS),
+        ('nome (1 termo), médico', prefixos, medico),
+        ('nome (2 termos), médico', dois_termos, medico),
+    ]:
+        p50, p95 = medir(lambda q: indice.pesquisar(q, particao, 10), consultas)
+        print(f"{rotulo:<26} p50={p50}ms p95={p95}ms")
+
+    amostra = aleatorio.sample(pacientes, min(500, len(pacientes)))
+    t = time.perf_counter()
+    for nif, id_paciente, nome, vinculos in amostra:
+        indice.atualizar(nif, id_paciente, nome, vinculos, ativo=False)
+        indice.atualizar(nif, id_paciente, nome, vinculos)
+    por_operacao = (time.perf_counter() - t) * 1000 / (2 * len(amostra))
+    print(f"atualização incremental   {por_operacao:.3f}ms por desativar/ativar")
+
+
+if __name__ == '__main__':
+    main()
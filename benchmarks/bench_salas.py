@@ -0,0 +1,128 @@
+"""
+Benchmark da alocação de salas: pesquisa antiga (NOT IN, só verifica o início)
+vs. udf_SalasLivres (sobreposição completa + best-fit, seek em IX_Atendimento_Sala_Inicio).
+
+Insere N marcações sintéticas nas salas comuns ativas dentro de uma transação,
+mede as duas pesquisas para intervalos aleatórios e faz ROLLBACK no fim
+(a BD fica como estava). Requer sql/udf.sql e sql/indexes.sql aplicados.
+
+    python -m benchmarks.bench_salas --marcacoes 50000 --consultas 500
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from persistence.session import get_db_connection
+
+SQL_ANTIGO = """
+SELECT TOP 1 s.id_sala
+FROM SGA_SALA s
+WHERE s.is_online = 0 AND s.ativa = 1 AND s.id_dono IS NULL
+AND s.id_sala NOT IN (
+    SELECT a.id_sala FROM SGA_ATENDIMENTO a
+    WHERE a.estado != 'cancelado'
+    AND (? >= a.data_inicio AND ? < a.data_fim)
+)
+"""
+
+SQL_NOVO = """
+SELECT TOP 1 L.id_sala
+FROM dbo.udf_SalasLivres(?, ?) L
+WHERE L.id_dono IS NULL
+ORDER BY L.folga_min, L.id_sala
+"""
+
+
+def gerar_marcacoes(salas, total, inicio, semente, ocupacao=0.7):
+    """
+    Marcações de 60/120 min sem sobreposição por sala, entre as 9h e as 18h, dia a dia
+    a partir de 'inicio' até chegar a 'total'. Retorna (marcacoes, dias_usados).
+    """
+    aleatorio = random.Random(semente)
+    linhas = []
+    dia = 0
+    while len(linhas) < total:
+        base = inicio + timedelta(days=dia)
+        for sala in salas:
+            hora = base.replace(hour=9)
+            fecho = base.replace(hour=18)
+            while hora < fecho and len(linhas) < total:
+                duracao = timedelta(minutes=aleatorio.choice((60, 120)))
+                if hora + duracao <= fecho and aleatorio.random() < ocupacao:
+                    linhas.append((sala, hora, hora + duracao, 'agendado'))
+                    hora += duracao
+                else:
+                    hora += timedelta(minutes=60)
+        dia += 1
+    return linhas, dia
+
+
+def medir(cursor, sql, intervalos, params):
+    tempos = []
+    for ini, fim in intervalos:
+        t = time.perf_counter()
+        cursor.execute(sql, params(ini, fim))
+        cursor.fetchall()
+        tempos.append((time.perf_counter() - t) * 1000)
+    tempos.sort()
+    return round(statistics.median(tempos), 3), round(tempos[int(len(tempos) * 0.95) - 1], 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--marcacoes', type=int, default=50000)
+    parser.add_argument('--consultas', type=int, default=500)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id_sala FROM SGA_SALA WHERE is_online = 0 AND ativa = 1 AND id_dono IS NULL")
+        salas = [row[0] for row in cursor.fetchall()]
+        if not salas:
+            print("Sem salas comuns ativas: nada a medir.")
+            return
+
+        inicio = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=400)
+        marcacoes, dias = gerar_marcacoes(salas, args.marcacoes, inicio, args.semente)
+
+        t = time.perf_counter()
+        cursor.fast_executemany = True
+        cursor.executemany(
+            "INSERT INTO SGA_ATENDIMENTO (id_sala, data_inicio, data_fim, estado) VALUES (?, ?, ?, ?)",
+            marcacoes,
+        )
+        print(f"{len(marcacoes)} marcações em {len(salas)} salas / {dias} dias inseridas em {time.perf_counter() - t:.1f}s")
+
+        aleatorio = random.Random(args.semente + 1)
+        intervalos = []
+        for _ in range(args.consultas):
+            ini = (inicio + timedelta(days=aleatorio.randrange(dias))).replace(hour=aleatorio.randrange(9, 17))
+            intervalos.append((ini, ini + timedelta(minutes=60)))
+
+        p50, p95 = medir(cursor, SQL_ANTIGO, intervalos, lambda i, f: (i, i))
+        print(f"antigo (NOT IN)     p50={p50}ms p95={p95}ms")
+        p50, p95 = medir(cursor, SQL_NOVO, intervalos, lambda i, f: (i, f))
+        print(f"udf_SalasLivres     p50={p50}ms p95={p95}ms")
+
+        # Diferenças de resultado: o antigo ignora consultas que começam a meio do intervalo pedido
+        conflitos = 0
+        for ini, fim in intervalos:
+            cursor.execute(SQL_ANTIGO, (ini, ini))
+            row = cursor.fetchone()
+            if row:
+                cursor.execute(
+                    "SELECT COUNT(*) FROM SGA_ATENDIMENTO WHERE id_sala = ? AND estado != 'cancelado' "
+                    "AND data_inicio < ? AND data_fim > ?", (row[0], fim, ini))
+                conflitos += 1 if cursor.fetchone()[0] else 0
+        print(f"salas em conflito escolhidas pela pesquisa antiga: {conflitos}/{len(intervalos)}")
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
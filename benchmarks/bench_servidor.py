@@ -0,0 +1,131 @@
+"""
+Benchmark do servidor: servidor de desenvolvimento do Flask (python app.py) vs.
+gunicorn (gunicorn.conf.py + wsgi.py).
+
+Para cada modo arranca o servidor num processo filho e mede:
+  - arranque a frio: desde o spawn até à primeira resposta (< 500) ao URL;
+  - débito: --concorrencia clientes com keep-alive durante --duracao segundos
+    (pedidos/s, p50/p95 da latência e erros).
+
+Precisa da BD configurada no .env (o gunicorn aquece pool e índices no arranque).
+Páginas autenticadas: passar o cookie de sessão de um browser com --cookie.
+
+    python -m benchmarks.bench_servidor --modos dev,dev-debug,gunicorn --url /login
+    python -m benchmarks.bench_servidor --modos gunicorn --url /agenda --cookie "session=..."
+"""
+import argparse
+import http.client
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modo -> (comando, variáveis de ambiente extra); {porta} é substituído
+MODOS = {
+    'dev': ([sys.executable, 'app.py'], {'FLASK_DEBUG': '0', 'PORT': '{porta}'}),
+    'dev-debug': ([sys.executable, 'app.py'], {'FLASK_DEBUG': '1', 'PORT': '{porta}'}),
+    'gunicorn': ([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                 {'WEB_BIND': '127.0.0.1:{porta}', 'WEB_ACCESS_LOG': ''}),
+}
+
+
+def pedir(conn, url, cookie):
+    conn.request('GET', url, headers={'Cookie': cookie} if cookie else {})
+    resposta = conn.getresponse()
+    resposta.read()
+    return resposta.status
+
+
+def arrancar(modo, porta, url, cookie, limite_s=60):
+    """Retorna (processo, segundos até à primeira resposta)."""
+    comando, extra = MODOS[modo]
+    ambiente = dict(os.environ, **{k: v.format(porta=porta) for k, v in extra.items()})
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(comando, cwd=RAIZ, env=ambiente,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                start_new_session=True)
+    while time.perf_counter() - inicio < limite_s:
+        if processo.poll() is not None:
+            raise RuntimeError(f"{modo}: o servidor terminou no arranque (código {processo.returncode}).")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', porta, timeout=5)
+            if pedir(conn, url, cookie) < 500:
+                conn.close()
+                return processo, time.perf_counter() - inicio
+        except OSError:
+            time.sleep(0.05)
+    parar(processo)
+    raise RuntimeError(f"{modo}: sem resposta em {limite_s}s.")
+
+
+def parar(processo):
+    # O grupo inteiro: o reloader do modo debug corre a app num processo filho
+    os.killpg(processo.pid, signal.SIGTERM)
+    processo.wait(timeout=30)
+
+
+def carga(porta, url, cookie, concorrencia, duracao):
+    latencias, erros = [], [0]
+    lock = threading.Lock()
+    fim = time.perf_counter() + duracao
+
+    def cliente():
+        conn = http.client.HTTPConnection('127.0.0.1', porta, timeout=30)
+        locais, falhas = [], 0
+        while time.perf_counter() < fim:
+            t = time.perf_counter()
+            try:
+                if pedir(conn, url, cookie) >= 500:
+                    falhas += 1
+                locais.append(time.perf_counter() - t)
+            except (OSError, http.client.HTTPException):
+                falhas += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', porta, timeout=30)
+        conn.close()
+        with lock:
+            latencias.extend(locais)
+            erros[0] += falhas
+
+    clientes = [threading.Thread(target=cliente) for _ in range(concorrencia)]
+    for c in clientes:
+        c.start()
+    for c in clientes:
+        c.join()
+
+    latencias.sort()
+    if not latencias:
+        return 0, None, None, erros[0]
+    return (len(latencias) / duracao, statistics.median(latencias) * 1000,
+            latencias[max(0, int(len(latencias) * 0.95) - 1)] * 1000, erros[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modos', default='dev,gunicorn')
+    parser.add_argument('--url', default='/login')
+    parser.add_argument('--cookie')
+    parser.add_argument('--concorrencia', type=int, default=16)
+    parser.add_argument('--duracao', type=float, default=10)
+    parser.add_argument('--porta', type=int, default=8765)
+    args = parser.parse_args()
+
+    for modo in args.modos.split(','):
+        processo, arranque = arrancar(modo, args.porta, args.url, args.cookie)
+        try:
+            carga(args.porta, args.url, args.cookie, 2, 1)  # aquecer as ligações
+            por_segundo, p50, p95, erros = carga(args.porta, args.url, args.cookie,
+                                                 args.concorrencia, args.duracao)
+        finally:
+            parar(processo)
+        latencia = f"p50={p50:.1f}ms p95={p95:.1f}ms" if p50 is not None else "sem respostas"
+        print(f"{modo:<10} arranque={arranque:.2f}s  {por_segundo:.0f} pedidos/s  {latencia}  erros={erros}")
+
+
+if __name__ == '__main__':
+    main()
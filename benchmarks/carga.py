@@ -0,0 +1,384 @@
+"""
+Teste de carga da agenda: utilizadores virtuais a repetir os fluxos reais das rotas.
+
+Cada utilizador faz login e repete o seu fluxo, com tempos de reflexão entre
+passos (exponenciais, média --pensar segundos; 0 = sem pausas):
+
+  rececao (admin)       /dashboard -> /agenda -> /api/eventos da semana ->
+                        /api/pacientes/pesquisa -> /api/horarios-disponiveis ->
+                        POST /criar_agendamento -> /api/eventos?desde= (delta);
+                        com probabilidade --edicoes abre uma consulta futura
+                        (/api/atendimento/<id>), pede os horários livres e muda-a
+                        de hora (POST /editar_agendamento). Como o browser, os POST
+                        seguem o redirect para /agenda; sem flash de sucesso (ex.:
+                        conflito) contam como erro
+  medico (colaborador)  /dashboard -> /agenda -> /api/eventos da semana e depois
+                        --atualizacoes refrescamentos da agenda, alternando
+                        If-None-Match (304) e ?desde= (delta)
+
+--mistura rececao=3,medico=1 reparte os --utilizadores pelos fluxos.
+
+Alvos:
+  --alvo memoria          a app corre neste processo (test client do Flask) com a
+                          BD substituída por benchmarks/agenda_memoria.py: mede a
+                          app sem a BD (--latencia-bd simula a ida à BD). Cliente e
+                          app partilham o GIL: comparar configurações, não
+                          capacidade absoluta.
+  --alvo processo         a app corre neste processo contra a BD configurada
+                          (DB_BACKEND/SQLITE_PATH ou o SQL Server do .env), com
+                          dados de benchmarks/gerar_dados.py: compara backends
+                          sem servidor web (ex.: DB_BACKEND=sqlite, offline).
+  --alvo http://host:porta servidor a correr (ex.: gunicorn contra um SQL Server
+                          local em container com dados de benchmarks/gerar_dados.py).
+
+Credenciais como em benchmarks/gerar_dados.py: a receção entra com o primeiro
+médico gerado (admin), os médicos com os --medicos seguintes, todos com --senha.
+
+Relatório por endpoint (pedidos, erros, p50/p95/p99/máximo em ms) e débito total;
+--json guarda-o para comparar execuções.
+
+    python -m benchmarks.carga --alvo memoria --utilizadores 40 --duracao 60 --pensar 0.5
+    DB_BACKEND=sqlite python -m benchmarks.carga --alvo processo --utilizadores 10 --pensar 0.5
+    python -m benchmarks.carga --alvo http://127.0.0.1:8000 --utilizadores 20 --medicos 118 --pensar 2
+"""
+import argparse
+import http.client
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from urllib.parse import quote, urlencode, urlsplit
+
+from benchmarks.gerar_dados import NOMES, PREFIXO_MEDICOS, nif_gerado
+
+FLUXOS = ('rececao', 'medico')
+PADRAO_MEDICOS = re.compile(r'id="filtroMedico".*?</select>', re.DOTALL)
+PADRAO_OPCAO = re.compile(r'<option value="(\d+)">')
+
+
+class ClienteHttp:
+    """Uma conexão keep-alive e os cookies de um utilizador."""
+
+    def __init__(self, url):
+        partes = urlsplit(url)
+        self.host, self.porta = partes.hostname, partes.port or 80
+        self.cookies = {}
+        self.conn = None
+
+    def pedir(self, metodo, caminho, dados=None, cabecalhos=None):
+        cabecalhos = dict(cabecalhos or {})
+        if self.cookies:
+            cabecalhos['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        corpo = None
+        if dados is not None:
+            corpo = urlencode(dados)
+            cabecalhos['Content-Type'] = 'application/x-www-form-urlencoded'
+        reutilizada = self.conn is not None
+        while True:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.porta, timeout=30)
+            try:
+                self.conn.request(metodo, caminho, body=corpo, headers=cabecalhos)
+                resposta = self.conn.getresponse()
+                conteudo = resposta.read()
+                break
+            except (OSError, http.client.HTTPException):
+                self.conn.close()
+                self.conn = None
+                # O servidor fecha as conexões paradas (keepalive): uma nova tentativa
+                if not reutilizada:
+                    raise
+                reutilizada = False
+        for valor in resposta.headers.get_all('Set-Cookie') or []:
+            nome, _, resto = valor.partition('=')
+            self.cookies[nome.strip()] = resto.split(';', 1)[0]
+        return resposta.status, conteudo, resposta.headers
+
+
+class ClienteProcesso:
+    """Test client do Flask (cookies próprios), para a app no mesmo processo."""
+
+    def __init__(self, app):
+        self.cliente = app.test_client()
+
+    def pedir(self, metodo, caminho, dados=None, cabecalhos=None):
+        resposta = self.cliente.open(caminho, method=metodo, data=dados, headers=cabecalhos)
+        return resposta.status_code, resposta.get_data(), resposta.headers
+
+
+class Utilizador:
+    def __init__(self, numero, fluxo, cliente, args, fim):
+        self.numero = numero
+        self.fluxo = fluxo
+        self.cliente = cliente
+        self.args = args
+        self.fim = fim
+        self.aleatorio = random.Random(args.semente * 1000 + numero)
+        self.tempos = defaultdict(list)
+        self.erros = Counter()
+        self.medicos = []
+
+    def ativo(self):
+        return time.perf_counter() < self.fim
+
+    def pensar(self):
+        if self.args.pensar > 0:
+            pausa = min(self.aleatorio.expovariate(1 / self.args.pensar), 4 * self.args.pensar)
+            time.sleep(max(0.0, min(pausa, self.fim - time.perf_counter())))
+
+    def pedir(self, rotulo, metodo, caminho, dados=None, cabecalhos=None, esperado=(200,)):
+        """Retorna (status, corpo, cabeçalhos); (None, None, {}) se o pedido falhar."""
+        inicio = time.perf_counter()
+        try:
+            status, corpo, resposta = self.cliente.pedir(metodo, caminho, dados, cabecalhos)
+        except Exception:
+            status, corpo, resposta = None, None, {}
+        self.tempos[rotulo].append((time.perf_counter() - inicio) * 1000)
+        if status not in esperado:
+            self.erros[rotulo] += 1
+        return status, corpo, resposta
+
+    def gravar(self, rotulo, caminho, dados):
+        """POST de formulário que redireciona para /agenda: só conta como sucesso se o flash o confirmar."""
+        status, _, _ = self.pedir(rotulo, 'POST', caminho, dados, esperado=(302,))
+        if status != 302:
+            return False
+        _, corpo, _ = self.pedir('agenda', 'GET', '/agenda')
+        if not corpo or b'alert-success' not in corpo:
+            self.erros[rotulo] += 1
+            return False
+        return True
+
+    def json(self, rotulo, caminho, vazio):
+        status, corpo, _ = self.pedir(rotulo, 'GET', caminho)
+        try:
+            return json.loads(corpo) if status == 200 else vazio
+        except ValueError:
+            return vazio
+
+    # --- Fluxos ---
+
+    def entrar(self):
+        if self.fluxo == 'rececao':
+            nif = nif_gerado(PREFIXO_MEDICOS, 0)
+        else:
+            nif = nif_gerado(PREFIXO_MEDICOS, 1 + self.numero % max(1, self.args.medicos - 1))
+        status, _, _ = self.pedir('login', 'POST', '/login', {'nif': nif, 'senha': self.args.senha}, esperado=(302,))
+        return status == 302
+
+    def janela(self):
+        """Semana (start/end do FullCalendar) de um dia útil nas próximas duas semanas."""
+        dia = date.today() + timedelta(days=self.aleatorio.randrange(14))
+        if dia.weekday() >= 5:
+            dia += timedelta(days=7 - dia.weekday())
+        segunda = dia - timedelta(days=dia.weekday())
+        return dia, f"start={segunda.isoformat()}T00:00:00&end={(segunda + timedelta(days=7)).isoformat()}T00:00:00"
+
+    def abrir_agenda(self):
+        self.pedir('dashboard', 'GET', '/dashboard')
+        self.pensar()
+        _, corpo, _ = self.pedir('agenda', 'GET', '/agenda')
+        if corpo and not self.medicos:
+            seletor = PADRAO_MEDICOS.search(corpo.decode('utf-8', 'replace'))
+            self.medicos = [int(i) for i in PADRAO_OPCAO.findall(seletor.group(0))] if seletor else []
+        dia, janela = self.janela()
+        status, corpo, resposta = self.pedir('eventos', 'GET', f'/api/eventos?{janela}')
+        try:
+            eventos = json.loads(corpo) if status == 200 else []
+        except ValueError:
+            eventos = []
+        return dia, janela, eventos, resposta.get('X-Sync-Token'), resposta.get('ETag')
+
+    def rececao(self):
+        dia, janela, eventos, token, _ = self.abrir_agenda()
+        self.pensar()
+        termo = self.aleatorio.choice(NOMES)[:self.aleatorio.randint(2, 4)]
+        pacientes = self.json('pesquisa_pacientes', f'/api/pacientes/pesquisa?q={quote(termo)}', [])
+        if not self.medicos or not pacientes or not self.ativo():
+            return
+        self.pensar()
+        id_medico = self.aleatorio.choice(self.medicos)
+        horas = self.json('horarios', f'/api/horarios-disponiveis?medico={id_medico}&data={dia.isoformat()}'
+                                      f'&duracao=60&granularidade=60', [])
+        if horas and self.ativo():
+            self.pensar()
+            self.gravar('criar_agendamento', '/criar_agendamento', {
+                'nif_paciente': self.aleatorio.choice(pacientes)['nif'], 'id_medico': id_medico,
+                'data': dia.isoformat(), 'hora': self.aleatorio.choice(horas), 'duracao': 60,
+            })
+            if token:
+                self.pedir('eventos_delta', 'GET', f'/api/eventos?{janela}&desde={token}')
+
+        agora = datetime.now().isoformat()
+        futuros = [e for e in eventos if e['start'] > agora]
+        if futuros and self.ativo() and self.aleatorio.random() < self.args.edicoes:
+            self.pensar()
+            evento = self.aleatorio.choice(futuros)
+            detalhes = self.json('detalhes_atendimento', f"/api/atendimento/{evento['id']}", {})
+            if not detalhes.get('id_medico'):
+                return
+            horas = self.json('horarios', f"/api/horarios-disponiveis?medico={detalhes['id_medico']}"
+                                          f"&data={detalhes['data_iso']}&duracao={detalhes['duracao']}"
+                                          f"&ignorar_id={evento['id']}&granularidade=60", [])
+            if horas:
+                self.pensar()
+                self.gravar('editar_agendamento', '/editar_agendamento', {
+                    'id_atendimento': evento['id'], 'data': detalhes['data_iso'],
+                    'hora': self.aleatorio.choice(horas), 'duracao': detalhes['duracao'],
+                })
+
+    def medico(self):
+        _, janela, _, token, etag = self.abrir_agenda()
+        for i in range(self.args.atualizacoes):
+            if not self.ativo():
+                return
+            self.pensar()
+            if i % 2 == 0 and etag:
+                self.pedir('eventos_etag', 'GET', f'/api/eventos?{janela}',
+                           cabecalhos={'If-None-Match': etag},
+                           esperado=(200, 304))
+            elif token:
+                _, corpo, _ = self.pedir('eventos_delta', 'GET', f'/api/eventos?{janela}&desde={token}')
+                try:
+                    token = json.loads(corpo).get('token') or token
+                except (TypeError, ValueError, AttributeError):
+                    pass
+
+    def correr(self):
+        if not self.entrar():
+            return
+        passo = getattr(self, self.fluxo)
+        while self.ativo():
+            passo()
+            self.pensar()
+
+
+def preparar_memoria(args):
+    """App neste processo, com o pool de conexões a apontar para a BD em memória."""
+    from benchmarks.agenda_memoria import BaseMemoria
+    from persistence.session import PoolConexoes, definir_pool
+
+    base = BaseMemoria(medicos=args.medicos, pacientes=args.pacientes, semente=args.semente,
+                       senha=args.senha, latencia_ms=args.latencia_bd)
+    definir_pool(PoolConexoes(fabrica=base.ligar, maximo=max(10, args.utilizadores)))
+
+    from app import app
+    app.secret_key = app.secret_key or 'teste-de-carga'
+    return lambda: ClienteProcesso(app)
+
+
+def preparar_processo(args):
+    """App neste processo, com o pool de conexões ao backend configurado."""
+    from persistence.session import PoolConexoes, definir_pool
+
+    definir_pool(PoolConexoes(maximo=max(10, args.utilizadores)))
+
+    from app import app
+    app.secret_key = app.secret_key or 'teste-de-carga'
+    return lambda: ClienteProcesso(app)
+
+
+def ler_mistura(texto):
+    mistura = {}
+    for parte in texto.split(','):
+        fluxo, _, peso = parte.partition('=')
+        if fluxo.strip() not in FLUXOS:
+            raise argparse.ArgumentTypeError(f"fluxo desconhecido: '{fluxo}' ({', '.join(FLUXOS)})")
+        mistura[fluxo.strip()] = float(peso or 1)
+    return mistura
+
+
+def repartir(total, mistura):
+    """Atribui um fluxo a cada utilizador, proporcional aos pesos (maiores restos)."""
+    soma = sum(mistura.values())
+    quotas = {f: total * p / soma for f, p in mistura.items()}
+    contagem = {f: int(q) for f, q in quotas.items()}
+    for f in sorted(quotas, key=lambda f: quotas[f] - contagem[f], reverse=True)[:total - sum(contagem.values())]:
+        contagem[f] += 1
+    return [f for f, n in contagem.items() for _ in range(n)]
+
+
+def percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def resumir(utilizadores, duracao):
+    tempos, erros = defaultdict(list), Counter()
+    for u in utilizadores:
+        for rotulo, lista in u.tempos.items():
+            tempos[rotulo].extend(lista)
+        erros.update(u.erros)
+    endpoints = {}
+    for rotulo, lista in sorted(tempos.items()):
+        lista.sort()
+        endpoints[rotulo] = {
+            'pedidos': len(lista), 'erros': erros[rotulo],
+            'p50_ms': round(percentil(lista, 0.5), 2), 'p95_ms': round(percentil(lista, 0.95), 2),
+            'p99_ms': round(percentil(lista, 0.99), 2), 'max_ms': round(lista[-1], 2),
+        }
+    pedidos = sum(e['pedidos'] for e in endpoints.values())
+    return {
+        'pedidos': pedidos, 'erros': sum(erros.values()),
+        'pedidos_s': round(pedidos / duracao, 1), 'endpoints': endpoints,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--alvo', default='memoria', help="'memoria', 'processo' ou URL do servidor")
+    parser.add_argument('--utilizadores', type=int, default=20)
+    parser.add_argument('--mistura', type=ler_mistura, default='rececao=3,medico=1')
+    parser.add_argument('--duracao', type=float, default=30, help='segundos (depois da rampa)')
+    parser.add_argument('--rampa', type=float, default=5, help='segundos para arrancar todos os utilizadores')
+    parser.add_argument('--pensar', type=float, default=1.0, help='média do tempo de reflexão (s)')
+    parser.add_argument('--edicoes', type=float, default=0.3, help='probabilidade de a receção editar uma consulta')
+    parser.add_argument('--atualizacoes', type=int, default=6, help='refrescamentos da agenda por ciclo do médico')
+    parser.add_argument('--medicos', type=int, default=20, help='médicos gerados (logins dos médicos)')
+    parser.add_argument('--senha', default='gerado123')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--pacientes', type=int, default=5000, help='memoria: pacientes na BD em memória')
+    parser.add_argument('--latencia-bd', type=float, default=0.0, help='memoria: ms por ida à BD')
+    parser.add_argument('--json', help='guardar o relatório neste ficheiro')
+    args = parser.parse_args()
+
+    if args.alvo == 'memoria':
+        novo_cliente = preparar_memoria(args)
+    elif args.alvo == 'processo':
+        novo_cliente = preparar_processo(args)
+    else:
+        novo_cliente = lambda: ClienteHttp(args.alvo)
+
+    inicio = time.perf_counter()
+    fim = inicio + args.rampa + args.duracao
+    utilizadores = [Utilizador(n, fluxo, novo_cliente(), args, fim)
+                    for n, fluxo in enumerate(repartir(args.utilizadores, args.mistura))]
+
+    def arrancar(u):
+        time.sleep(args.rampa * u.numero / max(1, len(utilizadores)))
+        u.correr()
+
+    threads = [threading.Thread(target=arrancar, args=(u,), daemon=True) for u in utilizadores]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    resumo = resumir(utilizadores, time.perf_counter() - inicio)
+    resumo['parametros'] = {k: v for k, v in vars(args).items() if k != 'senha'}
+    print(f"{'endpoint':<22}{'pedidos':>9}{'erros':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)")
+    for rotulo, e in resumo['endpoints'].items():
+        print(f"{rotulo:<22}{e['pedidos']:>9}{e['erros']:>7}{e['p50_ms']:>9}{e['p95_ms']:>9}"
+              f"{e['p99_ms']:>9}{e['max_ms']:>9}")
+    taxa = 100 * resumo['erros'] / max(1, resumo['pedidos'])
+    print(f"{resumo['pedidos']} pedidos, {resumo['pedidos_s']} pedidos/s, "
+          f"{resumo['erros']} erros ({taxa:.2f}%), {len(utilizadores)} utilizadores")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resumo, f, indent=2, ensure_ascii=False, default=str)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,427 @@
+"""
+Gerador de dados sintéticos para testes de carga e de regressão.
+
+Gera uma clínica com anos de histórico, com integridade referencial:
+médicos (SGA_PESSOA, SGA_TRABALHADOR, contrato/prestação de serviço e um gabinete
+cada), pacientes com vínculos clínicos, consultas (SGA_ATENDIMENTO e as ligações a
+médico e paciente) e relatórios das consultas realizadas.
+
+  - Reprodutível: a mesma --semente, os mesmos parâmetros e a mesma
+    --data-referencia dão os mesmos dados (os ids começam depois dos existentes).
+    A data de referência por omissão é fixa (DATA_REFERENCIA); para uma agenda
+    à volta de hoje (ex.: benchmarks/carga.py) passar --data-referencia $(date +%F).
+  - Consultas em dias úteis, de hora a hora das 9h às 17h (50 min), sem
+    sobreposição por médico, no gabinete do médico ou na sala online, só com
+    pacientes do médico já inscritos; estado conforme a data (passadas:
+    finalizado/falta/cancelado; futuras: agendado/cancelado).
+  - Relatórios só de consultas finalizadas, do médico para o paciente da consulta.
+  - Carga em lotes de --lote linhas por tabela com fast_executemany e ids
+    explícitos (IDENTITY_INSERT), um commit por lote. Os triggers de
+    SGA_ESTATISTICA_DIARIA ficam desligados durante a carga e a tabela é
+    reconstruída no fim (sp_reconstruirEstatisticaDiaria).
+
+Os dados gerados usam NIFs começados por 17 (médicos) e 27 (pacientes) e emails
+@gerado.sga; --limpar apaga-os (e tudo o que deles depende).
+Os médicos entram com a senha --senha; o primeiro gerado é admin.
+
+    python -m benchmarks.gerar_dados --pacientes 100000 --consultas 5000000 --relatorios 1000000
+    python -m benchmarks.gerar_dados --pacientes 2000 --consultas 50000 --relatorios 10000 --anos 1
+    python -m benchmarks.gerar_dados --limpar
+
+Sem --medicos, o número de médicos é o necessário para ~70% de ocupação da agenda.
+Escreve na BD configurada (DB_BACKEND: SQL Server ou o ficheiro SQLite de SQLITE_PATH).
+"""
+import argparse
+import bisect
+import math
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from autenticacao import gerar_hash_senha
+from importacao import digito_controlo_nif
+from persistence.importacao import (
+    SQL_BIT, SQL_CHAR, SQL_INTEGER, SQL_NUMERIC, SQL_TYPE_DATE, SQL_TYPE_TIMESTAMP, SQL_VARCHAR
+)
+from persistence.dashboard import verificar_estatistica_diaria
+from persistence.session import get_db_connection
+
+DOMINIO = 'gerado.sga'
+PREFIXO_MEDICOS = '17'
+PREFIXO_PACIENTES = '27'
+SALA_ONLINE = 'Online (dados gerados)'
+HORAS = list(range(9, 18))
+DURACAO = timedelta(minutes=50)
+OCUPACAO = 0.7
+DATA_REFERENCIA = date(2026, 1, 5)
+TRIGGERS = [('trg_EstatisticaAtendimento', 'SGA_ATENDIMENTO'),
+            ('trg_EstatisticaTrabalhadorAtendimento', 'SGA_TRABALHADOR_ATENDIMENTO')]
+
+NOMES = ['Ana', 'João', 'Maria', 'Pedro', 'Inês', 'Rui', 'Sofia', 'Tiago', 'Beatriz', 'Miguel',
+         'Catarina', 'Luís', 'Marta', 'André', 'Rita', 'Gonçalo', 'Joana', 'Diogo', 'Carla', 'Nuno',
+         'Leonor', 'Francisco', 'Mariana', 'Duarte', 'Matilde', 'Afonso', 'Carolina', 'Vasco']
+APELIDOS = ['Silva', 'Santos', 'Ferreira', 'Pereira', 'Oliveira', 'Costa', 'Rodrigues', 'Martins',
+            'Jesus', 'Sousa', 'Fernandes', 'Gonçalves', 'Gomes', 'Lopes', 'Marques', 'Alves',
+            'Almeida', 'Ribeiro', 'Pinto', 'Carvalho', 'Teixeira', 'Moreira', 'Correia', 'Mendes']
+FRASES = [
+    'Paciente compareceu à sessão pontualmente e mostrou-se colaborante.',
+    'Refere melhoria do padrão de sono desde a última consulta.',
+    'Mantém queixas de ansiedade em contexto laboral.',
+    'Trabalhadas estratégias de regulação emocional e respiração diafragmática.',
+    'Revisto o registo de pensamentos automáticos da semana.',
+    'Humor ligeiramente deprimido, sem ideação suicida.',
+    'Aplicada a escala de avaliação de sintomas; resultados em linha com a anterior.',
+    'Discutidos conflitos familiares recentes e formas de comunicação assertiva.',
+    'Exposição gradual às situações evitadas com boa adesão.',
+    'Combinadas tarefas para casa: diário de atividades e de humor.',
+    'Relata episódios de irritabilidade e dificuldade de concentração.',
+    'Boa evolução do quadro; ponderar espaçar as sessões.',
+    'Sessão focada na prevenção de recaída.',
+    'Articulação com o médico de família a propósito da medicação.',
+]
+
+# tabela -> (colunas (nome, tipo ODBC, tamanho, casas), ids explícitos na coluna IDENTITY)
+# Pela ordem das chaves estrangeiras: cada lote insere os pais antes dos filhos.
+TABELAS = {
+    'SGA_PESSOA': ([
+        ('NIF', SQL_CHAR, 9, 0),
+        ('nome', SQL_VARCHAR, 50, 0),
+        ('data_nascimento', SQL_TYPE_DATE, 0, 0),
+        ('telefone', SQL_CHAR, 9, 0),
+        ('email', SQL_VARCHAR, 100, 0),
+    ], False),
+    'SGA_TRABALHADOR': ([
+        ('id_trabalhador', SQL_INTEGER, 0, 0),
+        ('NIF', SQL_CHAR, 9, 0),
+        ('senha_hash', SQL_VARCHAR, 255, 0),
+        ('tipo_perfil', SQL_VARCHAR, 20, 0),
+        ('cedula_profissional', SQL_CHAR, 5, 0),
+        ('ativo', SQL_BIT, 0, 0),
+        ('data_inicio', SQL_TYPE_DATE, 0, 0),
+        ('data_fim', SQL_TYPE_DATE, 0, 0),
+    ], True),
+    'SGA_CONTRATADO': ([
+        ('id_trabalhador', SQL_INTEGER, 0, 0),
+        ('contrato_trabalho', SQL_VARCHAR, 20, 0),
+    ], False),
+    'SGA_PRESTADOR_SERVICO': ([
+        ('id_trabalhador', SQL_INTEGER, 0, 0),
+        ('ordem', SQL_VARCHAR, 50, 0),
+        ('remuneracao', SQL_NUMERIC, 10, 2),
+    ], False),
+    'SGA_SALA': ([
+        ('id_sala', SQL_INTEGER, 0, 0),
+        ('nome', SQL_VARCHAR, 50, 0),
+        ('is_online', SQL_BIT, 0, 0),
+        ('ativa', SQL_BIT, 0, 0),
+        ('id_dono', SQL_INTEGER, 0, 0),
+    ], True),
+    'SGA_PACIENTE': ([
+        ('id_paciente', SQL_INTEGER, 0, 0),
+        ('NIF', SQL_CHAR, 9, 0),
+        ('data_inscricao', SQL_TYPE_DATE, 0, 0),
+        ('observacoes', SQL_VARCHAR, 250, 0),
+        ('ativo', SQL_BIT, 0, 0),
+    ], True),
+    'SGA_VINCULO_CLINICO': ([
+        ('NIF_trabalhador', SQL_CHAR, 9, 0),
+        ('NIF_paciente', SQL_CHAR, 9, 0),
+        ('tipo_vinculo', SQL_VARCHAR, 50, 0),
+        ('data_inicio', SQL_TYPE_TIMESTAMP, 27, 7),
+    ], False),
+    'SGA_ATENDIMENTO': ([
+        ('num_atendimento', SQL_INTEGER, 0, 0),
+        ('data_inicio', SQL_TYPE_TIMESTAMP, 27, 7),
+        ('data_fim', SQL_TYPE_TIMESTAMP, 27, 7),
+        ('estado', SQL_VARCHAR, 20, 0),
+        ('id_sala', SQL_INTEGER, 0, 0),
+    ], True),
+    'SGA_TRABALHADOR_ATENDIMENTO': ([
+        ('id_trabalhador', SQL_INTEGER, 0, 0),
+        ('num_atendimento', SQL_INTEGER, 0, 0),
+    ], False),
+    'SGA_PACIENTE_ATENDIMENTO': ([
+        ('id_paciente', SQL_INTEGER, 0, 0),
+        ('num_atendimento', SQL_INTEGER, 0, 0),
+        ('observacoes', SQL_VARCHAR, 250, 0),
+        ('presenca', SQL_BIT, 0, 0),
+    ], False),
+    'SGA_RELATORIO': ([
+        ('id', SQL_INTEGER, 0, 0),
+        ('id_paciente', SQL_INTEGER, 0, 0),
+        ('id_autor', SQL_INTEGER, 0, 0),
+        ('tipo_relatorio', SQL_VARCHAR, 50, 0),
+        ('data_criacao', SQL_TYPE_TIMESTAMP, 27, 7),
+        # varchar(max) com tamanho fixo: o fast_executemany não envia a coluna por partes
+        ('conteudo', SQL_VARCHAR, 4000, 0),
+    ], True),
+}
+
+LIMPAR = f"""
+SET NOCOUNT ON;
+SELECT NIF INTO #Pessoas FROM SGA_PESSOA WHERE email LIKE '%@{DOMINIO}';
+SELECT id_paciente INTO #Pacientes FROM SGA_PACIENTE WHERE NIF IN (SELECT NIF FROM #Pessoas);
+SELECT id_trabalhador INTO #Trabalhadores FROM SGA_TRABALHADOR WHERE NIF IN (SELECT NIF FROM #Pessoas);
+SELECT num_atendimento INTO #Atendimentos FROM SGA_TRABALHADOR_ATENDIMENTO
+    WHERE id_trabalhador IN (SELECT id_trabalhador FROM #Trabalhadores)
+UNION
+SELECT num_atendimento FROM SGA_PACIENTE_ATENDIMENTO
+    WHERE id_paciente IN (SELECT id_paciente FROM #Pacientes);
+
+DELETE FROM SGA_RELATORIO WHERE id_paciente IN (SELECT id_paciente FROM #Pacientes)
+    OR id_autor IN (SELECT id_trabalhador FROM #Trabalhadores);
+DELETE FROM SGA_PACIENTE_ATENDIMENTO WHERE num_atendimento IN (SELECT num_atendimento FROM #Atendimentos);
+DELETE FROM SGA_TRABALHADOR_ATENDIMENTO WHERE num_atendimento IN (SELECT num_atendimento FROM #Atendimentos);
+DELETE FROM SGA_ATENDIMENTO WHERE num_atendimento IN (SELECT num_atendimento FROM #Atendimentos);
+DELETE FROM SGA_VINCULO_CLINICO WHERE NIF_trabalhador IN (SELECT NIF FROM #Pessoas)
+    OR NIF_paciente IN (SELECT NIF FROM #Pessoas);
+DELETE FROM SGA_SALA WHERE id_dono IN (SELECT id_trabalhador FROM #Trabalhadores) OR nome = '{SALA_ONLINE}';
+DELETE FROM SGA_CONTRATADO WHERE id_trabalhador IN (SELECT id_trabalhador FROM #Trabalhadores);
+DELETE FROM SGA_PRESTADOR_SERVICO WHERE id_trabalhador IN (SELECT id_trabalhador FROM #Trabalhadores);
+DELETE FROM SGA_PACIENTE WHERE id_paciente IN (SELECT id_paciente FROM #Pacientes);
+DELETE FROM SGA_TRABALHADOR WHERE id_trabalhador IN (SELECT id_trabalhador FROM #Trabalhadores);
+DELETE FROM SGA_PESSOA WHERE NIF IN (SELECT NIF FROM #Pessoas);
+SELECT (SELECT COUNT(*) FROM #Pessoas), (SELECT COUNT(*) FROM #Atendimentos);
+"""
+
+
+class Carga:
+    """Acumula linhas por tabela e insere-as em lotes (fast_executemany, tipos explícitos)."""
+
+    def __init__(self, conn, lote):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.lote = lote
+        self.pendentes = {tabela: [] for tabela in TABELAS}
+        self.inseridas = dict.fromkeys(TABELAS, 0)
+
+    def adicionar(self, tabela, linha):
+        pendentes = self.pendentes[tabela]
+        pendentes.append(linha)
+        if len(pendentes) >= self.lote:
+            self.despejar()
+
+    def despejar(self):
+        for tabela, linhas in self.pendentes.items():
+            if linhas:
+                self._inserir(tabela, linhas)
+                self.inseridas[tabela] += len(linhas)
+                self.pendentes[tabela] = []
+        self.conn.commit()
+
+    def _inserir(self, tabela, linhas):
+        colunas, identidade = TABELAS[tabela]
+        if identidade:
+            self.cursor.execute(f"SET IDENTITY_INSERT {tabela} ON")
+        self.cursor.fast_executemany = True
+        self.cursor.setinputsizes([(tipo, tamanho, casas) for _, tipo, tamanho, casas in colunas])
+        try:
+            self.cursor.executemany(
+                f"INSERT INTO {tabela} ({', '.join(c[0] for c in colunas)}) VALUES ({', '.join('?' * len(colunas))})",
+                linhas,
+            )
+        finally:
+            self.cursor.fast_executemany = False
+            self.cursor.setinputsizes(None)
+            if identidade:
+                self.cursor.execute(f"SET IDENTITY_INSERT {tabela} OFF")
+
+
+def nif_gerado(prefixo, n):
+    base = f"{prefixo}{n:06d}"
+    return base + digito_controlo_nif(base)
+
+
+def pessoa(aleatorio, nif, email, nascido_de, nascido_ate):
+    nome = ' '.join([aleatorio.choice(NOMES)] + aleatorio.sample(APELIDOS, 2))
+    nascimento = date(nascido_de, 1, 1) + timedelta(days=aleatorio.randrange(365 * (nascido_ate - nascido_de)))
+    telefone = '9' + ''.join(aleatorio.choice('0123456789') for _ in range(8))
+    return (nif, nome, nascimento, telefone, email)
+
+
+def estado_consulta(aleatorio, passada):
+    sorteio = aleatorio.random()
+    if passada:
+        return 'finalizado' if sorteio < 0.82 else 'falta' if sorteio < 0.9 else 'cancelado'
+    return 'agendado' if sorteio < 0.93 else 'cancelado'
+
+
+def ids_base(cursor):
+    cursor.execute("""
+        SELECT (SELECT ISNULL(MAX(id_trabalhador), 0) FROM SGA_TRABALHADOR),
+               (SELECT ISNULL(MAX(id_sala), 0) FROM SGA_SALA),
+               (SELECT ISNULL(MAX(id_paciente), 0) FROM SGA_PACIENTE),
+               (SELECT ISNULL(MAX(num_atendimento), 0) FROM SGA_ATENDIMENTO),
+               (SELECT ISNULL(MAX(id), 0) FROM SGA_RELATORIO),
+               (SELECT COUNT(*) FROM SGA_PESSOA WHERE NIF LIKE ? OR NIF LIKE ?)
+    """, (PREFIXO_MEDICOS + '%', PREFIXO_PACIENTES + '%'))
+    return cursor.fetchone()
+
+
+def alternar_triggers(cursor, ligar):
+    for trigger, tabela in TRIGGERS:
+        cursor.execute(f"{'ENABLE' if ligar else 'DISABLE'} TRIGGER {trigger} ON {tabela}")
+    cursor.commit()
+
+
+def gerar(carga, args, base, medicos, dias):
+    aleatorio = random.Random(args.semente)
+    base_trabalhador, base_sala, base_paciente, num_atendimento, id_relatorio = base
+    referencia = args.data_referencia
+    agora = datetime.combine(referencia, datetime.min.time()) + timedelta(hours=13)
+    senha_hash = gerar_hash_senha(args.senha)
+
+    # Médicos: ~5% saíram durante o período (deixam de ter consultas depois da data_fim)
+    equipa = []  # (id_trabalhador, NIF, id do gabinete, data_fim)
+    for i in range(medicos):
+        id_trabalhador, id_sala = base_trabalhador + i + 1, base_sala + i + 1
+        linha = pessoa(aleatorio, nif_gerado(PREFIXO_MEDICOS, i), f"t{i}@{DOMINIO}", 1960, 1998)
+        entrada = dias[0] - timedelta(days=aleatorio.randrange(3 * 365))
+        saida = None
+        if i and aleatorio.random() < 0.05:
+            saida = dias[0] + timedelta(days=aleatorio.randrange(max(1, (referencia - dias[0]).days)))
+        carga.adicionar('SGA_PESSOA', linha)
+        carga.adicionar('SGA_TRABALHADOR', (id_trabalhador, linha[0], senha_hash, 'admin' if i == 0 else 'colaborador',
+                                            f"{aleatorio.randrange(100000):05d}", saida is None, entrada, saida))
+        if aleatorio.random() < 0.7:
+            carga.adicionar('SGA_CONTRATADO', (id_trabalhador, aleatorio.choice(['Sem termo', 'Termo certo'])))
+        else:
+            carga.adicionar('SGA_PRESTADOR_SERVICO', (id_trabalhador, 'Ordem dos Psicólogos Portugueses',
+                                                      Decimal(aleatorio.randrange(150000, 400000)) / 100))
+        carga.adicionar('SGA_SALA', (id_sala, f"Gabinete G{i + 1}", False, True, id_trabalhador))
+        equipa.append((id_trabalhador, linha[0], id_sala, saida))
+    sala_online = base_sala + medicos + 1
+    carga.adicionar('SGA_SALA', (sala_online, SALA_ONLINE, True, True, None))
+
+    # Pacientes: inscritos ao longo do período (e no ano anterior), um médico responsável
+    # e ~20% com um segundo em acompanhamento
+    inscricoes = [[] for _ in range(medicos)]  # por médico: (ordinal da inscrição, id_paciente)
+    primeiro_dia = dias[0] - timedelta(days=365)
+    for i in range(args.pacientes):
+        id_paciente = base_paciente + i + 1
+        linha = pessoa(aleatorio, nif_gerado(PREFIXO_PACIENTES, i), f"p{i}@{DOMINIO}", 1940, 2018)
+        inscricao = primeiro_dia + timedelta(days=aleatorio.randrange((referencia - primeiro_dia).days + 1))
+        carga.adicionar('SGA_PESSOA', linha)
+        carga.adicionar('SGA_PACIENTE', (id_paciente, linha[0], inscricao,
+                                         'Dados gerados' if aleatorio.random() < 0.1 else None,
+                                         aleatorio.random() < 0.9))
+        responsavel = aleatorio.randrange(medicos)
+        vinculos = [(responsavel, 'Responsável Principal')]
+        if medicos > 1 and aleatorio.random() < 0.2:
+            vinculos.append(((responsavel + aleatorio.randrange(1, medicos)) % medicos, 'Acompanhamento'))
+        for m, tipo in vinculos:
+            carga.adicionar('SGA_VINCULO_CLINICO', (equipa[m][1], linha[0], tipo,
+                                                    datetime.combine(inscricao, datetime.min.time()) + timedelta(hours=10)))
+            inscricoes[m].append((inscricao.toordinal(), id_paciente))
+    for lista in inscricoes:
+        lista.sort()
+    datas_de = [[d for d, _ in lista] for lista in inscricoes]
+    pacientes_de = [[p for _, p in lista] for lista in inscricoes]
+
+    # Consultas: cada médico ocupa cada hora com probabilidade p; relatórios numa
+    # fração das finalizadas (mais de um por consulta se --relatorios o exigir)
+    p = args.consultas / (len(dias) * len(HORAS) * medicos)
+    passadas = sum(1 for d in dias if d < referencia) / len(dias)
+    por_finalizada = args.relatorios / max(1.0, args.consultas * passadas * 0.82)
+    relatorios_fixos, relatorios_extra = int(por_finalizada), por_finalizada % 1
+
+    for dia in dias:
+        ordinal = dia.toordinal()
+        for m, (id_trabalhador, _, gabinete, saida) in enumerate(equipa):
+            if saida is not None and dia > saida:
+                continue
+            ocupadas = sum(1 for _ in HORAS if aleatorio.random() < p)
+            elegiveis = bisect.bisect_right(datas_de[m], ordinal)
+            if not ocupadas or not elegiveis:
+                continue
+            for hora in sorted(aleatorio.sample(HORAS, ocupadas)):
+                inicio = datetime(dia.year, dia.month, dia.day, hora)
+                estado = estado_consulta(aleatorio, inicio < agora)
+                id_paciente = pacientes_de[m][aleatorio.randrange(elegiveis)]
+                num_atendimento += 1
+                carga.adicionar('SGA_ATENDIMENTO', (num_atendimento, inicio, inicio + DURACAO, estado,
+                                                    sala_online if aleatorio.random() < 0.2 else gabinete))
+                carga.adicionar('SGA_TRABALHADOR_ATENDIMENTO', (id_trabalhador, num_atendimento))
+                carga.adicionar('SGA_PACIENTE_ATENDIMENTO', (id_paciente, num_atendimento, None, estado == 'finalizado'))
+                if estado != 'finalizado':
+                    continue
+                for _ in range(relatorios_fixos + (aleatorio.random() < relatorios_extra)):
+                    id_relatorio += 1
+                    tipo = aleatorio.choices(['Consulta', 'Acompanhamento', 'Avaliação', 'Urgência'], (80, 12, 6, 2))[0]
+                    conteudo = ' '.join(aleatorio.sample(FRASES, aleatorio.randint(2, 6)))
+                    carga.adicionar('SGA_RELATORIO', (id_relatorio, id_paciente, id_trabalhador, tipo,
+                                                      inicio + DURACAO + timedelta(minutes=aleatorio.randrange(5, 240)),
+                                                      conteudo))
+    carga.despejar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pacientes', type=int, default=10000)
+    parser.add_argument('--consultas', type=int, default=200000)
+    parser.add_argument('--relatorios', type=int, default=50000)
+    parser.add_argument('--medicos', type=int, help='omissão: o necessário para ~70%% de ocupação')
+    parser.add_argument('--anos', type=int, default=3, help='anos de histórico até à data de referência')
+    parser.add_argument('--dias-futuros', type=int, default=60, help='agenda marcada depois da data de referência')
+    parser.add_argument('--data-referencia', type=date.fromisoformat, default=DATA_REFERENCIA,
+                        help=f'fim do histórico, AAAA-MM-DD (omissão: {DATA_REFERENCIA})')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--lote', type=int, default=10000)
+    parser.add_argument('--senha', default='gerado123')
+    parser.add_argument('--limpar', action='store_true', help='apaga os dados gerados e sai')
+    args = parser.parse_args()
+
+    inicio = args.data_referencia - timedelta(days=365 * args.anos)
+    dias = [d for d in (inicio + timedelta(days=n) for n in range((args.data_referencia - inicio).days + args.dias_futuros + 1))
+            if d.weekday() < 5]
+    vagas_por_medico = len(dias) * len(HORAS)
+    medicos = args.medicos or max(5, math.ceil(args.consultas / (vagas_por_medico * OCUPACAO)))
+    if args.consultas > medicos * vagas_por_medico:
+        parser.error(f"{args.consultas} consultas não cabem em {medicos} médicos x {vagas_por_medico} vagas: "
+                     f"aumentar --medicos ou --anos.")
+    if args.pacientes >= 10 ** 6 or medicos >= 10 ** 6:
+        parser.error("Máximo de 999999 pacientes e de 999999 médicos (NIFs com prefixo fixo).")
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    t = time.perf_counter()
+    try:
+        alternar_triggers(cursor, False)
+        try:
+            if args.limpar:
+                cursor.execute(LIMPAR)
+                while cursor.description is None and cursor.nextset():
+                    pass
+                pessoas, atendimentos = cursor.fetchone()
+                conn.commit()
+                print(f"Apagadas {pessoas} pessoas geradas e {atendimentos} consultas.")
+            else:
+                base = ids_base(cursor)
+                if base[5]:
+                    parser.error(f"Já existem pessoas com NIF {PREFIXO_MEDICOS}/{PREFIXO_PACIENTES}...: "
+                                 f"correr primeiro com --limpar.")
+                carga = Carga(conn, args.lote)
+                gerar(carga, args, base[:5], medicos, dias)
+                segundos = time.perf_counter() - t
+                total = sum(carga.inseridas.values())
+                for tabela, linhas in carga.inseridas.items():
+                    print(f"{tabela:<28} {linhas:>10}")
+                print(f"{total} linhas em {segundos:.1f}s ({total / segundos:.0f} linhas/s), {medicos} médicos")
+        finally:
+            alternar_triggers(cursor, True)
+
+        t = time.perf_counter()
+        desde, ate = (None, None) if args.limpar else (dias[0], dias[-1])
+        divergencias = verificar_estatistica_diaria(cursor, reparar=True, desde=desde, ate=ate)
+        conn.commit()
+        print(f"SGA_ESTATISTICA_DIARIA: {len(divergencias)} linhas reconstruídas em {time.perf_counter() - t:.1f}s")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,334 @@
+"""
+Custos e planos reais dos procedimentos de sql/stored_procedures.sql, para justificar
+os índices de sql/indexes.sql com números.
+
+Para cada procedimento da carga (CARGA, parâmetros tirados dos dados: o médico com mais
+consultas, o paciente com mais relatórios, ...):
+  - duração: mediana de --repeticoes execuções com cache quente (lidas até ao fim);
+  - uma execução com SET STATISTICS XML ON: leituras lógicas e CPU somadas de todas as
+    instruções (incluindo triggers), operadores de scan por tabela, sugestões de
+    índices em falta do otimizador, e os planos em <saida>/<rótulo>-<n>.sqlplan
+    (abrem no SSMS / Azure Data Studio).
+As escritas (marcar/cancelar) correm numa transação desfeita no fim.
+
+Antes/depois: --sem-pacote põe a BD como estava antes do pacote de índices da
+carga (a secção "Pacote de índices" de sql/indexes.sql): desativa (ALTER INDEX ...
+DISABLE) os índices que o pacote cria e volta a criar os que o pacote elimina;
+no fim repõe tudo. Os índices anteriores ao pacote ficam ativos nas duas medições.
+--comparar imprime a tabela e grava-a em <DEPOIS>/comparacao.txt, para juntar ao
+commit que altera os índices.
+Só numa BD de teste, por exemplo num contentor local com dados em volume:
+
+    docker run -e ACCEPT_EULA=Y -e MSSQL_SA_PASSWORD='...' -p 1433:1433 -d mcr.microsoft.com/mssql/server:2022-latest
+    (criar a BD com sql/scripts/*.sql e sql/*.sql; apontar o .env para o contentor)
+
+    python -m benchmarks.planos --saida planos/antes --sem-pacote
+    python -m benchmarks.planos --saida planos/depois
+    python -m benchmarks.planos --comparar planos/antes planos/depois
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import time
+import xml.etree.ElementTree as ET
+from datetime import date, datetime, timedelta
+
+from persistence.session import get_db_connection
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NS = {'p': 'http://schemas.microsoft.com/sqlserver/2004/07/showplan'}
+COLUNA_PLANO = 'Microsoft SQL Server 2005 XML Showplan'
+SCANS = ('Table Scan', 'Clustered Index Scan', 'Index Scan')
+INICIO_PACOTE = '-- Pacote de índices'
+
+# Índices que o pacote elimina, como estavam antes dele (para a medição --sem-pacote)
+ELIMINADOS_PELO_PACOTE = {
+    ('IX_Vinculo_Trabalhador', 'SGA_VINCULO_CLINICO'):
+        "CREATE NONCLUSTERED INDEX IX_Vinculo_Trabalhador ON SGA_VINCULO_CLINICO (NIF_trabalhador) "
+        "INCLUDE (NIF_paciente)",
+}
+
+# Valores de teste tirados da BD (o caso mais pesado de cada tipo)
+AMOSTRAS = """
+SET NOCOUNT ON;
+SELECT
+    (SELECT TOP 1 id_trabalhador FROM SGA_TRABALHADOR_ATENDIMENTO
+     GROUP BY id_trabalhador ORDER BY COUNT(*) DESC) AS id_medico,
+    (SELECT TOP 1 pa.id_paciente FROM SGA_PACIENTE_ATENDIMENTO pa
+     GROUP BY pa.id_paciente ORDER BY COUNT(*) DESC) AS id_paciente,
+    (SELECT TOP 1 id_paciente FROM SGA_RELATORIO
+     GROUP BY id_paciente, id_autor ORDER BY COUNT(*) DESC) AS rel_paciente,
+    (SELECT TOP 1 id_autor FROM SGA_RELATORIO
+     GROUP BY id_paciente, id_autor ORDER BY COUNT(*) DESC) AS rel_autor,
+    (SELECT MAX(num_atendimento) FROM SGA_ATENDIMENTO WHERE estado != 'cancelado') AS num_atendimento,
+    CAST(MIN_ACTIVE_ROWVERSION() AS BIGINT) - 1 AS versao
+"""
+
+# (rótulo, SQL, função amostras -> parâmetros, escrita)
+CARGA = [
+    ('login', "EXEC sp_obterLogin @NIF = ?", lambda a: (a['nif_medico'],), False),
+    ('dashboard_admin', "EXEC sp_ObterDashboardTotais ?, 'admin'", lambda a: (a['id_medico'],), False),
+    ('dashboard_medico', "EXEC sp_ObterDashboardTotais ?, 'colaborador'", lambda a: (a['id_medico'],), False),
+    ('proximas_admin', "EXEC sp_ObterProximasConsultas ?, 'admin'", lambda a: (a['id_medico'],), False),
+    ('proximas_medico', "EXEC sp_ObterProximasConsultas ?, 'colaborador'", lambda a: (a['id_medico'],), False),
+    ('consultas_hoje', "EXEC sp_countConsultasHoje", lambda a: (), False),
+    ('salas_livres_agora', "EXEC sp_contarSalasLivresAgora", lambda a: (), False),
+    ('ocupacao_salas_dia', "EXEC sp_obterOcupacaoSalasDia ?", lambda a: (a['hoje'],), False),
+    ('horarios_livres', "EXEC sp_ObterHorariosLivres @id_medico = ?, @data_consulta = ?",
+     lambda a: (a['id_medico'], a['amanha']), False),
+    ('horarios_livres_semana', "EXEC sp_ObterHorariosLivresLote @data_inicio = ?, @data_fim = ?",
+     lambda a: (a['hoje'], a['hoje'] + timedelta(days=6)), False),
+    ('calendario_admin', "EXEC sp_listarEventosCalendario @id_user = ?, @perfil = 'admin', "
+                         "@data_inicio = ?, @data_fim = ?",
+     lambda a: (a['id_medico'], a['mes_inicio'], a['mes_fim']), False),
+    ('calendario_medico', "EXEC sp_listarEventosCalendario @id_user = ?, @perfil = 'colaborador', "
+                          "@data_inicio = ?, @data_fim = ?",
+     lambda a: (a['id_medico'], a['mes_inicio'], a['mes_fim']), False),
+    ('eventos_alterados', "EXEC sp_listarEventosAlterados @id_user = ?, @perfil = 'admin', "
+                          "@data_inicio = ?, @data_fim = ?, @desde = ?",
+     lambda a: (a['id_medico'], a['mes_inicio'], a['mes_fim'], a['versao'] - 100), False),
+    ('detalhes_atendimento', "EXEC sp_obterDetalhesAtendimento ?", lambda a: (a['num_atendimento'],), False),
+    ('pacientes_agenda', "EXEC sp_ListarPacientesParaAgenda ?, 'colaborador'", lambda a: (a['id_medico'],), False),
+    ('indice_pacientes_delta', "EXEC sp_listarPacientesIndiceAlterados ?", lambda a: (a['versao'] - 100,), False),
+    ('pacientes_pagina', "EXEC sp_listarPacientesSGAPagina @id_trabalhador = ?, @perfil = 'admin'",
+     lambda a: (a['id_medico'],), False),
+    ('pacientes_pesquisa', "EXEC sp_listarPacientesSGAPagina @id_trabalhador = ?, @perfil = 'admin', @pesquisa = 'Ma'",
+     lambda a: (a['id_medico'],), False),
+    ('equipa_pagina', "EXEC sp_listarEquipaPagina", lambda a: (), False),
+    ('ficha_paciente', "EXEC sp_obterFichaCompletaPaciente ?, ?, 'admin'",
+     lambda a: (a['id_paciente'], a['id_medico']), False),
+    ('equipa_do_paciente', "EXEC sp_listarTrabalhadoresDePaciente ?", lambda a: (a['id_paciente'],), False),
+    ('pacientes_do_medico', "EXEC sp_listarPacientesDeTrabalhador ?", lambda a: (a['id_medico'],), False),
+    ('processos_clinicos', "EXEC sp_listarProcessosClinicosAtivos ?, 'colaborador'", lambda a: (a['rel_autor'],), False),
+    ('historico_relatorios', "EXEC sp_obterLivrariaRelatorios ?, ?",
+     lambda a: (a['rel_paciente'], a['rel_autor']), False),
+    ('exportar_atendimentos_mes', "EXEC sp_exportarAtendimentos ?, ?",
+     lambda a: (a['mes_inicio'], a['mes_fim']), False),
+    ('marcar_consulta', "EXEC sp_criarAgendamento ?, ?, ?, 0, 60",
+     lambda a: (a['nif_paciente'], a['id_medico'], a['slot_livre']), True),
+    ('cancelar_consulta', "EXEC sp_cancelarAgendamento ?", lambda a: (a['num_atendimento'],), True),
+]
+
+
+def carregar_amostras(cursor):
+    cursor.execute(AMOSTRAS)
+    colunas = [c[0] for c in cursor.description]
+    amostras = dict(zip(colunas, cursor.fetchone()))
+    cursor.execute("SELECT NIF FROM SGA_TRABALHADOR WHERE id_trabalhador = ?", (amostras['id_medico'],))
+    amostras['nif_medico'] = cursor.fetchone()[0]
+    cursor.execute("SELECT NIF FROM SGA_PACIENTE WHERE id_paciente = ?", (amostras['id_paciente'],))
+    amostras['nif_paciente'] = cursor.fetchone()[0]
+
+    hoje = date.today()
+    amostras['hoje'] = hoje
+    amostras['amanha'] = hoje + timedelta(days=1)
+    # Vista mensal do calendário (com as semanas de fronteira)
+    inicio_mes = datetime(hoje.year, hoje.month, 1)
+    amostras['mes_inicio'] = inicio_mes - timedelta(days=7)
+    amostras['mes_fim'] = inicio_mes + timedelta(days=42)
+    # Daqui a um ano e meio, 10h de um dia útil: sem colisões com os dados existentes
+    slot = datetime.combine(hoje + timedelta(days=550), datetime.min.time()).replace(hour=10)
+    amostras['slot_livre'] = slot + timedelta(days=(7 - slot.weekday()) % 7)
+    return amostras
+
+
+def ler_tudo(cursor):
+    """Consome todos os result sets; retorna (nº de linhas, [XML dos planos])."""
+    linhas, planos = 0, []
+    while True:
+        if cursor.description:
+            rows = cursor.fetchall()
+            if cursor.description[0][0] == COLUNA_PLANO:
+                planos.extend(row[0] for row in rows)
+            else:
+                linhas += len(rows)
+        if not cursor.nextset():
+            return linhas, planos
+
+
+def analisar_planos(planos):
+    """Soma leituras lógicas e CPU dos planos reais; lista scans e índices em falta."""
+    leituras = cpu = 0
+    scans, em_falta = set(), []
+    for xml in planos:
+        raiz = ET.fromstring(xml)
+        for contador in raiz.iterfind('.//p:RunTimeCountersPerThread', NS):
+            leituras += int(contador.get('ActualLogicalReads', 0)) + int(contador.get('ActualLobLogicalReads', 0))
+        for tempos in raiz.iterfind('.//p:QueryTimeStats', NS):
+            cpu += int(tempos.get('CpuTime', 0))
+        for op in raiz.iterfind('.//p:RelOp', NS):
+            if op.get('PhysicalOp') in SCANS:
+                objeto = op.find('.//p:Object', NS)
+                if objeto is not None:
+                    scans.add(f"{op.get('PhysicalOp')} {objeto.get('Table', '').strip('[]')}"
+                              f".{objeto.get('Index', '').strip('[]')}")
+        for grupo in raiz.iterfind('.//p:MissingIndexGroup', NS):
+            indice = grupo.find('p:MissingIndex', NS)
+            colunas = {uso.get('Usage'): [c.get('Name').strip('[]') for c in uso.iterfind('p:Column', NS)]
+                       for uso in indice.iterfind('p:ColumnGroup', NS)}
+            em_falta.append({'tabela': indice.get('Table').strip('[]'),
+                             'impacto': float(grupo.get('Impact')), **colunas})
+    return {'leituras_logicas': leituras, 'cpu_ms': cpu, 'scans': sorted(scans), 'indices_em_falta': em_falta}
+
+
+def medir(conn, rotulo, sql, params, repeticoes, saida):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        ler_tudo(cursor)
+        conn.rollback()
+
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            cursor.execute(sql, params)
+            linhas, _ = ler_tudo(cursor)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+            conn.rollback()
+
+        cursor.execute("SET STATISTICS XML ON")
+        try:
+            cursor.execute(sql, params)
+            _, planos = ler_tudo(cursor)
+        finally:
+            conn.rollback()
+            cursor.execute("SET STATISTICS XML OFF")
+
+        for n, xml in enumerate(planos, 1):
+            with open(os.path.join(saida, f"{rotulo}-{n}.sqlplan"), 'w', encoding='utf-8') as f:
+                f.write(xml)
+        return {'duracao_ms': round(statistics.median(tempos), 2), 'linhas': linhas,
+                'instrucoes': len(planos), **analisar_planos(planos)}
+    except Exception as e:
+        conn.rollback()
+        return {'erro': str(e)}
+    finally:
+        cursor.close()
+
+
+def indices_do_pacote():
+    """(índice, tabela) dos CREATE NONCLUSTERED INDEX do pacote da carga em sql/indexes.sql."""
+    with open(os.path.join(RAIZ, 'sql', 'indexes.sql'), encoding='utf-8') as f:
+        texto = f.read()
+    return re.findall(r'CREATE NONCLUSTERED INDEX (\w+)\s+ON (\w+)', texto[texto.index(INICIO_PACOTE):])
+
+
+def alternar_indices(conn, ativar, indices):
+    """Desativa (ou reconstrói) os índices indicados; retorna os que mudaram."""
+    cursor = conn.cursor()
+    mudados = []
+    for indice, tabela in indices:
+        cursor.execute("SELECT is_disabled FROM sys.indexes WHERE name = ? AND object_id = OBJECT_ID(?)",
+                       (indice, tabela))
+        row = cursor.fetchone()
+        if row is None or bool(row[0]) == (not ativar):
+            continue
+        cursor.execute(f"ALTER INDEX {indice} ON {tabela} {'REBUILD' if ativar else 'DISABLE'}")
+        mudados.append((indice, tabela))
+    conn.commit()
+    cursor.close()
+    return mudados
+
+
+def repor_eliminados(conn, criar, indices):
+    """Cria (ou volta a eliminar) os índices que o pacote elimina; retorna os que mudaram."""
+    cursor = conn.cursor()
+    mudados = []
+    for indice, tabela in indices:
+        cursor.execute("SELECT 1 FROM sys.indexes WHERE name = ? AND object_id = OBJECT_ID(?)", (indice, tabela))
+        if (cursor.fetchone() is None) != criar:
+            continue
+        cursor.execute(ELIMINADOS_PELO_PACOTE[(indice, tabela)] if criar else f"DROP INDEX {indice} ON {tabela}")
+        mudados.append((indice, tabela))
+    conn.commit()
+    cursor.close()
+    return mudados
+
+
+def executar(args):
+    os.makedirs(args.saida, exist_ok=True)
+    conn = get_db_connection()
+    desativados, repostos = [], []
+    try:
+        cursor = conn.cursor()
+        amostras = carregar_amostras(cursor)
+        cursor.close()
+        conn.rollback()
+        if args.sem_pacote:
+            desativados = alternar_indices(conn, False, indices_do_pacote())
+            repostos = repor_eliminados(conn, True, ELIMINADOS_PELO_PACOTE)
+            print(f"Índices desativados: {', '.join(i for i, _ in desativados) or 'nenhum'}; "
+                  f"repostos: {', '.join(i for i, _ in repostos) or 'nenhum'}")
+
+        filtro = set(args.so.split(',')) if args.so else None
+        resumo = {'gerado_em': datetime.now().isoformat(timespec='seconds'),
+                  'sem_pacote': args.sem_pacote, 'procedimentos': {}}
+        for rotulo, sql, parametros, escrita in CARGA:
+            if filtro and rotulo not in filtro:
+                continue
+            r = medir(conn, rotulo, sql, parametros(amostras), args.repeticoes, args.saida)
+            r['escrita'] = escrita
+            resumo['procedimentos'][rotulo] = r
+            if 'erro' in r:
+                print(f"{rotulo:<26} ERRO {r['erro']}")
+            else:
+                print(f"{rotulo:<26} {r['duracao_ms']:>9.2f}ms {r['leituras_logicas']:>9} leituras "
+                      f"{r['cpu_ms']:>6}ms CPU  {len(r['scans'])} scans  {len(r['indices_em_falta'])} em falta")
+    finally:
+        if desativados:
+            alternar_indices(conn, True, desativados)
+            print("Índices reconstruídos.")
+        if repostos:
+            repor_eliminados(conn, False, repostos)
+            print("Índices repostos eliminados.")
+        conn.close()
+
+    with open(os.path.join(args.saida, 'resumo.json'), 'w', encoding='utf-8') as f:
+        json.dump(resumo, f, ensure_ascii=False, indent=2, default=str)
+
+
+def comparar(antes, depois):
+    def carregar(pasta):
+        with open(os.path.join(pasta, 'resumo.json'), encoding='utf-8') as f:
+            return json.load(f)
+
+    a, d = carregar(antes), carregar(depois)
+    linhas = [f"antes: {antes} ({a['gerado_em']})  depois: {depois} ({d['gerado_em']})",
+              f"{'procedimento':<26} {'leituras antes':>15} {'depois':>9} {'ms antes':>10} {'depois':>9}"]
+    a, d = a['procedimentos'], d['procedimentos']
+    for rotulo in a:
+        x, y = a[rotulo], d.get(rotulo, {})
+        if 'erro' in x or 'erro' in y or not y:
+            linhas.append(f"{rotulo:<26} (sem comparação)")
+            continue
+        linhas.append(f"{rotulo:<26} {x['leituras_logicas']:>15} {y['leituras_logicas']:>9} "
+                      f"{x['duracao_ms']:>10.2f} {y['duracao_ms']:>9.2f}")
+        for scan in sorted(set(x['scans']) - set(y['scans'])):
+            linhas.append(f"{'':<28}- {scan}")
+
+    texto = '\n'.join(linhas)
+    print(texto)
+    with open(os.path.join(depois, 'comparacao.txt'), 'w', encoding='utf-8') as f:
+        f.write(texto + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--saida', default='planos')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--sem-pacote', action='store_true',
+                        help='mede sem o pacote de índices da carga (o "antes")')
+    parser.add_argument('--so', help="rótulos separados por vírgulas (por omissão, toda a CARGA)")
+    parser.add_argument('--comparar', nargs=2, metavar=('ANTES', 'DEPOIS'))
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(*args.comparar)
+    else:
+        executar(args)
+
+
+if __name__ == '__main__':
+    main()
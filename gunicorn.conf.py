@@ -0,0 +1,67 @@
+"""
+Configuração do gunicorn (produção):
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Modelo: WEB_WORKERS processos x WEB_THREADS threads (worker gthread). A app é
+carregada uma vez no master (preload_app) e cada worker aquece o seu pool e
+as suas caches depois do fork, antes de receber pedidos (ver wsgi.aquecer).
+Cada thread pode ter uma conexão à BD: manter DB_POOL_MAX >= WEB_THREADS.
+
+Calendários ligados por SSE (/api/eventos/stream) ocupam uma thread cada no
+gthread: cada worker aceita no máximo WEB_THREADS - 2 streams (os seguintes
+recebem 503 e a agenda fica com o delta a cada minuto), para que os outros
+pedidos não fiquem sem threads. Para muitas agendas abertas,
+WEB_WORKER_CLASS=gevent (pip install gevent): as ligações paradas deixam de
+ocupar threads, mas as chamadas pyodbc não cedem ao gevent e bloqueiam o
+worker enquanto correm.
+
+Reload sem cortar pedidos:
+  - kill -HUP <master>: novos workers (relê esta config e aquece-os); os antigos
+    terminam os pedidos em curso até WEB_GRACEFUL_TIMEOUT segundos.
+  - Código novo (com preload_app o HUP reutiliza o código já carregado):
+    kill -USR2 <master> arranca um master novo ao lado do antigo; depois
+    kill -QUIT <master antigo>.
+"""
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.getenv("WEB_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_WORKERS", multiprocessing.cpu_count()))
+worker_class = os.getenv("WEB_WORKER_CLASS", "gthread")
+threads = int(os.getenv("WEB_THREADS", 8))
+if worker_class == "gevent":
+    # Antes do preload: os locks/Conditions criados no import da app (ex.: a central
+    # de notificações SSE) têm de ser já os do gevent
+    from gevent import monkey
+    monkey.patch_all()
+    worker_connections = int(os.getenv("WEB_WORKER_CONNECTIONS", 1000))
+
+preload_app = True
+timeout = int(os.getenv("WEB_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("WEB_KEEPALIVE", 5))
+
+# Reciclar workers de vez em quando (0 = nunca); o jitter evita que reiniciem todos juntos
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv("WEB_ACCESS_LOG", "-") or None  # vazio: sem access log
+errorlog = "-"
+
+
+def post_worker_init(worker):
+    # Depois do fork e da inicialização do worker, antes do primeiro pedido.
+    # Pool, caches e índices são por processo: nada disto vem do master.
+    from gunicorn.workers.base_async import AsyncWorker
+    from notificacoes import central_notificacoes
+    from wsgi import aquecer
+    if not isinstance(worker, AsyncWorker):
+        # gthread/sync: cada stream SSE prende uma thread do worker
+        central_notificacoes.limitar_a_threads(worker.cfg.threads)
+    tempos = aquecer()
+    worker.log.info("Worker %s aquecido: %s", worker.pid, tempos)
@@ -0,0 +1,272 @@
+"""
+Importação em massa de pacientes e trabalhadores a partir de CSV.
+
+O ficheiro é lido em streaming (linha a linha, nunca inteiro em memória) e cada
+linha é validada aqui (NIF com dígito de controlo, datas, telefone, ...). As
+linhas válidas seguem em lotes de IMPORTACAO_LOTE para a BD, com um commit por
+lote (ver persistence/importacao.py). O relatório indica, por linha, o motivo
+de cada rejeição, seja da validação ou da BD (ex.: NIF já registado).
+
+Colunas (a ordem é livre; separador ',' ou ';'):
+  pacientes:     nif, nome, data_nascimento, telefone, [email], [observacoes], [id_medico]
+  trabalhadores: nif, nome, data_nascimento, telefone, [email], senha, perfil, categoria,
+                 [cedula], [contrato], [ordem], [remuneracao]
+"""
+import csv
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from autenticacao import gerar_hash_senha
+from persistence.importacao import preparar_importacao, importar_lote, lote_confirmado
+
+TAMANHO_LOTE = int(os.getenv("IMPORTACAO_LOTE", 1000))
+MAX_ERROS_RELATORIO = 1000
+# Primeiros dígitos atribuídos pela AT (pessoas singulares, coletivas, públicas, ...)
+PRIMEIROS_DIGITOS_NIF = ('1', '2', '3', '45', '5', '6', '70', '71', '72', '74', '75', '77', '79',
+                         '8', '90', '91', '98', '99')
+PERFIS = ('admin', 'colaborador')
+CATEGORIAS = ('CONTRATADO', 'PRESTADOR')
+
+_EMAIL = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+
+class LinhaInvalida(ValueError):
+    """Linha do CSV rejeitada na validação (a mensagem vai para o relatório)."""
+
+
+class CodificacaoInvalida(ValueError):
+    """Linha do ficheiro que não é texto UTF-8 (a leitura para aí)."""
+
+    def __init__(self, linha):
+        super().__init__(f"A linha {linha} não é texto UTF-8; o resto do ficheiro não foi lido.")
+        self.linha = linha
+
+
+def digito_controlo_nif(oito_digitos):
+    soma = sum(int(d) * (9 - i) for i, d in enumerate(oito_digitos))
+    resto = soma % 11
+    return '0' if resto < 2 else str(11 - resto)
+
+
+def nif_valido(nif):
+    return (len(nif) == 9 and nif.isdigit() and nif.startswith(PRIMEIROS_DIGITOS_NIF)
+            and nif[8] == digito_controlo_nif(nif[:8]))
+
+
+def _texto(campos, nome, maximo, obrigatorio=True):
+    valor = (campos.get(nome) or '').strip()
+    if not valor:
+        if obrigatorio:
+            raise LinhaInvalida(f"Campo '{nome}' em falta.")
+        return None
+    if len(valor) > maximo:
+        raise LinhaInvalida(f"Campo '{nome}' com mais de {maximo} caracteres.")
+    return valor
+
+
+def _nif(campos):
+    nif = re.sub(r'\s', '', campos.get('nif') or '')
+    if not nif_valido(nif):
+        raise LinhaInvalida(f"NIF inválido: '{nif}'.")
+    return nif
+
+
+def _data_nascimento(campos):
+    valor = _texto(campos, 'data_nascimento', 10)
+    for formato in ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y'):
+        try:
+            data = datetime.strptime(valor, formato).date()
+            break
+        except ValueError:
+            continue
+    else:
+        raise LinhaInvalida(f"Data de nascimento inválida: '{valor}' (usar AAAA-MM-DD ou DD/MM/AAAA).")
+    if not date(1900, 1, 1) <= data <= date.today():
+        raise LinhaInvalida(f"Data de nascimento fora do intervalo: '{valor}'.")
+    return data
+
+
+def _telefone(campos):
+    telefone = re.sub(r'[\s-]', '', campos.get('telefone') or '')
+    if telefone.startswith('+351'):
+        telefone = telefone[4:]
+    if len(telefone) != 9 or not telefone.isdigit():
+        raise LinhaInvalida(f"Telefone inválido: '{telefone}' (9 dígitos).")
+    return telefone
+
+
+def _email(campos):
+    email = _texto(campos, 'email', 100, obrigatorio=False)
+    if email and not _EMAIL.match(email):
+        raise LinhaInvalida(f"Email inválido: '{email}'.")
+    return email
+
+
+def _inteiro(campos, nome):
+    valor = (campos.get(nome) or '').strip()
+    if not valor:
+        return None
+    if not valor.isdigit():
+        raise LinhaInvalida(f"Campo '{nome}' deve ser um número inteiro.")
+    return int(valor)
+
+
+def validar_paciente(campos):
+    return (_nif(campos), _texto(campos, 'nome', 50), _data_nascimento(campos), _telefone(campos),
+            _email(campos), _texto(campos, 'observacoes', 250, obrigatorio=False), _inteiro(campos, 'id_medico'))
+
+
+def validar_trabalhador(campos):
+    """A senha vai em claro; o hash é calculado por lote (ver _hash_senhas)."""
+    perfil = (campos.get('perfil') or '').strip().lower()
+    if perfil not in PERFIS:
+        raise LinhaInvalida(f"Perfil inválido: '{perfil}' ({' / '.join(PERFIS)}).")
+    categoria = (campos.get('categoria') or '').strip().upper()
+    if categoria not in CATEGORIAS:
+        raise LinhaInvalida(f"Categoria inválida: '{categoria}' ({' / '.join(CATEGORIAS)}).")
+    cedula = _texto(campos, 'cedula', 5, obrigatorio=False)
+
+    remuneracao = (campos.get('remuneracao') or '').strip().replace(',', '.')
+    try:
+        remuneracao = Decimal(remuneracao).quantize(Decimal('0.01')) if remuneracao else None
+    except InvalidOperation:
+        raise LinhaInvalida(f"Remuneração inválida: '{remuneracao}'.")
+    if remuneracao is not None and not 0 <= remuneracao < Decimal('100000000'):
+        raise LinhaInvalida(f"Remuneração fora do intervalo: '{remuneracao}'.")
+
+    return (_nif(campos), _texto(campos, 'nome', 50), _data_nascimento(campos), _telefone(campos),
+            _email(campos), _texto(campos, 'senha', 128), perfil, cedula, categoria,
+            _texto(campos, 'contrato', 20, obrigatorio=False) if categoria == 'CONTRATADO' else None,
+            _texto(campos, 'ordem', 50, obrigatorio=False) if categoria == 'PRESTADOR' else None,
+            remuneracao if categoria == 'PRESTADOR' else None)
+
+
+def _hash_senhas(lote):
+    # O scrypt liberta o GIL: o custo por senha (ver autenticacao.py) divide-se pelos núcleos
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 2) as executor:
+        hashes = list(executor.map(gerar_hash_senha, [linha[5] for _, linha in lote]))
+    return [(numero, linha[:5] + (h,) + linha[6:]) for (numero, linha), h in zip(lote, hashes)]
+
+
+# entidade -> (validação, colunas obrigatórias no cabeçalho)
+ENTIDADES = {
+    'pacientes': (validar_paciente, ('nif', 'nome', 'data_nascimento', 'telefone')),
+    'trabalhadores': (validar_trabalhador, ('nif', 'nome', 'data_nascimento', 'telefone',
+                                            'senha', 'perfil', 'categoria')),
+}
+
+
+def ler_csv(ficheiro):
+    """
+    Ficheiro binário (ex.: upload) -> (cabeçalho, gerador de (nº da linha, dict)).
+    Aceita UTF-8 com ou sem BOM e deteta o separador (',' ou ';') pelo cabeçalho.
+    Cada linha é descodificada à parte: o gerador lança CodificacaoInvalida com o
+    número da linha que não é UTF-8.
+    """
+    def descodificar():
+        for numero, linha in enumerate(ficheiro, 1):
+            try:
+                yield linha.decode('utf-8-sig' if numero == 1 else 'utf-8')
+            except UnicodeDecodeError:
+                raise CodificacaoInvalida(numero) from None
+
+    texto = descodificar()
+    primeira = next(texto, '')
+    separador = ';' if primeira.count(';') > primeira.count(',') else ','
+    cabecalho = [c.strip().lower() for c in next(csv.reader([primeira], delimiter=separador), [])]
+    leitor = csv.reader(texto, delimiter=separador)
+
+    def linhas():
+        for valores in leitor:
+            if not any(v.strip() for v in valores):
+                continue
+            # +1: o cabeçalho é a linha 1
+            yield leitor.line_num + 1, dict(zip(cabecalho, valores))
+
+    return cabecalho, linhas()
+
+
+def importar_csv(conn, entidade, ficheiro, tamanho_lote=TAMANHO_LOTE, confirmar=True):
+    """
+    Importa o CSV e retorna o relatório (dict). Com confirmar=False nenhum lote é
+    confirmado (o chamador faz rollback), o que permite medir sem alterar a BD.
+    Lança ValueError se o cabeçalho não tiver as colunas obrigatórias.
+    """
+    validar, obrigatorias = ENTIDADES[entidade]
+    cabecalho, linhas = ler_csv(ficheiro)
+    em_falta = [c for c in obrigatorias if c not in cabecalho]
+    if em_falta:
+        raise ValueError(f"Colunas em falta no cabeçalho: {', '.join(em_falta)}.")
+
+    inicio = time.perf_counter()
+    relatorio = {'entidade': entidade, 'lidas': 0, 'importadas': 0, 'rejeitadas': 0, 'lotes': 0, 'erros': []}
+
+    def rejeitar(numero, nif, motivo):
+        relatorio['rejeitadas'] += 1
+        if len(relatorio['erros']) < MAX_ERROS_RELATORIO:
+            relatorio['erros'].append({'linha': numero, 'nif': nif, 'motivo': motivo})
+
+    cursor = conn.cursor()
+    preparar_importacao(cursor, entidade)
+    if confirmar:
+        conn.commit()
+
+    def carregar(lote):
+        if entidade == 'trabalhadores':
+            lote = _hash_senhas(lote)
+        try:
+            rejeitadas = importar_lote(cursor, entidade, [(numero,) + linha for numero, linha in lote])
+            if confirmar:
+                conn.commit()
+                lote_confirmado(entidade)
+        except Exception as e:
+            if confirmar:
+                conn.rollback()
+            rejeitadas = {numero: f"Lote não gravado: {e}" for numero, _ in lote}
+        relatorio['lotes'] += 1
+        for numero, linha in lote:
+            if numero in rejeitadas:
+                rejeitar(numero, linha[0], rejeitadas[numero])
+            else:
+                relatorio['importadas'] += 1
+
+    def ler():
+        # Linha que não é UTF-8 a meio: os lotes anteriores já estão gravados, por isso
+        # termina com o que foi lido e indica a linha no relatório em vez de falhar
+        try:
+            yield from linhas
+        except CodificacaoInvalida as e:
+            relatorio['lidas'] += 1
+            relatorio['interrompida_na_linha'] = e.linha
+            rejeitar(e.linha, None, str(e))
+
+    vistos = set()
+    lote = []
+    for numero, campos in ler():
+        relatorio['lidas'] += 1
+        try:
+            linha = validar(campos)
+        except LinhaInvalida as e:
+            rejeitar(numero, (campos.get('nif') or '').strip() or None, str(e))
+            continue
+        if linha[0] in vistos:
+            rejeitar(numero, linha[0], "NIF repetido no ficheiro.")
+            continue
+        vistos.add(linha[0])
+        lote.append((numero, linha))
+        if len(lote) >= tamanho_lote:
+            carregar(lote)
+            lote = []
+    if lote:
+        carregar(lote)
+    cursor.close()
+
+    segundos = time.perf_counter() - inicio
+    relatorio['segundos'] = round(segundos, 3)
+    relatorio['linhas_por_segundo'] = round(relatorio['lidas'] / segundos, 1) if segundos else None
+    relatorio['erros_omitidos'] = max(0, relatorio['rejeitadas'] - len(relatorio['erros']))
+    return relatorio
@@ -0,0 +1,173 @@
+"""
+Notificações em tempo real da agenda (Server-Sent Events).
+
+As rotas que criam/editam/cancelam consultas publicam um evento depois do commit;
+cada calendário aberto mantém um pedido GET /api/eventos/stream e recebe apenas
+os eventos que sp_listarEventosCalendario lhe mostraria (mesmo filtro por perfil,
+médico e paciente). O cliente reage com um refetch incremental (?desde=token).
+
+Os eventos ficam num buffer circular partilhado com número de sequência: cada
+ligação só guarda a última sequência que enviou, por isso centenas de ligações
+paradas custam apenas uma espera na Condition. Num worker com threads (gthread),
+porém, cada ligação ocupa uma thread enquanto estiver aberta: o gunicorn.conf.py
+limita então as ligações a WEB_THREADS - RESERVA_THREADS por worker (limitar_a_threads),
+para que os outros pedidos tenham sempre threads livres; acima disso o stream
+responde 503 e a agenda fica só com o delta. Para muitas agendas abertas, correr
+com workers gevent (WEB_WORKER_CLASS=gevent), onde só conta SSE_MAX_LIGACOES.
+
+O buffer é por processo: com vários workers, um cliente só recebe o que foi
+publicado no seu worker. Por isso a agenda mantém o delta barato (?desde=) a cada
+60s mesmo com o stream ligado: alterações feitas noutro worker chegam nesse prazo.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+TAMANHO_BUFFER = int(os.getenv("SSE_BUFFER", 1000))
+MAX_LIGACOES = int(os.getenv("SSE_MAX_LIGACOES", 500))
+HEARTBEAT = float(os.getenv("SSE_HEARTBEAT", 25))
+RESERVA_THREADS = 2
+
+
+class LimiteLigacoes(Exception):
+    """Demasiados calendários ligados a este processo."""
+
+
+class FiltroAgenda:
+    """Mesmas regras de visibilidade que sp_listarEventosCalendario."""
+
+    def __init__(self, id_user, perfil, filtro_medico=None, filtro_paciente_nif=None):
+        self.id_user = int(id_user)
+        self.perfil = perfil
+        self.filtro_medico = int(filtro_medico) if filtro_medico else None
+        self.filtro_paciente_nif = filtro_paciente_nif or None
+
+    def aceita(self, evento):
+        id_medico = evento.get('id_medico')
+        nif = evento.get('nif_paciente')
+        # Campos desconhecidos (ex.: falha ao ler o atendimento) -> entrega, o cliente só refaz o delta
+        if id_medico is not None:
+            if self.perfil == 'colaborador' and int(id_medico) != self.id_user:
+                return False
+            if self.perfil == 'admin' and self.filtro_medico and int(id_medico) != self.filtro_medico:
+                return False
+            if self.perfil not in ('admin', 'colaborador'):
+                return False
+        if nif is not None and self.filtro_paciente_nif and nif != self.filtro_paciente_nif:
+            return False
+        return True
+
+
+class CentralNotificacoes:
+    def __init__(self, tamanho=TAMANHO_BUFFER, max_ligacoes=MAX_LIGACOES):
+        self._cond = threading.Condition()
+        self._eventos = deque(maxlen=tamanho)  # (seq, evento)
+        self._seq = 0
+        self.max_ligacoes = max_ligacoes
+        self._ligacoes = 0
+        self._publicados = 0
+        self._enviados = 0
+
+    def limitar_a_threads(self, threads):
+        """Worker com 'threads' threads: deixa RESERVA_THREADS livres para os pedidos normais."""
+        with self._cond:
+            self.max_ligacoes = min(self.max_ligacoes, max(0, threads - RESERVA_THREADS))
+
+    def publicar(self, tipo, id_atendimento, id_medico=None, nif_paciente=None):
+        evento = {
+            'tipo': tipo,
+            'id': id_atendimento,
+            'id_medico': id_medico,
+            'nif_paciente': nif_paciente,
+            'quando': time.time(),
+        }
+        with self._cond:
+            self._seq += 1
+            self._eventos.append((self._seq, evento))
+            self._publicados += 1
+            self._cond.notify_all()
+
+    def _aguardar(self, apos, timeout):
+        """Eventos com seq > apos (espera até timeout). Retorna (eventos, perdeu_eventos, nova_seq)."""
+        with self._cond:
+            if self._seq <= apos:
+                self._cond.wait(timeout)
+            if self._seq <= apos:
+                return [], False, apos
+            perdeu = bool(self._eventos) and self._eventos[0][0] > apos + 1
+            novos = [(s, e) for s, e in self._eventos if s > apos]
+            return novos, perdeu, self._seq
+
+    def subscrever(self, filtro, ultimo_id=None):
+        """
+        Reserva uma ligação e devolve o stream SSE (iterável com close()).
+        Last-Event-ID (ultimo_id) permite retomar após uma reconexão sem perder eventos.
+        """
+        with self._cond:
+            if self._ligacoes >= self.max_ligacoes:
+                raise LimiteLigacoes(f"Limite de {self.max_ligacoes} ligações atingido.")
+            # Reservada já, com o mesmo lock da verificação: ligações em simultâneo não passam o limite
+            self._ligacoes += 1
+            seq = self._seq if ultimo_id is None or ultimo_id > self._seq else ultimo_id
+        return LigacaoSSE(self, self._stream(filtro, seq))
+
+    def _libertar(self):
+        with self._cond:
+            self._ligacoes -= 1
+
+    def _stream(self, filtro, seq):
+        yield 'retry: 5000\n\n'
+        while True:
+            eventos, perdeu, seq = self._aguardar(seq, HEARTBEAT)
+            if perdeu:
+                # O cliente esteve desligado mais tempo do que o buffer cobre
+                yield f'id: {seq}\nevent: reset\ndata: {{}}\n\n'
+                continue
+            if not eventos:
+                # Comentário SSE: mantém proxies abertos e deteta clientes desligados
+                yield ': ping\n\n'
+                continue
+            for s, evento in eventos:
+                if filtro.aceita(evento):
+                    self._enviados += 1
+                    yield f'id: {s}\nevent: agenda\ndata: {json.dumps(evento)}\n\n'
+
+    def estatisticas(self):
+        with self._cond:
+            return {
+                'ligacoes': self._ligacoes,
+                'max_ligacoes': self.max_ligacoes,
+                'publicados': self._publicados,
+                'enviados': self._enviados,
+                'seq': self._seq,
+            }
+
+
+class LigacaoSSE:
+    """
+    Stream de uma ligação. O servidor WSGI chama close() no fim da resposta, mesmo
+    que o stream nunca tenha começado (aí o finally de um gerador não correria):
+    é aqui que a ligação reservada em subscrever() é libertada.
+    """
+
+    def __init__(self, central, gerador):
+        self._central = central
+        self._gerador = gerador
+        self._fechada = False
+
+    def __iter__(self):
+        return self._gerador
+
+    def close(self):
+        if self._fechada:
+            return
+        self._fechada = True
+        try:
+            self._gerador.close()
+        finally:
+            self._central._libertar()
+
+
+central_notificacoes = CentralNotificacoes()
@@ -1,3 +1,8 @@
+import json
+
+from persistence.pacientes import invalidar_pacientes_agenda
+from persistence.dashboard import invalidar_dashboard
+
 def contar_atendimentos_hoje(cursor):
     try:
         cursor.execute('exec sp_countConsultasHoje')
@@ -15,26 +20,46 @@ def contar_atendimentos_hoje(cursor):
         print(f"Erro a contar consultas: {e}")
         return {'total': 0, 'online': 0, 'presencial': 0}
 
-def obter_horarios_livres(cursor, id_medico, data, is_online=0, duracao=60, ignorar_id=None):
+def obter_horarios_livres(cursor, id_medico, data, is_online=0, duracao=60, ignorar_id=None, granularidade=60):
     try:
-        cursor.execute("EXEC sp_ObterHorariosLivres ?, ?, ?, ?, ?", 
-                       (id_medico, data, is_online, duracao, ignorar_id))
+        cursor.execute("EXEC sp_ObterHorariosLivres ?, ?, ?, ?, ?, ?", 
+                       (id_medico, data, is_online, duracao, ignorar_id, granularidade))
         rows = cursor.fetchall()
         return [row[0] for row in rows]
     except Exception as e:
         print(f"Erro slots: {e}")
         return []
+
+def obter_horarios_livres_lote(cursor, ids_medicos, data_inicio, data_fim, is_online=0, duracao=60, granularidade=60):
+    """
+    Horários livres de vários médicos num intervalo de dias, numa só chamada.
+    ids_medicos vazio/None = todos os médicos ativos.
+    Retorna {id_medico: {'YYYY-MM-DD': ['09:00', ...]}}
+    """
+    try:
+        ids = ','.join(str(i) for i in ids_medicos) if ids_medicos else None
+        cursor.execute("EXEC sp_ObterHorariosLivresLote ?, ?, ?, ?, ?, ?",
+                       (ids, data_inicio, data_fim, is_online, duracao, granularidade))
+        resultado = {}
+        for id_medico, dia, hora in cursor.fetchall():
+            resultado.setdefault(id_medico, {}).setdefault(str(dia), []).append(hora)
+        return resultado
+    except Exception as e:
+        print(f"Erro slots lote: {e}")
+        return {}
     
-def listar_eventos_calendario(cursor, user_id, perfil, filtro_medico_id=None, filtro_paciente_nif=None):
+def listar_eventos_calendario(cursor, user_id, perfil, filtro_medico_id=None, filtro_paciente_nif=None,
+                              data_inicio=None, data_fim=None):
     """
     Lista eventos para o calendário usando a Stored Procedure sp_listarEventosCalendario.
+    data_inicio/data_fim limitam o resultado aos eventos que se sobrepõem à janela visível.
     """
     try:
         f_medico = filtro_medico_id if filtro_medico_id else None
         f_paciente = filtro_paciente_nif if filtro_paciente_nif else None
 
-        cursor.execute("EXEC sp_listarEventosCalendario ?, ?, ?, ?", 
-                       (user_id, perfil, f_medico, f_paciente))
+        cursor.execute("EXEC sp_listarEventosCalendario ?, ?, ?, ?, ?, ?", 
+                       (user_id, perfil, f_medico, f_paciente, data_inicio, data_fim))
         
         return cursor.fetchall()
         
@@ -43,6 +68,19 @@ def listar_eventos_calendario(cursor, user_id, perfil, filtro_medico_id=None, fi
         return []
 
 
+def listar_eventos_alterados(cursor, user_id, perfil, desde, filtro_medico_id=None, filtro_paciente_nif=None,
+                             data_inicio=None, data_fim=None):
+    """
+    Eventos alterados desde a versão 'desde' (sp_listarEventosAlterados), incluindo
+    cancelados e eventos movidos para fora da janela, para o cliente os remover.
+    Os erros não são engolidos: uma lista vazia faria o cliente avançar o token e perder alterações.
+    """
+    cursor.execute("EXEC sp_listarEventosAlterados ?, ?, ?, ?, ?, ?, ?",
+                   (user_id, perfil, filtro_medico_id or None, filtro_paciente_nif or None,
+                    data_inicio, data_fim, desde))
+    return cursor.fetchall()
+
+
 def obter_detalhes_atendimento(cursor, id_atendimento):
     try:
         cursor.execute("EXEC sp_obterDetalhesAtendimento ?", (id_atendimento,))
@@ -66,9 +104,49 @@ def obter_detalhes_atendimento(cursor, id_atendimento):
         print(f"Erro detalhes: {e}")
         return None
 
+def criar_agendamento(cursor, nif_paciente, id_medico, data_completa, preferencia_online, duracao):
+    """Retorna o num_atendimento criado."""
+    cursor.execute("EXEC sp_criarAgendamento ?, ?, ?, ?, ?", 
+                   (nif_paciente, id_medico, data_completa, preferencia_online, duracao))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def criar_agendamentos_lote(cursor, nif_paciente, id_medico, datas, preferencia_online, duracao):
+    """
+    Marca várias sessões numa só ida à BD (sp_criarAgendamentosLote), tudo ou nada.
+    datas: lista de datetime. Retorna (criados, conflitos), listas de dicts por ocorrência;
+    se houver conflitos nada foi inserido.
+    """
+    datas_json = json.dumps([d.strftime('%Y-%m-%dT%H:%M:%S') for d in datas])
+    cursor.execute("EXEC sp_criarAgendamentosLote ?, ?, ?, ?, ?",
+                   (nif_paciente, id_medico, datas_json, preferencia_online, duracao))
+    ocorrencias = [{
+        'ordem': row[0],
+        'inicio': row[1],
+        'fim': row[2],
+        'num_atendimento': row[3],
+        'id_sala': row[4],
+        'motivo': row[5],
+    } for row in cursor.fetchall()]
+
+    conflitos = [o for o in ocorrencias if o['motivo']]
+    if conflitos:
+        return [], conflitos
+    return ocorrencias, []
+
 def editar_agendamento(cursor, id_atendimento, nova_data_str, duracao):
     # nova_data_str vem como 'YYYY-MM-DD HH:MM'
     cursor.execute("EXEC sp_editarAgendamento ?, ?, ?", (id_atendimento, nova_data_str, duracao))
 
 def cancelar_agendamento(cursor, id_atendimento):
-    cursor.execute("EXEC sp_cancelarAgendamento ?", (id_atendimento,))
\ No newline at end of file
+    cursor.execute("EXEC sp_cancelarAgendamento ?", (id_atendimento,))
+
+def agenda_alterada(vinculos=False):
+    """
+    Invalida as caches afetadas por marcações; chamar depois do commit.
+    vinculos=True quando se criaram consultas (a SP cria o vínculo médico-paciente
+    se ainda não existir, o que muda a lista de pacientes da agenda).
+    """
+    invalidar_dashboard()
+    if vinculos:
+        invalidar_pacientes_agenda()
@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheTTL:
+    """
+    Cache em memória (por processo) com expiração por TTL e despejo LRU.
+    As chaves são tuplos cujo primeiro elemento é o nome do procedimento,
+    ex.: ('sp_ListarPacientesParaAgenda', id_user, perfil), o que permite
+    invalidar todas as entradas de um procedimento de uma vez.
+    """
+
+    def __init__(self, ttl=300, tamanho_max=256):
+        self.ttl = ttl
+        self.tamanho_max = tamanho_max
+        self._dados = OrderedDict()  # chave -> (expira_em, valor)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._despejos = 0
+        self._invalidacoes = 0
+
+    def obter(self, chave):
+        """Retorna (encontrado, valor)."""
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is not None:
+                expira_em, valor = entrada
+                if expira_em > time.monotonic():
+                    self._dados.move_to_end(chave)
+                    self._hits += 1
+                    return True, valor
+                del self._dados[chave]
+            self._misses += 1
+            return False, None
+
+    def guardar(self, chave, valor, ttl=None):
+        with self._lock:
+            self._dados[chave] = (time.monotonic() + (ttl or self.ttl), valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.tamanho_max:
+                self._dados.popitem(last=False)
+                self._despejos += 1
+
+    def obter_ou_calcular(self, chave, calcular, ttl=None):
+        encontrado, valor = self.obter(chave)
+        if encontrado:
+            return valor
+        valor = calcular()
+        self.guardar(chave, valor, ttl)
+        return valor
+
+    def invalidar(self, *procedimentos):
+        """Remove todas as entradas dos procedimentos indicados."""
+        with self._lock:
+            for chave in [c for c in self._dados if c[0] in procedimentos]:
+                del self._dados[chave]
+                self._invalidacoes += 1
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+    def estatisticas(self):
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                'entradas': len(self._dados),
+                'tamanho_max': self.tamanho_max,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / total, 3) if total else 0,
+                'despejos': self._despejos,
+                'invalidacoes': self._invalidacoes,
+            }
+
+
+# Dados de referência dos dropdowns (médicos, pacientes da agenda)
+cache_referencia = CacheTTL(
+    ttl=float(os.getenv("CACHE_REFERENCIA_TTL", 300)),
+    tamanho_max=int(os.getenv("CACHE_REFERENCIA_MAX", 256)),
+)
+
+# Snapshot curto do dashboard (evita repetir os mesmos agregados às 9:00)
+cache_dashboard = CacheTTL(
+    ttl=float(os.getenv("CACHE_DASHBOARD_TTL", 30)),
+    tamanho_max=int(os.getenv("CACHE_DASHBOARD_MAX", 512)),
+)
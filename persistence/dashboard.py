@@ -1,48 +1,129 @@
 # persistence/dashboard.py
 from datetime import datetime
+from persistence.cache import cache_dashboard
 
-def obter_totais_dashboard(cursor, user_id, perfil):
+TOTAIS_VAZIOS = {'total_pacientes': 0, 'total_equipa': 0, 'consultas_hoje': 0}
+
+def _mapear_totais(row):
+    if row:
+        return {
+            'total_pacientes': row[0],
+            'total_equipa': row[1],
+            'consultas_hoje': row[2]
+        }
+    return dict(TOTAIS_VAZIOS)
+
+def _mapear_consultas(rows):
+    consultas = []
+    for row in rows:
+        # row[2] é datetime do SQL Server
+        data_obj = row[2]
+        
+        consultas.append({
+            'id': row[0],
+            'paciente': row[1],
+            'hora': data_obj.strftime('%H:%M'),
+            'dia': data_obj.strftime('%d/%m'),
+            'dia_iso': data_obj.strftime('%Y-%m-%d'),
+            'estado': row[3],
+            'medico': row[4]
+        })
+    return consultas
+
+def _mapear_consultas_hoje(row):
+    # SUM() devolve NULL quando não há consultas
+    total = row[0] if row and row[0] else 0
+    online = row[1] if row and row[1] else 0
+    return {'total': total, 'online': online, 'presencial': total - online}
+
+def _carregar_dashboard_bd(cursor, user_id, perfil):
+    # Um único batch com vários result sets, lidos com nextset()
+    cursor.execute("""
+        SET NOCOUNT ON;
+        EXEC sp_ObterDashboardTotais ?, ?;
+        EXEC sp_ObterProximasConsultas ?, ?;
+        EXEC sp_countConsultasHoje;
+        EXEC sp_contarSalasLivresAgora;
+    """, (user_id, perfil, user_id, perfil))
+
+    totais = _mapear_totais(cursor.fetchone())
+    cursor.nextset()
+    proximas = _mapear_consultas(cursor.fetchall())
+    cursor.nextset()
+    hoje = _mapear_consultas_hoje(cursor.fetchone())
+    cursor.nextset()
+    row = cursor.fetchone()
+    salas_livres = row[0] if row else 0
+
+    return {
+        'totais': totais,
+        'proximas_consultas': proximas,
+        'consultas_hoje': hoje,
+        'salas_livres': salas_livres,
+        'gerado_em': datetime.now(),
+    }
+
+def carregar_dashboard(cursor, user_id, perfil):
     """
-    Retorna um dicionário com: total_pacientes, total_equipa, consultas_hoje
+    Todos os widgets do dashboard numa só ida à BD.
+    O resultado fica em cache uns segundos: partilhado por todos os admins
+    (veem os mesmos números) e por utilizador nos restantes perfis.
     """
+    chave = ('dashboard', None if perfil == 'admin' else user_id, perfil)
     try:
-        cursor.execute("EXEC sp_ObterDashboardTotais ?, ?", (user_id, perfil))
-        row = cursor.fetchone()
-        
-        if row:
-            return {
-                'total_pacientes': row[0],
-                'total_equipa': row[1],
-                'consultas_hoje': row[2]
-            }
-        return {'total_pacientes': 0, 'total_equipa': 0, 'consultas_hoje': 0}
+        return cache_dashboard.obter_ou_calcular(chave, lambda: _carregar_dashboard_bd(cursor, user_id, perfil))
     except Exception as e:
-        print(f"Erro ao obter totais dashboard: {e}")
-        return {'total_pacientes': 0, 'total_equipa': 0, 'consultas_hoje': 0}
+        print(f"Erro ao carregar dashboard: {e}")
+        return {
+            'totais': dict(TOTAIS_VAZIOS),
+            'proximas_consultas': [],
+            'consultas_hoje': {'total': 0, 'online': 0, 'presencial': 0},
+            'salas_livres': 0,
+            'gerado_em': datetime.now(),
+        }
+
+def invalidar_dashboard():
+    cache_dashboard.invalidar('dashboard')
 
-def listar_proximas_consultas(cursor, user_id, perfil):
+def verificar_estatistica_diaria(cursor, reparar=False, desde=None, ate=None):
     """
-    Retorna lista de dicionários com as próximas 5 consultas
+    Compara SGA_ESTATISTICA_DIARIA (mantida pelos triggers) com as consultas e,
+    com reparar=True, reconstrói o intervalo. Retorna as linhas que divergiam
+    [{dia, id_trabalhador, consultas: (esperadas, guardadas), online: ..., presencial: ...}].
     """
-    try:
-        cursor.execute("EXEC sp_ObterProximasConsultas ?, ?", (user_id, perfil))
-        rows = cursor.fetchall()
-        
-        consultas = []
-        for row in rows:
-            # row[2] é datetime do SQL Server
-            data_obj = row[2]
-            
-            consultas.append({
-                'id': row[0],
-                'paciente': row[1],
-                'hora': data_obj.strftime('%H:%M'),
-                'dia': data_obj.strftime('%d/%m'),
-                'dia_iso': data_obj.strftime('%Y-%m-%d'),
-                'estado': row[3],
-                'medico': row[4]
-            })
-        return consultas
-    except Exception as e:
-        print(f"Erro ao listar próximas consultas: {e}")
-        return []
\ No newline at end of file
+    cursor.execute("EXEC sp_reconstruirEstatisticaDiaria ?, ?, ?", (desde, ate, 1 if reparar else 0))
+    divergencias = [{
+        'dia': row[0],
+        'id_trabalhador': row[1],
+        'consultas': (row[2], row[3]),
+        'online': (row[4], row[5]),
+        'presencial': (row[6], row[7]),
+    } for row in cursor.fetchall()]
+    # A reconstrução corre depois do result set: só termina quando o lote é consumido
+    while cursor.nextset():
+        pass
+    if reparar:
+        invalidar_dashboard()
+    return divergencias
+
+if __name__ == "__main__":
+    # Verificação periódica (ex.: cron diário): python -m persistence.dashboard [--reparar]
+    import argparse
+    from datetime import date
+    from persistence.session import get_db_connection
+
+    parser = argparse.ArgumentParser(description="Verifica/reconstrói SGA_ESTATISTICA_DIARIA.")
+    parser.add_argument('--reparar', action='store_true')
+    parser.add_argument('--desde', type=date.fromisoformat)
+    parser.add_argument('--ate', type=date.fromisoformat)
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    divergencias = verificar_estatistica_diaria(conn.cursor(), args.reparar, args.desde, args.ate)
+    conn.commit()
+    conn.close()
+    for d in divergencias:
+        print(f"{d['dia']} médico={d['id_trabalhador'] or 'total'} consultas={d['consultas']} "
+              f"online={d['online']} presencial={d['presencial']} (esperado, guardado)")
+    estado = "reconstruídas" if args.reparar else "por corrigir (--reparar)"
+    print(f"{len(divergencias)} linhas divergentes {estado}.")
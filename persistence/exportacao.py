@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+TAMANHO_LOTE = 500
+
+# entidade -> (chamada à SP, aceita intervalo de datas?, colunas)
+EXPORTACOES = {
+    'pacientes': ("EXEC sp_exportarPacientes", False,
+                  ['id_paciente', 'nif', 'nome', 'data_nascimento', 'telefone', 'email',
+                   'data_inscricao', 'observacoes', 'ativo']),
+    'atendimentos': ("EXEC sp_exportarAtendimentos ?, ?", True,
+                     ['num_atendimento', 'data_inicio', 'data_fim', 'estado', 'sala', 'is_online',
+                      'id_trabalhador', 'medico', 'id_paciente', 'nif_paciente', 'paciente', 'presenca']),
+    'relatorios': ("EXEC sp_exportarRelatorios ?, ?", True,
+                   ['id', 'id_paciente', 'paciente', 'id_autor', 'autor', 'tipo_relatorio',
+                    'data_criacao', 'conteudo']),
+}
+
+
+def iterar_linhas(cursor, tamanho_lote=TAMANHO_LOTE):
+    """Percorre o result set em lotes de fetchmany(): memória constante."""
+    while True:
+        rows = cursor.fetchmany(tamanho_lote)
+        if not rows:
+            break
+        yield from rows
+
+
+def executar_exportacao(cursor, entidade, data_inicio=None, data_fim=None):
+    """Executa a SP de exportação e retorna (colunas, gerador de linhas)."""
+    sql, com_datas, colunas = EXPORTACOES[entidade]
+    if com_datas:
+        cursor.execute(sql, (data_inicio, data_fim))
+    else:
+        cursor.execute(sql)
+    return colunas, iterar_linhas(cursor)
+
+
+def _valor_json(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return valor
+
+
+def gerar_csv(colunas, linhas, tamanho_lote=TAMANHO_LOTE):
+    """Gera o CSV em blocos de texto (um por lote de linhas)."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(colunas)
+    for i, row in enumerate(linhas, 1):
+        escritor.writerow(row)
+        if i % tamanho_lote == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def gerar_json(colunas, linhas, tamanho_lote=TAMANHO_LOTE):
+    """Gera um array JSON de objetos, em blocos, sem o montar em memória."""
+    partes = ['[']
+    for i, row in enumerate(linhas):
+        objeto = {c: _valor_json(v) for c, v in zip(colunas, row)}
+        partes.append((',' if i else '') + json.dumps(objeto, ensure_ascii=False))
+        if len(partes) >= tamanho_lote:
+            yield ''.join(partes)
+            partes = []
+    partes.append(']')
+    yield ''.join(partes)
@@ -0,0 +1,82 @@
+"""
+Carregamento em massa para a importação CSV (ver importacao.py).
+
+Cada lote já validado vai para uma tabela temporária da sessão num único
+executemany com fast_executemany e é inserido de uma vez por
+sp_importarPacientes / sp_importarTrabalhadores.
+"""
+from persistence.pacientes import invalidar_pacientes_agenda
+from persistence.trabalhadores import invalidar_medicos
+
+# Tipos SQL do ODBC (sql.h), os valores de pyodbc.SQL_*: sem importar o pyodbc no backend SQLite
+SQL_CHAR, SQL_NUMERIC, SQL_INTEGER, SQL_VARCHAR, SQL_BIT = 1, 2, 4, 12, -7
+SQL_TYPE_DATE, SQL_TYPE_TIMESTAMP = 91, 93
+
+# entidade -> (tabela temporária, colunas (nome, tipo SQL, tipo ODBC, tamanho, casas), SP)
+TABELAS = {
+    'pacientes': ('#ImportacaoPacientes', [
+        ('linha', 'INT', SQL_INTEGER, 0, 0),
+        ('nif', 'CHAR(9)', SQL_CHAR, 9, 0),
+        ('nome', 'VARCHAR(50)', SQL_VARCHAR, 50, 0),
+        ('data_nascimento', 'DATE', SQL_TYPE_DATE, 0, 0),
+        ('telefone', 'CHAR(9)', SQL_CHAR, 9, 0),
+        ('email', 'VARCHAR(100)', SQL_VARCHAR, 100, 0),
+        ('observacoes', 'VARCHAR(250)', SQL_VARCHAR, 250, 0),
+        ('id_medico', 'INT', SQL_INTEGER, 0, 0),
+    ], "EXEC sp_importarPacientes"),
+    'trabalhadores': ('#ImportacaoTrabalhadores', [
+        ('linha', 'INT', SQL_INTEGER, 0, 0),
+        ('nif', 'CHAR(9)', SQL_CHAR, 9, 0),
+        ('nome', 'VARCHAR(50)', SQL_VARCHAR, 50, 0),
+        ('data_nascimento', 'DATE', SQL_TYPE_DATE, 0, 0),
+        ('telefone', 'CHAR(9)', SQL_CHAR, 9, 0),
+        ('email', 'VARCHAR(100)', SQL_VARCHAR, 100, 0),
+        ('senha_hash', 'VARCHAR(255)', SQL_VARCHAR, 255, 0),
+        ('perfil', 'VARCHAR(20)', SQL_VARCHAR, 20, 0),
+        ('cedula', 'CHAR(5)', SQL_CHAR, 5, 0),
+        ('categoria', 'VARCHAR(20)', SQL_VARCHAR, 20, 0),
+        ('contrato', 'VARCHAR(20)', SQL_VARCHAR, 20, 0),
+        ('ordem', 'VARCHAR(50)', SQL_VARCHAR, 50, 0),
+        ('remuneracao', 'NUMERIC(10,2)', SQL_NUMERIC, 10, 2),
+    ], "EXEC sp_importarTrabalhadores"),
+}
+
+
+def preparar_importacao(cursor, entidade):
+    """Cria (vazia) a tabela temporária da entidade. Fazer commit antes do primeiro lote."""
+    tabela, colunas, _ = TABELAS[entidade]
+    definicao = ', '.join(f'{nome} {tipo}' for nome, tipo, *_ in colunas)
+    cursor.execute(f"IF OBJECT_ID('tempdb..{tabela}') IS NOT NULL DROP TABLE {tabela}; "
+                   f"CREATE TABLE {tabela} ({definicao}, PRIMARY KEY (linha))")
+
+
+def importar_lote(cursor, entidade, linhas):
+    """
+    Insere um lote (tuplos pela ordem de TABELAS[entidade]).
+    Retorna {linha: motivo} das linhas rejeitadas pela BD.
+    """
+    tabela, colunas, sql = TABELAS[entidade]
+    cursor.execute(f"TRUNCATE TABLE {tabela}")
+
+    # Tipos explícitos: o driver não consegue descrever os parâmetros de uma tabela #temporária
+    cursor.fast_executemany = True
+    cursor.setinputsizes([(tipo_odbc, tamanho, casas) for _, _, tipo_odbc, tamanho, casas in colunas])
+    try:
+        cursor.executemany(
+            f"INSERT INTO {tabela} ({', '.join(c[0] for c in colunas)}) VALUES ({', '.join('?' * len(colunas))})",
+            linhas,
+        )
+    finally:
+        cursor.fast_executemany = False
+        cursor.setinputsizes(None)
+
+    cursor.execute(sql)
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+
+def lote_confirmado(entidade):
+    """Invalida as caches da entidade; chamar depois do commit de cada lote."""
+    if entidade == 'pacientes':
+        invalidar_pacientes_agenda()
+    else:
+        invalidar_medicos()
@@ -0,0 +1,226 @@
+"""
+Pesquisa rápida (type-ahead) de pacientes ativos por prefixo do nome ou do NIF,
+usada na agenda em vez de enviar a lista completa de pacientes ao browser.
+
+Índice em memória (por processo) particionado por médico, mais uma partição com
+todos os pacientes para o admin. Cada partição tem duas listas ordenadas,
+(palavra do nome normalizada, nif) e nif, pesquisadas com bisect. É mantido
+como o índice dos relatórios (persistence/pesquisa.py):
+  - delta por rowversion (sp_listarPacientesIndiceAlterados) a cada
+    PACIENTES_REFRESCAR_S, ou logo na pesquisa seguinte quando este processo
+    altera pacientes/vínculos (invalidar_pacientes_agenda -> marcar_desatualizado);
+  - contagens diferentes das da BD depois do delta (eliminações) forçam recarga
+    (sincronizar_por_versao, partilhado com o índice dos relatórios).
+"""
+import heapq
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+from persistence.pesquisa import normalizar, sincronizar_por_versao
+
+REFRESCAR_S = float(os.getenv("PACIENTES_REFRESCAR_S", 30))
+MAX_CANDIDATOS = 2000
+TODOS = None  # partição do admin
+
+_PALAVRA = re.compile(r'\w+')
+
+
+class _Particao:
+    __slots__ = ('palavras', 'nifs')
+
+    def __init__(self):
+        self.palavras = []  # (palavra, nif), ordenada
+        self.nifs = []  # ordenada
+
+    def adicionar(self, nif, palavras):
+        for palavra in palavras:
+            insort(self.palavras, (palavra, nif))
+        insort(self.nifs, nif)
+
+    def remover(self, nif, palavras):
+        for palavra in palavras:
+            i = bisect_left(self.palavras, (palavra, nif))
+            if i < len(self.palavras) and self.palavras[i] == (palavra, nif):
+                del self.palavras[i]
+        i = bisect_left(self.nifs, nif)
+        if i < len(self.nifs) and self.nifs[i] == nif:
+            del self.nifs[i]
+
+    def por_palavra(self, prefixo, limite=MAX_CANDIDATOS):
+        palavras = self.palavras
+        i = bisect_left(palavras, (prefixo,))
+        encontrados = []
+        while i < len(palavras) and palavras[i][0].startswith(prefixo) and len(encontrados) < limite:
+            encontrados.append(palavras[i][1])
+            i += 1
+        return encontrados
+
+    def por_nif(self, prefixo, limite):
+        nifs = self.nifs
+        i = bisect_left(nifs, prefixo)
+        encontrados = []
+        while i < len(nifs) and nifs[i].startswith(prefixo) and len(encontrados) < limite:
+            encontrados.append(nifs[i])
+            i += 1
+        return encontrados
+
+
+class IndicePacientes:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._pacientes = {}  # nif -> (id_paciente, nome, nome normalizado, palavras, médicos)
+        self._particoes = {TODOS: _Particao()}
+        self.vinculos = 0
+        self.versao = 0
+        self.sincronizado_em = None
+
+    def __len__(self):
+        return len(self._pacientes)
+
+    def _remover(self, nif):
+        anterior = self._pacientes.pop(nif, None)
+        if anterior is None:
+            return
+        _, _, _, palavras, medicos = anterior
+        for id_medico in (TODOS,) + tuple(medicos):
+            self._particoes[id_medico].remover(nif, palavras)
+        self.vinculos -= len(medicos)
+
+    def _entrada(self, nif, id_paciente, nome, medicos):
+        nome_normalizado = normalizar(nome or '')
+        palavras = tuple(sorted(set(_PALAVRA.findall(nome_normalizado))))
+        medicos = frozenset(medicos)
+        self._pacientes[nif] = (id_paciente, nome, nome_normalizado, palavras, medicos)
+        self.vinculos += len(medicos)
+        return palavras, (TODOS,) + tuple(medicos)
+
+    def _particao(self, id_medico):
+        particao = self._particoes.get(id_medico)
+        if particao is None:
+            particao = self._particoes[id_medico] = _Particao()
+        return particao
+
+    def carregar(self, pacientes):
+        """Carga inicial [(nif, id_paciente, nome, médicos)]: junta tudo e ordena uma vez (insort seria O(n²))."""
+        with self._lock:
+            for nif, id_paciente, nome, medicos in pacientes:
+                self._remover(nif)
+                palavras, particoes = self._entrada(nif, id_paciente, nome, medicos)
+                for id_medico in particoes:
+                    particao = self._particao(id_medico)
+                    particao.palavras.extend((palavra, nif) for palavra in palavras)
+                    particao.nifs.append(nif)
+            for particao in self._particoes.values():
+                particao.palavras.sort()
+                particao.nifs.sort()
+
+    def atualizar(self, nif, id_paciente, nome, medicos, ativo=True):
+        """Substitui o paciente (ou retira-o do índice, se inativo)."""
+        with self._lock:
+            self._remover(nif)
+            if not ativo:
+                return
+            palavras, particoes = self._entrada(nif, id_paciente, nome, medicos)
+            for id_medico in particoes:
+                self._particao(id_medico).adicionar(nif, palavras)
+
+    def pesquisar(self, texto, id_medico=TODOS, limite=10):
+        """Pacientes cujo NIF começa por 'texto' ou cujo nome tem palavras a começar por cada termo."""
+        texto = normalizar((texto or '').strip())
+        with self._lock:
+            particao = self._particoes.get(id_medico)
+            if particao is None or not texto:
+                return []
+
+            if texto.isdigit():
+                nifs = particao.por_nif(texto, limite)
+                return [self._resultado(nif) for nif in nifs]
+
+            termos = _PALAVRA.findall(texto)
+            if not termos:
+                return []
+            # O termo mais longo é, em regra, o mais seletivo
+            principal = max(termos, key=len)
+            candidatos = set(particao.por_palavra(principal))
+            outros = [t for t in termos if t != principal]
+            pacientes = self._pacientes
+            if outros:
+                candidatos = [nif for nif in candidatos
+                              if all(any(p.startswith(t) for p in pacientes[nif][3]) for t in outros)]
+            # Primeiro os nomes que começam pelo texto escrito, depois por ordem alfabética
+            melhores = heapq.nsmallest(limite, candidatos, key=lambda nif: (
+                not pacientes[nif][2].startswith(texto), pacientes[nif][2], nif))
+            return [self._resultado(nif) for nif in melhores]
+
+    def _resultado(self, nif):
+        id_paciente, nome, *_ = self._pacientes[nif]
+        return {'id': id_paciente, 'nif': nif, 'nome': nome}
+
+
+_indice = IndicePacientes()
+_sincronizacao = threading.Lock()
+_desatualizado = False
+
+
+def marcar_desatualizado():
+    """Chamado quando este processo altera pacientes/vínculos: o delta corre na próxima pesquisa."""
+    global _desatualizado
+    _desatualizado = True
+
+
+def sincronizar_indice_pacientes(cursor, forcar=False):
+    """Aplica ao índice os pacientes alterados desde a última sincronização."""
+    global _indice, _desatualizado
+    agora = time.monotonic()
+    if (not forcar and not _desatualizado and _indice.sincronizado_em is not None
+            and agora - _indice.sincronizado_em < REFRESCAR_S):
+        return
+    # Se outro pedido já está a sincronizar, usa o índice como está (desde que já exista)
+    if not _sincronizacao.acquire(blocking=_indice.sincronizado_em is None):
+        return
+
+    def aplicar_delta(indice):
+        cursor.execute("EXEC sp_listarPacientesIndiceAlterados ?", (indice.versao,))
+        pacientes, vinculos, versao = cursor.fetchone()
+        cursor.nextset()
+        # Uma linha por vínculo: agrupar por paciente
+        alterados = {}
+        for id_paciente, nome, nif, ativo, id_medico in cursor.fetchall():
+            _, _, _, medicos = alterados.setdefault(nif, (id_paciente, nome, ativo, set()))
+            if id_medico is not None:
+                medicos.add(id_medico)
+        if len(indice) == 0:
+            indice.carregar((nif, id_paciente, nome, medicos)
+                            for nif, (id_paciente, nome, ativo, medicos) in alterados.items() if ativo)
+        else:
+            for nif, (id_paciente, nome, ativo, medicos) in alterados.items():
+                indice.atualizar(nif, id_paciente, nome, medicos, ativo=bool(ativo))
+        indice.versao = versao
+        return len(indice) == pacientes and indice.vinculos == vinculos
+
+    try:
+        _desatualizado = False
+        indice = _indice
+        if forcar or indice.sincronizado_em is None:
+            indice = IndicePacientes()
+        _indice = sincronizar_por_versao(indice, IndicePacientes, aplicar_delta)
+    finally:
+        _sincronizacao.release()
+
+
+def pesquisar_pacientes(cursor, texto, id_medico=TODOS, limite=10):
+    """Até 'limite' pacientes ativos [{id, nif, nome}] (id_medico=None: todos, para o admin)."""
+    sincronizar_indice_pacientes(cursor)
+    return _indice.pesquisar(texto, int(id_medico) if id_medico else TODOS, limite)
+
+
+def estatisticas_indice_pacientes():
+    return {
+        'pacientes': len(_indice),
+        'vinculos': _indice.vinculos,
+        'medicos': len(_indice._particoes) - 1,
+        'versao': _indice.versao,
+    }
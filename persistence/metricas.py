@@ -0,0 +1,251 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+logger = logging.getLogger('sga.metricas')
+
+LENTO_MS = float(os.getenv("METRICAS_LENTO_MS", 500))
+LOG_JSON = os.getenv("METRICAS_LOG_JSON", "0") == "1"
+AMOSTRAS = int(os.getenv("METRICAS_AMOSTRAS", 2048))
+
+_RE_EXEC = re.compile(r'\bEXEC(?:UTE)?\s+(?:dbo\.)?\[?(\w+)', re.IGNORECASE)
+
+
+def nome_procedimento(sql):
+    """'EXEC sp_x ?, ?' -> 'sp_x'. Batches com várias SPs -> 'sp_a+sp_b'. SQL direto -> 'sql'."""
+    nomes = _RE_EXEC.findall(sql)
+    return '+'.join(dict.fromkeys(nomes)) if nomes else 'sql'
+
+
+class Estatistica:
+    """Contadores de uma rota/procedimento + últimas N durações para os percentis."""
+
+    def __init__(self):
+        self.chamadas = 0
+        self.erros = 0
+        self.linhas = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.amostras = deque(maxlen=AMOSTRAS)
+        self.extras = {}
+
+    def resumo(self):
+        ordenadas = sorted(self.amostras)
+
+        def percentil(p):
+            if not ordenadas:
+                return 0
+            return round(ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p))], 2)
+
+        dados = {
+            'chamadas': self.chamadas,
+            'erros': self.erros,
+            'linhas': self.linhas,
+            'media_ms': round(self.total_ms / self.chamadas, 2) if self.chamadas else 0,
+            'p50_ms': percentil(0.50),
+            'p95_ms': percentil(0.95),
+            'p99_ms': percentil(0.99),
+            'max_ms': round(self.max_ms, 2),
+        }
+        for nome, total in self.extras.items():
+            dados[f'{nome}_media'] = round(total / self.chamadas, 2) if self.chamadas else 0
+        return dados
+
+
+class RegistoMetricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dados = {}
+
+    def registar(self, chave, duracao_ms, linhas=0, erro=False, **extras):
+        with self._lock:
+            est = self._dados.get(chave)
+            if est is None:
+                est = self._dados[chave] = Estatistica()
+            est.chamadas += 1
+            est.erros += 1 if erro else 0
+            est.linhas += linhas
+            est.total_ms += duracao_ms
+            est.max_ms = max(est.max_ms, duracao_ms)
+            est.amostras.append(duracao_ms)
+            for nome, valor in extras.items():
+                est.extras[nome] = est.extras.get(nome, 0) + valor
+
+    def adicionar_linhas(self, chave, linhas):
+        with self._lock:
+            if chave in self._dados:
+                self._dados[chave].linhas += linhas
+
+    def resumo(self):
+        with self._lock:
+            return {chave: est.resumo() for chave, est in sorted(self._dados.items())}
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+
+metricas_procedimentos = RegistoMetricas()
+metricas_rotas = RegistoMetricas()
+
+
+class ContadoresPedido:
+    """Consultas e tempo de BD de um pedido (também somados pelas threads de persistence/paralelo.py)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.consultas = 0
+        self.tempo_bd = 0.0
+
+    def registar(self, duracao_ms):
+        with self._lock:
+            self.consultas += 1
+            self.tempo_bd += duracao_ms
+
+
+_thread = threading.local()
+
+
+def contadores_pedido():
+    """Contadores do pedido em curso: os do contexto Flask ou os emprestados a esta thread."""
+    if has_request_context():
+        return g.get('_sga_contadores')
+    return getattr(_thread, 'contadores', None)
+
+
+@contextmanager
+def usar_contadores(contadores):
+    """Soma as consultas feitas nesta thread (sem contexto Flask) aos contadores de um pedido."""
+    anteriores = getattr(_thread, 'contadores', None)
+    _thread.contadores = contadores
+    try:
+        yield
+    finally:
+        _thread.contadores = anteriores
+
+
+def _log(evento, nivel=logging.INFO, **campos):
+    logger.log(nivel, json.dumps({'evento': evento, **campos}, default=str, ensure_ascii=False))
+
+
+class CursorInstrumentado:
+    """
+    Envolve um cursor pyodbc: mede cada execute() (duração, procedimento, linhas
+    lidas) e acumula por procedimento e por pedido. Tudo o resto é delegado.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._procedimento = None
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+    def __setattr__(self, nome, valor):
+        # Ex.: cursor.fast_executemany = True tem de chegar ao cursor pyodbc
+        if nome.startswith('_'):
+            object.__setattr__(self, nome, valor)
+        else:
+            setattr(self._cursor, nome, valor)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql, *params):
+        procedimento = nome_procedimento(sql)
+        self._procedimento = procedimento
+        inicio = time.perf_counter()
+        erro = False
+        try:
+            self._cursor.execute(sql, *params)
+            return self
+        except Exception:
+            erro = True
+            raise
+        finally:
+            duracao = (time.perf_counter() - inicio) * 1000
+            metricas_procedimentos.registar(procedimento, duracao, erro=erro)
+            contadores = contadores_pedido()
+            if contadores is not None:
+                contadores.registar(duracao)
+            if duracao >= LENTO_MS:
+                _log('consulta_lenta', logging.WARNING, procedimento=procedimento,
+                     duracao_ms=round(duracao, 2), erro=erro)
+            elif LOG_JSON:
+                _log('consulta', procedimento=procedimento, duracao_ms=round(duracao, 2), erro=erro)
+
+    def executemany(self, sql, params):
+        self._procedimento = nome_procedimento(sql)
+        inicio = time.perf_counter()
+        erro = False
+        try:
+            return self._cursor.executemany(sql, params)
+        except Exception:
+            erro = True
+            raise
+        finally:
+            metricas_procedimentos.registar(self._procedimento, (time.perf_counter() - inicio) * 1000, erro=erro)
+
+    def _contar(self, linhas):
+        if self._procedimento and linhas:
+            metricas_procedimentos.adicionar_linhas(self._procedimento, linhas)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        self._contar(1 if row is not None else 0)
+        return row
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._contar(len(rows))
+        return rows
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        self._contar(len(rows))
+        return rows
+
+
+def init_app(app):
+    """Mede cada pedido e agrega por endpoint (inclui nº de consultas e tempo de BD)."""
+    if LOG_JSON and not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+
+    @app.before_request
+    def _iniciar_medicao():
+        g._sga_inicio = time.perf_counter()
+        g._sga_contadores = ContadoresPedido()
+
+    @app.after_request
+    def _guardar_estado(resposta):
+        g._sga_estado = resposta.status_code
+        return resposta
+
+    # No teardown e não no after_request: um pedido que rebenta (e não chega a ter
+    # resposta) também conta, como 500
+    @app.teardown_request
+    def _terminar_medicao(excecao):
+        inicio = g.pop('_sga_inicio', None)
+        if inicio is None:
+            return
+        duracao = (time.perf_counter() - inicio) * 1000
+        rota = request.endpoint or 'desconhecida'
+        estado = 500 if excecao is not None else g.pop('_sga_estado', 500)
+        contadores = g.pop('_sga_contadores')
+        consultas, tempo_bd = contadores.consultas, contadores.tempo_bd
+        metricas_rotas.registar(rota, duracao, erro=estado >= 500,
+                                consultas=consultas, bd_ms=tempo_bd)
+        if LOG_JSON or duracao >= LENTO_MS or excecao is not None:
+            _log('pedido', logging.WARNING if duracao >= LENTO_MS or excecao is not None else logging.INFO,
+                 rota=rota, metodo=request.method, estado=estado,
+                 duracao_ms=round(duracao, 2), consultas=consultas, bd_ms=round(tempo_bd, 2))
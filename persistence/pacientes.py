@@ -1,4 +1,8 @@
 from datetime import datetime
+from persistence.cache import cache_referencia
+from persistence.dashboard import invalidar_dashboard
+from persistence.indice_pacientes import marcar_desatualizado
+from persistence.paginacao import executar_pagina, escapar_like, descodificar_cursor, normalizar_tamanho
 
 def contar_pacientes(cursor):
     try:
@@ -41,16 +45,46 @@ def listar_pacientes_geral(cursor, id_user, perfil):
     cursor.execute("EXEC sp_listarPacientesSGA ?, ?", (id_user, perfil))
     return cursor.fetchall() # Retorna tuplos, como o template espera
 
+def listar_pacientes_pagina(cursor, id_user, perfil, tamanho=None, pesquisa=None, descendente=False, apos=None):
+    """
+    Versão paginada de listar_pacientes_geral (mesmas colunas).
+    Retorna (linhas, token_proxima_pagina | None).
+    """
+    tamanho = normalizar_tamanho(tamanho)
+    apos_nome, apos_id = descodificar_cursor(apos)
+    return executar_pagina(cursor, "EXEC sp_listarPacientesSGAPagina ?, ?, ?, ?, ?, ?, ?",
+                           (id_user, perfil, tamanho, escapar_like(pesquisa), 1 if descendente else 0, apos_nome, apos_id),
+                           tamanho, idx_nome=1, idx_id=0)
+
 def listar_pacientes_arquivo(cursor):
     cursor.execute("EXEC sp_listarPacientesInativos")
     return cursor.fetchall()
 
+def listar_pacientes_arquivo_pagina(cursor, tamanho=None, pesquisa=None, descendente=False, apos=None):
+    tamanho = normalizar_tamanho(tamanho)
+    apos_nome, apos_id = descodificar_cursor(apos)
+    return executar_pagina(cursor, "EXEC sp_listarPacientesInativosPagina ?, ?, ?, ?, ?",
+                           (tamanho, escapar_like(pesquisa), 1 if descendente else 0, apos_nome, apos_id),
+                           tamanho, idx_nome=1, idx_id=0)
+
+def invalidar_pacientes_agenda():
+    """Chamado pela rota depois do commit de qualquer alteração a pacientes/vínculos."""
+    cache_referencia.invalidar('sp_ListarPacientesParaAgenda')
+    marcar_desatualizado()
+    # total_pacientes do dashboard (por médico: também depende dos vínculos)
+    invalidar_dashboard()
+
 def listar_pacientes_dropdown_agenda(cursor, id_user, perfil):
     """Substitui a lógica da rota /agenda para pacientes"""
-    cursor.execute("EXEC sp_ListarPacientesParaAgenda ?, ?", (id_user, perfil))
-    rows = cursor.fetchall()
-    # REPLICAÇÃO EXATA DA LÓGICA DO APP.PY:
-    return [{'nif': r[2], 'nome': r[1]} for r in rows]
+    def carregar():
+        cursor.execute("EXEC sp_ListarPacientesParaAgenda ?, ?", (id_user, perfil))
+        rows = cursor.fetchall()
+        # REPLICAÇÃO EXATA DA LÓGICA DO APP.PY:
+        return [{'nif': r[2], 'nome': r[1]} for r in rows]
+    # id_user pode chegar como str (query string) ou int (sessão)
+    chave = ('sp_ListarPacientesParaAgenda', str(id_user), perfil)
+    # Cópia para que quem chama não altere a entrada em cache
+    return list(cache_referencia.obter_ou_calcular(chave, carregar))
 
 def criar_paciente_completo(cursor, nif, nome, data_nasc, telefone, email, observacoes, id_medico):
     cursor.execute("EXEC sp_guardarPessoa ?, ?, ?, ?, ?", 
@@ -81,4 +115,4 @@ def ativar_paciente_logico(cursor, id_paciente):
     cursor.execute("EXEC sp_ativarPaciente ?", (id_paciente,))
 
 def eliminar_paciente_fisico(cursor, id_paciente):
-    cursor.execute("EXEC sp_eliminarPacientePermanente ?", (id_paciente,))
\ No newline at end of file
+    cursor.execute("EXEC sp_eliminarPacientePermanente ?", (id_paciente,))
@@ -0,0 +1,49 @@
+import base64
+import json
+
+TAMANHO_PADRAO = 50
+TAMANHO_MAX = 200
+
+
+def escapar_like(texto):
+    """Escapa os caracteres especiais do LIKE para pesquisas por prefixo."""
+    if not texto:
+        return None
+    return texto.strip().replace('[', '[[]').replace('%', '[%]').replace('_', '[_]') or None
+
+
+def codificar_cursor(nome, id_):
+    return base64.urlsafe_b64encode(json.dumps([nome, id_]).encode()).decode().rstrip('=')
+
+
+def descodificar_cursor(token):
+    """Token opaco -> (nome, id). Token vazio ou inválido -> (None, None)."""
+    if not token:
+        return None, None
+    try:
+        nome, id_ = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return str(nome), int(id_)
+    except (ValueError, TypeError):
+        return None, None
+
+
+def normalizar_tamanho(tamanho):
+    try:
+        tamanho = int(tamanho)
+    except (TypeError, ValueError):
+        return TAMANHO_PADRAO
+    return max(1, min(tamanho, TAMANHO_MAX))
+
+
+def executar_pagina(cursor, sql, params, tamanho, idx_nome, idx_id):
+    """
+    Executa uma SP paginada (que devolve tamanho + 1 linhas) e retorna
+    (linhas, token_proxima_pagina | None).
+    """
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    if len(rows) <= tamanho:
+        return rows, None
+    rows = rows[:tamanho]
+    ultima = rows[-1]
+    return rows, codificar_cursor(ultima[idx_nome], ultima[idx_id])
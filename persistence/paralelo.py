@@ -0,0 +1,58 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from persistence.metricas import contadores_pedido, usar_contadores
+from persistence.session import get_db_connection
+
+# Threads partilhadas pelos pedidos; cada chamada usa uma conexão própria do pool
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("DB_PARALELO_MAX", 8)),
+    thread_name_prefix="sga-bd",
+)
+
+
+def _executar(funcao, args):
+    conn = get_db_connection()
+    try:
+        return funcao(conn.cursor(), *args)
+    finally:
+        conn.close()
+
+
+def _executar_na_thread(contadores, funcao, args):
+    # As consultas contam para o pedido que as lançou (métricas por rota)
+    with usar_contadores(contadores):
+        return _executar(funcao, args)
+
+
+def executar_em_paralelo(*chamadas):
+    """
+    Executa consultas independentes em simultâneo e devolve os resultados pela
+    mesma ordem. Cada chamada é (funcao, *args) e a função recebe o cursor como
+    primeiro argumento, como as restantes funções de persistência:
+
+        detalhes, equipa = executar_em_paralelo(
+            (obter_detalhes_paciente, id_paciente, id_user, perfil),
+            (listar_equipa_do_paciente, id_paciente),
+        )
+
+    Só para leituras: cada chamada corre numa conexão (e transação) diferente.
+    Se alguma falhar, a exceção é relançada depois de todas terminarem.
+    """
+    if len(chamadas) == 1:
+        funcao, *args = chamadas[0]
+        return [_executar(funcao, args)]
+
+    contadores = contadores_pedido()
+    futuros = [_executor.submit(_executar_na_thread, contadores, funcao, args) for funcao, *args in chamadas]
+    erro = None
+    resultados = []
+    for futuro in futuros:
+        try:
+            resultados.append(futuro.result())
+        except Exception as e:
+            erro = erro or e
+            resultados.append(None)
+    if erro is not None:
+        raise erro
+    return resultados
@@ -0,0 +1,345 @@
+"""
+Pesquisa por palavras-chave nos relatórios clínicos (SGA_RELATORIO.conteudo).
+
+Com o índice full-text do SQL Server (sql/fulltext.sql) a pesquisa é feita por
+sp_pesquisarRelatorios (CONTAINSTABLE). Sem ele, usa-se um índice invertido em
+memória, por autor (só postings e comprimentos; os trechos dos melhores resultados
+vêm da BD), carregado de sp_listarRelatoriosAlterados e mantido por:
+  - relatorio_guardado, depois do commit (atualização imediata neste processo);
+  - sincronização incremental por rowversion a cada PESQUISA_REFRESCAR_S
+    (apanha o que foi gravado noutros processos; eliminações forçam recarga).
+
+Em ambos os casos só se pesquisa nos relatórios do próprio autor, como em
+sp_obterLivrariaRelatorios. Os termos são pesquisados por prefixo, sem
+distinção de maiúsculas nem acentos, e todos têm de aparecer (AND).
+"""
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime
+
+REFRESCAR_S = float(os.getenv("PESQUISA_REFRESCAR_S", 30))
+TAMANHO_TRECHO = 200
+MAX_EXPANSOES = 50
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_PALAVRA = re.compile(r'\w+')
+_IRRELEVANTES = frozenset(
+    'ao aos as com da das de do dos e em na nas no nos o os ou para pela pelo por que se um uma'.split()
+)
+
+# Minúsculas sem acentos, carácter a carácter: o texto normalizado mantém o comprimento
+# do original e as posições encontradas servem diretamente para os trechos.
+_TABELA = {}
+for _cp in range(0x250):
+    _base = unicodedata.normalize('NFD', chr(_cp))[0].lower()
+    if len(_base) == 1 and _base != chr(_cp):
+        _TABELA[_cp] = _base
+
+
+def normalizar(texto):
+    return texto.translate(_TABELA)
+
+
+def termos_pesquisa(texto):
+    """Termos de uma pesquisa (normalizados, sem palavras irrelevantes, sem repetidos)."""
+    vistos = []
+    for termo in _PALAVRA.findall(normalizar(texto or '')):
+        if len(termo) >= 2 and termo not in _IRRELEVANTES and termo not in vistos:
+            vistos.append(termo)
+    return vistos[:10]
+
+
+def consulta_contains(termos):
+    """Termos -> condição CONTAINS por prefixo: '"ansied*" AND "sono*"'."""
+    return ' AND '.join(f'"{termo}*"' for termo in termos)
+
+
+def gerar_trecho(conteudo, termos, tamanho=TAMANHO_TRECHO):
+    """
+    Excerto do conteúdo à volta da primeira ocorrência de um dos termos.
+    Retorna (trecho, destaques) com destaques = [[inicio, fim], ...] relativos ao trecho.
+    """
+    conteudo = conteudo or ''
+    ocorrencias = [(m.start(), m.end()) for m in _PALAVRA.finditer(normalizar(conteudo))
+                   if any(m.group().startswith(t) for t in termos)]
+
+    primeira = ocorrencias[0][0] if ocorrencias else 0
+    inicio = max(0, primeira - tamanho // 4)
+    if inicio > 0:
+        espaco = conteudo.rfind(' ', 0, inicio)
+        inicio = espaco + 1 if espaco >= 0 and inicio - espaco < 20 else inicio
+    fim = min(len(conteudo), inicio + tamanho)
+    if fim < len(conteudo):
+        espaco = conteudo.find(' ', fim)
+        fim = espaco if 0 <= espaco - fim < 20 else fim
+
+    prefixo = '…' if inicio > 0 else ''
+    trecho = prefixo + conteudo[inicio:fim] + ('…' if fim < len(conteudo) else '')
+    destaques = [[i - inicio + len(prefixo), f - inicio + len(prefixo)]
+                 for i, f in ocorrencias if i >= inicio and f <= fim]
+    return trecho, destaques
+
+
+class _IndiceAutor:
+    __slots__ = ('postings', 'comprimentos', 'comprimento_total', '_termos_ordenados')
+
+    def __init__(self):
+        self.postings = {}  # termo -> {id_relatorio: frequência}
+        self.comprimentos = {}  # id_relatorio -> nº de termos
+        self.comprimento_total = 0
+        self._termos_ordenados = None
+
+    def termos_com_prefixo(self, prefixo):
+        if self._termos_ordenados is None:
+            self._termos_ordenados = sorted(self.postings)
+        termos = self._termos_ordenados
+        i = bisect_left(termos, prefixo)
+        encontrados = []
+        while i < len(termos) and termos[i].startswith(prefixo) and len(encontrados) < MAX_EXPANSOES:
+            encontrados.append(termos[i])
+            i += 1
+        return encontrados
+
+
+class IndiceRelatorios:
+    """
+    Índice invertido em memória, particionado por autor, com ranking BM25.
+    Só guarda postings, comprimentos e o necessário para filtrar/ordenar (autor,
+    paciente, data): o conteúdo, o tipo e o nome do paciente dos melhores resultados
+    são lidos da BD a cada pesquisa (sp_obterRelatoriosPorIds).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs = {}  # id -> (id_autor, id_paciente, data)
+        self._autores = {}  # id_autor -> _IndiceAutor
+        self.versao = 0
+        self.sincronizado_em = None
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _remover(self, id_rel):
+        # Só em edições (raras): percorre os postings do autor em vez de guardar os termos de cada documento
+        doc = self._docs.pop(id_rel, None)
+        if doc is None:
+            return
+        autor = self._autores[doc[0]]
+        for termo in [t for t, ids in autor.postings.items() if id_rel in ids]:
+            ids = autor.postings[termo]
+            del ids[id_rel]
+            if not ids:
+                del autor.postings[termo]
+                autor._termos_ordenados = None
+        autor.comprimento_total -= autor.comprimentos.pop(id_rel)
+
+    def adicionar(self, id_rel, id_autor, id_paciente, data, conteudo):
+        frequencias = Counter(_PALAVRA.findall(normalizar(conteudo or '')))
+        for termo in [t for t in frequencias if len(t) < 2 or t in _IRRELEVANTES]:
+            del frequencias[termo]
+
+        with self._lock:
+            anterior = self._docs.get(id_rel)
+            if anterior:
+                data = data or anterior[2]
+            self._remover(id_rel)
+            autor = self._autores.setdefault(id_autor, _IndiceAutor())
+            postings = autor.postings
+            for termo, freq in frequencias.items():
+                ids = postings.get(termo)
+                if ids is None:
+                    ids = postings[termo] = {}
+                    autor._termos_ordenados = None
+                ids[id_rel] = freq
+            self._docs[id_rel] = (id_autor, id_paciente, data or datetime.now())
+            comprimento = sum(frequencias.values())
+            autor.comprimentos[id_rel] = comprimento
+            autor.comprimento_total += comprimento
+
+    def pesquisar(self, id_autor, termos, id_paciente=None, limite=20):
+        """[(id_relatorio, pontuação)] dos melhores resultados, por pontuação e data."""
+        with self._lock:
+            autor = self._autores.get(id_autor)
+            if autor is None or not termos:
+                return []
+
+            n_docs = len(autor.comprimentos)
+            media = autor.comprimento_total / n_docs if n_docs else 1
+            pontuacoes = None
+            for termo in termos:
+                do_termo = {}
+                for expansao in autor.termos_com_prefixo(termo):
+                    ids = autor.postings[expansao]
+                    idf = math.log(1 + (n_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+                    for id_rel, freq in ids.items():
+                        norma = BM25_K1 * (1 - BM25_B + BM25_B * autor.comprimentos[id_rel] / media)
+                        do_termo[id_rel] = do_termo.get(id_rel, 0) + idf * freq * (BM25_K1 + 1) / (freq + norma)
+                # Todos os termos têm de aparecer
+                if pontuacoes is None:
+                    pontuacoes = do_termo
+                else:
+                    pontuacoes = {i: p + do_termo[i] for i, p in pontuacoes.items() if i in do_termo}
+                if not pontuacoes:
+                    return []
+
+            if id_paciente is not None:
+                pontuacoes = {i: p for i, p in pontuacoes.items() if self._docs[i][1] == id_paciente}
+
+            melhores = sorted(pontuacoes.items(),
+                              key=lambda item: (-item[1], -self._docs[item[0]][2].timestamp()))[:limite]
+            return [(id_rel, round(pontuacao, 3)) for id_rel, pontuacao in melhores]
+
+
+_indice = IndiceRelatorios()
+_sincronizacao = threading.Lock()
+_fts_disponivel = None  # None: ainda não testado
+
+
+def sincronizar_por_versao(indice, novo, aplicar_delta, tentativas=2):
+    """
+    Aplica ao índice o delta desde indice.versao; aplicar_delta(indice) devolve True se
+    as contagens do índice batem com as da BD. Se não batem (eliminações, ou gravação
+    entre a contagem e as linhas) recarrega tudo num índice novo, até 'tentativas'
+    passagens. Esgotadas, fica a última carga completa: a sincronização seguinte volta
+    a conferir as contagens, e até lá o índice serve melhor do que um vazio.
+    """
+    for tentativa in range(tentativas):
+        if tentativa:
+            indice = novo()
+        if aplicar_delta(indice):
+            break
+    indice.sincronizado_em = time.monotonic()
+    return indice
+
+
+def sincronizar_indice(cursor, forcar=False):
+    """Aplica ao índice em memória os relatórios alterados desde a última sincronização."""
+    global _indice
+    agora = time.monotonic()
+    if not forcar and _indice.sincronizado_em is not None and agora - _indice.sincronizado_em < REFRESCAR_S:
+        return
+    # Se outro pedido já está a sincronizar, usa o índice como está (desde que já exista)
+    if not _sincronizacao.acquire(blocking=_indice.sincronizado_em is None):
+        return
+
+    def aplicar_delta(indice):
+        cursor.execute("EXEC sp_listarRelatoriosAlterados ?", (indice.versao,))
+        total, versao = cursor.fetchone()
+        cursor.nextset()
+        while True:
+            rows = cursor.fetchmany(500)
+            if not rows:
+                break
+            for row in rows:
+                # O conteúdo só é usado para os postings; não fica em memória
+                indice.adicionar(row[0], row[3], row[1], row[5], row[6])
+        indice.versao = versao
+        return len(indice) == total
+
+    try:
+        indice = _indice
+        if forcar or indice.sincronizado_em is None:
+            indice = IndiceRelatorios()
+        _indice = sincronizar_por_versao(indice, IndiceRelatorios, aplicar_delta)
+    finally:
+        _sincronizacao.release()
+
+
+def preparar_em_segundo_plano():
+    """
+    Decide o motor (full-text ou memória) e, sem full-text, carrega o índice numa
+    thread: o aquecimento do worker não espera (com muitos relatórios a carga pode
+    passar o timeout do gunicorn). Uma pesquisa feita antes de acabar espera por ela.
+    """
+    from persistence.session import get_db_connection
+
+    def preparar():
+        conn = None
+        try:
+            conn = get_db_connection()
+            pesquisar_relatorios(conn.cursor(), 0, 'aquecimento', limite=1)
+        except Exception as e:
+            print(f"Erro ao preparar a pesquisa de relatórios: {e}")
+        finally:
+            if conn is not None:
+                conn.close()
+
+    threading.Thread(target=preparar, name='indice-relatorios', daemon=True).start()
+
+
+def atualizar_relatorio_indice(id_rel, id_paciente, id_autor, conteudo):
+    """Chamado por relatorio_guardado, depois do commit: o relatório fica pesquisável de imediato."""
+    if _indice.sincronizado_em is not None:
+        _indice.adicionar(id_rel, id_autor, id_paciente, None, conteudo)
+
+
+def _detalhes(cursor, id_autor, melhores):
+    """Linhas completas dos resultados do índice em memória, pela ordem do ranking."""
+    if not melhores:
+        return []
+    cursor.execute("EXEC sp_obterRelatoriosPorIds ?, ?",
+                   (id_autor, ','.join(str(id_rel) for id_rel, _ in melhores)))
+    por_id = {row[0]: row for row in cursor.fetchall()}
+    # Um relatório eliminado entretanto (ainda no índice) fica de fora
+    return [(*por_id[id_rel][:5], pontuacao, por_id[id_rel][5])
+            for id_rel, pontuacao in melhores if id_rel in por_id]
+
+
+def pesquisar_relatorios(cursor, id_autor, texto, id_paciente=None, limite=20):
+    """
+    Retorna (motor, resultados): motor é 'fulltext' ou 'memoria'; cada resultado é um dict
+    com id, id_paciente, nome_paciente, tipo, data, pontuacao, trecho e destaques.
+    """
+    global _fts_disponivel
+    termos = termos_pesquisa(texto)
+    if not termos:
+        return 'memoria', []
+
+    rows = None
+    motor = 'fulltext'
+    if _fts_disponivel is not False:
+        try:
+            cursor.execute("EXEC sp_pesquisarRelatorios ?, ?, ?, ?",
+                           (id_autor, consulta_contains(termos), id_paciente, limite))
+            rows = cursor.fetchall()
+            _fts_disponivel = True
+        except Exception as e:
+            if '50020' in str(e):
+                _fts_disponivel = False
+            else:
+                print(f"Erro na pesquisa full-text, a usar índice em memória: {e}")
+
+    if rows is None:
+        motor = 'memoria'
+        sincronizar_indice(cursor)
+        rows = _detalhes(cursor, id_autor, _indice.pesquisar(int(id_autor), termos, id_paciente, limite))
+
+    resultados = []
+    for row in rows:
+        trecho, destaques = gerar_trecho(row[6], termos)
+        resultados.append({
+            'id': row[0],
+            'id_paciente': row[1],
+            'nome_paciente': row[2],
+            'tipo': row[3],
+            'data': row[4],
+            'pontuacao': row[5],
+            'trecho': trecho,
+            'destaques': destaques,
+        })
+    return motor, resultados
+
+
+def estatisticas_indice():
+    return {
+        'fulltext': _fts_disponivel,
+        'relatorios_em_memoria': len(_indice),
+        'versao': _indice.versao,
+    }
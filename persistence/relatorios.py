@@ -1,10 +1,47 @@
+from datetime import datetime
+
+from persistence.paginacao import codificar_cursor, descodificar_cursor
+from persistence.pesquisa import atualizar_relatorio_indice
+
+TAMANHO_HISTORICO = 20
+
 def listar_relatorios_dashboard(cursor, id_user, perfil):
     cursor.execute("EXEC sp_listarProcessosClinicosAtivos ?, ?", (id_user, perfil))
     return cursor.fetchall()
 
-def carregar_historico_relatorios(cursor, id_paciente, id_leitor):
-    cursor.execute("EXEC sp_obterLivrariaRelatorios ?, ?", (id_paciente, id_leitor))
-    return cursor.fetchall()
+def carregar_historico_relatorios(cursor, id_paciente, id_leitor, tamanho=TAMANHO_HISTORICO, apos=None):
+    """
+    Uma página do histórico (id, tipo_relatorio, data_criacao), do mais recente para o mais antigo.
+    Retorna (linhas, token_proxima_pagina | None). O conteúdo lê-se com obter_relatorio.
+    """
+    data_apos, id_apos = descodificar_cursor(apos)
+    try:
+        data_apos = datetime.fromisoformat(data_apos) if data_apos else None
+    except ValueError:
+        data_apos, id_apos = None, None
+
+    cursor.execute("EXEC sp_obterLivrariaRelatorios ?, ?, ?, ?, ?",
+                   (id_paciente, id_leitor, tamanho, data_apos, id_apos))
+    rows = cursor.fetchall()
+    if len(rows) <= tamanho:
+        return rows, None
+    rows = rows[:tamanho]
+    ultima = rows[-1]
+    return rows, codificar_cursor(ultima[2].isoformat(), ultima[0])
+
+def obter_relatorio(cursor, id_relatorio, id_leitor):
+    """Relatório completo (só para o autor) ou None."""
+    cursor.execute("EXEC sp_obterRelatorio ?, ?", (id_relatorio, id_leitor))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return {
+        'id': row[0],
+        'id_paciente': row[1],
+        'tipo': row[2],
+        'data': row[3],
+        'conteudo': row[4],
+    }
 
 def obter_nome_paciente_simples(cursor, id_paciente):
     # Query direta que estava no app.py
@@ -13,5 +50,18 @@ def obter_nome_paciente_simples(cursor, id_paciente):
     return res[0] if res else "Paciente"
 
 def guardar_relatorio_clinico(cursor, id_rel, id_pac, id_autor, conteudo, tipo):
+    """
+    Retorna o id do relatório gravado. Depois do commit, quem chama atualiza o índice
+    de pesquisa (relatorio_guardado): antes disso a gravação ainda pode ser desfeita.
+    """
     cursor.execute("EXEC sp_salvarRelatorioClinico ?, ?, ?, ?, ?", 
-                   (id_rel, id_pac, id_autor, conteudo, tipo))
\ No newline at end of file
+                   (id_rel, id_pac, id_autor, conteudo, tipo))
+    row = cursor.fetchone()
+    if row and row[0]:
+        return int(row[0])
+    return None
+
+def relatorio_guardado(id_rel, id_pac, id_autor, conteudo):
+    """Depois do commit: o relatório fica pesquisável de imediato neste processo."""
+    if id_rel:
+        atualizar_relatorio_indice(int(id_rel), int(id_pac), int(id_autor), conteudo)
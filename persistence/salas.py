@@ -1,3 +1,9 @@
+from datetime import datetime, time
+
+# Horário de funcionamento (igual ao businessHours da agenda)
+PERIODOS_FUNCIONAMENTO = ((time(9, 0), time(13, 0)), (time(14, 0), time(18, 0)))
+
+
 def contar_salas_livres(cursor):
     try:
         cursor.execute("EXEC sp_contarSalasLivresAgora")
@@ -5,4 +11,48 @@ def contar_salas_livres(cursor):
         return row[0] if row else 0
     except Exception as e:
         print(f"Erro salas livres: {e}")
-        return 0
\ No newline at end of file
+        return 0
+
+
+def _intervalos_livres(dia, ocupados):
+    """Buracos do horário de funcionamento não cobertos pelos intervalos ocupados (ordenados)."""
+    livres = []
+    for abertura, fecho in PERIODOS_FUNCIONAMENTO:
+        cursor_hora = datetime.combine(dia, abertura)
+        fim_periodo = datetime.combine(dia, fecho)
+        for inicio, fim in ocupados:
+            if fim <= cursor_hora or inicio >= fim_periodo:
+                continue
+            if inicio > cursor_hora:
+                livres.append((cursor_hora, inicio))
+            cursor_hora = max(cursor_hora, fim)
+        if cursor_hora < fim_periodo:
+            livres.append((cursor_hora, fim_periodo))
+    return livres
+
+
+def obter_ocupacao_salas_dia(cursor, dia):
+    """
+    Ocupação das salas físicas num dia (sp_obterOcupacaoSalasDia).
+    Retorna lista de dicts: id_sala, nome, id_dono, ocupado [(inicio, fim, num_atendimento)],
+    livre [(inicio, fim)] dentro do horário de funcionamento.
+    """
+    try:
+        cursor.execute("EXEC sp_obterOcupacaoSalasDia ?", (dia,))
+        salas = {}
+        for row in cursor.fetchall():
+            sala = salas.setdefault(row[0], {
+                'id_sala': row[0],
+                'nome': row[1],
+                'id_dono': row[2],
+                'ocupado': [],
+            })
+            if row[3] is not None:
+                sala['ocupado'].append((row[4], row[5], row[3]))
+
+        for sala in salas.values():
+            sala['livre'] = _intervalos_livres(dia, [(i, f) for i, f, _ in sala['ocupado']])
+        return list(salas.values())
+    except Exception as e:
+        print(f"Erro ocupação salas: {e}")
+        return []
@@ -1,14 +1,21 @@
 import os
+import threading
+import time
+from collections import deque
 from dotenv import load_dotenv
-import pyodbc
+from flask import g, has_app_context
+
+from persistence.metricas import CursorInstrumentado
 
 load_dotenv()
 
-def get_db_connection():
-    """
-    Cria conexão ao SQL Server.
-    """
-    conn_str = (
+
+class PoolEsgotado(Exception):
+    """Não foi possível obter uma conexão dentro do tempo limite."""
+
+
+def _conn_str():
+    return (
         f'DRIVER={{ODBC Driver 18 for SQL Server}};'
         f'SERVER={os.getenv("SERVER")};'
         f'DATABASE={os.getenv("DATABASE")};'
@@ -16,17 +23,337 @@ def get_db_connection():
         f'PWD={os.getenv("PWD")};'
         f'TrustServerCertificate=yes;'
     )
-    return pyodbc.connect(conn_str)
+
+
+def _ligar_sqlserver():
+    # Importado só aqui: o backend SQLite não precisa do pyodbc nem do unixODBC
+    import pyodbc
+    return pyodbc.connect(_conn_str())
+
+
+def _ligar_sqlite():
+    # Só carregado quando escolhido (ver persistence/sqlite.py)
+    from persistence.sqlite import ligar
+    return ligar(os.getenv("SQLITE_PATH", "sga.sqlite3"))
+
+
+BACKENDS = {
+    'sqlserver': _ligar_sqlserver,
+    'sqlite': _ligar_sqlite,
+}
+
+
+def _criar_conexao():
+    """
+    Cria conexão à BD do backend configurado em DB_BACKEND: 'sqlserver' (por omissão)
+    ou 'sqlite' (ficheiro local SQLITE_PATH, para benchmarks e testes sem servidor).
+    Os dois implementam os mesmos procedimentos; o resto da persistência não muda.
+    """
+    nome = os.getenv("DB_BACKEND", "sqlserver").strip().lower()
+    if nome not in BACKENDS:
+        raise ValueError(f"DB_BACKEND desconhecido: '{nome}' (opções: {', '.join(BACKENDS)})")
+    return BACKENDS[nome]()
+
+
+class ConexaoPooled:
+    """
+    Envolve uma conexão pyodbc emprestada pelo pool.
+    close() devolve a conexão ao pool em vez de a fechar; tudo o resto
+    (cursor, commit, rollback, ...) é delegado na conexão real.
+    """
+
+    def __init__(self, pool, conn, criada_em):
+        self._pool = pool
+        self._conn = conn
+        self._criada_em = criada_em
+        self._devolvida = False
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+    def cursor(self):
+        # Cursores medidos (ver persistence/metricas.py)
+        return CursorInstrumentado(self._conn.cursor())
+
+    def close(self):
+        if self._devolvida:
+            return
+        self._devolvida = True
+        self._pool.devolver(self._conn, self._criada_em)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PoolConexoes:
+    """
+    Pool de conexões limitado e thread-safe.
+
+    - minimo/maximo: nº de conexões mantidas abertas / abertas em simultâneo
+    - timeout: segundos que um pedido espera por uma conexão livre
+    - max_inativa: segundos que uma conexão livre (acima do mínimo) pode ficar parada
+    - max_vida: segundos máximos de vida de qualquer conexão
+    Cada conexão reutilizada é validada com SELECT 1 antes de ser entregue.
+    """
+
+    def __init__(self, fabrica=_criar_conexao, minimo=1, maximo=10, timeout=15,
+                 max_inativa=300, max_vida=1800):
+        self._fabrica = fabrica
+        self.minimo = minimo
+        self.maximo = maximo
+        self.timeout = timeout
+        self.max_inativa = max_inativa
+        self.max_vida = max_vida
+
+        self._cond = threading.Condition()
+        self._livres = deque()  # (conn, criada_em, usada_em)
+        self._total = 0
+        self._em_uso = 0
+        self._em_espera = 0
+
+        self._pedidos = 0
+        self._esperas = 0
+        self._tempo_espera_total = 0.0
+        self._tempo_espera_max = 0.0
+        self._esgotamentos = 0
+        self._criadas = 0
+        self._descartadas = 0
+
+    # --- Ciclo de vida das conexões ---
+
+    def _expirada(self, criada_em, usada_em, agora):
+        if agora - criada_em > self.max_vida:
+            return True
+        return self._total > self.minimo and agora - usada_em > self.max_inativa
+
+    def _retirar_livre(self, a_fechar):
+        """Retira a conexão livre mais recente, descartando as expiradas (com o lock)."""
+        agora = time.monotonic()
+        while self._livres:
+            conn, criada_em, usada_em = self._livres.pop()
+            if self._expirada(criada_em, usada_em, agora):
+                self._total -= 1
+                self._descartadas += 1
+                a_fechar.append(conn)
+                continue
+            return conn, criada_em
+        return None
+
+    @staticmethod
+    def _fechar(conexoes):
+        for conn in conexoes:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _validar(conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _descartar(self, conn):
+        self._fechar([conn])
+        with self._cond:
+            self._total -= 1
+            self._descartadas += 1
+            self._cond.notify()
+
+    def obter(self):
+        inicio = time.monotonic()
+        limite = inicio + self.timeout
+        esperou = False
+
+        while True:
+            a_fechar = []
+            candidata = None
+            with self._cond:
+                while True:
+                    candidata = self._retirar_livre(a_fechar)
+                    if candidata or self._total < self.maximo:
+                        break
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        self._esgotamentos += 1
+                        self._fechar(a_fechar)
+                        raise PoolEsgotado(
+                            f"Sem conexões livres após {self.timeout}s ({self.maximo} em uso)."
+                        )
+                    esperou = True
+                    self._em_espera += 1
+                    try:
+                        self._cond.wait(restante)
+                    finally:
+                        self._em_espera -= 1
+                if candidata is None:
+                    self._total += 1
+            self._fechar(a_fechar)
+
+            if candidata is None:
+                try:
+                    conn = self._fabrica()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+                criada_em = time.monotonic()
+                with self._cond:
+                    self._criadas += 1
+            else:
+                conn, criada_em = candidata
+                if not self._validar(conn):
+                    self._descartar(conn)
+                    continue
+            break
+
+        espera = time.monotonic() - inicio
+        with self._cond:
+            self._em_uso += 1
+            self._pedidos += 1
+            if esperou:
+                self._esperas += 1
+            self._tempo_espera_total += espera
+            self._tempo_espera_max = max(self._tempo_espera_max, espera)
+        return ConexaoPooled(self, conn, criada_em)
+
+    def devolver(self, conn, criada_em):
+        # Descarta qualquer transação que tenha ficado aberta (ex.: erro antes do commit)
+        try:
+            conn.rollback()
+            saudavel = True
+        except Exception:
+            saudavel = False
+
+        with self._cond:
+            self._em_uso -= 1
+            if saudavel:
+                self._livres.append((conn, criada_em, time.monotonic()))
+            else:
+                self._total -= 1
+                self._descartadas += 1
+            self._cond.notify()
+        if not saudavel:
+            self._fechar([conn])
+
+    def aquecer(self):
+        """Abre conexões até ao mínimo configurado."""
+        while True:
+            with self._cond:
+                if self._total >= self.minimo:
+                    return
+                self._total += 1
+            try:
+                conn = self._fabrica()
+            except Exception:
+                with self._cond:
+                    self._total -= 1
+                raise
+            with self._cond:
+                self._criadas += 1
+                self._livres.appendleft((conn, time.monotonic(), time.monotonic()))
+                self._cond.notify()
+
+    def fechar_todas(self):
+        with self._cond:
+            livres = [c for c, _, _ in self._livres]
+            self._total -= len(livres)
+            self._livres.clear()
+        self._fechar(livres)
+
+    def estatisticas(self):
+        with self._cond:
+            return {
+                'minimo': self.minimo,
+                'maximo': self.maximo,
+                'total': self._total,
+                'em_uso': self._em_uso,
+                'livres': len(self._livres),
+                'em_espera': self._em_espera,
+                'pedidos': self._pedidos,
+                'pedidos_com_espera': self._esperas,
+                'espera_media_ms': round(self._tempo_espera_total / self._pedidos * 1000, 2) if self._pedidos else 0,
+                'espera_max_ms': round(self._tempo_espera_max * 1000, 2),
+                'esgotamentos': self._esgotamentos,
+                'criadas': self._criadas,
+                'descartadas': self._descartadas,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def obter_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PoolConexoes(
+                    minimo=int(os.getenv("DB_POOL_MIN", 1)),
+                    maximo=int(os.getenv("DB_POOL_MAX", 10)),
+                    timeout=float(os.getenv("DB_POOL_TIMEOUT", 15)),
+                    max_inativa=float(os.getenv("DB_POOL_MAX_IDLE", 300)),
+                    max_vida=float(os.getenv("DB_POOL_MAX_LIFETIME", 1800)),
+                )
+    return _pool
+
+
+def definir_pool(pool):
+    """
+    Substitui o pool do processo (ex.: benchmarks/carga.py com outra fábrica de
+    conexões). As conexões livres do pool anterior são fechadas.
+    """
+    global _pool
+    with _pool_lock:
+        anterior, _pool = _pool, pool
+    if anterior is not None:
+        anterior.fechar_todas()
+
+
+def get_db_connection():
+    """
+    Empresta uma conexão do pool.
+    Dentro de um pedido Flask a conexão fica registada no contexto da app e é
+    devolvida automaticamente no teardown, mesmo que a rota falhe antes do close().
+    """
+    conn = obter_pool().obter()
+    if has_app_context():
+        g.setdefault('_sga_conexoes', []).append(conn)
+    return conn
+
+
+def estatisticas_pool():
+    return obter_pool().estatisticas()
+
+
+def init_app(app):
+    """Regista a devolução das conexões do pedido no fim do contexto da app."""
+
+    @app.teardown_appcontext
+    def _devolver_conexoes(exc):
+        for conn in g.pop('_sga_conexoes', []):
+            conn.close()
+
 
 def test_connection():
     try:
-        get_db_connection()
+        get_db_connection().close()
         print("Conexão realizada com sucesso.")
         return True
     except Exception as e:
         print(f"Erro na conexão: {e}")
         return False
-    
+
 if __name__ == "__main__":
     print("A testar a conexão...")
-    test_connection()
\ No newline at end of file
+    test_connection()
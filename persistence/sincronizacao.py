@@ -0,0 +1,56 @@
+import base64
+import hashlib
+import json
+
+
+def obter_marcador_alteracoes(cursor):
+    """
+    Estado atual das tabelas da agenda (sp_obterMarcadorAlteracoes).
+    Retorna um dict ou None se falhar (as APIs respondem então sem ETag).
+    """
+    try:
+        cursor.execute("EXEC sp_obterMarcadorAlteracoes")
+        row = cursor.fetchone()
+        return {
+            'versao': row[0],
+            'versao_segura': row[1],
+            'atendimentos': row[2],
+            'ultimo_id': row[3],
+            'outras_linhas': row[4],
+        }
+    except Exception as e:
+        print(f"Erro ao obter marcador de alterações: {e}")
+        return None
+
+
+def calcular_etag(marcador, *partes):
+    """ETag forte: muda quando a BD muda ou quando mudam as partes (utilizador, URL, ...)."""
+    base = json.dumps([marcador['versao'], marcador['atendimentos'], marcador['ultimo_id'],
+                       marcador['outras_linhas'], *partes], default=str)
+    return hashlib.sha1(base.encode()).hexdigest()[:24]
+
+
+def codificar_token(marcador):
+    """Token opaco de sincronização da agenda (?desde=)."""
+    dados = [marcador['versao_segura'], marcador['atendimentos'], marcador['ultimo_id']]
+    return base64.urlsafe_b64encode(json.dumps(dados).encode()).decode().rstrip('=')
+
+
+def descodificar_token(token):
+    """Token -> (versao, atendimentos, ultimo_id). Vazio ou inválido -> None."""
+    if not token:
+        return None
+    try:
+        versao, atendimentos, ultimo_id = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return int(versao), int(atendimentos), int(ultimo_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def delta_valido(token, marcador):
+    """
+    Os DELETEs não deixam rasto em rowversion: o delta só é fiável se todos os
+    atendimentos criados desde o token ainda existirem e nenhum antigo tiver sido apagado.
+    """
+    _, atendimentos, ultimo_id = token
+    return marcador['atendimentos'] - atendimentos == marcador['ultimo_id'] - ultimo_id
@@ -0,0 +1,1531 @@
+"""
+Backend SQLite da camada de persistência (DB_BACKEND=sqlite, ver persistence/session.py).
+
+A interface entre a aplicação e a BD são os procedimentos: persistence/*.py só faz
+EXEC sp_... e lê os resultados por posição. Este módulo implementa os mesmos
+procedimentos (nome, parâmetros, result sets e números dos THROW) sobre um ficheiro
+SQLite, com a semântica de sql/stored_procedures.sql e sql/udf.sql, para correr a
+aplicação, os benchmarks e testes de regressão sem o SQL Server.
+
+  - Conexões e cursores com a parte da API do pyodbc que a aplicação usa (batches com
+    várias instruções, nextset, description, fetchmany, executemany, commit/rollback).
+  - O T-SQL escrito fora dos procedimentos (DECLARE/OUTPUT do registo rápido, tabelas
+    #temporárias da importação, SET e ENABLE/DISABLE TRIGGER do gerador de dados,
+    ISNULL, TOP) é traduzido; o resto passa tal como está.
+  - Cada procedimento corre num SAVEPOINT: um erro desfaz só o que ele fez. A transação
+    fica aberta até ao commit()/rollback() da aplicação, como no pyodbc.
+  - Procedimentos que escrevem e DML começam a transação com BEGIN IMMEDIATE: os
+    escritores esperam pela vez (timeout da conexão) e os leitores não bloqueiam (WAL).
+  - Erros com o texto do driver ODBC (número do THROW entre parênteses).
+
+Não há pesquisa de texto integral: sp_pesquisarRelatorios lança 50020 e a aplicação usa
+o índice em memória (persistence/pesquisa.py). Esquema em sql/sqlite/esquema.sql,
+aplicado na primeira conexão a cada ficheiro.
+"""
+import inspect
+import json
+import re
+import sqlite3
+import threading
+from collections import deque
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from itertools import islice
+from pathlib import Path
+
+ESQUEMA = Path(__file__).resolve().parent.parent / 'sql' / 'sqlite' / 'esquema.sql'
+TIMEOUT = 15
+
+# Datas como texto ISO 8601 (ordenável); tipos declarados -> tipos Python do pyodbc
+sqlite3.register_adapter(datetime, lambda valor: valor.isoformat(' '))
+sqlite3.register_adapter(date, lambda valor: valor.isoformat())
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter('DATE', lambda valor: date.fromisoformat(valor.decode()[:10]))
+sqlite3.register_converter('DATETIME2', lambda valor: datetime.fromisoformat(valor.decode()))
+sqlite3.register_converter('BIT', lambda valor: bool(int(valor)))
+sqlite3.register_converter('NUMERIC', lambda valor: Decimal(valor.decode()).quantize(Decimal('0.01')))
+
+MINIMO = datetime(1, 1, 1)
+MAXIMO = datetime(9999, 12, 31)
+
+
+# Mesma hierarquia de exceções do pyodbc (args = (sqlstate, mensagem)); definidas aqui para
+# que este backend não dependa do pyodbc nem do unixODBC
+class Error(Exception):
+    pass
+
+
+class DatabaseError(Error):
+    pass
+
+
+class ProgrammingError(DatabaseError):
+    pass
+
+
+class IntegrityError(DatabaseError):
+    pass
+
+
+class OperationalError(DatabaseError):
+    pass
+
+
+def _erro(numero, mensagem):
+    # Mesmo formato das mensagens do driver: as rotas procuram o número do THROW no texto
+    return ProgrammingError('42000', f"[42000] {mensagem} ({numero}) (SQLExecDirectW)")
+
+
+def _erro_sqlite(db, e):
+    """Converte um erro do sqlite3 no erro equivalente do driver ODBC do SQL Server."""
+    mensagem = str(e)
+    if isinstance(e, sqlite3.IntegrityError):
+        if mensagem.startswith('UNIQUE constraint failed: '):
+            colunas = [c.strip().split('.') for c in mensagem.split(': ', 1)[1].split(',')]
+            tabela = colunas[0][0]
+            chave = [linha[1] for linha in sorted(db.execute(f'PRAGMA table_info({tabela})'), key=lambda l: l[5])
+                     if linha[5]]
+            tipo = 'PRIMARY KEY' if [c[-1] for c in colunas] == chave else 'UNIQUE KEY'
+            return IntegrityError('23000', f"[23000] Violation of {tipo} constraint. Cannot insert duplicate "
+                                                  f"key in object '{tabela}'. ({mensagem}) (2627) (SQLExecDirectW)")
+        numero = 515 if mensagem.startswith('NOT NULL') else 547
+        return IntegrityError('23000', f"[23000] {mensagem} ({numero}) (SQLExecDirectW)")
+    if 'locked' in mensagem or 'busy' in mensagem:
+        return OperationalError('HYT00', f"[HYT00] Query timeout expired: {mensagem} (0) (SQLExecDirectW)")
+    return ProgrammingError('42000', f"[42000] {mensagem} (SQLExecDirectW)")
+
+
+# --- Conversão de parâmetros (o driver aceita texto onde a SP espera INT/DATE/DATETIME2) ---
+
+def _int(valor):
+    if valor is None or isinstance(valor, int):
+        return valor
+    try:
+        return int(str(valor).strip())
+    except ValueError:
+        raise _erro(245, f"Conversion failed when converting the varchar value '{valor}' to data type int.") from None
+
+
+def _bit(valor):
+    if isinstance(valor, str):
+        return valor.strip().lower() in ('1', 'true')
+    return bool(valor)
+
+
+def _data_hora(valor):
+    if valor is None or isinstance(valor, datetime):
+        return valor
+    if isinstance(valor, date):
+        return datetime.combine(valor, time.min)
+    try:
+        return datetime.fromisoformat(str(valor).strip().replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        raise _erro(241, 'Conversion failed when converting date and/or time from character string.') from None
+
+
+def _data(valor):
+    valor = _data_hora(valor)
+    return valor.date() if valor else None
+
+
+def _minutos(inicio, fim):
+    """DATEDIFF(MINUTE, inicio, fim): fronteiras de minuto atravessadas."""
+    return (fim.replace(second=0, microsecond=0) - inicio.replace(second=0, microsecond=0)) // timedelta(minutes=1)
+
+
+def _hora(minuto):
+    return f"{minuto // 60:02d}:{minuto % 60:02d}"
+
+
+def _grelha(granularidade, duracao):
+    """Minutos de início válidos (09:00-13:00 e 14:00-18:00) na grelha de 15, 30 ou 60 minutos."""
+    granularidade = _int(granularidade)
+    if granularidade not in (15, 30, 60):
+        granularidade = 60
+    duracao = _int(duracao)
+    if duracao is None:
+        return []
+    return [m for m in range(540, 1080, granularidade)
+            if (m >= 540 and m + duracao <= 780) or (m >= 840 and m + duracao <= 1080)]
+
+
+def _prefixo_like(pesquisa):
+    """Prefixo já escapado para o LIKE do T-SQL ([%], [_], [[]) -> padrão com ESCAPE '\\'."""
+    return (pesquisa.replace('\\', '\\\\').replace('[%]', '\\%').replace('[_]', '\\_').replace('[[]', '[')
+            + '%')
+
+
+def _escrita(metodo):
+    """Marca um procedimento que escreve: começa a transação com BEGIN IMMEDIATE."""
+    metodo.escrita = True
+    return metodo
+
+
+# Colunas comuns aos eventos do calendário (sp_listarEventosCalendario / sp_listarEventosAlterados)
+EVENTOS = """
+    SELECT DISTINCT
+        A.num_atendimento,
+        PessPac.nome AS NomePaciente,
+        A.data_inicio,
+        A.data_fim,
+        A.estado,
+        PessMed.nome AS NomeMedico
+    FROM {origem}
+    JOIN SGA_PACIENTE_ATENDIMENTO PA ON A.num_atendimento = PA.num_atendimento
+    JOIN SGA_PACIENTE Pac ON PA.id_paciente = Pac.id_paciente
+    JOIN SGA_PESSOA PessPac ON Pac.NIF = PessPac.NIF
+    JOIN SGA_TRABALHADOR_ATENDIMENTO TA ON A.num_atendimento = TA.num_atendimento
+    JOIN SGA_TRABALHADOR T ON TA.id_trabalhador = T.id_trabalhador
+    JOIN SGA_PESSOA PessMed ON T.NIF = PessMed.NIF
+    WHERE {condicoes}
+"""
+
+EQUIPA = """
+    SELECT P.nome, P.email, P.telefone, T.tipo_perfil, IFNULL(T.cedula_profissional, '---'),
+           P.NIF, T.id_trabalhador
+    FROM SGA_TRABALHADOR T
+    JOIN SGA_PESSOA P ON T.NIF = P.NIF
+"""
+
+PACIENTES_SGA = """
+    SELECT Pac.id_paciente, P.nome, P.NIF, P.telefone, P.email,
+           strftime('%d/%m/%Y', Pac.data_inscricao), Pac.observacoes
+    FROM SGA_PACIENTE Pac
+    JOIN SGA_PESSOA P ON Pac.NIF = P.NIF
+"""
+
+PACIENTES_INATIVOS = """
+    SELECT Pac.id_paciente, Pess.nome, Pess.NIF, Pess.telefone, Pac.data_inscricao
+    FROM SGA_PACIENTE Pac
+    JOIN SGA_PESSOA Pess ON Pac.NIF = Pess.NIF
+"""
+
+
+class Procedimentos:
+    """
+    Os procedimentos de sql/stored_procedures.sql, um método por SP com o mesmo nome e os
+    parâmetros em minúsculas (para os EXEC com @nome = ?). Cada um devolve a lista dos
+    seus result sets (cursor sqlite3 lido a pedido ou lista de tuplos); os parâmetros
+    OUTPUT ficam em self.saidas.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.saidas = {}
+
+    # --- Auxiliares ---
+
+    def _cursor(self, sql, parametros=()):
+        return self.db.execute(sql, parametros)
+
+    def _todos(self, sql, parametros=()):
+        return self.db.execute(sql, parametros).fetchall()
+
+    def _valor(self, sql, parametros=()):
+        linha = self.db.execute(sql, parametros).fetchone()
+        return linha[0] if linha else None
+
+    def _colisao_medico(self, id_medico, inicio, fim, ignorar=None):
+        # udf_VerificarColisaoMedico: as três condições da UDF são a sobreposição de [inicio, fim[
+        return self._valor("""
+            SELECT 1
+            FROM SGA_TRABALHADOR_ATENDIMENTO ta
+            JOIN SGA_ATENDIMENTO a ON ta.num_atendimento = a.num_atendimento
+            WHERE ta.id_trabalhador = :id_medico
+              AND a.estado != 'cancelado'
+              AND (:ignorar IS NULL OR a.num_atendimento != :ignorar)
+              AND a.data_inicio < :fim AND a.data_fim > :inicio
+            LIMIT 1
+        """, {'id_medico': id_medico, 'ignorar': ignorar, 'inicio': inicio, 'fim': fim}) is not None
+
+    def _salas_livres(self, inicio, fim):
+        """udf_SalasLivres: [(id_sala, nome, id_dono, folga_min)] das salas físicas ativas livres em [inicio, fim[."""
+        dia = datetime.combine(inicio.date(), time.min)
+        seguinte = dia + timedelta(days=1)
+        linhas = self._todos("""
+            SELECT s.id_sala, s.nome, s.id_dono,
+                   (SELECT MAX(a.data_fim) FROM SGA_ATENDIMENTO a
+                    WHERE a.id_sala = s.id_sala AND a.estado != 'cancelado'
+                      AND a.data_inicio >= :dia AND a.data_inicio < :inicio) AS "anterior [DATETIME2]",
+                   (SELECT MIN(a.data_inicio) FROM SGA_ATENDIMENTO a
+                    WHERE a.id_sala = s.id_sala AND a.estado != 'cancelado'
+                      AND a.data_inicio >= :fim AND a.data_inicio < :seguinte) AS "proxima [DATETIME2]"
+            FROM SGA_SALA s
+            WHERE s.is_online = 0
+              AND s.ativa = 1
+              AND NOT EXISTS (
+                  SELECT 1 FROM SGA_ATENDIMENTO a
+                  WHERE a.id_sala = s.id_sala
+                    AND a.estado != 'cancelado'
+                    AND a.data_inicio >= :desde
+                    AND a.data_inicio < :fim
+                    AND a.data_fim > :inicio)
+        """, {'dia': dia, 'seguinte': seguinte, 'inicio': inicio, 'fim': fim, 'desde': inicio - timedelta(days=1)})
+        return [(id_sala, nome, id_dono, _minutos(anterior or dia, inicio) + _minutos(fim, proxima or seguinte))
+                for id_sala, nome, id_dono, anterior, proxima in linhas]
+
+    def _sala_online(self):
+        return self._valor("SELECT id_sala FROM SGA_SALA WHERE is_online = 1 ORDER BY id_sala LIMIT 1")
+
+    def _gabinete(self, id_medico):
+        return self._valor("SELECT id_sala FROM SGA_SALA WHERE id_dono = ? AND ativa = 1 ORDER BY id_sala LIMIT 1",
+                           (id_medico,))
+
+    def _sala_comum(self, inicio, fim):
+        # Best-fit: a sala comum livre com menor folga no dia
+        livres = [(folga, id_sala) for id_sala, _, id_dono, folga in self._salas_livres(inicio, fim) if id_dono is None]
+        return min(livres)[1] if livres else None
+
+    def _paciente_ativo(self, nif_paciente):
+        id_paciente = self._valor("SELECT id_paciente FROM SGA_PACIENTE WHERE NIF = ? AND ativo = 1", (nif_paciente,))
+        if id_paciente is None:
+            raise _erro(50009, 'Paciente não encontrado.')
+        return id_paciente
+
+    def _vincular(self, id_medico, nif_paciente, tipo='Responsável'):
+        self.db.execute("""
+            INSERT INTO SGA_VINCULO_CLINICO (NIF_trabalhador, NIF_paciente, tipo_vinculo, data_inicio)
+            SELECT T.NIF, :nif_paciente, :tipo, :agora
+            FROM SGA_TRABALHADOR T
+            WHERE T.id_trabalhador = :id_medico
+              AND NOT EXISTS (SELECT 1 FROM SGA_VINCULO_CLINICO V
+                              WHERE V.NIF_trabalhador = T.NIF AND V.NIF_paciente = :nif_paciente)
+        """, {'id_medico': id_medico, 'nif_paciente': nif_paciente, 'tipo': tipo, 'agora': datetime.now()})
+
+    def _marcar(self, id_medico, id_paciente, id_sala, inicio, fim):
+        num = self.db.execute(
+            "INSERT INTO SGA_ATENDIMENTO (id_sala, data_inicio, data_fim, estado) VALUES (?, ?, ?, 'agendado')",
+            (id_sala, inicio, fim)).lastrowid
+        self.db.execute("INSERT INTO SGA_TRABALHADOR_ATENDIMENTO (id_trabalhador, num_atendimento) VALUES (?, ?)",
+                        (id_medico, num))
+        self.db.execute("INSERT INTO SGA_PACIENTE_ATENDIMENTO (id_paciente, num_atendimento, presenca) VALUES (?, ?, 0)",
+                        (id_paciente, num))
+        return num
+
+    def _nif_trabalhador(self, id_trabalhador):
+        return self._valor("SELECT NIF FROM SGA_TRABALHADOR WHERE id_trabalhador = ?", (id_trabalhador,))
+
+    def _pagina(self, sql, condicoes, parametros, nome, chave, nif, tamanho, pesquisa, descendente, apos_nome, apos_id):
+        """Keyset pagination por (nome, id) das SPs *Pagina: devolve tamanho + 1 linhas."""
+        condicoes = list(condicoes)
+        parametros = dict(parametros, tamanho=_int(tamanho) + 1, apos_nome=apos_nome, apos_id=_int(apos_id))
+        if pesquisa is not None:
+            parametros['pesquisa'] = _prefixo_like(pesquisa)
+            condicoes.append(f"({nome} LIKE :pesquisa ESCAPE '\\' OR {nif} LIKE :pesquisa ESCAPE '\\')")
+        operador, ordem = ('<', 'DESC') if _bit(descendente) else ('>', 'ASC')
+        if apos_nome is not None:
+            condicoes.append(f"({nome} {operador} :apos_nome OR ({nome} = :apos_nome AND {chave} {operador} :apos_id))")
+        return [self._cursor(f"{sql} WHERE {' AND '.join(condicoes)} "
+                             f"ORDER BY {nome} {ordem}, {chave} {ordem} LIMIT :tamanho", parametros)]
+
+    @staticmethod
+    def _filtros_eventos(id_user, perfil, filtro_medico, filtro_paciente_nif, data_inicio, data_fim):
+        """Visibilidade e janela de sp_listarEventosCalendario: (condições de visibilidade, janela, parâmetros)."""
+        inicio, fim = _data_hora(data_inicio), _data_hora(data_fim)
+        parametros = {
+            'id_user': _int(id_user),
+            'filtro_medico': _int(filtro_medico),
+            'nif_paciente': filtro_paciente_nif,
+            'inicio': inicio,
+            # As consultas nunca passam de um dia: basta procurar inícios desde inicio - 1 dia
+            'procurar_desde': inicio - timedelta(days=1) if inicio else MINIMO,
+            'procurar_ate': fim or MAXIMO,
+        }
+        visibilidade = []
+        if perfil == 'colaborador':
+            visibilidade.append('TA.id_trabalhador = :id_user')
+        elif perfil == 'admin':
+            if filtro_medico is not None:
+                visibilidade.append('TA.id_trabalhador = :filtro_medico')
+        else:
+            visibilidade.append('0 = 1')
+        if filtro_paciente_nif is not None:
+            visibilidade.append('PessPac.NIF = :nif_paciente')
+        janela = ['A.data_inicio >= :procurar_desde', 'A.data_inicio < :procurar_ate']
+        if inicio is not None:
+            janela.append('A.data_fim > :inicio')
+        return visibilidade, janela, parametros
+
+    # --- 1. Utilizadores e login ---
+
+    def sp_obterLogin(self, nif):
+        return [self._cursor("""
+            SELECT T.id_trabalhador, T.senha_hash, T.tipo_perfil, P.nome, P.NIF
+            FROM SGA_TRABALHADOR T
+            JOIN SGA_PESSOA P ON T.NIF = P.NIF
+            WHERE T.NIF = ? AND T.ativo = 1
+        """, (nif,))]
+
+    @_escrita
+    def sp_atualizarSenhaTrabalhador(self, id_trabalhador, senha_hash):
+        self.db.execute("UPDATE SGA_TRABALHADOR SET senha_hash = ? WHERE id_trabalhador = ?",
+                        (senha_hash, id_trabalhador))
+        return []
+
+    @_escrita
+    def sp_guardarPessoa(self, nif, nome, data_nascimento, telefone, email=None):
+        if nif is None or len(nif) != 9 or not nif.isdigit():
+            raise _erro(50001, 'NIF inválido.')
+        self.db.execute("""
+            INSERT INTO SGA_PESSOA (NIF, nome, data_nascimento, telefone, email)
+            VALUES (:nif, :nome, :data_nascimento, :telefone, :email)
+            ON CONFLICT (NIF) DO UPDATE SET
+                nome = excluded.nome, data_nascimento = excluded.data_nascimento,
+                telefone = excluded.telefone, email = excluded.email
+        """, {'nif': nif, 'nome': nome, 'data_nascimento': _data(data_nascimento), 'telefone': telefone,
+              'email': email})
+        return []
+
+    # --- 2. Dashboard e estatísticas ---
+
+    def sp_ObterDashboardTotais(self, id_trabalhador, perfil):
+        hoje = date.today()
+        equipa = self._valor("SELECT COUNT(*) FROM SGA_TRABALHADOR WHERE ativo = 1")
+        if perfil == 'admin':
+            pacientes = self._valor("SELECT COUNT(*) FROM SGA_PACIENTE WHERE ativo = 1")
+            consultas = self._valor(
+                "SELECT consultas FROM SGA_ESTATISTICA_DIARIA WHERE dia = ? AND id_trabalhador = 0", (hoje,))
+        else:
+            pacientes = self._valor("""
+                SELECT COUNT(*)
+                FROM SGA_VINCULO_CLINICO V
+                JOIN SGA_PACIENTE P ON P.NIF = V.NIF_paciente
+                WHERE V.NIF_trabalhador = (SELECT NIF FROM SGA_TRABALHADOR WHERE id_trabalhador = ?)
+                  AND P.ativo = 1
+            """, (id_trabalhador,))
+            consultas = self._valor(
+                "SELECT consultas FROM SGA_ESTATISTICA_DIARIA WHERE dia = ? AND id_trabalhador = ?",
+                (hoje, id_trabalhador))
+        return [[(pacientes or 0, equipa or 0, consultas or 0)]]
+
+    def sp_ObterProximasConsultas(self, id_trabalhador, perfil):
+        return [self._cursor("""
+            SELECT a.num_atendimento, p.nome AS Paciente, a.data_inicio, a.estado, t_pess.nome AS Medico
+            FROM SGA_ATENDIMENTO a
+            JOIN SGA_PACIENTE_ATENDIMENTO pa ON a.num_atendimento = pa.num_atendimento
+            JOIN SGA_PACIENTE pac ON pa.id_paciente = pac.id_paciente
+            JOIN SGA_PESSOA p ON pac.NIF = p.NIF
+            JOIN SGA_TRABALHADOR_ATENDIMENTO ta ON a.num_atendimento = ta.num_atendimento
+            JOIN SGA_TRABALHADOR t ON ta.id_trabalhador = t.id_trabalhador
+            JOIN SGA_PESSOA t_pess ON t.NIF = t_pess.NIF
+            WHERE a.data_inicio >= :hoje
+              AND a.estado != 'cancelado'
+              AND (:perfil = 'admin' OR ta.id_trabalhador = :id)
+            ORDER BY a.data_inicio
+            LIMIT 5
+        """, {'hoje': datetime.combine(date.today(), time.min), 'perfil': perfil, 'id': id_trabalhador})]
+
+    def sp_contarSalasLivresAgora(self):
+        agora = datetime.now()
+        return [[(len(self._salas_livres(agora, agora + timedelta(seconds=1))),)]]
+
+    def sp_obterOcupacaoSalasDia(self, dia):
+        inicio = datetime.combine(_data(dia), time.min)
+        return [self._cursor("""
+            SELECT s.id_sala, s.nome, s.id_dono, a.num_atendimento, a.data_inicio, a.data_fim
+            FROM SGA_SALA s
+            LEFT JOIN SGA_ATENDIMENTO a
+                ON a.id_sala = s.id_sala
+               AND a.estado != 'cancelado'
+               AND a.data_inicio >= :desde
+               AND a.data_inicio < :fim
+               AND a.data_fim > :inicio
+            WHERE s.is_online = 0 AND s.ativa = 1
+            ORDER BY s.id_sala, a.data_inicio
+        """, {'desde': inicio - timedelta(days=1), 'inicio': inicio, 'fim': inicio + timedelta(days=1)})]
+
+    def sp_countConsultasHoje(self):
+        return [self._cursor("""
+            SELECT IFNULL(SUM(consultas), 0), IFNULL(SUM(online), 0), IFNULL(SUM(presencial), 0)
+            FROM SGA_ESTATISTICA_DIARIA
+            WHERE dia = ? AND id_trabalhador = 0
+        """, (date.today(),))]
+
+    @_escrita
+    def sp_reconstruirEstatisticaDiaria(self, desde=None, ate=None, reparar=1):
+        inicio = datetime.combine(_data(desde), time.min) if desde is not None else MINIMO
+        fim = datetime.combine(_data(ate), time.min) + timedelta(days=1) if ate is not None else MAXIMO
+        intervalo = {'inicio': inicio, 'fim': fim, 'dia_inicio': inicio.date(), 'dia_fim': fim.date()}
+
+        esperado = {(dia, id_trabalhador): valores for dia, id_trabalhador, *valores in self._todos("""
+            SELECT x.dia AS "dia [DATE]", x.id_trabalhador, COUNT(*),
+                   SUM(CASE WHEN x.is_online = 1 THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN x.is_online = 0 THEN 1 ELSE 0 END)
+            FROM (
+                SELECT date(a.data_inicio) AS dia, 0 AS id_trabalhador, s.is_online
+                FROM SGA_ATENDIMENTO a
+                JOIN SGA_SALA s ON s.id_sala = a.id_sala
+                WHERE a.estado != 'cancelado' AND a.data_inicio >= :inicio AND a.data_inicio < :fim
+                UNION ALL
+                SELECT date(a.data_inicio), ta.id_trabalhador, s.is_online
+                FROM SGA_ATENDIMENTO a
+                JOIN SGA_TRABALHADOR_ATENDIMENTO ta ON ta.num_atendimento = a.num_atendimento
+                JOIN SGA_SALA s ON s.id_sala = a.id_sala
+                WHERE a.estado != 'cancelado' AND a.data_inicio >= :inicio AND a.data_inicio < :fim
+            ) x
+            GROUP BY x.dia, x.id_trabalhador
+        """, intervalo)}
+        guardado = {(dia, id_trabalhador): valores for dia, id_trabalhador, *valores in self._todos("""
+            SELECT dia, id_trabalhador, consultas, online, presencial
+            FROM SGA_ESTATISTICA_DIARIA
+            WHERE dia >= :dia_inicio AND dia < :dia_fim
+        """, intervalo)}
+
+        divergencias = []
+        for chave in sorted(esperado.keys() | guardado.keys()):
+            n = esperado.get(chave, (0, 0, 0))
+            e = guardado.get(chave, (0, 0, 0))
+            if list(n) != list(e):
+                divergencias.append((*chave, n[0], e[0], n[1], e[1], n[2], e[2]))
+
+        if _bit(reparar):
+            self.db.execute("DELETE FROM SGA_ESTATISTICA_DIARIA WHERE dia >= :dia_inicio AND dia < :dia_fim",
+                            intervalo)
+            self.db.executemany(
+                "INSERT INTO SGA_ESTATISTICA_DIARIA (dia, id_trabalhador, consultas, online, presencial) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(*chave, *valores) for chave, valores in esperado.items()])
+        return [divergencias]
+
+    # --- 3. Agenda ---
+
+    def sp_ObterHorariosLivres(self, id_medico, data_consulta, is_online=0, duracao=60,
+                               id_atendimento_ignorar=None, granularidade=60):
+        dia = datetime.combine(_data(data_consulta), time.min)
+        # Só dias úteis, como sp_ObterHorariosLivresLote
+        if dia.weekday() >= 5:
+            return [[]]
+        # Uma única leitura das consultas do médico nesse dia
+        ocupado = self._todos("""
+            SELECT a.data_inicio, a.data_fim
+            FROM SGA_TRABALHADOR_ATENDIMENTO ta
+            JOIN SGA_ATENDIMENTO a ON ta.num_atendimento = a.num_atendimento
+            WHERE ta.id_trabalhador = :id_medico
+              AND a.estado != 'cancelado'
+              AND (:ignorar IS NULL OR a.num_atendimento != :ignorar)
+              AND a.data_inicio >= :desde
+              AND a.data_inicio < :seguinte
+              AND a.data_fim > :dia
+        """, {'id_medico': id_medico, 'ignorar': _int(id_atendimento_ignorar), 'dia': dia,
+              'desde': dia - timedelta(days=1), 'seguinte': dia + timedelta(days=1)})
+        minutos = _int(duracao) or 0
+        duracao = timedelta(minutes=minutos)
+        horas = []
+        for minuto in _grelha(granularidade, minutos):
+            inicio = dia + timedelta(minutes=minuto)
+            if not any(o_inicio < inicio + duracao and o_fim > inicio for o_inicio, o_fim in ocupado):
+                horas.append((_hora(minuto),))
+        return [horas]
+
+    def sp_ObterHorariosLivresLote(self, ids_medicos, data_inicio, data_fim, is_online=0, duracao=60,
+                                   granularidade=60):
+        primeiro, ultimo = _data(data_inicio), _data(data_fim)
+        # Limite de segurança: no máximo 31 dias por pedido
+        if (ultimo - primeiro).days > 30:
+            ultimo = primeiro + timedelta(days=30)
+
+        if ids_medicos is None:
+            medicos = [linha[0] for linha in self._todos("SELECT id_trabalhador FROM SGA_TRABALHADOR WHERE ativo = 1")]
+        else:
+            medicos = set()
+            for valor in str(ids_medicos).split(','):
+                try:
+                    medicos.add(int(valor.strip()))
+                except ValueError:
+                    pass
+        medicos = sorted(medicos)
+        if not medicos:
+            return [[]]
+
+        inicio = datetime.combine(primeiro, time.min)
+        fim = datetime.combine(ultimo, time.min) + timedelta(days=1)
+        ocupado = {}
+        for id_medico, o_inicio, o_fim in self._todos(f"""
+            SELECT ta.id_trabalhador, a.data_inicio, a.data_fim
+            FROM SGA_TRABALHADOR_ATENDIMENTO ta
+            JOIN SGA_ATENDIMENTO a ON ta.num_atendimento = a.num_atendimento
+            WHERE ta.id_trabalhador IN ({', '.join('?' * len(medicos))})
+              AND a.estado != 'cancelado'
+              AND a.data_inicio >= ?
+              AND a.data_inicio < ?
+              AND a.data_fim > ?
+        """, (*medicos, inicio - timedelta(days=1), fim, inicio)):
+            ocupado.setdefault(id_medico, []).append((o_inicio, o_fim))
+
+        minutos = _int(duracao) or 0
+        duracao = timedelta(minutes=minutos)
+        grelha = _grelha(granularidade, minutos)
+        dias = [d for d in (primeiro + timedelta(days=n) for n in range((ultimo - primeiro).days + 1))
+                if d.weekday() < 5]
+        linhas = []
+        for id_medico in medicos:
+            consultas = ocupado.get(id_medico, [])
+            for dia in dias:
+                base = datetime.combine(dia, time.min)
+                for minuto in grelha:
+                    slot = base + timedelta(minutes=minuto)
+                    if not any(o_inicio < slot + duracao and o_fim > slot for o_inicio, o_fim in consultas):
+                        linhas.append((id_medico, dia, _hora(minuto)))
+        return [linhas]
+
+    def sp_listarMedicosAgenda(self):
+        return [self._cursor("""
+            SELECT t.id_trabalhador, p.nome
+            FROM SGA_TRABALHADOR t
+            JOIN SGA_PESSOA p ON t.NIF = p.NIF
+            WHERE t.ativo = 1
+        """)]
+
+    def sp_ListarPacientesParaAgenda(self, id_trabalhador, perfil):
+        if perfil == 'admin':
+            return [self._cursor("""
+                SELECT Pac.id_paciente, P.nome, P.NIF
+                FROM SGA_PACIENTE Pac
+                JOIN SGA_PESSOA P ON Pac.NIF = P.NIF
+                WHERE Pac.ativo = 1
+                ORDER BY P.nome
+            """)]
+        return [self._cursor("""
+            SELECT Pac.id_paciente, P.nome, P.NIF
+            FROM SGA_PACIENTE Pac
+            JOIN SGA_PESSOA P ON Pac.NIF = P.NIF
+            JOIN SGA_VINCULO_CLINICO V ON Pac.NIF = V.NIF_paciente
+            JOIN SGA_TRABALHADOR T ON V.NIF_trabalhador = T.NIF
+            WHERE T.id_trabalhador = ? AND Pac.ativo = 1
+            ORDER BY P.nome
+        """, (id_trabalhador,))]
+
+    def sp_listarPacientesIndiceAlterados(self, desde=0):
+        desde = _int(desde)
+        contagens = self._todos("""
+            SELECT
+                (SELECT COUNT(*) FROM SGA_PACIENTE WHERE ativo = 1),
+                (SELECT COUNT(*)
+                 FROM SGA_VINCULO_CLINICO V
+                 JOIN SGA_PACIENTE Pac ON V.NIF_paciente = Pac.NIF
+                 JOIN SGA_TRABALHADOR T ON V.NIF_trabalhador = T.NIF
+                 WHERE Pac.ativo = 1),
+                (SELECT valor FROM SGA_VERSAO)
+        """)
+        colunas = """
+            SELECT Pac.id_paciente, P.nome, Pac.NIF, Pac.ativo, T.id_trabalhador
+            FROM {origem}
+            JOIN SGA_PESSOA P ON Pac.NIF = P.NIF
+            LEFT JOIN SGA_VINCULO_CLINICO V ON Pac.NIF = V.NIF_paciente
+            LEFT JOIN SGA_TRABALHADOR T ON V.NIF_trabalhador = T.NIF
+        """
+        if desde == 0:
+            pacientes = self._cursor(colunas.format(origem='SGA_PACIENTE Pac') + " WHERE Pac.ativo = 1")
+        else:
+            pacientes = self._cursor("""
+                WITH Alterados (NIF) AS (
+                    SELECT NIF FROM SGA_PACIENTE WHERE versao > :desde
+                    UNION
+                    SELECT NIF FROM SGA_PESSOA WHERE versao > :desde
+                    UNION
+                    SELECT NIF_paciente FROM SGA_VINCULO_CLINICO WHERE versao > :desde
+                )
+            """ + colunas.format(origem='Alterados A JOIN SGA_PACIENTE Pac ON A.NIF = Pac.NIF'), {'desde': desde})
+        return [contagens, pacientes]
+
+    @_escrita
+    def sp_criarAgendamento(self, nif_paciente, id_medico, data_inicio, preferencia_online, duracao=60):
+        id_paciente = self._paciente_ativo(nif_paciente)
+        id_medico = _int(id_medico)
+        inicio = _data_hora(data_inicio)
+        fim = inicio + timedelta(minutes=_int(duracao))
+        if self._colisao_medico(id_medico, inicio, fim):
+            raise _erro(50010, 'O médico já tem consulta marcada a essa hora.')
+
+        if _bit(preferencia_online):
+            id_sala = self._sala_online()
+        else:
+            id_sala = self._gabinete(id_medico) or self._sala_comum(inicio, fim)
+        if id_sala is None:
+            raise _erro(50011, 'Não foi possível alocar sala (Médico sem gabinete e salas comuns cheias).')
+
+        self._vincular(id_medico, nif_paciente)
+        return [[(self._marcar(id_medico, id_paciente, id_sala, inicio, fim),)]]
+
+    @_escrita
+    def sp_criarAgendamentosLote(self, nif_paciente, id_medico, datas, preferencia_online, duracao=60):
+        id_paciente = self._paciente_ativo(nif_paciente)
+        id_medico = _int(id_medico)
+        try:
+            lista = json.loads(datas)
+        except (TypeError, ValueError):
+            raise _erro(50013, 'Lista de datas inválida.') from None
+        if not isinstance(lista, list):
+            raise _erro(50013, 'Lista de datas inválida.')
+        if not lista:
+            raise _erro(50013, 'Lista de datas vazia.')
+
+        duracao = timedelta(minutes=_int(duracao))
+        # [ordem, data_inicio, data_fim, id_sala, motivo]
+        ocorrencias = [[ordem, _data_hora(valor), _data_hora(valor) + duracao, None, None]
+                       for ordem, valor in enumerate(lista)]
+
+        # 1. Colisões com a agenda do médico; 2. sobreposição entre ocorrências do próprio pedido
+        for ocorrencia in ocorrencias:
+            ordem, inicio, fim = ocorrencia[:3]
+            if self._colisao_medico(id_medico, inicio, fim):
+                ocorrencia[4] = 'O médico já tem consulta marcada a essa hora.'
+            elif any(o[0] < ordem and o[1] < fim and o[2] > inicio for o in ocorrencias):
+                ocorrencia[4] = 'Sobrepõe-se a outra sessão do mesmo pedido.'
+
+        # 3. Salas (mesmas regras que sp_criarAgendamento)
+        if _bit(preferencia_online):
+            sala = self._sala_online()
+            for ocorrencia in ocorrencias:
+                ocorrencia[3] = sala
+        else:
+            gabinete = self._gabinete(id_medico)
+            for ocorrencia in ocorrencias:
+                ocorrencia[3] = gabinete or self._sala_comum(ocorrencia[1], ocorrencia[2])
+        for ocorrencia in ocorrencias:
+            if ocorrencia[4] is None and ocorrencia[3] is None:
+                ocorrencia[4] = 'Não foi possível alocar sala (Médico sem gabinete e salas comuns cheias).'
+
+        # 4. Tudo ou nada
+        if any(o[4] for o in ocorrencias):
+            return [[(ordem, inicio, fim, None, id_sala, motivo) for ordem, inicio, fim, id_sala, motivo in ocorrencias]]
+        self._vincular(id_medico, nif_paciente)
+        return [[(ordem, inicio, fim, self._marcar(id_medico, id_paciente, id_sala, inicio, fim), id_sala, None)
+                 for ordem, inicio, fim, id_sala, _ in ocorrencias]]
+
+    def sp_obterDetalhesAtendimento(self, id_atendimento):
+        return [self._cursor("""
+            SELECT A.num_atendimento, PessPac.nome AS NomePaciente, PessPac.NIF AS NifPaciente,
+                   PessMed.nome AS NomeMedico, T.id_trabalhador AS IdMedico, A.data_inicio, A.data_fim, A.estado
+            FROM SGA_ATENDIMENTO A
+            JOIN SGA_PACIENTE_ATENDIMENTO PA ON A.num_atendimento = PA.num_atendimento
+            JOIN SGA_PACIENTE Pac ON PA.id_paciente = Pac.id_paciente
+            JOIN SGA_PESSOA PessPac ON Pac.NIF = PessPac.NIF
+            JOIN SGA_TRABALHADOR_ATENDIMENTO TA ON A.num_atendimento = TA.num_atendimento
+            JOIN SGA_TRABALHADOR T ON TA.id_trabalhador = T.id_trabalhador
+            JOIN SGA_PESSOA PessMed ON T.NIF = PessMed.NIF
+            WHERE A.num_atendimento = ?
+        """, (id_atendimento,))]
+
+    def sp_listarEventosCalendario(self, id_user, perfil, filtro_medico=None, filtro_paciente_nif=None,
+                                   data_inicio=None, data_fim=None):
+        visibilidade, janela, parametros = self._filtros_eventos(
+            id_user, perfil, filtro_medico, filtro_paciente_nif, data_inicio, data_fim)
+        condicoes = ["A.estado != 'cancelado'", *visibilidade, *janela]
+        return [self._cursor(EVENTOS.format(origem='SGA_ATENDIMENTO A', condicoes=' AND '.join(condicoes)),
+                             parametros)]
+
+    def sp_obterMarcadorAlteracoes(self):
+        # Um escritor de cada vez: tudo o que tem versão <= valor já está confirmado
+        return [self._cursor("""
+            SELECT V.valor, V.valor,
+                   (SELECT linhas FROM SGA_CONTAGEM WHERE tabela = 'SGA_ATENDIMENTO'),
+                   IFNULL((SELECT seq FROM sqlite_sequence WHERE name = 'SGA_ATENDIMENTO'), 0),
+                   (SELECT SUM(linhas) FROM SGA_CONTAGEM
+                    WHERE tabela IN ('SGA_PACIENTE', 'SGA_VINCULO_CLINICO', 'SGA_PACIENTE_ATENDIMENTO'))
+            FROM SGA_VERSAO V
+        """)]
+
+    def sp_listarEventosAlterados(self, id_user, perfil, filtro_medico=None, filtro_paciente_nif=None,
+                                  data_inicio=None, data_fim=None, desde=None):
+        visibilidade, janela, parametros = self._filtros_eventos(
+            id_user, perfil, filtro_medico, filtro_paciente_nif, data_inicio, data_fim)
+        parametros['desde'] = _int(desde)
+        # A própria linha mudou: devolvido mesmo fora da janela (pode ter sido movido para fora dela)
+        condicoes = [*visibilidade, f"(Al.proprio = 1 OR ({' AND '.join(janela)}))"]
+        return [self._cursor("""
+            WITH Proprios AS (
+                SELECT num_atendimento FROM SGA_ATENDIMENTO WHERE versao > :desde
+            ),
+            Alterados AS (
+                SELECT num_atendimento, 1 AS proprio FROM Proprios
+                UNION ALL
+                SELECT X.num_atendimento, 0
+                FROM (
+                    SELECT num_atendimento FROM SGA_PACIENTE_ATENDIMENTO WHERE versao > :desde
+                    UNION
+                    SELECT num_atendimento FROM SGA_TRABALHADOR_ATENDIMENTO WHERE versao > :desde
+                    UNION
+                    SELECT PA.num_atendimento
+                    FROM SGA_PESSOA P
+                    JOIN SGA_PACIENTE Pac ON Pac.NIF = P.NIF
+                    JOIN SGA_PACIENTE_ATENDIMENTO PA ON PA.id_paciente = Pac.id_paciente
+                    WHERE P.versao > :desde
+                    UNION
+                    SELECT TA.num_atendimento
+                    FROM SGA_PESSOA P
+                    JOIN SGA_TRABALHADOR T ON T.NIF = P.NIF
+                    JOIN SGA_TRABALHADOR_ATENDIMENTO TA ON TA.id_trabalhador = T.id_trabalhador
+                    WHERE P.versao > :desde
+                ) X
+                WHERE X.num_atendimento NOT IN (SELECT num_atendimento FROM Proprios)
+            )
+        """ + EVENTOS.format(origem='Alterados Al JOIN SGA_ATENDIMENTO A ON A.num_atendimento = Al.num_atendimento',
+                             condicoes=' AND '.join(condicoes) or '1 = 1'), parametros)]
+
+    @_escrita
+    def sp_editarAgendamento(self, id_atendimento, nova_data, nova_duracao):
+        id_atendimento = _int(id_atendimento)
+        inicio = _data_hora(nova_data)
+        fim = inicio + timedelta(minutes=_int(nova_duracao))
+        id_medico = self._valor("SELECT id_trabalhador FROM SGA_TRABALHADOR_ATENDIMENTO WHERE num_atendimento = ?",
+                                (id_atendimento,))
+        if id_medico is not None and self._colisao_medico(id_medico, inicio, fim, id_atendimento):
+            raise _erro(50012, 'O médico já tem consulta marcada nesse horário.')
+        self.db.execute("UPDATE SGA_ATENDIMENTO SET data_inicio = ?, data_fim = ? WHERE num_atendimento = ?",
+                        (inicio, fim, id_atendimento))
+        return []
+
+    @_escrita
+    def sp_cancelarAgendamento(self, id_atendimento):
+        self.db.execute("UPDATE SGA_ATENDIMENTO SET estado = 'cancelado' WHERE num_atendimento = ?",
+                        (id_atendimento,))
+        return []
+
+    # --- 4. Equipa ---
+
+    def sp_listarEquipa(self):
+        return [self._cursor(EQUIPA + " WHERE T.ativo = 1")]
+
+    def sp_listarEquipaPagina(self, tamanho=50, pesquisa=None, descendente=0, apos_nome=None, apos_id=None):
+        return self._pagina(EQUIPA, ['T.ativo = 1'], {}, 'P.nome', 'T.id_trabalhador', 'P.NIF',
+                            tamanho, pesquisa, descendente, apos_nome, apos_id)
+
+    def sp_listarEquipaInativa(self):
+        return [self._cursor("""
+            SELECT P.nome, P.email, P.telefone, T.tipo_perfil,
+                   IFNULL(strftime('%d/%m/%Y', T.data_fim), 'N/A'), T.id_trabalhador
+            FROM SGA_TRABALHADOR T
+            JOIN SGA_PESSOA P ON T.NIF = P.NIF
+            WHERE T.ativo = 0
+            ORDER BY P.nome
+        """)]
+
+    def sp_obterDetalhesTrabalhador(self, id_trabalhador_alvo, perfil_quem_pede):
+        if perfil_quem_pede != 'admin':
+            raise _erro(50006, 'Acesso Negado: Apenas administradores podem consultar detalhes da equipa.')
+        return [self._cursor("""
+            SELECT P.nome, P.email, P.telefone, T.tipo_perfil, T.cedula_profissional, P.NIF,
+                   strftime('%d/%m/%Y', P.data_nascimento), T.id_trabalhador, T.ativo,
+                   strftime('%d/%m/%Y', T.data_inicio), C.contrato_trabalho, S.ordem, S.remuneracao
+            FROM SGA_TRABALHADOR T
+            JOIN SGA_PESSOA P ON T.NIF = P.NIF
+            LEFT JOIN SGA_CONTRATADO C ON T.id_trabalhador = C.id_trabalhador
+            LEFT JOIN SGA_PRESTADOR_SERVICO S ON T.id_trabalhador = S.id_trabalhador
+            WHERE T.id_trabalhador = ?
+        """, (id_trabalhador_alvo,))]
+
+    @_escrita
+    def sp_criarFuncionario(self, nif, nome, data_nasc, telemovel, email, senha_hash, tipo_perfil, cedula,
+                            categoria, contrato_tipo=None, ordem=None, remuneracao=None):
+        if self._valor("SELECT 1 FROM SGA_PESSOA WHERE NIF = ?", (nif,)):
+            raise _erro(50000, f'O NIF {nif} já se encontra registado no sistema.')
+        self.sp_guardarPessoa(nif, nome, data_nasc, telemovel, email)
+        novo_id = self.db.execute("""
+            INSERT INTO SGA_TRABALHADOR (NIF, senha_hash, tipo_perfil, cedula_profissional, ativo, data_inicio)
+            VALUES (?, ?, ?, ?, 1, ?)
+        """, (nif, senha_hash, tipo_perfil, cedula, date.today())).lastrowid
+        if categoria == 'CONTRATADO':
+            self.db.execute("INSERT INTO SGA_CONTRATADO (id_trabalhador, contrato_trabalho) VALUES (?, ?)",
+                            (novo_id, contrato_tipo))
+        elif categoria == 'PRESTADOR':
+            self.db.execute("INSERT INTO SGA_PRESTADOR_SERVICO (id_trabalhador, ordem, remuneracao) VALUES (?, ?, ?)",
+                            (novo_id, ordem, remuneracao))
+        return []
+
+    @_escrita
+    def sp_editarTrabalhador(self, nif, nome, telefone, email, perfil, cedula, categoria, campo_extra=None):
+        self.db.execute("UPDATE SGA_PESSOA SET nome = ?, telefone = ?, email = ? WHERE NIF = ?",
+                        (nome, telefone, email, nif))
+        self.db.execute("UPDATE SGA_TRABALHADOR SET tipo_perfil = ?, cedula_profissional = ? WHERE NIF = ?",
+                        (perfil, cedula, nif))
+        id_trabalhador = self._valor("SELECT id_trabalhador FROM SGA_TRABALHADOR WHERE NIF = ?", (nif,))
+        if categoria == 'CONTRATADO':
+            self.db.execute("UPDATE SGA_CONTRATADO SET contrato_trabalho = ? WHERE id_trabalhador = ?",
+                            (campo_extra, id_trabalhador))
+        else:
+            self.db.execute("UPDATE SGA_PRESTADOR_SERVICO SET ordem = ? WHERE id_trabalhador = ?",
+                            (campo_extra, id_trabalhador))
+        return []
+
+    @_escrita
+    def sp_desativarFuncionario(self, id_trabalhador):
+        # trg_DesativarTrabalhador preenche data_fim
+        self.db.execute("UPDATE SGA_TRABALHADOR SET ativo = 0 WHERE id_trabalhador = ?", (id_trabalhador,))
+        return []
+
+    @_escrita
+    def sp_ativarFuncionario(self, id_trabalhador):
+        self.db.execute("UPDATE SGA_TRABALHADOR SET ativo = 1, data_fim = NULL WHERE id_trabalhador = ?",
+                        (id_trabalhador,))
+        return []
+
+    @_escrita
+    def sp_eliminarTrabalhadorPermanente(self, id_trabalhador):
+        if self._valor("SELECT 1 FROM SGA_TRABALHADOR WHERE id_trabalhador = ? AND ativo = 1", (id_trabalhador,)):
+            raise _erro(50000, 'Erro: Não é possível eliminar um funcionário ativo.')
+        nif = self._nif_trabalhador(id_trabalhador)
+        self.db.execute("DELETE FROM SGA_RELATORIO WHERE id_autor = ?", (id_trabalhador,))
+        self.db.execute("UPDATE SGA_SALA SET id_dono = NULL WHERE id_dono = ?", (id_trabalhador,))
+        self.db.execute("DELETE FROM SGA_VINCULO_CLINICO WHERE NIF_trabalhador = ?", (nif,))
+        self.db.execute("DELETE FROM SGA_TRABALHADOR_ATENDIMENTO WHERE id_trabalhador = ?", (id_trabalhador,))
+        self.db.execute("DELETE FROM SGA_CONTRATADO WHERE id_trabalhador = ?", (id_trabalhador,))
+        self.db.execute("DELETE FROM SGA_PRESTADOR_SERVICO WHERE id_trabalhador = ?", (id_trabalhador,))
+        self.db.execute("DELETE FROM SGA_TRABALHADOR WHERE id_trabalhador = ?", (id_trabalhador,))
+        return []
+
+    # --- 4. Pacientes ---
+
+    def sp_listarPacientesSGA(self, id_trabalhador, perfil):
+        if perfil == 'admin':
+            return [self._cursor(PACIENTES_SGA + " WHERE Pac.ativo = 1 ORDER BY P.nome")]
+        return [self._cursor(PACIENTES_SGA + """
+            JOIN SGA_VINCULO_CLINICO V ON Pac.NIF = V.NIF_paciente
+            WHERE V.NIF_trabalhador = (SELECT NIF FROM SGA_TRABALHADOR WHERE id_trabalhador = ?) AND Pac.ativo = 1
+            ORDER BY P.nome
+        """, (id_trabalhador,))]
+
+    def sp_listarPacientesSGAPagina(self, id_trabalhador, perfil, tamanho=50, pesquisa=None, descendente=0,
+                                    apos_nome=None, apos_id=None):
+        condicoes = ['Pac.ativo = 1']
+        if perfil != 'admin':
+            condicoes.append("""EXISTS (
+                SELECT 1 FROM SGA_VINCULO_CLINICO V
+                WHERE V.NIF_paciente = Pac.NIF AND V.NIF_trabalhador = :nif_medico)""")
+        return self._pagina(PACIENTES_SGA, condicoes, {'nif_medico': self._nif_trabalhador(id_trabalhador)},
+                            'P.nome', 'Pac.id_paciente', 'P.NIF', tamanho, pesquisa, descendente, apos_nome, apos_id)
+
+    @_escrita
+    def sp_inserirPaciente(self, nif, data_inscricao, observacoes=None, id_medico=None):
+        # Segundo passo de /criar_paciente (a pessoa já foi gravada por sp_guardarPessoa);
+        # mesmas regras de sp_importarPacientes para uma só linha
+        id_medico = _int(id_medico or None)
+        if self._valor("SELECT 1 FROM SGA_PACIENTE WHERE NIF = ?", (nif,)):
+            raise _erro(50003, 'Paciente já registado.')
+        if id_medico is not None and not self._valor(
+                "SELECT 1 FROM SGA_TRABALHADOR WHERE id_trabalhador = ? AND ativo = 1", (id_medico,)):
+            raise _erro(50007, 'Profissional responsável inexistente ou inativo.')
+        self.db.execute("INSERT INTO SGA_PACIENTE (NIF, data_inscricao, observacoes, ativo) VALUES (?, ?, ?, 1)",
+                        (nif, _data(data_inscricao), observacoes))
+        if id_medico is not None:
+            self._vincular(id_medico, nif, 'Responsável Principal')
+        return []
+
+    @_escrita
+    def sp_desativarPaciente(self, id_paciente):
+        self.db.execute("UPDATE SGA_PACIENTE SET ativo = 0 WHERE id_paciente = ?", (id_paciente,))
+        return []
+
+    def sp_listarPacientesInativos(self):
+        return [self._cursor(PACIENTES_INATIVOS + " WHERE Pac.ativo = 0 ORDER BY Pess.nome")]
+
+    def sp_listarPacientesInativosPagina(self, tamanho=50, pesquisa=None, descendente=0, apos_nome=None,
+                                         apos_id=None):
+        return self._pagina(PACIENTES_INATIVOS, ['Pac.ativo = 0'], {}, 'Pess.nome', 'Pac.id_paciente', 'Pess.NIF',
+                            tamanho, pesquisa, descendente, apos_nome, apos_id)
+
+    @_escrita
+    def sp_ativarPaciente(self, id_paciente):
+        self.db.execute("UPDATE SGA_PACIENTE SET ativo = 1 WHERE id_paciente = ?", (id_paciente,))
+        return []
+
+    def sp_obterFichaCompletaPaciente(self, id_paciente, id_trabalhador, perfil):
+        if perfil != 'admin' and not self._valor("""
+            SELECT 1 FROM SGA_VINCULO_CLINICO
+            WHERE NIF_paciente = (SELECT NIF FROM SGA_PACIENTE WHERE id_paciente = ?)
+              AND NIF_trabalhador = (SELECT NIF FROM SGA_TRABALHADOR WHERE id_trabalhador = ?)
+        """, (id_paciente, id_trabalhador)):
+            raise _erro(50005, 'Acesso Negado: Sem permissão clínica para este paciente.')
+        return [self._cursor("""
+            SELECT Pac.id_paciente, Pess.nome, Pess.NIF, Pess.data_nascimento, Pess.telefone, Pess.email,
+                   Pac.data_inscricao, Pac.observacoes, Pac.ativo
+            FROM SGA_PACIENTE Pac
+            JOIN SGA_PESSOA Pess ON Pac.NIF = Pess.NIF
+            WHERE Pac.id_paciente = ?
+        """, (id_paciente,))]
+
+    @_escrita
+    def sp_editarPaciente(self, nif, nome, telefone, email, obs):
+        self.db.execute("UPDATE SGA_PESSOA SET nome = ?, telefone = ?, email = ? WHERE NIF = ?",
+                        (nome, telefone, email, nif))
+        self.db.execute("UPDATE SGA_PACIENTE SET observacoes = ? WHERE NIF = ?", (obs, nif))
+        return []
+
+    @_escrita
+    def sp_atualizarObservacoesPaciente(self, id, obs):
+        if not self._valor("SELECT 1 FROM SGA_PACIENTE WHERE id_paciente = ?", (id,)):
+            raise _erro(50004, 'Não existe paciente com esse Id.')
+        self.db.execute("UPDATE SGA_PACIENTE SET observacoes = ? WHERE id_paciente = ?", (obs, id))
+        return []
+
+    @_escrita
+    def sp_eliminarPacientePermanente(self, id_paciente):
+        if self._valor("SELECT 1 FROM SGA_PACIENTE WHERE id_paciente = ? AND ativo = 1", (id_paciente,)):
+            raise _erro(50000, 'Erro: Não é possível eliminar um paciente ativo. Desative-o primeiro.')
+        nif = self._valor("SELECT NIF FROM SGA_PACIENTE WHERE id_paciente = ?", (id_paciente,))
+        self.db.execute("DELETE FROM SGA_RELATORIO WHERE id_paciente = ?", (id_paciente,))
+        self.db.execute("DELETE FROM SGA_VINCULO_CLINICO WHERE NIF_paciente = ?", (nif,))
+        self.db.execute("DELETE FROM SGA_PACIENTE_ATENDIMENTO WHERE id_paciente = ?", (id_paciente,))
+        self.db.execute("DELETE FROM SGA_PACIENTE WHERE id_paciente = ?", (id_paciente,))
+        return []
+
+    def sp_countPaciente(self):
+        return [self._cursor("SELECT COUNT(*) FROM SGA_PACIENTE WHERE ativo = 1")]
+
+    def sp_listarPacientesDeTrabalhador(self, id_trabalhador):
+        return [self._cursor("""
+            SELECT P.id_paciente, Pe.nome, V.tipo_vinculo, strftime('%d/%m/%Y', V.data_inicio) AS desde
+            FROM SGA_VINCULO_CLINICO V
+            JOIN SGA_PACIENTE P ON V.NIF_paciente = P.NIF
+            JOIN SGA_PESSOA Pe ON P.NIF = Pe.NIF
+            WHERE V.NIF_trabalhador = (SELECT NIF FROM SGA_TRABALHADOR WHERE id_trabalhador = ?) AND P.ativo = 1
+        """, (id_trabalhador,))]
+
+    def sp_listarTrabalhadoresDePaciente(self, id_paciente):
+        return [self._cursor("""
+            SELECT T.id_trabalhador, Pe.nome, T.tipo_perfil, V.tipo_vinculo
+            FROM SGA_VINCULO_CLINICO V
+            JOIN SGA_TRABALHADOR T ON V.NIF_trabalhador = T.NIF
+            JOIN SGA_PESSOA Pe ON T.NIF = Pe.NIF
+            WHERE V.NIF_paciente = (SELECT NIF FROM SGA_PACIENTE WHERE id_paciente = ?) AND T.ativo = 1
+        """, (id_paciente,))]
+
+    # --- Relatórios ---
+
+    def sp_listarProcessosClinicosAtivos(self, id_trabalhador_sessao, perfil):
+        return [self._cursor("""
+            SELECT Pac.id_paciente, P_Pess.nome AS nome_paciente,
+                   MAX(R.data_criacao) AS "ultima_atividade [DATETIME2]", COUNT(R.id) AS total_paragrafos
+            FROM SGA_VINCULO_CLINICO V
+            JOIN SGA_PACIENTE Pac ON V.NIF_paciente = Pac.NIF
+            JOIN SGA_PESSOA P_Pess ON Pac.NIF = P_Pess.NIF
+            JOIN SGA_TRABALHADOR T ON T.id_trabalhador = :id
+            LEFT JOIN SGA_RELATORIO R ON Pac.id_paciente = R.id_paciente AND R.id_autor = :id
+            WHERE V.NIF_trabalhador = T.NIF
+              AND (Pac.ativo = 1 OR :perfil = 'admin')
+            GROUP BY Pac.id_paciente, P_Pess.nome
+            ORDER BY 3 DESC
+        """, {'id': id_trabalhador_sessao, 'perfil': perfil})]
+
+    @_escrita
+    def sp_salvarRelatorioClinico(self, id_relatorio, id_paciente, id_autor, conteudo, tipo):
+        if self._valor("SELECT 1 FROM SGA_RELATORIO WHERE id = ? AND id_autor = ?", (id_relatorio, id_autor)):
+            self.db.execute("UPDATE SGA_RELATORIO SET conteudo = ?, tipo_relatorio = ? WHERE id = ?",
+                            (conteudo, tipo, id_relatorio))
+        else:
+            id_relatorio = self.db.execute("""
+                INSERT INTO SGA_RELATORIO (id_paciente, id_autor, conteudo, tipo_relatorio, data_criacao)
+                VALUES (?, ?, ?, ?, ?)
+            """, (id_paciente, id_autor, conteudo, tipo, datetime.now())).lastrowid
+        return [[(_int(id_relatorio),)]]
+
+    def sp_pesquisarRelatorios(self, id_autor, consulta, id_paciente=None, limite=20):
+        raise _erro(50020, 'Pesquisa de texto integral indisponível.')
+
+    def sp_listarRelatoriosAlterados(self, desde=0):
+        return [
+            self._todos("SELECT (SELECT COUNT(*) FROM SGA_RELATORIO), (SELECT valor FROM SGA_VERSAO)"),
+            self._cursor("""
+                SELECT R.id, R.id_paciente, PessPac.nome AS nome_paciente, R.id_autor, R.tipo_relatorio,
+                       R.data_criacao, R.conteudo
+                FROM SGA_RELATORIO R
+                JOIN SGA_PACIENTE Pac ON R.id_paciente = Pac.id_paciente
+                JOIN SGA_PESSOA PessPac ON Pac.NIF = PessPac.NIF
+                WHERE R.versao > ?
+            """, (_int(desde),)),
+        ]
+
+    def sp_obterLivrariaRelatorios(self, id_paciente, id_autor, tamanho=20, apos_data=None, apos_id=None):
+        return [self._cursor("""
+            SELECT id, tipo_relatorio, data_criacao
+            FROM SGA_RELATORIO
+            WHERE id_paciente = :id_paciente AND id_autor = :id_autor
+              AND (:apos_data IS NULL
+                   OR data_criacao < :apos_data
+                   OR (data_criacao = :apos_data AND id < :apos_id))
+            ORDER BY data_criacao DESC, id DESC
+            LIMIT :tamanho
+        """, {'id_paciente': id_paciente, 'id_autor': id_autor, 'tamanho': _int(tamanho) + 1,
+              'apos_data': _data_hora(apos_data), 'apos_id': _int(apos_id)})]
+
+    def sp_obterRelatorio(self, id, id_autor):
+        return [self._cursor("""
+            SELECT id, id_paciente, tipo_relatorio, data_criacao, conteudo
+            FROM SGA_RELATORIO
+            WHERE id = ? AND id_autor = ?
+        """, (id, id_autor))]
+
+    def sp_obterRelatoriosPorIds(self, id_autor, ids):
+        ids = sorted({int(v) for v in str(ids or '').split(',') if v.strip().isdigit()})
+        if not ids:
+            return [[]]
+        return [self._cursor(f"""
+            SELECT R.id, R.id_paciente, PessPac.nome AS nome_paciente, R.tipo_relatorio, R.data_criacao, R.conteudo
+            FROM SGA_RELATORIO R
+            JOIN SGA_PACIENTE Pac ON R.id_paciente = Pac.id_paciente
+            JOIN SGA_PESSOA PessPac ON Pac.NIF = PessPac.NIF
+            WHERE R.id_autor = ? AND R.id IN ({', '.join('?' * len(ids))})
+        """, (id_autor, *ids))]
+
+    @_escrita
+    def sp_RegistoRapidoAgenda(self, nif, nome, telemovel, data_nasc, id_paciente_gerado=None):
+        self.db.execute("""
+            INSERT INTO SGA_PESSOA (NIF, nome, data_nascimento, telefone) VALUES (?, ?, ?, ?)
+            ON CONFLICT (NIF) DO UPDATE SET
+                nome = excluded.nome, data_nascimento = excluded.data_nascimento, telefone = excluded.telefone
+        """, (nif, nome, _data(data_nasc), telemovel))
+        id_existente = self._valor("SELECT id_paciente FROM SGA_PACIENTE WHERE NIF = ?", (nif,))
+        if id_existente is None:
+            self.saidas['id_paciente_gerado'] = self.db.execute("""
+                INSERT INTO SGA_PACIENTE (NIF, data_inscricao, observacoes, ativo)
+                VALUES (?, ?, 'Registo Rápido via Agenda', 1)
+            """, (nif, date.today())).lastrowid
+        else:
+            self.db.execute("UPDATE SGA_PACIENTE SET ativo = 1 WHERE id_paciente = ?", (id_existente,))
+            self.saidas['id_paciente_gerado'] = id_existente
+        return []
+
+    # --- 5. Exportação (lidas a pedido com fetchmany) ---
+
+    def sp_exportarPacientes(self):
+        return [self._cursor("""
+            SELECT Pac.id_paciente, P.NIF, P.nome, P.data_nascimento, P.telefone, P.email,
+                   Pac.data_inscricao, Pac.observacoes, Pac.ativo
+            FROM SGA_PACIENTE Pac
+            JOIN SGA_PESSOA P ON Pac.NIF = P.NIF
+            ORDER BY Pac.id_paciente
+        """)]
+
+    def sp_exportarAtendimentos(self, data_inicio=None, data_fim=None):
+        return [self._cursor("""
+            SELECT A.num_atendimento, A.data_inicio, A.data_fim, A.estado,
+                   S.nome AS sala, S.is_online,
+                   T.id_trabalhador, PessMed.nome AS medico,
+                   Pac.id_paciente, PessPac.NIF AS nif_paciente, PessPac.nome AS paciente, PA.presenca
+            FROM SGA_ATENDIMENTO A
+            JOIN SGA_SALA S ON A.id_sala = S.id_sala
+            LEFT JOIN SGA_TRABALHADOR_ATENDIMENTO TA ON A.num_atendimento = TA.num_atendimento
+            LEFT JOIN SGA_TRABALHADOR T ON TA.id_trabalhador = T.id_trabalhador
+            LEFT JOIN SGA_PESSOA PessMed ON T.NIF = PessMed.NIF
+            LEFT JOIN SGA_PACIENTE_ATENDIMENTO PA ON A.num_atendimento = PA.num_atendimento
+            LEFT JOIN SGA_PACIENTE Pac ON PA.id_paciente = Pac.id_paciente
+            LEFT JOIN SGA_PESSOA PessPac ON Pac.NIF = PessPac.NIF
+            WHERE (:inicio IS NULL OR A.data_inicio >= :inicio)
+              AND (:fim IS NULL OR A.data_inicio < :fim)
+            ORDER BY A.num_atendimento
+        """, {'inicio': _data_hora(data_inicio), 'fim': _data_hora(data_fim)})]
+
+    def sp_exportarRelatorios(self, data_inicio=None, data_fim=None):
+        return [self._cursor("""
+            SELECT R.id, R.id_paciente, PessPac.nome AS paciente, R.id_autor, PessAut.nome AS autor,
+                   R.tipo_relatorio, R.data_criacao, R.conteudo
+            FROM SGA_RELATORIO R
+            JOIN SGA_PACIENTE Pac ON R.id_paciente = Pac.id_paciente
+            JOIN SGA_PESSOA PessPac ON Pac.NIF = PessPac.NIF
+            JOIN SGA_TRABALHADOR T ON R.id_autor = T.id_trabalhador
+            JOIN SGA_PESSOA PessAut ON T.NIF = PessAut.NIF
+            WHERE (:inicio IS NULL OR R.data_criacao >= :inicio)
+              AND (:fim IS NULL OR R.data_criacao < :fim)
+            ORDER BY R.id
+        """, {'inicio': _data_hora(data_inicio), 'fim': _data_hora(data_fim)})]
+
+    # --- 6. Importação em massa (tabelas temp.Importacao*, ver persistence/importacao.py) ---
+
+    def _rejeitadas(self, tabela, numero):
+        if not self._valor("SELECT 1 FROM temp.sqlite_master WHERE type = 'table' AND name = ?", (tabela,)):
+            raise _erro(numero, f'Tabela #{tabela} em falta.')
+        self.db.execute("CREATE TEMP TABLE IF NOT EXISTS ImportacaoRejeitadas (linha INTEGER PRIMARY KEY, motivo TEXT)")
+        self.db.execute("DELETE FROM temp.ImportacaoRejeitadas")
+
+    @_escrita
+    def sp_importarPacientes(self):
+        self._rejeitadas('ImportacaoPacientes', 50030)
+        valida = "I.linha NOT IN (SELECT linha FROM temp.ImportacaoRejeitadas)"
+        for sql in (
+            """INSERT INTO temp.ImportacaoRejeitadas (linha, motivo)
+               SELECT I.linha, 'Paciente já registado.'
+               FROM temp.ImportacaoPacientes I
+               WHERE EXISTS (SELECT 1 FROM SGA_PACIENTE P WHERE P.NIF = I.nif)""",
+            f"""INSERT INTO temp.ImportacaoRejeitadas (linha, motivo)
+               SELECT I.linha, 'Profissional responsável inexistente ou inativo.'
+               FROM temp.ImportacaoPacientes I
+               WHERE I.id_medico IS NOT NULL
+                 AND NOT EXISTS (SELECT 1 FROM SGA_TRABALHADOR T WHERE T.id_trabalhador = I.id_medico AND T.ativo = 1)
+                 AND {valida}""",
+            # Quem já existe como pessoa (ex.: um trabalhador) mantém os seus dados, como no registo rápido
+            f"""INSERT INTO SGA_PESSOA (NIF, nome, data_nascimento, telefone, email)
+               SELECT I.nif, I.nome, I.data_nascimento, I.telefone, I.email
+               FROM temp.ImportacaoPacientes I
+               WHERE {valida} AND NOT EXISTS (SELECT 1 FROM SGA_PESSOA P WHERE P.NIF = I.nif)""",
+            f"""INSERT INTO SGA_PACIENTE (NIF, data_inscricao, observacoes, ativo)
+               SELECT I.nif, :hoje, I.observacoes, 1
+               FROM temp.ImportacaoPacientes I
+               WHERE {valida}""",
+            f"""INSERT INTO SGA_VINCULO_CLINICO (NIF_trabalhador, NIF_paciente, tipo_vinculo, data_inicio)
+               SELECT T.NIF, I.nif, 'Responsável Principal', :agora
+               FROM temp.ImportacaoPacientes I
+               JOIN SGA_TRABALHADOR T ON T.id_trabalhador = I.id_medico
+               WHERE {valida}
+                 AND NOT EXISTS (SELECT 1 FROM SGA_VINCULO_CLINICO V
+                                 WHERE V.NIF_trabalhador = T.NIF AND V.NIF_paciente = I.nif)""",
+        ):
+            self.db.execute(sql, {'hoje': date.today(), 'agora': datetime.now()})
+        return [self._todos("SELECT linha, motivo FROM temp.ImportacaoRejeitadas ORDER BY linha")]
+
+    @_escrita
+    def sp_importarTrabalhadores(self):
+        self._rejeitadas('ImportacaoTrabalhadores', 50031)
+        valida = "I.linha NOT IN (SELECT linha FROM temp.ImportacaoRejeitadas)"
+        for sql in (
+            """INSERT INTO temp.ImportacaoRejeitadas (linha, motivo)
+               SELECT I.linha, 'O NIF ' || I.nif || ' já se encontra registado no sistema.'
+               FROM temp.ImportacaoTrabalhadores I
+               WHERE EXISTS (SELECT 1 FROM SGA_PESSOA P WHERE P.NIF = I.nif)""",
+            f"""INSERT INTO SGA_PESSOA (NIF, nome, data_nascimento, telefone, email)
+               SELECT I.nif, I.nome, I.data_nascimento, I.telefone, I.email
+               FROM temp.ImportacaoTrabalhadores I
+               WHERE {valida}""",
+            f"""INSERT INTO SGA_TRABALHADOR (NIF, senha_hash, tipo_perfil, cedula_profissional, ativo, data_inicio)
+               SELECT I.nif, I.senha_hash, I.perfil, I.cedula, 1, :hoje
+               FROM temp.ImportacaoTrabalhadores I
+               WHERE {valida}""",
+            # As linhas aceites acabaram de ser criadas: o NIF identifica o trabalhador
+            f"""INSERT INTO SGA_CONTRATADO (id_trabalhador, contrato_trabalho)
+               SELECT T.id_trabalhador, I.contrato
+               FROM temp.ImportacaoTrabalhadores I
+               JOIN SGA_TRABALHADOR T ON T.NIF = I.nif
+               WHERE {valida} AND I.categoria = 'CONTRATADO'""",
+            f"""INSERT INTO SGA_PRESTADOR_SERVICO (id_trabalhador, ordem, remuneracao)
+               SELECT T.id_trabalhador, I.ordem, I.remuneracao
+               FROM temp.ImportacaoTrabalhadores I
+               JOIN SGA_TRABALHADOR T ON T.NIF = I.nif
+               WHERE {valida} AND I.categoria = 'PRESTADOR'""",
+        ):
+            self.db.execute(sql, {'hoje': date.today()})
+        return [self._todos("SELECT linha, motivo FROM temp.ImportacaoRejeitadas ORDER BY linha")]
+
+
+# Nomes dos procedimentos sem distinção de maiúsculas, como no SQL Server
+PROCEDIMENTOS = {nome.lower(): nome for nome in dir(Procedimentos) if nome.startswith('sp_')}
+
+
+# --- Tradução do T-SQL escrito fora dos procedimentos ---
+
+_RE_IGNORAR = re.compile(r'^SET\s+(NOCOUNT|IDENTITY_INSERT|XACT_ABORT|ANSI_\w+|QUOTED_IDENTIFIER)\b', re.I)
+_RE_DECLARE = re.compile(r'^DECLARE\s+@(\w+)\b', re.I)
+_RE_TRIGGER = re.compile(r'^(ENABLE|DISABLE)\s+TRIGGER\s+(\w+)\s+ON\s+\w+$', re.I)
+_RE_EXEC = re.compile(r'^EXEC(?:UTE)?\s+(?:dbo\.)?(\w+)\s*(.*)$', re.I | re.S)
+_RE_SELECT_VARIAVEIS = re.compile(r'^SELECT\s+@\w+(?:\s+AS\s+\w+)?(?:\s*,\s*@\w+(?:\s+AS\s+\w+)?)*$', re.I)
+_RE_ARGUMENTO = re.compile(r'^(?:@(\w+)\s*=\s*)?(.*)$', re.S)
+_RE_SAIDA = re.compile(r'^@(\w+)\s+OUT(?:PUT)?$', re.I)
+_RE_ESCRITA = re.compile(r'^(INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b', re.I)
+_RE_VIRGULAS = re.compile(r",(?=(?:[^']*'[^']*')*[^']*$)")
+_RE_TEXTO = re.compile(r"'(?:[^']|'')*'")
+
+_TRADUCOES = [
+    (re.compile(r"^IF\s+OBJECT_ID\('tempdb\.\.#(\w+)'\)\s+IS\s+NOT\s+NULL\s+DROP\s+TABLE\s+#\w+$", re.I),
+     r'DROP TABLE IF EXISTS temp.\1'),
+    (re.compile(r'^CREATE\s+TABLE\s+#(\w+)', re.I), r'CREATE TEMP TABLE \1'),
+    (re.compile(r'^SELECT\s+(.+?)\s+INTO\s+#(\w+)\s+FROM\b', re.I | re.S), r'CREATE TEMP TABLE \2 AS SELECT \1 FROM'),
+    (re.compile(r'^TRUNCATE\s+TABLE\b', re.I), 'DELETE FROM'),
+    (re.compile(r'#(\w+)'), r'temp.\1'),
+    (re.compile(r'\bISNULL\s*\(', re.I), 'IFNULL('),
+    (re.compile(r'^SELECT\s+TOP\s*\(?\s*(\d+)\s*\)?\s+(.*)$', re.I | re.S), r'SELECT \2 LIMIT \1'),
+]
+
+
+def _traduzir(sql):
+    for padrao, substituto in _TRADUCOES:
+        sql = padrao.sub(substituto, sql)
+    return sql
+
+
+def _instrucoes(sql):
+    """Divide um batch nas instruções separadas por ';' (fora de strings)."""
+    instrucoes, atual = [], ''
+    for parte in sql.split(';'):
+        atual += parte + ';'
+        if sqlite3.complete_statement(atual):
+            if atual.strip(' \t\r\n;'):
+                instrucoes.append(atual.strip().rstrip(';').strip())
+            atual = ''
+    if atual.strip(' \t\r\n;'):
+        instrucoes.append(atual.strip().rstrip(';').strip())
+    return instrucoes
+
+
+def _marcadores(sql):
+    return _RE_TEXTO.sub('', sql).count('?')
+
+
+def _literal(texto):
+    if texto.upper() == 'NULL':
+        return None
+    if texto[:2].upper() == "N'":
+        texto = texto[1:]
+    if texto.startswith("'"):
+        return texto[1:-1].replace("''", "'")
+    try:
+        return int(texto)
+    except ValueError:
+        return Decimal(texto)
+
+
+class _Resultado:
+    """Um result set: cursor sqlite3 (lido a pedido) ou lista de tuplos de um procedimento."""
+
+    def __init__(self, linhas):
+        if isinstance(linhas, sqlite3.Cursor):
+            self.description = linhas.description
+        else:
+            linhas = list(linhas)
+            colunas = len(linhas[0]) if linhas else 1
+            self.description = tuple(('', None, None, None, None, None, None) for _ in range(colunas))
+        self._linhas = iter(linhas)
+
+    def fetchone(self):
+        return next(self._linhas, None)
+
+    def fetchmany(self, tamanho):
+        return list(islice(self._linhas, tamanho))
+
+    def fetchall(self):
+        return list(self._linhas)
+
+
+class CursorSQLite:
+    """Cursor com a API do pyodbc usada pela aplicação."""
+
+    def __init__(self, conexao):
+        self._conexao = conexao
+        self._resultados = deque()
+        self._atual = None
+        self._variaveis = {}
+        self.fast_executemany = False
+        self.rowcount = -1
+        self.arraysize = 1
+
+    @property
+    def description(self):
+        return self._atual.description if self._atual else None
+
+    def execute(self, sql, *parametros):
+        if len(parametros) == 1 and isinstance(parametros[0], (list, tuple)):
+            parametros = parametros[0]
+        self._resultados.clear()
+        self._atual = None
+        self._variaveis = {}
+        self.rowcount = -1
+
+        instrucoes = _instrucoes(sql)
+        esperados = sum(_marcadores(i) for i in instrucoes)
+        if esperados != len(parametros):
+            raise ProgrammingError(
+                f'The SQL contains {esperados} parameter markers, but {len(parametros)} parameters were supplied',
+                'HY000')
+        valores = iter(parametros)
+        try:
+            for instrucao in instrucoes:
+                self._executar(instrucao, [next(valores) for _ in range(_marcadores(instrucao))])
+        except sqlite3.Error as e:
+            raise _erro_sqlite(self._conexao.db, e) from e
+        self._avancar()
+        return self
+
+    def executemany(self, sql, sequencia):
+        self._resultados.clear()
+        self._atual = None
+        sql = _traduzir(sql.strip())
+        try:
+            self._conexao.escrever()
+            self.rowcount = self._conexao.db.executemany(sql, sequencia).rowcount
+        except sqlite3.Error as e:
+            raise _erro_sqlite(self._conexao.db, e) from e
+
+    def setinputsizes(self, tamanhos):
+        """Sem efeito: o SQLite não precisa dos tipos dos parâmetros."""
+
+    def _executar(self, sql, valores):
+        if _RE_IGNORAR.match(sql):
+            return
+        declaracao = _RE_DECLARE.match(sql)
+        if declaracao:
+            self._variaveis[declaracao.group(1).lower()] = None
+            return
+        trigger = _RE_TRIGGER.match(sql)
+        if trigger:
+            self._conexao.alternar_trigger(trigger.group(2), trigger.group(1).upper() == 'ENABLE')
+            return
+        chamada = _RE_EXEC.match(sql)
+        if chamada:
+            self._procedimento(chamada.group(1), chamada.group(2), valores)
+            return
+        if _RE_SELECT_VARIAVEIS.match(sql):
+            nomes = re.findall(r'@(\w+)(?:\s+AS\s+\w+)?', sql)
+            self._resultados.append(_Resultado([tuple(self._variaveis.get(n.lower()) for n in nomes)]))
+            return
+
+        sql = _traduzir(sql)
+        if _RE_ESCRITA.match(sql):
+            self._conexao.escrever()
+        cursor = self._conexao.db.execute(sql, valores)
+        if cursor.description is not None:
+            self._resultados.append(_Resultado(cursor))
+        else:
+            self.rowcount = cursor.rowcount
+
+    def _procedimento(self, nome, argumentos, valores):
+        posicionais, nomeados, saidas = [], {}, {}
+        valores = iter(valores)
+        for texto in filter(None, (a.strip() for a in _RE_VIRGULAS.split(argumentos))):
+            parametro, valor = _RE_ARGUMENTO.match(texto).groups()
+            valor = valor.strip()
+            saida = _RE_SAIDA.match(valor)
+            if saida:
+                if parametro:
+                    saidas[parametro.lower()] = saida.group(1).lower()
+                valor = self._variaveis.get(saida.group(1).lower())
+            elif valor == '?':
+                valor = next(valores)
+            elif valor.startswith('@'):
+                valor = self._variaveis.get(valor[1:].lower())
+            else:
+                valor = _literal(valor)
+            if parametro:
+                nomeados[parametro.lower()] = valor
+            else:
+                posicionais.append(valor)
+
+        resultados, valores_saida = self._conexao.executar_procedimento(nome, posicionais, nomeados)
+        for parametro, variavel in saidas.items():
+            self._variaveis[variavel] = valores_saida.get(parametro)
+        self._resultados.extend(_Resultado(r) for r in resultados)
+
+    def _avancar(self):
+        self._atual = self._resultados.popleft() if self._resultados else None
+
+    def _resultado(self):
+        if self._atual is None:
+            raise ProgrammingError('No results.  Previous SQL was not a query.', '24000')
+        return self._atual
+
+    def fetchone(self):
+        try:
+            return self._resultado().fetchone()
+        except sqlite3.Error as e:
+            raise _erro_sqlite(self._conexao.db, e) from e
+
+    def fetchmany(self, tamanho=None):
+        try:
+            return self._resultado().fetchmany(tamanho or self.arraysize)
+        except sqlite3.Error as e:
+            raise _erro_sqlite(self._conexao.db, e) from e
+
+    def fetchall(self):
+        try:
+            return self._resultado().fetchall()
+        except sqlite3.Error as e:
+            raise _erro_sqlite(self._conexao.db, e) from e
+
+    def nextset(self):
+        self._avancar()
+        return self._atual is not None
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def commit(self):
+        self._conexao.commit()
+
+    def rollback(self):
+        self._conexao.rollback()
+
+    def close(self):
+        self._resultados.clear()
+        self._atual = None
+
+
+class ConexaoSQLite:
+    """Conexão com a API do pyodbc (sem autocommit: a transação acaba no commit/rollback)."""
+
+    def __init__(self, db):
+        self.db = db
+        self._procedimentos = Procedimentos(db)
+
+    def cursor(self):
+        return CursorSQLite(self)
+
+    def escrever(self):
+        """Começa a transação de escrita, se ainda não houver: um escritor de cada vez."""
+        if not self.db.in_transaction:
+            self.db.execute('BEGIN IMMEDIATE')
+
+    def executar_procedimento(self, nome, posicionais, nomeados):
+        """Corre o procedimento num SAVEPOINT. Devolve (result sets, parâmetros OUTPUT)."""
+        real = PROCEDIMENTOS.get(nome.lower())
+        if real is None:
+            raise ProgrammingError(
+                '42000', f"[42000] Could not find stored procedure '{nome}'. (2812) (SQLExecDirectW)")
+        metodo = getattr(self._procedimentos, real)
+        try:
+            inspect.signature(metodo).bind(*posicionais, **nomeados)
+        except TypeError as e:
+            raise ProgrammingError(
+                '42000', f"[42000] Procedure or function '{real}': {e}. (201) (SQLExecDirectW)") from None
+
+        if getattr(metodo, 'escrita', False):
+            self.escrever()
+        self._procedimentos.saidas = {}
+        self.db.execute(f'SAVEPOINT {real}')
+        try:
+            resultados = metodo(*posicionais, **nomeados)
+        except BaseException:
+            self.db.execute(f'ROLLBACK TO {real}')
+            self.db.execute(f'RELEASE {real}')
+            raise
+        self.db.execute(f'RELEASE {real}')
+        return resultados, self._procedimentos.saidas
+
+    def alternar_trigger(self, nome, ligar):
+        """ENABLE/DISABLE TRIGGER: os triggers do esquema consultam SGA_TRIGGERS_DESLIGADOS."""
+        if not self.db.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name LIKE ? || '%'",
+                               (nome,)).fetchone():
+            raise ProgrammingError(
+                '42000', f"[42000] Cannot find the object \"{nome}\". (3701) (SQLExecDirectW)")
+        self.escrever()
+        if ligar:
+            self.db.execute("DELETE FROM SGA_TRIGGERS_DESLIGADOS WHERE nome = ?", (nome,))
+        else:
+            self.db.execute("INSERT OR IGNORE INTO SGA_TRIGGERS_DESLIGADOS (nome) VALUES (?)", (nome,))
+
+    def commit(self):
+        if self.db.in_transaction:
+            self.db.execute('COMMIT')
+
+    def rollback(self):
+        if self.db.in_transaction:
+            self.db.execute('ROLLBACK')
+
+    def close(self):
+        self.db.close()
+
+
+_esquemas = set()
+_esquemas_lock = threading.Lock()
+
+
+def ligar(caminho):
+    """
+    Abre uma conexão ao ficheiro SQLite (fábrica do pool com DB_BACKEND=sqlite).
+    Na primeira conexão a cada ficheiro aplica sql/sqlite/esquema.sql (idempotente).
+    """
+    db = sqlite3.connect(caminho, timeout=TIMEOUT, isolation_level=None, check_same_thread=False,
+                         detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+    db.execute('PRAGMA journal_mode = WAL')
+    db.execute('PRAGMA synchronous = NORMAL')
+    db.execute('PRAGMA foreign_keys = ON')
+    with _esquemas_lock:
+        if caminho not in _esquemas or caminho == ':memory:':
+            db.executescript('BEGIN IMMEDIATE;\n' + ESQUEMA.read_text(encoding='utf-8') + '\nCOMMIT;')
+            _esquemas.add(caminho)
+    return ConexaoSQLite(db)
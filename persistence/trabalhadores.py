@@ -1,7 +1,22 @@
+from persistence.cache import cache_referencia
+from persistence.dashboard import invalidar_dashboard
+from persistence.paginacao import executar_pagina, escapar_like, descodificar_cursor, normalizar_tamanho
+
+def _listar_medicos_agenda(cursor):
+    """Resultado de sp_listarMedicosAgenda, partilhado pelos dois dropdowns (em cache)."""
+    def carregar():
+        cursor.execute('exec sp_listarMedicosAgenda')
+        return [tuple(r) for r in cursor.fetchall()]
+    return cache_referencia.obter_ou_calcular(('sp_listarMedicosAgenda', None, None), carregar)
+
+def invalidar_medicos():
+    """Chamado pela rota depois do commit de qualquer alteração à equipa."""
+    cache_referencia.invalidar('sp_listarMedicosAgenda')
+    invalidar_dashboard()  # total_equipa
+
 def medicos_agenda_dropdown(cursor):
     try:
-        cursor.execute('exec sp_listarMedicosAgenda')
-        rows = cursor.fetchall()
+        rows = _listar_medicos_agenda(cursor)
         if rows:
             return [{'id':row[0], 'nome':row[1]} for row in rows]
         return []
@@ -18,6 +33,9 @@ def obter_dados_login(cursor, nif):
         print(f"Erro no login DB: {e}")
         return None
     
+def atualizar_hash_senha(cursor, id_trabalhador, senha_hash):
+    cursor.execute("EXEC sp_atualizarSenhaTrabalhador ?, ?", (id_trabalhador, senha_hash))
+
 def obter_nome_trabalhador(cursor, id_user):
     cursor.execute("SELECT nome FROM SGA_PESSOA p JOIN SGA_TRABALHADOR t ON p.NIF = t.NIF WHERE t.id_trabalhador = ?", (id_user,))
     res = cursor.fetchone()
@@ -27,6 +45,14 @@ def listar_equipa_ativa(cursor):
     cursor.execute("EXEC sp_listarEquipa")
     return cursor.fetchall() # Tuplos para o equipa.html
 
+def listar_equipa_pagina(cursor, tamanho=None, pesquisa=None, descendente=False, apos=None):
+    """Versão paginada de listar_equipa_ativa. Retorna (linhas, token_proxima_pagina | None)."""
+    tamanho = normalizar_tamanho(tamanho)
+    apos_nome, apos_id = descodificar_cursor(apos)
+    return executar_pagina(cursor, "EXEC sp_listarEquipaPagina ?, ?, ?, ?, ?",
+                           (tamanho, escapar_like(pesquisa), 1 if descendente else 0, apos_nome, apos_id),
+                           tamanho, idx_nome=0, idx_id=6)
+
 def listar_equipa_arquivo(cursor):
     cursor.execute("EXEC sp_listarEquipaInativa")
     return cursor.fetchall()
@@ -46,8 +72,7 @@ def listar_equipa_do_paciente(cursor, id_paciente):
 # FUNÇÃO ESPECÍFICA PARA O MODAL DE PACIENTES
 # O template pacientes.html espera 'id_trabalhador'
 def listar_medicos_para_modal_pacientes(cursor):
-    cursor.execute("EXEC sp_listarMedicosAgenda")
-    rows = cursor.fetchall()
+    rows = _listar_medicos_agenda(cursor)
     # REPLICAÇÃO EXATA DA LÓGICA DO APP.PY (linha 106 do upload anterior)
     return [{'id_trabalhador': r[0], 'nome': r[1]} for r in rows]
 
@@ -67,4 +92,5 @@ def ativar_trabalhador(cursor, id_trabalhador):
     cursor.execute("EXEC sp_ativarFuncionario ?", (id_trabalhador,))
 
 def eliminar_trabalhador_fisico(cursor, id_trabalhador):
-    cursor.execute("EXEC sp_eliminarTrabalhadorPermanente ?", (id_trabalhador,))
\ No newline at end of file
+    # Apaga também os vínculos clínicos: depois do commit a rota chama também invalidar_pacientes_agenda()
+    cursor.execute("EXEC sp_eliminarTrabalhadorPermanente ?", (id_trabalhador,))
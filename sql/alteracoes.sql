@@ -0,0 +1,116 @@
+-- Alterações de esquema posteriores ao script inicial (sql/scripts/dml_script.sql).
+-- Executar antes de indexes.sql e stored_procedures.sql.
+
+-- Colunas ROWVERSION: cada INSERT/UPDATE nestas tabelas avança @@DBTS, que serve
+-- de marcador barato de alterações (ETag das APIs JSON e sincronização da agenda).
+IF COL_LENGTH('SGA_ATENDIMENTO', 'versao') IS NULL
+    ALTER TABLE SGA_ATENDIMENTO ADD versao ROWVERSION;
+GO
+
+IF COL_LENGTH('SGA_PACIENTE_ATENDIMENTO', 'versao') IS NULL
+    ALTER TABLE SGA_PACIENTE_ATENDIMENTO ADD versao ROWVERSION;
+GO
+
+IF COL_LENGTH('SGA_TRABALHADOR_ATENDIMENTO', 'versao') IS NULL
+    ALTER TABLE SGA_TRABALHADOR_ATENDIMENTO ADD versao ROWVERSION;
+GO
+
+IF COL_LENGTH('SGA_PESSOA', 'versao') IS NULL
+    ALTER TABLE SGA_PESSOA ADD versao ROWVERSION;
+GO
+
+IF COL_LENGTH('SGA_PACIENTE', 'versao') IS NULL
+    ALTER TABLE SGA_PACIENTE ADD versao ROWVERSION;
+GO
+
+IF COL_LENGTH('SGA_TRABALHADOR', 'versao') IS NULL
+    ALTER TABLE SGA_TRABALHADOR ADD versao ROWVERSION;
+GO
+
+IF COL_LENGTH('SGA_VINCULO_CLINICO', 'versao') IS NULL
+    ALTER TABLE SGA_VINCULO_CLINICO ADD versao ROWVERSION;
+GO
+
+-- Sincronização incremental do índice de pesquisa de relatórios em memória
+IF COL_LENGTH('SGA_RELATORIO', 'versao') IS NULL
+    ALTER TABLE SGA_RELATORIO ADD versao ROWVERSION;
+GO
+
+-- Estatísticas do dashboard: consultas (não canceladas) por dia e por médico, mantidas
+-- pelos triggers de triggers.sql; id_trabalhador = 0 guarda o total do dia (uma consulta
+-- conta uma vez, mesmo com vários médicos). online/presencial pela sala (is_online).
+-- Reconstrução/verificação: sp_reconstruirEstatisticaDiaria.
+IF OBJECT_ID('SGA_ESTATISTICA_DIARIA', 'U') IS NULL
+    CREATE TABLE SGA_ESTATISTICA_DIARIA (
+        dia DATE NOT NULL,
+        id_trabalhador INT NOT NULL,
+        consultas INT NOT NULL DEFAULT 0,
+        online INT NOT NULL DEFAULT 0,
+        presencial INT NOT NULL DEFAULT 0,
+        CONSTRAINT PK_EstatisticaDiaria PRIMARY KEY (dia, id_trabalhador)
+    );
+GO
+
+-- Contagens de pacientes e equipa em views indexadas: o SQL Server mantém-nas em cada
+-- INSERT/UPDATE/DELETE das tabelas base e a leitura (WITH (NOEXPAND)) é um seek.
+-- Quem escreve nestas tabelas tem de correr com ANSI_NULLS e QUOTED_IDENTIFIER ON
+-- (por omissão no ODBC e no SSMS; nos SPs/triggers conta o valor da altura da criação).
+SET ANSI_NULLS ON;
+SET QUOTED_IDENTIFIER ON;
+GO
+
+IF OBJECT_ID('vw_ContagemPacientes', 'V') IS NULL
+    EXEC('CREATE VIEW vw_ContagemPacientes WITH SCHEMABINDING AS
+          SELECT ativo, COUNT_BIG(*) AS total FROM dbo.SGA_PACIENTE GROUP BY ativo');
+GO
+IF NOT EXISTS (SELECT name FROM sys.indexes WHERE name = N'IX_vw_ContagemPacientes' AND object_id = OBJECT_ID(N'vw_ContagemPacientes'))
+    CREATE UNIQUE CLUSTERED INDEX IX_vw_ContagemPacientes ON vw_ContagemPacientes (ativo);
+GO
+
+IF OBJECT_ID('vw_ContagemTrabalhadores', 'V') IS NULL
+    EXEC('CREATE VIEW vw_ContagemTrabalhadores WITH SCHEMABINDING AS
+          SELECT ativo, COUNT_BIG(*) AS total FROM dbo.SGA_TRABALHADOR GROUP BY ativo');
+GO
+IF NOT EXISTS (SELECT name FROM sys.indexes WHERE name = N'IX_vw_ContagemTrabalhadores' AND object_id = OBJECT_ID(N'vw_ContagemTrabalhadores'))
+    CREATE UNIQUE CLUSTERED INDEX IX_vw_ContagemTrabalhadores ON vw_ContagemTrabalhadores (ativo);
+GO
+
+-- Pacientes ativos por médico (o PK de SGA_VINCULO_CLINICO garante um vínculo por par)
+IF OBJECT_ID('vw_PacientesAtivosPorMedico', 'V') IS NULL
+    EXEC('CREATE VIEW vw_PacientesAtivosPorMedico WITH SCHEMABINDING AS
+          SELECT v.NIF_trabalhador, COUNT_BIG(*) AS total
+          FROM dbo.SGA_VINCULO_CLINICO v
+          JOIN dbo.SGA_PACIENTE p ON p.NIF = v.NIF_paciente
+          WHERE p.ativo = 1
+          GROUP BY v.NIF_trabalhador');
+GO
+IF NOT EXISTS (SELECT name FROM sys.indexes WHERE name = N'IX_vw_PacientesAtivosPorMedico' AND object_id = OBJECT_ID(N'vw_PacientesAtivosPorMedico'))
+    CREATE UNIQUE CLUSTERED INDEX IX_vw_PacientesAtivosPorMedico ON vw_PacientesAtivosPorMedico (NIF_trabalhador);
+GO
+
+-- Contagens de sp_obterMarcadorAlteracoes (ETag/delta da agenda, pedido a pedido): somar
+-- os poucos grupos de cada view é um seek, em vez de varrer as tabelas com COUNT_BIG(*).
+-- Os pacientes vêm de vw_ContagemPacientes.
+IF OBJECT_ID('vw_ContagemAtendimentos', 'V') IS NULL
+    EXEC('CREATE VIEW vw_ContagemAtendimentos WITH SCHEMABINDING AS
+          SELECT estado, COUNT_BIG(*) AS total FROM dbo.SGA_ATENDIMENTO GROUP BY estado');
+GO
+IF NOT EXISTS (SELECT name FROM sys.indexes WHERE name = N'IX_vw_ContagemAtendimentos' AND object_id = OBJECT_ID(N'vw_ContagemAtendimentos'))
+    CREATE UNIQUE CLUSTERED INDEX IX_vw_ContagemAtendimentos ON vw_ContagemAtendimentos (estado);
+GO
+
+IF OBJECT_ID('vw_ContagemVinculos', 'V') IS NULL
+    EXEC('CREATE VIEW vw_ContagemVinculos WITH SCHEMABINDING AS
+          SELECT tipo_vinculo, COUNT_BIG(*) AS total FROM dbo.SGA_VINCULO_CLINICO GROUP BY tipo_vinculo');
+GO
+IF NOT EXISTS (SELECT name FROM sys.indexes WHERE name = N'IX_vw_ContagemVinculos' AND object_id = OBJECT_ID(N'vw_ContagemVinculos'))
+    CREATE UNIQUE CLUSTERED INDEX IX_vw_ContagemVinculos ON vw_ContagemVinculos (tipo_vinculo);
+GO
+
+IF OBJECT_ID('vw_ContagemPacienteAtendimento', 'V') IS NULL
+    EXEC('CREATE VIEW vw_ContagemPacienteAtendimento WITH SCHEMABINDING AS
+          SELECT presenca, COUNT_BIG(*) AS total FROM dbo.SGA_PACIENTE_ATENDIMENTO GROUP BY presenca');
+GO
+IF NOT EXISTS (SELECT name FROM sys.indexes WHERE name = N'IX_vw_ContagemPacienteAtendimento' AND object_id = OBJECT_ID(N'vw_ContagemPacienteAtendimento'))
+    CREATE UNIQUE CLUSTERED INDEX IX_vw_ContagemPacienteAtendimento ON vw_ContagemPacienteAtendimento (presenca);
+GO
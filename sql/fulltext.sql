@@ -0,0 +1,23 @@
+-- Pesquisa de texto integral sobre SGA_RELATORIO.conteudo (sp_pesquisarRelatorios).
+-- Opcional: requer o componente Full-Text Search na instância. Sem ele o script não
+-- faz nada e a aplicação usa o índice invertido em memória (persistence/pesquisa.py).
+-- Executar depois de alteracoes.sql.
+
+IF FULLTEXTSERVICEPROPERTY('IsFullTextInstalled') = 1
+BEGIN
+    -- O índice full-text precisa de uma chave única com nome (a PK de SGA_RELATORIO não tem)
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = N'UX_Relatorio_Id' AND object_id = OBJECT_ID(N'SGA_RELATORIO'))
+        CREATE UNIQUE NONCLUSTERED INDEX UX_Relatorio_Id ON SGA_RELATORIO (id);
+
+    -- Sem distinção de acentos: a aplicação envia os termos já sem acentos
+    IF NOT EXISTS (SELECT 1 FROM sys.fulltext_catalogs WHERE name = N'SGA_CatalogoTexto')
+        CREATE FULLTEXT CATALOG SGA_CatalogoTexto WITH ACCENT_SENSITIVITY = OFF;
+
+    -- 2070 = Português (Portugal): stemming e palavras irrelevantes em português.
+    -- CHANGE_TRACKING AUTO mantém o índice atualizado a cada INSERT/UPDATE.
+    IF NOT EXISTS (SELECT 1 FROM sys.fulltext_indexes WHERE object_id = OBJECT_ID(N'SGA_RELATORIO'))
+        EXEC ('CREATE FULLTEXT INDEX ON SGA_RELATORIO (conteudo LANGUAGE 2070)
+               KEY INDEX UX_Relatorio_Id ON SGA_CatalogoTexto
+               WITH CHANGE_TRACKING AUTO');
+END
+GO
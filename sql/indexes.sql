@@ -6,14 +6,6 @@ BEGIN
 END
 GO
 
-IF NOT EXISTS (SELECT name FROM sys.indexes WHERE name = N'IX_Vinculo_Trabalhador' AND object_id = OBJECT_ID(N'SGA_VINCULO_CLINICO'))
-BEGIN
-    CREATE NONCLUSTERED INDEX IX_Vinculo_Trabalhador
-    ON SGA_VINCULO_CLINICO (NIF_trabalhador)
-    INCLUDE (NIF_paciente);
-END
-GO
-
 IF NOT EXISTS (SELECT name FROM sys.indexes WHERE name = N'IX_Trabalhador_NIF' AND object_id = OBJECT_ID(N'SGA_TRABALHADOR'))
 BEGIN
     CREATE NONCLUSTERED INDEX IX_Trabalhador_NIF
@@ -28,4 +20,106 @@ BEGIN
     ON SGA_PACIENTE (NIF)
     INCLUDE (id_paciente, ativo);
 END
-GO
\ No newline at end of file
+GO
+
+-- Listagens paginadas por nome (keyset) e pesquisa por prefixo do nome
+IF NOT EXISTS (SELECT name FROM sys.indexes WHERE name = N'IX_Pessoa_Nome' AND object_id = OBJECT_ID(N'SGA_PESSOA'))
+BEGIN
+    CREATE NONCLUSTERED INDEX IX_Pessoa_Nome
+    ON SGA_PESSOA (nome)
+    INCLUDE (telefone, email);
+END
+GO
+
+-- Sincronização incremental da agenda (WHERE versao > @desde). Requer sql/alteracoes.sql
+IF NOT EXISTS (SELECT name FROM sys.indexes WHERE name = N'IX_Atendimento_Versao' AND object_id = OBJECT_ID(N'SGA_ATENDIMENTO'))
+BEGIN
+    CREATE NONCLUSTERED INDEX IX_Atendimento_Versao
+    ON SGA_ATENDIMENTO (versao);
+END
+GO
+
+-- Ocupação das salas: sobreposição por sala = seek em (id_sala, data_inicio) numa janela de 1 dia
+IF NOT EXISTS (SELECT name FROM sys.indexes WHERE name = N'IX_Atendimento_Sala_Inicio' AND object_id = OBJECT_ID(N'SGA_ATENDIMENTO'))
+BEGIN
+    CREATE NONCLUSTERED INDEX IX_Atendimento_Sala_Inicio
+    ON SGA_ATENDIMENTO (id_sala, data_inicio)
+    INCLUDE (data_fim, estado);
+END
+GO
+
+-- Histórico de relatórios (sp_obterLivrariaRelatorios): seek por paciente/autor já na ordem da página
+IF NOT EXISTS (SELECT name FROM sys.indexes WHERE name = N'IX_Relatorio_Paciente_Autor_Data' AND object_id = OBJECT_ID(N'SGA_RELATORIO'))
+BEGIN
+    CREATE NONCLUSTERED INDEX IX_Relatorio_Paciente_Autor_Data
+    ON SGA_RELATORIO (id_paciente, id_autor, data_criacao DESC, id DESC)
+    INCLUDE (tipo_relatorio);
+END
+GO
+
+-- Delta do índice de pesquisa de pacientes (sp_listarPacientesIndiceAlterados: versao > @desde).
+-- Requer sql/alteracoes.sql
+IF NOT EXISTS (SELECT name FROM sys.indexes WHERE name = N'IX_Pessoa_Versao' AND object_id = OBJECT_ID(N'SGA_PESSOA'))
+BEGIN
+    CREATE NONCLUSTERED INDEX IX_Pessoa_Versao
+    ON SGA_PESSOA (versao);
+END
+GO
+
+IF NOT EXISTS (SELECT name FROM sys.indexes WHERE name = N'IX_Paciente_Versao' AND object_id = OBJECT_ID(N'SGA_PACIENTE'))
+BEGIN
+    CREATE NONCLUSTERED INDEX IX_Paciente_Versao
+    ON SGA_PACIENTE (versao);
+END
+GO
+
+IF NOT EXISTS (SELECT name FROM sys.indexes WHERE name = N'IX_Vinculo_Versao' AND object_id = OBJECT_ID(N'SGA_VINCULO_CLINICO'))
+BEGIN
+    CREATE NONCLUSTERED INDEX IX_Vinculo_Versao
+    ON SGA_VINCULO_CLINICO (versao);
+END
+GO
+
+-- Médico(s) de uma consulta: o PK é (id_trabalhador, num_atendimento). Usado pelos
+-- triggers e pela reconstrução de SGA_ESTATISTICA_DIARIA
+IF NOT EXISTS (SELECT name FROM sys.indexes WHERE name = N'IX_TrabalhadorAtendimento_Atendimento' AND object_id = OBJECT_ID(N'SGA_TRABALHADOR_ATENDIMENTO'))
+BEGIN
+    CREATE NONCLUSTERED INDEX IX_TrabalhadorAtendimento_Atendimento
+    ON SGA_TRABALHADOR_ATENDIMENTO (num_atendimento)
+    INCLUDE (id_trabalhador);
+END
+GO
+
+-- =============================================
+-- Pacote de índices pela carga dos procedimentos. Antes/depois com benchmarks/planos.py:
+-- --sem-pacote (só esta secção desligada; os índices acima ficam) e --comparar, cuja
+-- tabela (comparacao.txt: leituras lógicas e duração por procedimento) acompanha
+-- cada alteração a esta secção.
+-- =============================================
+
+-- Paciente de cada consulta: o PK é (id_paciente, num_atendimento), mas o calendário,
+-- as próximas consultas, os eventos alterados e a exportação chegam pela consulta
+IF NOT EXISTS (SELECT name FROM sys.indexes WHERE name = N'IX_PacienteAtendimento_Atendimento' AND object_id = OBJECT_ID(N'SGA_PACIENTE_ATENDIMENTO'))
+BEGIN
+    CREATE NONCLUSTERED INDEX IX_PacienteAtendimento_Atendimento
+    ON SGA_PACIENTE_ATENDIMENTO (num_atendimento)
+    INCLUDE (id_paciente, presenca);
+END
+GO
+
+-- Equipa de um paciente (sp_listarTrabalhadoresDePaciente, ficha, eliminação):
+-- o PK é (NIF_trabalhador, NIF_paciente)
+IF NOT EXISTS (SELECT name FROM sys.indexes WHERE name = N'IX_Vinculo_Paciente' AND object_id = OBJECT_ID(N'SGA_VINCULO_CLINICO'))
+BEGIN
+    CREATE NONCLUSTERED INDEX IX_Vinculo_Paciente
+    ON SGA_VINCULO_CLINICO (NIF_paciente)
+    INCLUDE (tipo_vinculo);
+END
+GO
+
+-- IX_Vinculo_Trabalhador repete o PK clustered (NIF_trabalhador, NIF_paciente): não
+-- serve nenhuma consulta que o PK não sirva e é mais uma escrita por vínculo (e por
+-- atualização de vw_PacientesAtivosPorMedico)
+IF EXISTS (SELECT name FROM sys.indexes WHERE name = N'IX_Vinculo_Trabalhador' AND object_id = OBJECT_ID(N'SGA_VINCULO_CLINICO'))
+    DROP INDEX IX_Vinculo_Trabalhador ON SGA_VINCULO_CLINICO;
+GO
@@ -0,0 +1,407 @@
+-- =============================================
+-- Esquema SGA para SQLite (DB_BACKEND=sqlite, ver persistence/sqlite.py)
+-- Equivalente a scripts/dml_script.sql + alteracoes.sql + indexes.sql + triggers.sql,
+-- aplicado automaticamente na primeira conexão (idempotente).
+--
+-- Diferenças em relação ao SQL Server:
+--   - IDENTITY -> INTEGER PRIMARY KEY AUTOINCREMENT (ultimo_id vem de sqlite_sequence)
+--   - ROWVERSION -> versao INTEGER preenchida pelos triggers trg_Versao_* a partir do
+--     contador global SGA_VERSAO (só há um escritor de cada vez, por isso não há
+--     transações em curso com versões abaixo da atual: versao_segura = versao)
+--   - Views indexadas de contagem -> SGA_CONTAGEM, mantida pelos mesmos triggers
+--   - DISABLE/ENABLE TRIGGER -> linha em SGA_TRIGGERS_DESLIGADOS
+--   - Datas guardadas como texto ISO 8601 ('YYYY-MM-DD' / 'YYYY-MM-DD HH:MM:SS[.ffffff]')
+-- =============================================
+
+CREATE TABLE IF NOT EXISTS SGA_PESSOA (
+    NIF CHAR(9) PRIMARY KEY,
+    nome VARCHAR(50) NOT NULL COLLATE NOCASE,
+    data_nascimento DATE NOT NULL,
+    telefone CHAR(9) NOT NULL,
+    email VARCHAR(100),
+    versao INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS SGA_TRABALHADOR (
+    id_trabalhador INTEGER PRIMARY KEY AUTOINCREMENT,
+    NIF CHAR(9) NOT NULL UNIQUE REFERENCES SGA_PESSOA (NIF),
+    senha_hash VARCHAR(255) NOT NULL,
+    tipo_perfil VARCHAR(20) NOT NULL CHECK (tipo_perfil IN ('colaborador', 'admin')),
+    cedula_profissional CHAR(5),
+    ativo BIT NOT NULL DEFAULT 1,
+    data_inicio DATE,
+    data_fim DATE,
+    versao INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS SGA_CONTRATADO (
+    id_trabalhador INTEGER PRIMARY KEY REFERENCES SGA_TRABALHADOR (id_trabalhador),
+    contrato_trabalho VARCHAR(20)
+);
+
+CREATE TABLE IF NOT EXISTS SGA_PRESTADOR_SERVICO (
+    id_trabalhador INTEGER PRIMARY KEY REFERENCES SGA_TRABALHADOR (id_trabalhador),
+    ordem VARCHAR(50),
+    remuneracao NUMERIC(10,2)
+);
+
+CREATE TABLE IF NOT EXISTS SGA_SALA (
+    id_sala INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome VARCHAR(50) NOT NULL,
+    is_online BIT NOT NULL DEFAULT 0,
+    ativa BIT NOT NULL DEFAULT 1,
+    id_dono INTEGER REFERENCES SGA_TRABALHADOR (id_trabalhador)
+);
+
+CREATE TABLE IF NOT EXISTS SGA_PACIENTE (
+    id_paciente INTEGER PRIMARY KEY AUTOINCREMENT,
+    NIF CHAR(9) NOT NULL UNIQUE REFERENCES SGA_PESSOA (NIF),
+    data_inscricao DATE NOT NULL DEFAULT (date('now', 'localtime')),
+    observacoes VARCHAR(250),
+    ativo BIT NOT NULL DEFAULT 1,
+    versao INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS SGA_VINCULO_CLINICO (
+    NIF_trabalhador CHAR(9) NOT NULL REFERENCES SGA_TRABALHADOR (NIF),
+    NIF_paciente CHAR(9) NOT NULL REFERENCES SGA_PACIENTE (NIF),
+    tipo_vinculo VARCHAR(50) DEFAULT 'Acompanhamento',
+    data_inicio DATETIME2 DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+    versao INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (NIF_trabalhador, NIF_paciente)
+);
+
+CREATE TABLE IF NOT EXISTS SGA_ATENDIMENTO (
+    num_atendimento INTEGER PRIMARY KEY AUTOINCREMENT,
+    data_inicio DATETIME2 NOT NULL,
+    data_fim DATETIME2 NOT NULL,
+    estado VARCHAR(20) CHECK (estado IN ('falta', 'finalizado', 'agendado', 'a decorrer', 'cancelado')),
+    id_sala INTEGER NOT NULL REFERENCES SGA_SALA (id_sala),
+    versao INTEGER NOT NULL DEFAULT 0,
+    CHECK (data_fim > data_inicio)
+);
+
+CREATE TABLE IF NOT EXISTS SGA_TRABALHADOR_ATENDIMENTO (
+    id_trabalhador INTEGER NOT NULL REFERENCES SGA_TRABALHADOR (id_trabalhador),
+    num_atendimento INTEGER NOT NULL REFERENCES SGA_ATENDIMENTO (num_atendimento),
+    versao INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_trabalhador, num_atendimento)
+);
+
+CREATE TABLE IF NOT EXISTS SGA_PACIENTE_ATENDIMENTO (
+    id_paciente INTEGER NOT NULL REFERENCES SGA_PACIENTE (id_paciente),
+    num_atendimento INTEGER NOT NULL REFERENCES SGA_ATENDIMENTO (num_atendimento),
+    observacoes VARCHAR(250),
+    presenca BIT DEFAULT 0,
+    versao INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_paciente, num_atendimento)
+);
+
+CREATE TABLE IF NOT EXISTS SGA_RELATORIO (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_paciente INTEGER NOT NULL REFERENCES SGA_PACIENTE (id_paciente),
+    id_autor INTEGER NOT NULL REFERENCES SGA_TRABALHADOR (id_trabalhador),
+    tipo_relatorio VARCHAR(50) DEFAULT 'Consulta',
+    data_criacao DATETIME2 DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+    conteudo TEXT,
+    versao INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS SGA_ESTATISTICA_DIARIA (
+    dia DATE NOT NULL,
+    id_trabalhador INTEGER NOT NULL,
+    consultas INTEGER NOT NULL DEFAULT 0,
+    online INTEGER NOT NULL DEFAULT 0,
+    presencial INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, id_trabalhador)
+);
+
+-- Contador global das colunas versao (equivalente a @@DBTS)
+CREATE TABLE IF NOT EXISTS SGA_VERSAO (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    valor INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO SGA_VERSAO (id, valor) VALUES (1, 0);
+
+-- Nº de linhas das tabelas usadas por sp_obterMarcadorAlteracoes (evita COUNT(*) por pedido)
+CREATE TABLE IF NOT EXISTS SGA_CONTAGEM (
+    tabela VARCHAR(50) PRIMARY KEY,
+    linhas INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO SGA_CONTAGEM (tabela, linhas) VALUES
+    ('SGA_ATENDIMENTO', 0), ('SGA_PACIENTE', 0),
+    ('SGA_VINCULO_CLINICO', 0), ('SGA_PACIENTE_ATENDIMENTO', 0);
+
+-- Triggers desligados com DISABLE TRIGGER (ex.: benchmarks/gerar_dados.py)
+CREATE TABLE IF NOT EXISTS SGA_TRIGGERS_DESLIGADOS (
+    nome VARCHAR(128) PRIMARY KEY
+);
+
+-- =============================================
+-- Índices (indexes.sql)
+-- =============================================
+CREATE INDEX IF NOT EXISTS IX_Atendimento_Data_Estado ON SGA_ATENDIMENTO (data_inicio, data_fim, estado);
+CREATE INDEX IF NOT EXISTS IX_Atendimento_Versao ON SGA_ATENDIMENTO (versao);
+CREATE INDEX IF NOT EXISTS IX_Atendimento_Sala_Inicio ON SGA_ATENDIMENTO (id_sala, data_inicio);
+CREATE INDEX IF NOT EXISTS IX_Pessoa_Nome ON SGA_PESSOA (nome);
+CREATE INDEX IF NOT EXISTS IX_Pessoa_Versao ON SGA_PESSOA (versao);
+CREATE INDEX IF NOT EXISTS IX_Paciente_Versao ON SGA_PACIENTE (versao);
+CREATE INDEX IF NOT EXISTS IX_Relatorio_Paciente_Autor_Data ON SGA_RELATORIO (id_paciente, id_autor, data_criacao DESC, id DESC);
+CREATE INDEX IF NOT EXISTS IX_Relatorio_Versao ON SGA_RELATORIO (versao);
+CREATE INDEX IF NOT EXISTS IX_Vinculo_Versao ON SGA_VINCULO_CLINICO (versao);
+CREATE INDEX IF NOT EXISTS IX_Vinculo_Paciente ON SGA_VINCULO_CLINICO (NIF_paciente);
+CREATE INDEX IF NOT EXISTS IX_TrabalhadorAtendimento_Atendimento ON SGA_TRABALHADOR_ATENDIMENTO (num_atendimento);
+CREATE INDEX IF NOT EXISTS IX_PacienteAtendimento_Atendimento ON SGA_PACIENTE_ATENDIMENTO (num_atendimento);
+
+-- =============================================
+-- Versões (ROWVERSION) e contagens
+-- Cada INSERT/UPDATE avança SGA_VERSAO e grava o novo valor na linha. O UPDATE feito
+-- pelo próprio trigger muda versao, por isso não volta a disparar o trigger de UPDATE.
+-- =============================================
+CREATE TRIGGER IF NOT EXISTS trg_Versao_SGA_PESSOA_Insert AFTER INSERT ON SGA_PESSOA
+BEGIN
+    UPDATE SGA_VERSAO SET valor = valor + 1;
+    UPDATE SGA_PESSOA SET versao = (SELECT valor FROM SGA_VERSAO) WHERE rowid = NEW.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_Versao_SGA_PESSOA_Update AFTER UPDATE ON SGA_PESSOA
+WHEN NEW.versao = OLD.versao
+BEGIN
+    UPDATE SGA_VERSAO SET valor = valor + 1;
+    UPDATE SGA_PESSOA SET versao = (SELECT valor FROM SGA_VERSAO) WHERE rowid = NEW.rowid;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_Versao_SGA_TRABALHADOR_Insert AFTER INSERT ON SGA_TRABALHADOR
+BEGIN
+    UPDATE SGA_VERSAO SET valor = valor + 1;
+    UPDATE SGA_TRABALHADOR SET versao = (SELECT valor FROM SGA_VERSAO) WHERE rowid = NEW.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_Versao_SGA_TRABALHADOR_Update AFTER UPDATE ON SGA_TRABALHADOR
+WHEN NEW.versao = OLD.versao
+BEGIN
+    UPDATE SGA_VERSAO SET valor = valor + 1;
+    UPDATE SGA_TRABALHADOR SET versao = (SELECT valor FROM SGA_VERSAO) WHERE rowid = NEW.rowid;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_Versao_SGA_PACIENTE_Insert AFTER INSERT ON SGA_PACIENTE
+BEGIN
+    UPDATE SGA_VERSAO SET valor = valor + 1;
+    UPDATE SGA_PACIENTE SET versao = (SELECT valor FROM SGA_VERSAO) WHERE rowid = NEW.rowid;
+    UPDATE SGA_CONTAGEM SET linhas = linhas + 1 WHERE tabela = 'SGA_PACIENTE';
+END;
+CREATE TRIGGER IF NOT EXISTS trg_Versao_SGA_PACIENTE_Update AFTER UPDATE ON SGA_PACIENTE
+WHEN NEW.versao = OLD.versao
+BEGIN
+    UPDATE SGA_VERSAO SET valor = valor + 1;
+    UPDATE SGA_PACIENTE SET versao = (SELECT valor FROM SGA_VERSAO) WHERE rowid = NEW.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_Contagem_SGA_PACIENTE_Delete AFTER DELETE ON SGA_PACIENTE
+BEGIN
+    UPDATE SGA_CONTAGEM SET linhas = linhas - 1 WHERE tabela = 'SGA_PACIENTE';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_Versao_SGA_VINCULO_CLINICO_Insert AFTER INSERT ON SGA_VINCULO_CLINICO
+BEGIN
+    UPDATE SGA_VERSAO SET valor = valor + 1;
+    UPDATE SGA_VINCULO_CLINICO SET versao = (SELECT valor FROM SGA_VERSAO) WHERE rowid = NEW.rowid;
+    UPDATE SGA_CONTAGEM SET linhas = linhas + 1 WHERE tabela = 'SGA_VINCULO_CLINICO';
+END;
+CREATE TRIGGER IF NOT EXISTS trg_Versao_SGA_VINCULO_CLINICO_Update AFTER UPDATE ON SGA_VINCULO_CLINICO
+WHEN NEW.versao = OLD.versao
+BEGIN
+    UPDATE SGA_VERSAO SET valor = valor + 1;
+    UPDATE SGA_VINCULO_CLINICO SET versao = (SELECT valor FROM SGA_VERSAO) WHERE rowid = NEW.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_Contagem_SGA_VINCULO_CLINICO_Delete AFTER DELETE ON SGA_VINCULO_CLINICO
+BEGIN
+    UPDATE SGA_CONTAGEM SET linhas = linhas - 1 WHERE tabela = 'SGA_VINCULO_CLINICO';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_Versao_SGA_ATENDIMENTO_Insert AFTER INSERT ON SGA_ATENDIMENTO
+BEGIN
+    UPDATE SGA_VERSAO SET valor = valor + 1;
+    UPDATE SGA_ATENDIMENTO SET versao = (SELECT valor FROM SGA_VERSAO) WHERE rowid = NEW.rowid;
+    UPDATE SGA_CONTAGEM SET linhas = linhas + 1 WHERE tabela = 'SGA_ATENDIMENTO';
+END;
+CREATE TRIGGER IF NOT EXISTS trg_Versao_SGA_ATENDIMENTO_Update AFTER UPDATE ON SGA_ATENDIMENTO
+WHEN NEW.versao = OLD.versao
+BEGIN
+    UPDATE SGA_VERSAO SET valor = valor + 1;
+    UPDATE SGA_ATENDIMENTO SET versao = (SELECT valor FROM SGA_VERSAO) WHERE rowid = NEW.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_Contagem_SGA_ATENDIMENTO_Delete AFTER DELETE ON SGA_ATENDIMENTO
+BEGIN
+    UPDATE SGA_CONTAGEM SET linhas = linhas - 1 WHERE tabela = 'SGA_ATENDIMENTO';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_Versao_SGA_TRABALHADOR_ATENDIMENTO_Insert AFTER INSERT ON SGA_TRABALHADOR_ATENDIMENTO
+BEGIN
+    UPDATE SGA_VERSAO SET valor = valor + 1;
+    UPDATE SGA_TRABALHADOR_ATENDIMENTO SET versao = (SELECT valor FROM SGA_VERSAO) WHERE rowid = NEW.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_Versao_SGA_TRABALHADOR_ATENDIMENTO_Update AFTER UPDATE ON SGA_TRABALHADOR_ATENDIMENTO
+WHEN NEW.versao = OLD.versao
+BEGIN
+    UPDATE SGA_VERSAO SET valor = valor + 1;
+    UPDATE SGA_TRABALHADOR_ATENDIMENTO SET versao = (SELECT valor FROM SGA_VERSAO) WHERE rowid = NEW.rowid;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_Versao_SGA_PACIENTE_ATENDIMENTO_Insert AFTER INSERT ON SGA_PACIENTE_ATENDIMENTO
+BEGIN
+    UPDATE SGA_VERSAO SET valor = valor + 1;
+    UPDATE SGA_PACIENTE_ATENDIMENTO SET versao = (SELECT valor FROM SGA_VERSAO) WHERE rowid = NEW.rowid;
+    UPDATE SGA_CONTAGEM SET linhas = linhas + 1 WHERE tabela = 'SGA_PACIENTE_ATENDIMENTO';
+END;
+CREATE TRIGGER IF NOT EXISTS trg_Versao_SGA_PACIENTE_ATENDIMENTO_Update AFTER UPDATE ON SGA_PACIENTE_ATENDIMENTO
+WHEN NEW.versao = OLD.versao
+BEGIN
+    UPDATE SGA_VERSAO SET valor = valor + 1;
+    UPDATE SGA_PACIENTE_ATENDIMENTO SET versao = (SELECT valor FROM SGA_VERSAO) WHERE rowid = NEW.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_Contagem_SGA_PACIENTE_ATENDIMENTO_Delete AFTER DELETE ON SGA_PACIENTE_ATENDIMENTO
+BEGIN
+    UPDATE SGA_CONTAGEM SET linhas = linhas - 1 WHERE tabela = 'SGA_PACIENTE_ATENDIMENTO';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_Versao_SGA_RELATORIO_Insert AFTER INSERT ON SGA_RELATORIO
+BEGIN
+    UPDATE SGA_VERSAO SET valor = valor + 1;
+    UPDATE SGA_RELATORIO SET versao = (SELECT valor FROM SGA_VERSAO) WHERE rowid = NEW.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_Versao_SGA_RELATORIO_Update AFTER UPDATE ON SGA_RELATORIO
+WHEN NEW.versao = OLD.versao
+BEGIN
+    UPDATE SGA_VERSAO SET valor = valor + 1;
+    UPDATE SGA_RELATORIO SET versao = (SELECT valor FROM SGA_VERSAO) WHERE rowid = NEW.rowid;
+END;
+
+-- =============================================
+-- triggers.sql
+-- =============================================
+CREATE TRIGGER IF NOT EXISTS trg_DesativarTrabalhador AFTER UPDATE OF ativo ON SGA_TRABALHADOR
+WHEN OLD.ativo = 1 AND NEW.ativo = 0 AND NEW.data_fim IS NULL
+BEGIN
+    UPDATE SGA_TRABALHADOR SET data_fim = date('now', 'localtime') WHERE id_trabalhador = NEW.id_trabalhador;
+END;
+
+-- SGA_ESTATISTICA_DIARIA: -1 pelo estado antigo e +1 pelo novo de cada consulta não
+-- cancelada, no total do dia (id_trabalhador = 0) e nos médicos já ligados; a ligação
+-- a um médico conta com o estado atual da consulta (mesmas regras que triggers.sql).
+CREATE TRIGGER IF NOT EXISTS trg_EstatisticaAtendimento_Insert AFTER INSERT ON SGA_ATENDIMENTO
+WHEN NOT EXISTS (SELECT 1 FROM SGA_TRIGGERS_DESLIGADOS WHERE nome = 'trg_EstatisticaAtendimento')
+BEGIN
+    INSERT INTO SGA_ESTATISTICA_DIARIA (dia, id_trabalhador, consultas, online, presencial)
+    SELECT date(NEW.data_inicio), m.id_trabalhador, 1,
+           CASE WHEN s.is_online = 1 THEN 1 ELSE 0 END, CASE WHEN s.is_online = 0 THEN 1 ELSE 0 END
+    FROM (SELECT 0 AS id_trabalhador
+          UNION ALL
+          SELECT id_trabalhador FROM SGA_TRABALHADOR_ATENDIMENTO WHERE num_atendimento = NEW.num_atendimento) m
+    JOIN SGA_SALA s ON s.id_sala = NEW.id_sala
+    WHERE NEW.estado != 'cancelado'
+    ON CONFLICT (dia, id_trabalhador) DO UPDATE SET
+        consultas = consultas + excluded.consultas,
+        online = online + excluded.online,
+        presencial = presencial + excluded.presencial;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_EstatisticaAtendimento_Update AFTER UPDATE OF data_inicio, estado, id_sala ON SGA_ATENDIMENTO
+WHEN NOT EXISTS (SELECT 1 FROM SGA_TRIGGERS_DESLIGADOS WHERE nome = 'trg_EstatisticaAtendimento')
+BEGIN
+    INSERT INTO SGA_ESTATISTICA_DIARIA (dia, id_trabalhador, consultas, online, presencial)
+    SELECT date(OLD.data_inicio), m.id_trabalhador, -1,
+           CASE WHEN s.is_online = 1 THEN -1 ELSE 0 END, CASE WHEN s.is_online = 0 THEN -1 ELSE 0 END
+    FROM (SELECT 0 AS id_trabalhador
+          UNION ALL
+          SELECT id_trabalhador FROM SGA_TRABALHADOR_ATENDIMENTO WHERE num_atendimento = OLD.num_atendimento) m
+    JOIN SGA_SALA s ON s.id_sala = OLD.id_sala
+    WHERE OLD.estado != 'cancelado'
+    ON CONFLICT (dia, id_trabalhador) DO UPDATE SET
+        consultas = consultas + excluded.consultas,
+        online = online + excluded.online,
+        presencial = presencial + excluded.presencial;
+
+    INSERT INTO SGA_ESTATISTICA_DIARIA (dia, id_trabalhador, consultas, online, presencial)
+    SELECT date(NEW.data_inicio), m.id_trabalhador, 1,
+           CASE WHEN s.is_online = 1 THEN 1 ELSE 0 END, CASE WHEN s.is_online = 0 THEN 1 ELSE 0 END
+    FROM (SELECT 0 AS id_trabalhador
+          UNION ALL
+          SELECT id_trabalhador FROM SGA_TRABALHADOR_ATENDIMENTO WHERE num_atendimento = NEW.num_atendimento) m
+    JOIN SGA_SALA s ON s.id_sala = NEW.id_sala
+    WHERE NEW.estado != 'cancelado'
+    ON CONFLICT (dia, id_trabalhador) DO UPDATE SET
+        consultas = consultas + excluded.consultas,
+        online = online + excluded.online,
+        presencial = presencial + excluded.presencial;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_EstatisticaAtendimento_Delete AFTER DELETE ON SGA_ATENDIMENTO
+WHEN NOT EXISTS (SELECT 1 FROM SGA_TRIGGERS_DESLIGADOS WHERE nome = 'trg_EstatisticaAtendimento')
+BEGIN
+    INSERT INTO SGA_ESTATISTICA_DIARIA (dia, id_trabalhador, consultas, online, presencial)
+    SELECT date(OLD.data_inicio), m.id_trabalhador, -1,
+           CASE WHEN s.is_online = 1 THEN -1 ELSE 0 END, CASE WHEN s.is_online = 0 THEN -1 ELSE 0 END
+    FROM (SELECT 0 AS id_trabalhador
+          UNION ALL
+          SELECT id_trabalhador FROM SGA_TRABALHADOR_ATENDIMENTO WHERE num_atendimento = OLD.num_atendimento) m
+    JOIN SGA_SALA s ON s.id_sala = OLD.id_sala
+    WHERE OLD.estado != 'cancelado'
+    ON CONFLICT (dia, id_trabalhador) DO UPDATE SET
+        consultas = consultas + excluded.consultas,
+        online = online + excluded.online,
+        presencial = presencial + excluded.presencial;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_EstatisticaTrabalhadorAtendimento_Insert AFTER INSERT ON SGA_TRABALHADOR_ATENDIMENTO
+WHEN NOT EXISTS (SELECT 1 FROM SGA_TRIGGERS_DESLIGADOS WHERE nome = 'trg_EstatisticaTrabalhadorAtendimento')
+BEGIN
+    INSERT INTO SGA_ESTATISTICA_DIARIA (dia, id_trabalhador, consultas, online, presencial)
+    SELECT date(a.data_inicio), NEW.id_trabalhador, 1,
+           CASE WHEN s.is_online = 1 THEN 1 ELSE 0 END, CASE WHEN s.is_online = 0 THEN 1 ELSE 0 END
+    FROM SGA_ATENDIMENTO a
+    JOIN SGA_SALA s ON s.id_sala = a.id_sala
+    WHERE a.num_atendimento = NEW.num_atendimento AND a.estado != 'cancelado'
+    ON CONFLICT (dia, id_trabalhador) DO UPDATE SET
+        consultas = consultas + excluded.consultas,
+        online = online + excluded.online,
+        presencial = presencial + excluded.presencial;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_EstatisticaTrabalhadorAtendimento_Update AFTER UPDATE OF id_trabalhador, num_atendimento ON SGA_TRABALHADOR_ATENDIMENTO
+WHEN NOT EXISTS (SELECT 1 FROM SGA_TRIGGERS_DESLIGADOS WHERE nome = 'trg_EstatisticaTrabalhadorAtendimento')
+BEGIN
+    INSERT INTO SGA_ESTATISTICA_DIARIA (dia, id_trabalhador, consultas, online, presencial)
+    SELECT date(a.data_inicio), OLD.id_trabalhador, -1,
+           CASE WHEN s.is_online = 1 THEN -1 ELSE 0 END, CASE WHEN s.is_online = 0 THEN -1 ELSE 0 END
+    FROM SGA_ATENDIMENTO a
+    JOIN SGA_SALA s ON s.id_sala = a.id_sala
+    WHERE a.num_atendimento = OLD.num_atendimento AND a.estado != 'cancelado'
+    ON CONFLICT (dia, id_trabalhador) DO UPDATE SET
+        consultas = consultas + excluded.consultas,
+        online = online + excluded.online,
+        presencial = presencial + excluded.presencial;
+
+    INSERT INTO SGA_ESTATISTICA_DIARIA (dia, id_trabalhador, consultas, online, presencial)
+    SELECT date(a.data_inicio), NEW.id_trabalhador, 1,
+           CASE WHEN s.is_online = 1 THEN 1 ELSE 0 END, CASE WHEN s.is_online = 0 THEN 1 ELSE 0 END
+    FROM SGA_ATENDIMENTO a
+    JOIN SGA_SALA s ON s.id_sala = a.id_sala
+    WHERE a.num_atendimento = NEW.num_atendimento AND a.estado != 'cancelado'
+    ON CONFLICT (dia, id_trabalhador) DO UPDATE SET
+        consultas = consultas + excluded.consultas,
+        online = online + excluded.online,
+        presencial = presencial + excluded.presencial;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_EstatisticaTrabalhadorAtendimento_Delete AFTER DELETE ON SGA_TRABALHADOR_ATENDIMENTO
+WHEN NOT EXISTS (SELECT 1 FROM SGA_TRIGGERS_DESLIGADOS WHERE nome = 'trg_EstatisticaTrabalhadorAtendimento')
+BEGIN
+    INSERT INTO SGA_ESTATISTICA_DIARIA (dia, id_trabalhador, consultas, online, presencial)
+    SELECT date(a.data_inicio), OLD.id_trabalhador, -1,
+           CASE WHEN s.is_online = 1 THEN -1 ELSE 0 END, CASE WHEN s.is_online = 0 THEN -1 ELSE 0 END
+    FROM SGA_ATENDIMENTO a
+    JOIN SGA_SALA s ON s.id_sala = a.id_sala
+    WHERE a.num_atendimento = OLD.num_atendimento AND a.estado != 'cancelado'
+    ON CONFLICT (dia, id_trabalhador) DO UPDATE SET
+        consultas = consultas + excluded.consultas,
+        online = online + excluded.online,
+        presencial = presencial + excluded.presencial;
+END;
@@ -24,6 +24,17 @@ BEGIN
 END
 GO
 
+CREATE OR ALTER PROCEDURE sp_atualizarSenhaTrabalhador
+    @id_trabalhador INT,
+    @senha_hash VARCHAR(255)
+AS
+BEGIN
+    SET NOCOUNT ON;
+    -- Usada no login para converter hashes SHA-256 antigos para scrypt
+    UPDATE SGA_TRABALHADOR SET senha_hash = @senha_hash WHERE id_trabalhador = @id_trabalhador;
+END
+GO
+
 CREATE OR ALTER PROCEDURE sp_guardarPessoa
     @NIF CHAR(9),
     @nome VARCHAR(50),
@@ -59,6 +70,8 @@ GO
 -- 2. DASHBOARD E ESTATÍSTICAS
 -- =============================================
 
+-- Contadores do dashboard por leitura direta (seek): views indexadas de alteracoes.sql
+-- e SGA_ESTATISTICA_DIARIA (mantida pelos triggers de triggers.sql).
 CREATE OR ALTER PROCEDURE sp_ObterDashboardTotais
     @id_trabalhador INT,
     @perfil VARCHAR(20)
@@ -66,47 +79,37 @@ AS
 BEGIN
     SET NOCOUNT ON;
 
-    DECLARE @TotalPacientes INT;
-    DECLARE @TotalEquipa INT = dbo.udf_ContarEquipaAtiva();
+    DECLARE @hoje DATE = CAST(GETDATE() AS DATE);
+    DECLARE @TotalPacientes BIGINT;
+    DECLARE @TotalEquipa BIGINT = (SELECT total FROM vw_ContagemTrabalhadores WITH (NOEXPAND) WHERE ativo = 1);
     DECLARE @ConsultasHoje INT;
 
     IF @perfil = 'admin'
     BEGIN
-        SELECT @TotalPacientes = COUNT(*) FROM SGA_PACIENTE WHERE ativo = 1;
+        SELECT @TotalPacientes = total FROM vw_ContagemPacientes WITH (NOEXPAND) WHERE ativo = 1;
+
+        SELECT @ConsultasHoje = consultas
+        FROM SGA_ESTATISTICA_DIARIA
+        WHERE dia = @hoje AND id_trabalhador = 0;
     END
     ELSE
     BEGIN
         DECLARE @NifMedico CHAR(9);
         SELECT @NifMedico = NIF FROM SGA_TRABALHADOR WHERE id_trabalhador = @id_trabalhador;
 
-        SELECT @TotalPacientes = COUNT(DISTINCT v.NIF_paciente)
-        FROM SGA_VINCULO_CLINICO v
-        JOIN SGA_PACIENTE p ON v.NIF_paciente = p.NIF
-        WHERE v.NIF_trabalhador = @NifMedico
-          AND p.ativo = 1; 
-    END
+        SELECT @TotalPacientes = total
+        FROM vw_PacientesAtivosPorMedico WITH (NOEXPAND)
+        WHERE NIF_trabalhador = @NifMedico;
 
-    IF @perfil = 'admin'
-    BEGIN
-        SELECT @ConsultasHoje = COUNT(*) 
-        FROM SGA_ATENDIMENTO 
-        WHERE CAST(data_inicio AS DATE) = CAST(GETDATE() AS DATE)
-          AND estado != 'cancelado';
-    END
-    ELSE
-    BEGIN
-        SELECT @ConsultasHoje = COUNT(*) 
-        FROM SGA_ATENDIMENTO a
-        JOIN SGA_TRABALHADOR_ATENDIMENTO ta ON a.num_atendimento = ta.num_atendimento
-        WHERE ta.id_trabalhador = @id_trabalhador
-          AND CAST(a.data_inicio AS DATE) = CAST(GETDATE() AS DATE)
-          AND a.estado != 'cancelado';
+        SELECT @ConsultasHoje = consultas
+        FROM SGA_ESTATISTICA_DIARIA
+        WHERE dia = @hoje AND id_trabalhador = @id_trabalhador;
     END
 
     SELECT 
-        @TotalPacientes AS TotalPacientes, 
-        @TotalEquipa AS TotalEquipa, 
-        @ConsultasHoje AS ConsultasHoje;
+        CAST(ISNULL(@TotalPacientes, 0) AS INT) AS TotalPacientes, 
+        CAST(ISNULL(@TotalEquipa, 0) AS INT) AS TotalEquipa, 
+        ISNULL(@ConsultasHoje, 0) AS ConsultasHoje;
 END
 GO
 
@@ -138,27 +141,47 @@ BEGIN
 END
 GO
 
+-- Salas físicas ativas sem consulta (não cancelada) a decorrer neste momento, pelo horário
+-- das marcações e não pelo estado 'a decorrer' (que depende de alguém o atualizar).
 CREATE OR ALTER PROCEDURE sp_contarSalasLivresAgora
 AS
 BEGIN
     SET NOCOUNT ON;
-    
-    DECLARE @TotalSalasFisicas INT;
-    DECLARE @SalasOcupadasAgora INT;
 
-    SELECT @TotalSalasFisicas = COUNT(*) FROM SGA_SALA WHERE is_online = 0 AND ativa = 1;
+    DECLARE @agora DATETIME2 = SYSDATETIME();
 
-    SELECT @SalasOcupadasAgora = COUNT(DISTINCT a.id_sala)
-    FROM SGA_ATENDIMENTO a
-    JOIN SGA_SALA s ON a.id_sala = s.id_sala
-    WHERE s.is_online = 0 
-      AND a.estado = 'a decorrer' 
-      AND a.estado != 'cancelado';
-
-    SELECT CASE 
-        WHEN (@TotalSalasFisicas - @SalasOcupadasAgora) < 0 THEN 0 
-        ELSE (@TotalSalasFisicas - @SalasOcupadasAgora) 
-    END AS salas_livres;
+    SELECT COUNT(*) AS salas_livres
+    FROM dbo.udf_SalasLivres(@agora, DATEADD(SECOND, 1, @agora));
+END
+GO
+
+-- Ocupação das salas físicas ativas num dia: uma linha por consulta (ou uma linha
+-- com datas NULL para salas sem consultas), ordenada por sala e hora.
+CREATE OR ALTER PROCEDURE sp_obterOcupacaoSalasDia
+    @dia DATE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @inicio DATETIME2 = CAST(@dia AS DATETIME2);
+    DECLARE @fim DATETIME2 = DATEADD(DAY, 1, @inicio);
+
+    SELECT
+        s.id_sala,
+        s.nome,
+        s.id_dono,
+        a.num_atendimento,
+        a.data_inicio,
+        a.data_fim
+    FROM SGA_SALA s
+    LEFT JOIN SGA_ATENDIMENTO a
+        ON a.id_sala = s.id_sala
+       AND a.estado != 'cancelado'
+       AND a.data_inicio >= DATEADD(DAY, -1, @inicio)
+       AND a.data_inicio < @fim
+       AND a.data_fim > @inicio
+    WHERE s.is_online = 0 AND s.ativa = 1
+    ORDER BY s.id_sala, a.data_inicio;
 END
 GO
 
@@ -166,14 +189,121 @@ CREATE OR ALTER PROC sp_countConsultasHoje
 AS
 BEGIN
     SET NOCOUNT ON;
+    -- Agregado sobre (no máximo) uma linha: devolve sempre uma linha, com zeros se não houver consultas
     SELECT 
-        COUNT(*) AS total,
-        SUM(CASE WHEN s.is_online = 1 THEN 1 ELSE 0 END) AS online,
-        SUM(CASE WHEN s.is_online = 0 THEN 1 ELSE 0 END) AS presencial
-    FROM SGA_ATENDIMENTO a
-    JOIN SGA_SALA s ON a.id_sala = s.id_sala
-    WHERE CAST(a.data_inicio AS DATE) = CAST(GETDATE() AS DATE)
-      AND a.estado != 'cancelado';
+        ISNULL(SUM(consultas), 0) AS total,
+        ISNULL(SUM(online), 0) AS online,
+        ISNULL(SUM(presencial), 0) AS presencial
+    FROM SGA_ESTATISTICA_DIARIA
+    WHERE dia = CAST(GETDATE() AS DATE)
+      AND id_trabalhador = 0;
+END
+GO
+
+-- Aplica a SGA_ESTATISTICA_DIARIA os deltas em #DeltaEstatistica (dia, id_trabalhador,
+-- consultas, online, presencial), preenchida pelos triggers de triggers.sql.
+-- UPDLOCK + SERIALIZABLE: duas marcações em simultâneo no mesmo dia não tentam ambas
+-- inserir a linha (dia, médico) que ainda não existe.
+CREATE OR ALTER PROCEDURE sp_aplicarDeltaEstatistica
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    UPDATE e
+    SET consultas = e.consultas + d.consultas,
+        online = e.online + d.online,
+        presencial = e.presencial + d.presencial
+    FROM SGA_ESTATISTICA_DIARIA e WITH (UPDLOCK, SERIALIZABLE)
+    JOIN #DeltaEstatistica d ON d.dia = e.dia AND d.id_trabalhador = e.id_trabalhador;
+
+    INSERT INTO SGA_ESTATISTICA_DIARIA (dia, id_trabalhador, consultas, online, presencial)
+    SELECT d.dia, d.id_trabalhador, d.consultas, d.online, d.presencial
+    FROM #DeltaEstatistica d
+    WHERE NOT EXISTS (
+        SELECT 1 FROM SGA_ESTATISTICA_DIARIA e WITH (UPDLOCK, SERIALIZABLE)
+        WHERE e.dia = d.dia AND e.id_trabalhador = d.id_trabalhador
+    );
+END
+GO
+
+-- Recalcula SGA_ESTATISTICA_DIARIA a partir de SGA_ATENDIMENTO (entre @desde e @ate,
+-- inclusive; NULL = sem limite) e devolve as linhas que divergiam da tabela
+-- (dia, id_trabalhador, consultas/online/presencial esperados e guardados).
+-- Com @reparar = 1 substitui as linhas do intervalo pelos valores recalculados.
+-- Lê as consultas com TABLOCK + HOLDLOCK até ao fim: as marcações em curso esperam
+-- (nenhuma fica de fora da comparação nem é contada duas vezes); correr fora de horas
+-- ou por intervalos.
+CREATE OR ALTER PROCEDURE sp_reconstruirEstatisticaDiaria
+    @desde DATE = NULL,
+    @ate DATE = NULL,
+    @reparar BIT = 1
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @inicio DATETIME2 = CAST(ISNULL(@desde, '0001-01-01') AS DATETIME2);
+    DECLARE @fim DATETIME2 = CASE WHEN @ate IS NULL THEN '9999-12-31' ELSE DATEADD(DAY, 1, CAST(@ate AS DATETIME2)) END;
+
+    CREATE TABLE #Esperado (
+        dia DATE, id_trabalhador INT, consultas INT, online INT, presencial INT,
+        PRIMARY KEY (dia, id_trabalhador)
+    );
+
+    BEGIN TRAN;
+
+    INSERT INTO #Esperado (dia, id_trabalhador, consultas, online, presencial)
+    SELECT
+        x.dia,
+        x.id_trabalhador,
+        COUNT(*),
+        SUM(CASE WHEN x.is_online = 1 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN x.is_online = 0 THEN 1 ELSE 0 END)
+    FROM (
+        SELECT CAST(a.data_inicio AS DATE) AS dia, 0 AS id_trabalhador, s.is_online
+        FROM SGA_ATENDIMENTO a WITH (TABLOCK, HOLDLOCK)
+        JOIN SGA_SALA s ON s.id_sala = a.id_sala
+        WHERE a.estado != 'cancelado'
+          AND a.data_inicio >= @inicio AND a.data_inicio < @fim
+        UNION ALL
+        SELECT CAST(a.data_inicio AS DATE), ta.id_trabalhador, s.is_online
+        FROM SGA_ATENDIMENTO a WITH (TABLOCK, HOLDLOCK)
+        JOIN SGA_TRABALHADOR_ATENDIMENTO ta WITH (TABLOCK, HOLDLOCK) ON ta.num_atendimento = a.num_atendimento
+        JOIN SGA_SALA s ON s.id_sala = a.id_sala
+        WHERE a.estado != 'cancelado'
+          AND a.data_inicio >= @inicio AND a.data_inicio < @fim
+    ) x
+    GROUP BY x.dia, x.id_trabalhador;
+
+    SELECT
+        COALESCE(n.dia, e.dia) AS dia,
+        COALESCE(n.id_trabalhador, e.id_trabalhador) AS id_trabalhador,
+        ISNULL(n.consultas, 0) AS consultas_esperadas,
+        ISNULL(e.consultas, 0) AS consultas_guardadas,
+        ISNULL(n.online, 0) AS online_esperadas,
+        ISNULL(e.online, 0) AS online_guardadas,
+        ISNULL(n.presencial, 0) AS presencial_esperadas,
+        ISNULL(e.presencial, 0) AS presencial_guardadas
+    FROM #Esperado n
+    FULL JOIN (
+        SELECT * FROM SGA_ESTATISTICA_DIARIA WITH (UPDLOCK, HOLDLOCK)
+        WHERE dia >= CAST(@inicio AS DATE) AND dia < CAST(@fim AS DATE)
+    ) e ON e.dia = n.dia AND e.id_trabalhador = n.id_trabalhador
+    WHERE ISNULL(n.consultas, 0) != ISNULL(e.consultas, 0)
+       OR ISNULL(n.online, 0) != ISNULL(e.online, 0)
+       OR ISNULL(n.presencial, 0) != ISNULL(e.presencial, 0)
+    ORDER BY 1, 2;
+
+    IF @reparar = 1
+    BEGIN
+        DELETE FROM SGA_ESTATISTICA_DIARIA
+        WHERE dia >= CAST(@inicio AS DATE) AND dia < CAST(@fim AS DATE);
+
+        INSERT INTO SGA_ESTATISTICA_DIARIA (dia, id_trabalhador, consultas, online, presencial)
+        SELECT dia, id_trabalhador, consultas, online, presencial FROM #Esperado;
+    END
+
+    COMMIT TRAN;
 END
 GO
 
@@ -186,42 +316,146 @@ CREATE OR ALTER PROCEDURE sp_ObterHorariosLivres
     @data_consulta DATE,
     @is_online BIT = 0,
     @duracao INT = 60,
-    @id_atendimento_ignorar INT = NULL
+    @id_atendimento_ignorar INT = NULL,
+    @granularidade INT = 60
 AS
 BEGIN
     SET NOCOUNT ON;
 
-    DECLARE @HoraInicio TIME = '09:00';
-    DECLARE @HoraFim TIME = '18:00';
-    
-    CREATE TABLE #Slots (Hora TIME);
+    -- Grelha de 15, 30 ou 60 minutos entre as 09:00 e as 18:00 (pausa 13:00-14:00)
+    IF @granularidade NOT IN (15, 30, 60) SET @granularidade = 60;
 
-    DECLARE @HoraAtual TIME = @HoraInicio;
-    WHILE @HoraAtual < @HoraFim
+    -- Só dias úteis, como sp_ObterHorariosLivresLote (1900-01-01 foi segunda-feira)
+    IF DATEDIFF(DAY, '19000101', @data_consulta) % 7 >= 5
     BEGIN
-        IF @HoraAtual != '13:00' INSERT INTO #Slots VALUES (@HoraAtual);
-        SET @HoraAtual = DATEADD(MINUTE, 60, @HoraAtual);
+        SELECT CAST(NULL AS CHAR(5)) AS Hora WHERE 1 = 0;
+        RETURN;
     END
 
-    -- REFACTOR: Uso da UDF udf_VerificarColisaoMedico para limpar o código
-    SELECT LEFT(CAST(s.Hora AS VARCHAR), 5) AS Hora
-    FROM #Slots s
+    DECLARE @dia DATETIME2 = CAST(@data_consulta AS DATETIME2);
+    DECLARE @dia_seguinte DATETIME2 = DATEADD(DAY, 1, @dia);
+
+    -- REFACTOR: Set-based. Uma única leitura das consultas do médico nesse dia,
+    -- em vez de chamar udf_VerificarColisaoMedico uma vez por slot.
+    DECLARE @Ocupado TABLE (data_inicio DATETIME2, data_fim DATETIME2);
+
+    INSERT INTO @Ocupado (data_inicio, data_fim)
+    SELECT a.data_inicio, a.data_fim
+    FROM SGA_TRABALHADOR_ATENDIMENTO ta
+    JOIN SGA_ATENDIMENTO a ON ta.num_atendimento = a.num_atendimento
+    WHERE ta.id_trabalhador = @id_medico
+      AND a.estado != 'cancelado'
+      AND (@id_atendimento_ignorar IS NULL OR a.num_atendimento != @id_atendimento_ignorar)
+      AND a.data_inicio >= DATEADD(DAY, -1, @dia)
+      AND a.data_inicio < @dia_seguinte
+      AND a.data_fim > @dia;
+
+    -- 0..35 completos e filtrados: TOP sem ORDER BY não garante quais os números devolvidos
+    WITH Numeros AS (
+        SELECT ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) - 1 AS n
+        FROM (VALUES (0),(0),(0),(0),(0),(0)) x(v)
+        CROSS JOIN (VALUES (0),(0),(0),(0),(0),(0)) y(v)
+    ),
+    Grelha AS (
+        SELECT 540 + n * @granularidade AS minuto
+        FROM Numeros
+        WHERE n < 540 / @granularidade
+    )
+    SELECT CONVERT(CHAR(5), DATEADD(MINUTE, g.minuto, CAST('00:00' AS TIME)), 108) AS Hora
+    FROM Grelha g
     WHERE 
         (
-            (s.Hora >= '09:00' AND DATEADD(MINUTE, @duracao, s.Hora) <= '13:00')
+            (g.minuto >= 540 AND g.minuto + @duracao <= 780)
             OR
-            (s.Hora >= '14:00' AND DATEADD(MINUTE, @duracao, s.Hora) <= '18:00')
+            (g.minuto >= 840 AND g.minuto + @duracao <= 1080)
+        )
+        AND NOT EXISTS (
+            SELECT 1 FROM @Ocupado o
+            WHERE o.data_inicio < DATEADD(MINUTE, g.minuto + @duracao, @dia)
+              AND o.data_fim > DATEADD(MINUTE, g.minuto, @dia)
         )
-        AND
-        -- Chama a nova função (retorna 0 se livre, 1 se ocupado)
-        dbo.udf_VerificarColisaoMedico(
-            @id_medico, 
-            CAST(CAST(@data_consulta AS VARCHAR) + ' ' + CAST(s.Hora AS VARCHAR) AS DATETIME2),
-            @duracao,
-            @id_atendimento_ignorar
-        ) = 0;
-
-    DROP TABLE #Slots;
+    ORDER BY g.minuto;
+END
+GO
+
+CREATE OR ALTER PROCEDURE sp_ObterHorariosLivresLote
+    @ids_medicos VARCHAR(MAX) = NULL, -- '1,2,3'; NULL = todos os médicos ativos
+    @data_inicio DATE,
+    @data_fim DATE,                   -- inclusive
+    @is_online BIT = 0,
+    @duracao INT = 60,
+    @granularidade INT = 60
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    IF @granularidade NOT IN (15, 30, 60) SET @granularidade = 60;
+    -- Limite de segurança: no máximo 31 dias por pedido
+    IF DATEDIFF(DAY, @data_inicio, @data_fim) > 30 SET @data_fim = DATEADD(DAY, 30, @data_inicio);
+
+    DECLARE @inicio DATETIME2 = CAST(@data_inicio AS DATETIME2);
+    DECLARE @fim DATETIME2 = DATEADD(DAY, 1, CAST(@data_fim AS DATETIME2));
+
+    DECLARE @Medicos TABLE (id_medico INT PRIMARY KEY);
+    IF @ids_medicos IS NULL
+        INSERT INTO @Medicos SELECT id_trabalhador FROM SGA_TRABALHADOR WHERE ativo = 1;
+    ELSE
+        INSERT INTO @Medicos
+        SELECT DISTINCT TRY_CAST(value AS INT) FROM STRING_SPLIT(@ids_medicos, ',')
+        WHERE TRY_CAST(value AS INT) IS NOT NULL;
+
+    -- Uma única leitura das consultas de todos os médicos no intervalo
+    DECLARE @Ocupado TABLE (id_medico INT, data_inicio DATETIME2, data_fim DATETIME2);
+
+    INSERT INTO @Ocupado (id_medico, data_inicio, data_fim)
+    SELECT ta.id_trabalhador, a.data_inicio, a.data_fim
+    FROM @Medicos m
+    JOIN SGA_TRABALHADOR_ATENDIMENTO ta ON ta.id_trabalhador = m.id_medico
+    JOIN SGA_ATENDIMENTO a ON ta.num_atendimento = a.num_atendimento
+    WHERE a.estado != 'cancelado'
+      AND a.data_inicio >= DATEADD(DAY, -1, @inicio)
+      AND a.data_inicio < @fim
+      AND a.data_fim > @inicio;
+
+    -- 0..48, filtrados em Dias e Grelha (sem TOP: sem ORDER BY não garante quais os números)
+    WITH Numeros AS (
+        SELECT ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) - 1 AS n
+        FROM (VALUES (0),(0),(0),(0),(0),(0),(0)) x(v)
+        CROSS JOIN (VALUES (0),(0),(0),(0),(0),(0),(0)) y(v)
+    ),
+    Dias AS (
+        -- Dias úteis do intervalo (1900-01-01 foi segunda-feira)
+        SELECT DATEADD(DAY, n, @data_inicio) AS dia
+        FROM Numeros
+        WHERE n <= DATEDIFF(DAY, @data_inicio, @data_fim)
+          AND DATEDIFF(DAY, '19000101', DATEADD(DAY, n, @data_inicio)) % 7 < 5
+    ),
+    Grelha AS (
+        SELECT 540 + n * @granularidade AS minuto
+        FROM Numeros
+        WHERE n < 540 / @granularidade
+    ),
+    Slots AS (
+        SELECT m.id_medico, d.dia, g.minuto,
+               DATEADD(MINUTE, g.minuto, CAST(d.dia AS DATETIME2)) AS inicio,
+               DATEADD(MINUTE, g.minuto + @duracao, CAST(d.dia AS DATETIME2)) AS fim
+        FROM @Medicos m
+        CROSS JOIN Dias d
+        CROSS JOIN Grelha g
+        WHERE (g.minuto >= 540 AND g.minuto + @duracao <= 780)
+           OR (g.minuto >= 840 AND g.minuto + @duracao <= 1080)
+    )
+    SELECT s.id_medico,
+           s.dia,
+           CONVERT(CHAR(5), DATEADD(MINUTE, s.minuto, CAST('00:00' AS TIME)), 108) AS Hora
+    FROM Slots s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM @Ocupado o
+        WHERE o.id_medico = s.id_medico
+          AND o.data_inicio < s.fim
+          AND o.data_fim > s.inicio
+    )
+    ORDER BY s.id_medico, s.dia, s.minuto;
 END
 GO
 
@@ -268,6 +502,57 @@ BEGIN
 END
 GO
 
+-- Pesquisa rápida de pacientes na agenda (índice em memória, persistence/indice_pacientes.py).
+-- 1.º resultado: nº de pacientes ativos, nº de vínculos desses pacientes e versão atual
+-- (se depois do delta o índice tiver outras contagens houve eliminações -> recarga completa).
+-- 2.º: (id_paciente, nome, NIF, ativo, id_trabalhador), uma linha por vínculo. Com @desde = 0
+-- todos os pacientes ativos; senão os que mudaram em SGA_PESSOA, SGA_PACIENTE ou
+-- SGA_VINCULO_CLINICO desde @desde (incluindo os desativados, para saírem do índice).
+CREATE OR ALTER PROCEDURE sp_listarPacientesIndiceAlterados
+    @desde BIGINT = 0
+AS
+BEGIN
+    SET NOCOUNT ON;
+    DECLARE @desde_bin BINARY(8) = CAST(@desde AS BINARY(8));
+
+    SELECT
+        (SELECT COUNT_BIG(*) FROM SGA_PACIENTE WHERE ativo = 1) AS pacientes,
+        (SELECT COUNT_BIG(*)
+         FROM SGA_VINCULO_CLINICO V
+         JOIN SGA_PACIENTE Pac ON V.NIF_paciente = Pac.NIF
+         JOIN SGA_TRABALHADOR T ON V.NIF_trabalhador = T.NIF
+         WHERE Pac.ativo = 1) AS vinculos,
+        CAST(MIN_ACTIVE_ROWVERSION() AS BIGINT) - 1 AS versao;
+
+    IF @desde = 0
+    BEGIN
+        SELECT Pac.id_paciente, P.nome, Pac.NIF, Pac.ativo, T.id_trabalhador
+        FROM SGA_PACIENTE Pac
+        JOIN SGA_PESSOA P ON Pac.NIF = P.NIF
+        LEFT JOIN SGA_VINCULO_CLINICO V ON Pac.NIF = V.NIF_paciente
+        LEFT JOIN SGA_TRABALHADOR T ON V.NIF_trabalhador = T.NIF
+        WHERE Pac.ativo = 1;
+    END
+    ELSE
+    BEGIN
+        DECLARE @Alterados TABLE (NIF CHAR(9) PRIMARY KEY);
+        INSERT INTO @Alterados (NIF)
+        SELECT NIF FROM SGA_PACIENTE WHERE versao > @desde_bin
+        UNION
+        SELECT NIF FROM SGA_PESSOA WHERE versao > @desde_bin
+        UNION
+        SELECT NIF_paciente FROM SGA_VINCULO_CLINICO WHERE versao > @desde_bin;
+
+        SELECT Pac.id_paciente, P.nome, Pac.NIF, Pac.ativo, T.id_trabalhador
+        FROM @Alterados A
+        JOIN SGA_PACIENTE Pac ON A.NIF = Pac.NIF
+        JOIN SGA_PESSOA P ON Pac.NIF = P.NIF
+        LEFT JOIN SGA_VINCULO_CLINICO V ON Pac.NIF = V.NIF_paciente
+        LEFT JOIN SGA_TRABALHADOR T ON V.NIF_trabalhador = T.NIF;
+    END
+END
+GO
+
 CREATE OR ALTER PROCEDURE sp_criarAgendamento
     @nif_paciente CHAR(9),
     @id_medico INT,
@@ -297,16 +582,13 @@ BEGIN
     BEGIN
         SELECT @id_sala_final = id_sala FROM SGA_SALA WHERE id_dono = @id_medico AND ativa = 1;
 
+        -- Sala comum livre durante toda a consulta, best-fit (menor folga no dia)
         IF @id_sala_final IS NULL
         BEGIN
-            SELECT TOP 1 @id_sala_final = s.id_sala
-            FROM SGA_SALA s
-            WHERE s.is_online = 0 AND s.ativa = 1 AND s.id_dono IS NULL
-            AND s.id_sala NOT IN (
-                SELECT a.id_sala FROM SGA_ATENDIMENTO a
-                WHERE a.estado != 'cancelado' 
-                AND (@data_inicio >= a.data_inicio AND @data_inicio < a.data_fim)
-            )
+            SELECT TOP 1 @id_sala_final = L.id_sala
+            FROM dbo.udf_SalasLivres(@data_inicio, DATEADD(MINUTE, @duracao, @data_inicio)) L
+            WHERE L.id_dono IS NULL
+            ORDER BY L.folga_min, L.id_sala;
         END
     END
 
@@ -331,6 +613,8 @@ BEGIN
             INSERT INTO SGA_TRABALHADOR_ATENDIMENTO (id_trabalhador, num_atendimento) VALUES (@id_medico, @new_id);
             INSERT INTO SGA_PACIENTE_ATENDIMENTO (id_paciente, num_atendimento, presenca) VALUES (@id_paciente, @new_id, 0);
         COMMIT TRAN
+
+        SELECT @new_id AS num_atendimento;
     END TRY
     BEGIN CATCH
         IF @@TRANCOUNT > 0 ROLLBACK TRAN;
@@ -339,6 +623,143 @@ BEGIN
 END
 GO
 
+-- Marcação de várias sessões (ex.: série semanal) numa só transação.
+-- @datas: JSON com as datas/horas de início, ex.: ["2026-03-02T10:00:00", "2026-03-09T10:00:00"]
+-- Devolve uma linha por ocorrência (ordem, data_inicio, data_fim, num_atendimento, id_sala, motivo).
+-- Se alguma tiver motivo (conflito), nada é inserido: tudo ou nada.
+CREATE OR ALTER PROCEDURE sp_criarAgendamentosLote
+    @nif_paciente CHAR(9),
+    @id_medico INT,
+    @datas NVARCHAR(MAX),
+    @preferencia_online BIT,
+    @duracao INT = 60
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @id_paciente INT;
+    SELECT @id_paciente = id_paciente FROM SGA_PACIENTE WHERE NIF = @nif_paciente AND ativo = 1;
+    IF @id_paciente IS NULL THROW 50009, 'Paciente não encontrado.', 1;
+
+    IF ISJSON(@datas) = 0 THROW 50013, 'Lista de datas inválida.', 1;
+
+    CREATE TABLE #Ocorrencias (
+        ordem INT PRIMARY KEY,
+        data_inicio DATETIME2 NOT NULL,
+        data_fim DATETIME2 NOT NULL,
+        id_sala INT NULL,
+        motivo VARCHAR(120) NULL
+    );
+
+    INSERT INTO #Ocorrencias (ordem, data_inicio, data_fim)
+    SELECT CAST([key] AS INT), CAST([value] AS DATETIME2), DATEADD(MINUTE, @duracao, CAST([value] AS DATETIME2))
+    FROM OPENJSON(@datas);
+
+    IF NOT EXISTS (SELECT 1 FROM #Ocorrencias) THROW 50013, 'Lista de datas vazia.', 1;
+
+    BEGIN TRAN;
+
+    -- 1. Colisões com a agenda do médico (mesma regra que udf_VerificarColisaoMedico).
+    --    UPDLOCK/HOLDLOCK impede que outra marcação ocupe o intervalo antes do INSERT.
+    UPDATE O
+    SET motivo = 'O médico já tem consulta marcada a essa hora.'
+    FROM #Ocorrencias O
+    WHERE EXISTS (
+        SELECT 1
+        FROM SGA_TRABALHADOR_ATENDIMENTO ta WITH (UPDLOCK, HOLDLOCK)
+        JOIN SGA_ATENDIMENTO a WITH (UPDLOCK, HOLDLOCK) ON ta.num_atendimento = a.num_atendimento
+        WHERE ta.id_trabalhador = @id_medico
+          AND a.estado != 'cancelado'
+          AND a.data_inicio < O.data_fim
+          AND a.data_fim > O.data_inicio
+    );
+
+    -- 2. Sobreposição entre ocorrências do próprio pedido
+    UPDATE O
+    SET motivo = 'Sobrepõe-se a outra sessão do mesmo pedido.'
+    FROM #Ocorrencias O
+    WHERE O.motivo IS NULL
+      AND EXISTS (
+          SELECT 1 FROM #Ocorrencias O2
+          WHERE O2.ordem < O.ordem
+            AND O2.data_inicio < O.data_fim
+            AND O2.data_fim > O.data_inicio
+      );
+
+    -- 3. Salas (mesmas regras que sp_criarAgendamento). As ocorrências não se sobrepõem
+    --    entre si, por isso a mesma sala comum pode servir várias.
+    IF @preferencia_online = 1
+    BEGIN
+        UPDATE #Ocorrencias
+        SET id_sala = (SELECT TOP 1 id_sala FROM SGA_SALA WHERE is_online = 1);
+    END
+    ELSE
+    BEGIN
+        DECLARE @gabinete INT;
+        SELECT @gabinete = id_sala FROM SGA_SALA WHERE id_dono = @id_medico AND ativa = 1;
+
+        IF @gabinete IS NOT NULL
+            UPDATE #Ocorrencias SET id_sala = @gabinete;
+        ELSE
+            UPDATE O
+            SET id_sala = Livre.id_sala
+            FROM #Ocorrencias O
+            OUTER APPLY (
+                SELECT TOP 1 L.id_sala
+                FROM dbo.udf_SalasLivres(O.data_inicio, O.data_fim) L
+                WHERE L.id_dono IS NULL
+                ORDER BY L.folga_min, L.id_sala
+            ) Livre;
+    END
+
+    UPDATE #Ocorrencias
+    SET motivo = 'Não foi possível alocar sala (Médico sem gabinete e salas comuns cheias).'
+    WHERE motivo IS NULL AND id_sala IS NULL;
+
+    -- 4. Tudo ou nada
+    IF NOT EXISTS (SELECT 1 FROM #Ocorrencias WHERE motivo IS NOT NULL)
+    BEGIN
+        DECLARE @nif_medico_agenda CHAR(9);
+        SELECT @nif_medico_agenda = NIF FROM SGA_TRABALHADOR WHERE id_trabalhador = @id_medico;
+
+        IF @nif_medico_agenda IS NOT NULL AND NOT EXISTS (
+            SELECT 1 FROM SGA_VINCULO_CLINICO WHERE NIF_trabalhador = @nif_medico_agenda AND NIF_paciente = @nif_paciente
+        )
+        INSERT INTO SGA_VINCULO_CLINICO (NIF_trabalhador, NIF_paciente, tipo_vinculo) VALUES (@nif_medico_agenda, @nif_paciente, 'Responsável');
+
+        DECLARE @Novos TABLE (num_atendimento INT, data_inicio DATETIME2);
+
+        -- As ocorrências não se sobrepõem, logo data_inicio identifica cada uma
+        INSERT INTO SGA_ATENDIMENTO (id_sala, data_inicio, data_fim, estado)
+        OUTPUT inserted.num_atendimento, inserted.data_inicio INTO @Novos
+        SELECT id_sala, data_inicio, data_fim, 'agendado'
+        FROM #Ocorrencias;
+
+        INSERT INTO SGA_TRABALHADOR_ATENDIMENTO (id_trabalhador, num_atendimento)
+        SELECT @id_medico, num_atendimento FROM @Novos;
+
+        INSERT INTO SGA_PACIENTE_ATENDIMENTO (id_paciente, num_atendimento, presenca)
+        SELECT @id_paciente, num_atendimento, 0 FROM @Novos;
+
+        COMMIT TRAN;
+
+        SELECT O.ordem, O.data_inicio, O.data_fim, N.num_atendimento, O.id_sala, O.motivo
+        FROM #Ocorrencias O
+        JOIN @Novos N ON N.data_inicio = O.data_inicio
+        ORDER BY O.ordem;
+    END
+    ELSE
+    BEGIN
+        ROLLBACK TRAN;
+
+        SELECT ordem, data_inicio, data_fim, CAST(NULL AS INT) AS num_atendimento, id_sala, motivo
+        FROM #Ocorrencias
+        ORDER BY ordem;
+    END
+END
+GO
+
 CREATE OR ALTER PROCEDURE sp_obterDetalhesAtendimento
     @id_atendimento INT
 AS
@@ -368,11 +789,19 @@ CREATE OR ALTER PROCEDURE sp_listarEventosCalendario
     @id_user INT,
     @perfil VARCHAR(20),
     @filtro_medico INT = NULL,
-    @filtro_paciente_nif CHAR(9) = NULL
+    @filtro_paciente_nif CHAR(9) = NULL,
+    @data_inicio DATETIME2 = NULL,
+    @data_fim DATETIME2 = NULL
 AS
 BEGIN
     SET NOCOUNT ON;
 
+    -- Janela pedida pelo FullCalendar (start/end). Sem janela devolve todo o histórico.
+    -- As consultas nunca passam de um dia, por isso basta procurar inícios a partir
+    -- de @data_inicio - 1 dia: o filtro fica sargable em IX_Atendimento_Data_Estado.
+    DECLARE @procurar_desde DATETIME2 = ISNULL(DATEADD(DAY, -1, @data_inicio), '0001-01-01');
+    DECLARE @procurar_ate DATETIME2 = ISNULL(@data_fim, '9999-12-31');
+
     SELECT DISTINCT
         A.num_atendimento,
         PessPac.nome AS NomePaciente,
@@ -396,7 +825,112 @@ BEGIN
           (@perfil = 'admin' AND (@filtro_medico IS NULL OR TA.id_trabalhador = @filtro_medico))
       )
       -- Filtro de Paciente (Aplica-se a todos)
-      AND (@filtro_paciente_nif IS NULL OR PessPac.NIF = @filtro_paciente_nif);
+      AND (@filtro_paciente_nif IS NULL OR PessPac.NIF = @filtro_paciente_nif)
+      -- Janela temporal (sobreposição com [@data_inicio, @data_fim[)
+      AND A.data_inicio >= @procurar_desde
+      AND A.data_inicio < @procurar_ate
+      AND (@data_inicio IS NULL OR A.data_fim > @data_inicio)
+    OPTION (RECOMPILE);
+END
+GO
+
+-- Marcador de alterações para ETag e sincronização incremental.
+-- versao: último rowversion usado na BD (muda com qualquer INSERT/UPDATE nas tabelas com coluna versao)
+-- versao_segura: tudo o que tem rowversion <= este valor já está confirmado (transações
+--                em curso podem ainda confirmar valores acima, por isso o delta parte daqui)
+-- atendimentos/ultimo_id: permitem detetar DELETEs, que não deixam rasto em rowversion
+CREATE OR ALTER PROCEDURE sp_obterMarcadorAlteracoes
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    SELECT
+        CAST(@@DBTS AS BIGINT) AS versao,
+        CAST(MIN_ACTIVE_ROWVERSION() AS BIGINT) - 1 AS versao_segura,
+        -- Contagens das views indexadas de alteracoes.sql (seeks, não varrimentos)
+        ISNULL((SELECT SUM(total) FROM vw_ContagemAtendimentos WITH (NOEXPAND)), 0) AS atendimentos,
+        CAST(ISNULL(IDENT_CURRENT('SGA_ATENDIMENTO'), 0) AS BIGINT) AS ultimo_id,
+        ISNULL((SELECT SUM(total) FROM vw_ContagemPacientes WITH (NOEXPAND)), 0)
+          + ISNULL((SELECT SUM(total) FROM vw_ContagemVinculos WITH (NOEXPAND)), 0)
+          + ISNULL((SELECT SUM(total) FROM vw_ContagemPacienteAtendimento WITH (NOEXPAND)), 0) AS outras_linhas;
+END
+GO
+
+-- Eventos alterados desde @desde (inclui os cancelados, para o cliente os remover).
+-- Mesmos filtros de visibilidade que sp_listarEventosCalendario. Um atendimento cuja
+-- própria linha mudou é devolvido mesmo fora da janela (pode ter sido movido para fora dela);
+-- os afetados só por alterações de nomes/ligações limitam-se à janela.
+CREATE OR ALTER PROCEDURE sp_listarEventosAlterados
+    @id_user INT,
+    @perfil VARCHAR(20),
+    @filtro_medico INT = NULL,
+    @filtro_paciente_nif CHAR(9) = NULL,
+    @data_inicio DATETIME2 = NULL,
+    @data_fim DATETIME2 = NULL,
+    @desde BIGINT
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @versao BINARY(8) = CAST(@desde AS BINARY(8));
+    DECLARE @procurar_desde DATETIME2 = ISNULL(DATEADD(DAY, -1, @data_inicio), '0001-01-01');
+    DECLARE @procurar_ate DATETIME2 = ISNULL(@data_fim, '9999-12-31');
+
+    DECLARE @alterados TABLE (num_atendimento INT PRIMARY KEY, proprio BIT NOT NULL);
+
+    -- Seek em IX_Atendimento_Versao
+    INSERT INTO @alterados (num_atendimento, proprio)
+    SELECT num_atendimento, 1 FROM SGA_ATENDIMENTO WHERE versao > @versao;
+
+    INSERT INTO @alterados (num_atendimento, proprio)
+    SELECT DISTINCT X.num_atendimento, 0
+    FROM (
+        SELECT num_atendimento FROM SGA_PACIENTE_ATENDIMENTO WHERE versao > @versao
+        UNION
+        SELECT num_atendimento FROM SGA_TRABALHADOR_ATENDIMENTO WHERE versao > @versao
+        UNION
+        SELECT PA.num_atendimento
+        FROM SGA_PESSOA P
+        JOIN SGA_PACIENTE Pac ON Pac.NIF = P.NIF
+        JOIN SGA_PACIENTE_ATENDIMENTO PA ON PA.id_paciente = Pac.id_paciente
+        WHERE P.versao > @versao
+        UNION
+        SELECT TA.num_atendimento
+        FROM SGA_PESSOA P
+        JOIN SGA_TRABALHADOR T ON T.NIF = P.NIF
+        JOIN SGA_TRABALHADOR_ATENDIMENTO TA ON TA.id_trabalhador = T.id_trabalhador
+        WHERE P.versao > @versao
+    ) X
+    WHERE NOT EXISTS (SELECT 1 FROM @alterados Al WHERE Al.num_atendimento = X.num_atendimento);
+
+    SELECT DISTINCT
+        A.num_atendimento,
+        PessPac.nome AS NomePaciente,
+        A.data_inicio,
+        A.data_fim,
+        A.estado,
+        PessMed.nome AS NomeMedico
+    FROM @alterados Al
+    JOIN SGA_ATENDIMENTO A ON A.num_atendimento = Al.num_atendimento
+    JOIN SGA_PACIENTE_ATENDIMENTO PA ON A.num_atendimento = PA.num_atendimento
+    JOIN SGA_PACIENTE Pac ON PA.id_paciente = Pac.id_paciente
+    JOIN SGA_PESSOA PessPac ON Pac.NIF = PessPac.NIF
+    JOIN SGA_TRABALHADOR_ATENDIMENTO TA ON A.num_atendimento = TA.num_atendimento
+    JOIN SGA_TRABALHADOR T ON TA.id_trabalhador = T.id_trabalhador
+    JOIN SGA_PESSOA PessMed ON T.NIF = PessMed.NIF
+    WHERE (
+          (@perfil = 'colaborador' AND TA.id_trabalhador = @id_user)
+          OR
+          (@perfil = 'admin' AND (@filtro_medico IS NULL OR TA.id_trabalhador = @filtro_medico))
+      )
+      AND (@filtro_paciente_nif IS NULL OR PessPac.NIF = @filtro_paciente_nif)
+      AND (
+          Al.proprio = 1
+          OR (A.data_inicio >= @procurar_desde
+              AND A.data_inicio < @procurar_ate
+              AND (@data_inicio IS NULL OR A.data_fim > @data_inicio))
+      )
+    OPTION (RECOMPILE);
 END
 GO
 
@@ -454,6 +988,40 @@ BEGIN
 END;
 GO
 
+CREATE OR ALTER PROCEDURE sp_listarEquipaPagina
+    @tamanho INT = 50,
+    @pesquisa VARCHAR(50) = NULL,   -- prefixo do nome ou do NIF (já escapado para LIKE)
+    @descendente BIT = 0,
+    @apos_nome VARCHAR(50) = NULL,  -- chave da última linha da página anterior
+    @apos_id INT = NULL
+AS
+BEGIN
+    SET NOCOUNT ON;
+    -- Keyset pagination por (nome, id): devolve @tamanho + 1 linhas para saber se há mais
+    SELECT TOP (@tamanho + 1)
+        P.nome,                  -- [0]
+        P.email,                 -- [1]
+        P.telefone,              -- [2]
+        T.tipo_perfil,           -- [3]
+        ISNULL(T.cedula_profissional, '---'), -- [4]
+        P.NIF,                   -- [5] 
+        T.id_trabalhador         -- [6] 
+    FROM SGA_TRABALHADOR T
+    JOIN SGA_PESSOA P ON T.NIF = P.NIF
+    WHERE T.ativo = 1
+      AND (@pesquisa IS NULL OR P.nome LIKE @pesquisa + '%' OR P.NIF LIKE @pesquisa + '%')
+      AND (@apos_nome IS NULL
+           OR (@descendente = 0 AND (P.nome > @apos_nome OR (P.nome = @apos_nome AND T.id_trabalhador > @apos_id)))
+           OR (@descendente = 1 AND (P.nome < @apos_nome OR (P.nome = @apos_nome AND T.id_trabalhador < @apos_id))))
+    ORDER BY
+        CASE WHEN @descendente = 0 THEN P.nome END ASC,
+        CASE WHEN @descendente = 0 THEN T.id_trabalhador END ASC,
+        CASE WHEN @descendente = 1 THEN P.nome END DESC,
+        CASE WHEN @descendente = 1 THEN T.id_trabalhador END DESC
+    OPTION (RECOMPILE);
+END;
+GO
+
 CREATE OR ALTER PROCEDURE sp_listarEquipaInativa   
 AS
 BEGIN
@@ -680,6 +1248,81 @@ BEGIN
 END;
 GO
 
+CREATE OR ALTER PROCEDURE sp_listarPacientesSGAPagina
+    @id_trabalhador INT, 
+    @perfil VARCHAR(20),
+    @tamanho INT = 50,
+    @pesquisa VARCHAR(50) = NULL,   -- prefixo do nome ou do NIF (já escapado para LIKE)
+    @descendente BIT = 0,
+    @apos_nome VARCHAR(50) = NULL,  -- chave da última linha da página anterior
+    @apos_id INT = NULL
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @nif_medico CHAR(9);
+    SELECT @nif_medico = NIF FROM SGA_TRABALHADOR WHERE id_trabalhador = @id_trabalhador;
+
+    -- Keyset pagination por (nome, id): devolve @tamanho + 1 linhas para saber se há mais
+    SELECT TOP (@tamanho + 1)
+           Pac.id_paciente, P.nome, P.NIF, P.telefone, P.email, 
+           FORMAT(Pac.data_inscricao, 'dd/MM/yyyy'), Pac.observacoes
+    FROM SGA_PACIENTE Pac
+    JOIN SGA_PESSOA P ON Pac.NIF = P.NIF
+    WHERE Pac.ativo = 1
+      AND (@perfil = 'admin' OR EXISTS (
+              SELECT 1 FROM SGA_VINCULO_CLINICO V
+              WHERE V.NIF_paciente = Pac.NIF AND V.NIF_trabalhador = @nif_medico))
+      AND (@pesquisa IS NULL OR P.nome LIKE @pesquisa + '%' OR P.NIF LIKE @pesquisa + '%')
+      AND (@apos_nome IS NULL
+           OR (@descendente = 0 AND (P.nome > @apos_nome OR (P.nome = @apos_nome AND Pac.id_paciente > @apos_id)))
+           OR (@descendente = 1 AND (P.nome < @apos_nome OR (P.nome = @apos_nome AND Pac.id_paciente < @apos_id))))
+    ORDER BY
+        CASE WHEN @descendente = 0 THEN P.nome END ASC,
+        CASE WHEN @descendente = 0 THEN Pac.id_paciente END ASC,
+        CASE WHEN @descendente = 1 THEN P.nome END DESC,
+        CASE WHEN @descendente = 1 THEN Pac.id_paciente END DESC
+    OPTION (RECOMPILE);
+END;
+GO
+
+-- Segundo passo de /criar_paciente (a pessoa já foi gravada por sp_guardarPessoa);
+-- mesmas regras de sp_importarPacientes para uma só linha.
+CREATE OR ALTER PROCEDURE sp_inserirPaciente
+    @NIF CHAR(9),
+    @data_inscricao DATE,
+    @observacoes VARCHAR(250) = NULL,
+    @id_medico INT = NULL
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    BEGIN TRY
+        BEGIN TRANSACTION;
+            IF EXISTS (SELECT 1 FROM SGA_PACIENTE WITH (UPDLOCK, HOLDLOCK) WHERE NIF = @NIF)
+                THROW 50003, 'Paciente já registado.', 1;
+
+            IF @id_medico IS NOT NULL
+               AND NOT EXISTS (SELECT 1 FROM SGA_TRABALHADOR WHERE id_trabalhador = @id_medico AND ativo = 1)
+                THROW 50007, 'Profissional responsável inexistente ou inativo.', 1;
+
+            INSERT INTO SGA_PACIENTE (NIF, data_inscricao, observacoes, ativo)
+            VALUES (@NIF, @data_inscricao, @observacoes, 1);
+
+            INSERT INTO SGA_VINCULO_CLINICO (NIF_trabalhador, NIF_paciente, tipo_vinculo, data_inicio)
+            SELECT T.NIF, @NIF, 'Responsável Principal', SYSDATETIME()
+            FROM SGA_TRABALHADOR T
+            WHERE T.id_trabalhador = @id_medico
+            AND NOT EXISTS (SELECT 1 FROM SGA_VINCULO_CLINICO V WHERE V.NIF_trabalhador = T.NIF AND V.NIF_paciente = @NIF);
+        COMMIT TRANSACTION;
+    END TRY
+    BEGIN CATCH
+        IF @@TRANCOUNT > 0 ROLLBACK TRANSACTION;
+        THROW;
+    END CATCH
+END;
+GO
+
 CREATE OR ALTER PROCEDURE sp_desativarPaciente
     @id_paciente INT
 AS
@@ -706,6 +1349,37 @@ BEGIN
 END;
 GO
 
+CREATE OR ALTER PROCEDURE sp_listarPacientesInativosPagina
+    @tamanho INT = 50,
+    @pesquisa VARCHAR(50) = NULL,
+    @descendente BIT = 0,
+    @apos_nome VARCHAR(50) = NULL,
+    @apos_id INT = NULL
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SELECT TOP (@tamanho + 1)
+        Pac.id_paciente,    -- [0]
+        Pess.nome,          -- [1]
+        Pess.NIF,           -- [2]
+        Pess.telefone,      -- [3]
+        Pac.data_inscricao  -- [4]
+    FROM SGA_PACIENTE Pac
+    JOIN SGA_PESSOA Pess ON Pac.NIF = Pess.NIF
+    WHERE Pac.ativo = 0
+      AND (@pesquisa IS NULL OR Pess.nome LIKE @pesquisa + '%' OR Pess.NIF LIKE @pesquisa + '%')
+      AND (@apos_nome IS NULL
+           OR (@descendente = 0 AND (Pess.nome > @apos_nome OR (Pess.nome = @apos_nome AND Pac.id_paciente > @apos_id)))
+           OR (@descendente = 1 AND (Pess.nome < @apos_nome OR (Pess.nome = @apos_nome AND Pac.id_paciente < @apos_id))))
+    ORDER BY
+        CASE WHEN @descendente = 0 THEN Pess.nome END ASC,
+        CASE WHEN @descendente = 0 THEN Pac.id_paciente END ASC,
+        CASE WHEN @descendente = 1 THEN Pess.nome END DESC,
+        CASE WHEN @descendente = 1 THEN Pac.id_paciente END DESC
+    OPTION (RECOMPILE);
+END;
+GO
+
 CREATE OR ALTER PROCEDURE sp_ativarPaciente
     @id_paciente INT
 AS
@@ -902,6 +1576,8 @@ CREATE OR ALTER PROCEDURE sp_salvarRelatorioClinico
     @tipo VARCHAR(50)
 AS
 BEGIN
+    SET NOCOUNT ON;
+
     IF EXISTS (SELECT 1 FROM SGA_RELATORIO WHERE id = @id_relatorio AND id_autor = @id_autor)
     BEGIN
         UPDATE SGA_RELATORIO SET conteudo = @conteudo, tipo_relatorio = @tipo WHERE id = @id_relatorio;
@@ -910,24 +1586,131 @@ BEGIN
     BEGIN
         INSERT INTO SGA_RELATORIO (id_paciente, id_autor, conteudo, tipo_relatorio)
         VALUES (@id_paciente, @id_autor, @conteudo, @tipo);
+        SET @id_relatorio = SCOPE_IDENTITY();
     END
+
+    -- Id do relatório gravado (para atualizar o índice de pesquisa em memória)
+    SELECT @id_relatorio AS id;
 END;
 GO
 
+-- Pesquisa de texto integral nos relatórios do próprio autor (mesma regra de acesso
+-- que sp_obterLivrariaRelatorios). @consulta usa a sintaxe CONTAINS, ex.: '"ansied*" AND "sono*"'.
+-- Sem índice full-text (sql/fulltext.sql) lança 50020 e a aplicação usa o índice em memória.
+-- A consulta vai em SQL dinâmico para o procedimento compilar mesmo sem índice full-text.
+CREATE OR ALTER PROCEDURE sp_pesquisarRelatorios
+    @id_autor INT,
+    @consulta NVARCHAR(4000),
+    @id_paciente INT = NULL,
+    @limite INT = 20
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    IF FULLTEXTSERVICEPROPERTY('IsFullTextInstalled') = 0
+       OR NOT EXISTS (SELECT 1 FROM sys.fulltext_indexes WHERE object_id = OBJECT_ID(N'SGA_RELATORIO'))
+        THROW 50020, 'Pesquisa de texto integral indisponível.', 1;
+
+    EXEC sp_executesql N'
+        SELECT TOP (@limite)
+            R.id,
+            R.id_paciente,
+            PessPac.nome AS nome_paciente,
+            R.tipo_relatorio,
+            R.data_criacao,
+            FT.[RANK] AS pontuacao,
+            R.conteudo
+        FROM CONTAINSTABLE(SGA_RELATORIO, conteudo, @consulta) FT
+        JOIN SGA_RELATORIO R ON R.id = FT.[KEY]
+        JOIN SGA_PACIENTE Pac ON R.id_paciente = Pac.id_paciente
+        JOIN SGA_PESSOA PessPac ON Pac.NIF = PessPac.NIF
+        WHERE R.id_autor = @id_autor
+          AND (@id_paciente IS NULL OR R.id_paciente = @id_paciente)
+        ORDER BY FT.[RANK] DESC, R.data_criacao DESC;',
+        N'@consulta NVARCHAR(4000), @id_autor INT, @id_paciente INT, @limite INT',
+        @consulta = @consulta, @id_autor = @id_autor, @id_paciente = @id_paciente, @limite = @limite;
+END;
+GO
+
+-- Relatórios criados/alterados desde @desde, para o índice de pesquisa em memória.
+-- 1.º resultado: total de relatórios e versão atual (deteta eliminações); 2.º: as linhas.
+CREATE OR ALTER PROCEDURE sp_listarRelatoriosAlterados
+    @desde BIGINT = 0
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    SELECT COUNT_BIG(*) AS total, CAST(MIN_ACTIVE_ROWVERSION() AS BIGINT) - 1 AS versao
+    FROM SGA_RELATORIO;
+
+    SELECT
+        R.id,
+        R.id_paciente,
+        PessPac.nome AS nome_paciente,
+        R.id_autor,
+        R.tipo_relatorio,
+        R.data_criacao,
+        R.conteudo
+    FROM SGA_RELATORIO R
+    JOIN SGA_PACIENTE Pac ON R.id_paciente = Pac.id_paciente
+    JOIN SGA_PESSOA PessPac ON Pac.NIF = PessPac.NIF
+    WHERE R.versao > CAST(@desde AS BINARY(8));
+END;
+GO
+
+-- Histórico de relatórios do autor para um paciente: só metadados, paginado por keyset
+-- (data_criacao DESC, id DESC). Devolve @tamanho + 1 linhas para a aplicação saber se há mais.
+-- O conteúdo é lido a pedido (sp_obterRelatorio) e a data é formatada na aplicação.
 CREATE OR ALTER PROCEDURE sp_obterLivrariaRelatorios
     @id_paciente INT,
-    @id_autor INT
+    @id_autor INT,
+    @tamanho INT = 20,
+    @apos_data DATETIME2 = NULL,
+    @apos_id INT = NULL
 AS
 BEGIN
     SET NOCOUNT ON;
-    SELECT 
-        id, 
-        tipo_relatorio, 
-        FORMAT(data_criacao, 'dd/MM/yyyy HH:mm') as data_formatada, 
-        conteudo 
+    SELECT TOP (@tamanho + 1)
+        id,
+        tipo_relatorio,
+        data_criacao
     FROM SGA_RELATORIO
     WHERE id_paciente = @id_paciente AND id_autor = @id_autor
-    ORDER BY data_criacao DESC; 
+    AND (@apos_data IS NULL
+         OR data_criacao < @apos_data
+         OR (data_criacao = @apos_data AND id < @apos_id))
+    ORDER BY data_criacao DESC, id DESC
+    OPTION (RECOMPILE);
+END;
+GO
+
+-- Um relatório completo, apenas para o seu autor (mesma regra de acesso do histórico).
+CREATE OR ALTER PROCEDURE sp_obterRelatorio
+    @id INT,
+    @id_autor INT
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SELECT id, id_paciente, tipo_relatorio, data_criacao, conteudo
+    FROM SGA_RELATORIO
+    WHERE id = @id AND id_autor = @id_autor;
+END;
+GO
+
+-- Resultados da pesquisa com o índice em memória (persistence/pesquisa.py): o índice só
+-- guarda postings, o resto dos melhores resultados vem daqui. @ids: CSV de ids; só os do autor.
+CREATE OR ALTER PROCEDURE sp_obterRelatoriosPorIds
+    @id_autor INT,
+    @ids VARCHAR(MAX)
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SELECT R.id, R.id_paciente, PessPac.nome AS nome_paciente, R.tipo_relatorio, R.data_criacao, R.conteudo
+    FROM (SELECT DISTINCT TRY_CAST(value AS INT) AS id FROM STRING_SPLIT(@ids, ',')) I
+    JOIN SGA_RELATORIO R ON R.id = I.id
+    JOIN SGA_PACIENTE Pac ON R.id_paciente = Pac.id_paciente
+    JOIN SGA_PESSOA PessPac ON Pac.NIF = PessPac.NIF
+    WHERE R.id_autor = @id_autor;
 END;
 GO
 
@@ -979,4 +1762,176 @@ BEGIN
         THROW;
     END CATCH
 END
-GO
\ No newline at end of file
+GO
+
+-- =============================================
+-- 5. EXPORTAÇÃO (lidas em streaming com fetchmany)
+-- =============================================
+
+CREATE OR ALTER PROCEDURE sp_exportarPacientes
+AS
+BEGIN
+    SET NOCOUNT ON;
+    -- Ordenado pela chave clustered: não obriga a um SORT antes do primeiro byte
+    SELECT Pac.id_paciente, P.NIF, P.nome, P.data_nascimento, P.telefone, P.email,
+           Pac.data_inscricao, Pac.observacoes, Pac.ativo
+    FROM SGA_PACIENTE Pac
+    JOIN SGA_PESSOA P ON Pac.NIF = P.NIF
+    ORDER BY Pac.id_paciente;
+END;
+GO
+
+CREATE OR ALTER PROCEDURE sp_exportarAtendimentos
+    @data_inicio DATETIME2 = NULL,
+    @data_fim DATETIME2 = NULL
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SELECT A.num_atendimento, A.data_inicio, A.data_fim, A.estado,
+           S.nome AS sala, S.is_online,
+           T.id_trabalhador, PessMed.nome AS medico,
+           Pac.id_paciente, PessPac.NIF AS nif_paciente, PessPac.nome AS paciente, PA.presenca
+    FROM SGA_ATENDIMENTO A
+    JOIN SGA_SALA S ON A.id_sala = S.id_sala
+    LEFT JOIN SGA_TRABALHADOR_ATENDIMENTO TA ON A.num_atendimento = TA.num_atendimento
+    LEFT JOIN SGA_TRABALHADOR T ON TA.id_trabalhador = T.id_trabalhador
+    LEFT JOIN SGA_PESSOA PessMed ON T.NIF = PessMed.NIF
+    LEFT JOIN SGA_PACIENTE_ATENDIMENTO PA ON A.num_atendimento = PA.num_atendimento
+    LEFT JOIN SGA_PACIENTE Pac ON PA.id_paciente = Pac.id_paciente
+    LEFT JOIN SGA_PESSOA PessPac ON Pac.NIF = PessPac.NIF
+    WHERE (@data_inicio IS NULL OR A.data_inicio >= @data_inicio)
+      AND (@data_fim IS NULL OR A.data_inicio < @data_fim)
+    ORDER BY A.num_atendimento
+    OPTION (RECOMPILE);
+END;
+GO
+
+CREATE OR ALTER PROCEDURE sp_exportarRelatorios
+    @data_inicio DATETIME2 = NULL,
+    @data_fim DATETIME2 = NULL
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SELECT R.id, R.id_paciente, PessPac.nome AS paciente, R.id_autor, PessAut.nome AS autor,
+           R.tipo_relatorio, R.data_criacao, R.conteudo
+    FROM SGA_RELATORIO R
+    JOIN SGA_PACIENTE Pac ON R.id_paciente = Pac.id_paciente
+    JOIN SGA_PESSOA PessPac ON Pac.NIF = PessPac.NIF
+    JOIN SGA_TRABALHADOR T ON R.id_autor = T.id_trabalhador
+    JOIN SGA_PESSOA PessAut ON T.NIF = PessAut.NIF
+    WHERE (@data_inicio IS NULL OR R.data_criacao >= @data_inicio)
+      AND (@data_fim IS NULL OR R.data_criacao < @data_fim)
+    ORDER BY R.id
+    OPTION (RECOMPILE);
+END;
+GO
+
+-- =============================================
+-- 6. IMPORTAÇÃO EM MASSA (CSV)
+-- =============================================
+-- A aplicação cria a tabela temporária da sessão, carrega cada lote já validado com
+-- fast_executemany e chama o procedimento, que insere o lote de uma vez (set-based).
+-- Devolve as linhas rejeitadas pela BD: (linha, motivo). As restantes ficam inseridas.
+
+CREATE OR ALTER PROCEDURE sp_importarPacientes
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF OBJECT_ID('tempdb..#ImportacaoPacientes') IS NULL
+        THROW 50030, 'Tabela #ImportacaoPacientes em falta.', 1;
+
+    DECLARE @Rejeitadas TABLE (linha INT PRIMARY KEY, motivo VARCHAR(200));
+
+    BEGIN TRY
+        BEGIN TRANSACTION;
+            INSERT INTO @Rejeitadas (linha, motivo)
+            SELECT I.linha, 'Paciente já registado.'
+            FROM #ImportacaoPacientes I
+            WHERE EXISTS (SELECT 1 FROM SGA_PACIENTE P WITH (UPDLOCK, HOLDLOCK) WHERE P.NIF = I.nif);
+
+            INSERT INTO @Rejeitadas (linha, motivo)
+            SELECT I.linha, 'Profissional responsável inexistente ou inativo.'
+            FROM #ImportacaoPacientes I
+            WHERE I.id_medico IS NOT NULL
+            AND NOT EXISTS (SELECT 1 FROM SGA_TRABALHADOR T WHERE T.id_trabalhador = I.id_medico AND T.ativo = 1)
+            AND NOT EXISTS (SELECT 1 FROM @Rejeitadas R WHERE R.linha = I.linha);
+
+            -- Quem já existe como pessoa (ex.: um trabalhador) mantém os seus dados, como no registo rápido
+            INSERT INTO SGA_PESSOA (NIF, nome, data_nascimento, telefone, email)
+            SELECT I.nif, I.nome, I.data_nascimento, I.telefone, I.email
+            FROM #ImportacaoPacientes I
+            WHERE NOT EXISTS (SELECT 1 FROM @Rejeitadas R WHERE R.linha = I.linha)
+            AND NOT EXISTS (SELECT 1 FROM SGA_PESSOA P WITH (UPDLOCK, HOLDLOCK) WHERE P.NIF = I.nif);
+
+            INSERT INTO SGA_PACIENTE (NIF, data_inscricao, observacoes, ativo)
+            SELECT I.nif, CAST(GETDATE() AS DATE), I.observacoes, 1
+            FROM #ImportacaoPacientes I
+            WHERE NOT EXISTS (SELECT 1 FROM @Rejeitadas R WHERE R.linha = I.linha);
+
+            INSERT INTO SGA_VINCULO_CLINICO (NIF_trabalhador, NIF_paciente, tipo_vinculo, data_inicio)
+            SELECT T.NIF, I.nif, 'Responsável Principal', SYSDATETIME()
+            FROM #ImportacaoPacientes I
+            JOIN SGA_TRABALHADOR T ON T.id_trabalhador = I.id_medico
+            WHERE NOT EXISTS (SELECT 1 FROM @Rejeitadas R WHERE R.linha = I.linha)
+            AND NOT EXISTS (SELECT 1 FROM SGA_VINCULO_CLINICO V WHERE V.NIF_trabalhador = T.NIF AND V.NIF_paciente = I.nif);
+        COMMIT TRANSACTION;
+    END TRY
+    BEGIN CATCH
+        IF @@TRANCOUNT > 0 ROLLBACK TRANSACTION;
+        THROW;
+    END CATCH
+
+    SELECT linha, motivo FROM @Rejeitadas ORDER BY linha;
+END;
+GO
+
+-- Mesmas regras de sp_criarFuncionario (NIF novo no sistema; extensão por categoria).
+CREATE OR ALTER PROCEDURE sp_importarTrabalhadores
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF OBJECT_ID('tempdb..#ImportacaoTrabalhadores') IS NULL
+        THROW 50031, 'Tabela #ImportacaoTrabalhadores em falta.', 1;
+
+    DECLARE @Rejeitadas TABLE (linha INT PRIMARY KEY, motivo VARCHAR(200));
+    DECLARE @Criados TABLE (id_trabalhador INT PRIMARY KEY, NIF CHAR(9));
+
+    BEGIN TRY
+        BEGIN TRANSACTION;
+            INSERT INTO @Rejeitadas (linha, motivo)
+            SELECT I.linha, 'O NIF ' + I.nif + ' já se encontra registado no sistema.'
+            FROM #ImportacaoTrabalhadores I
+            WHERE EXISTS (SELECT 1 FROM SGA_PESSOA P WITH (UPDLOCK, HOLDLOCK) WHERE P.NIF = I.nif);
+
+            INSERT INTO SGA_PESSOA (NIF, nome, data_nascimento, telefone, email)
+            SELECT I.nif, I.nome, I.data_nascimento, I.telefone, I.email
+            FROM #ImportacaoTrabalhadores I
+            WHERE NOT EXISTS (SELECT 1 FROM @Rejeitadas R WHERE R.linha = I.linha);
+
+            INSERT INTO SGA_TRABALHADOR (NIF, senha_hash, tipo_perfil, cedula_profissional, ativo, data_inicio)
+            OUTPUT inserted.id_trabalhador, inserted.NIF INTO @Criados (id_trabalhador, NIF)
+            SELECT I.nif, I.senha_hash, I.perfil, I.cedula, 1, GETDATE()
+            FROM #ImportacaoTrabalhadores I
+            WHERE NOT EXISTS (SELECT 1 FROM @Rejeitadas R WHERE R.linha = I.linha);
+
+            INSERT INTO SGA_CONTRATADO (id_trabalhador, contrato_trabalho)
+            SELECT C.id_trabalhador, I.contrato
+            FROM @Criados C
+            JOIN #ImportacaoTrabalhadores I ON I.nif = C.NIF
+            WHERE I.categoria = 'CONTRATADO';
+
+            INSERT INTO SGA_PRESTADOR_SERVICO (id_trabalhador, ordem, remuneracao)
+            SELECT C.id_trabalhador, I.ordem, I.remuneracao
+            FROM @Criados C
+            JOIN #ImportacaoTrabalhadores I ON I.nif = C.NIF
+            WHERE I.categoria = 'PRESTADOR';
+        COMMIT TRANSACTION;
+    END TRY
+    BEGIN CATCH
+        IF @@TRANCOUNT > 0 ROLLBACK TRANSACTION;
+        THROW;
+    END CATCH
+
+    SELECT linha, motivo FROM @Rejeitadas ORDER BY linha;
+END;
+GO
@@ -1,3 +1,8 @@
+SET ANSI_NULLS ON;
+GO
+SET QUOTED_IDENTIFIER ON;
+GO
+
 CREATE OR ALTER TRIGGER trg_DesativarTrabalhador
 ON SGA_TRABALHADOR
 AFTER UPDATE
@@ -15,4 +20,105 @@ BEGIN
         WHERE i.ativo = 0 AND d.ativo = 1 AND T.data_fim IS NULL;
     END
 END
-GO
\ No newline at end of file
+GO
+-- =============================================
+-- SGA_ESTATISTICA_DIARIA (ver alteracoes.sql e sp_reconstruirEstatisticaDiaria)
+-- Cada trigger soma +1 pelo estado novo (inserted) e -1 pelo antigo (deleted) de cada
+-- consulta não cancelada, e aplica o saldo com sp_aplicarDeltaEstatistica.
+-- Os médicos vêm de SGA_TRABALHADOR_ATENDIMENTO, inserida depois da consulta e apagada
+-- antes dela: a consulta atualiza o total do dia (id_trabalhador = 0) e os médicos já
+-- ligados; a ligação atualiza o médico com o estado atual da consulta.
+-- Mudar is_online de uma sala não é acompanhado (corrige-se com a reconstrução).
+-- =============================================
+CREATE OR ALTER TRIGGER trg_EstatisticaAtendimento
+ON SGA_ATENDIMENTO
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    IF NOT EXISTS (SELECT 1 FROM inserted) AND NOT EXISTS (SELECT 1 FROM deleted)
+        RETURN;
+    -- UPDATE que não mexe no dia, estado nem sala (ex.: só data_fim): nada a contar
+    IF EXISTS (SELECT 1 FROM inserted) AND EXISTS (SELECT 1 FROM deleted)
+       AND NOT (UPDATE(data_inicio) OR UPDATE(estado) OR UPDATE(id_sala))
+        RETURN;
+
+    SELECT x.num_atendimento, x.dia, x.sinal, s.is_online
+    INTO #Alteradas
+    FROM (
+        SELECT num_atendimento, CAST(data_inicio AS DATE) AS dia, 1 AS sinal, id_sala
+        FROM inserted WHERE estado != 'cancelado'
+        UNION ALL
+        SELECT num_atendimento, CAST(data_inicio AS DATE), -1, id_sala
+        FROM deleted WHERE estado != 'cancelado'
+    ) x
+    JOIN SGA_SALA s ON s.id_sala = x.id_sala;
+
+    SELECT
+        y.dia,
+        y.id_trabalhador,
+        SUM(y.sinal) AS consultas,
+        SUM(CASE WHEN y.is_online = 1 THEN y.sinal ELSE 0 END) AS online,
+        SUM(CASE WHEN y.is_online = 0 THEN y.sinal ELSE 0 END) AS presencial
+    INTO #DeltaEstatistica
+    FROM (
+        SELECT dia, 0 AS id_trabalhador, sinal, is_online FROM #Alteradas
+        UNION ALL
+        SELECT a.dia, ta.id_trabalhador, a.sinal, a.is_online
+        FROM #Alteradas a
+        JOIN SGA_TRABALHADOR_ATENDIMENTO ta ON ta.num_atendimento = a.num_atendimento
+    ) y
+    GROUP BY y.dia, y.id_trabalhador
+    HAVING SUM(y.sinal) != 0
+        OR SUM(CASE WHEN y.is_online = 1 THEN y.sinal ELSE 0 END) != 0
+        OR SUM(CASE WHEN y.is_online = 0 THEN y.sinal ELSE 0 END) != 0;
+
+    IF @@ROWCOUNT > 0
+        EXEC sp_aplicarDeltaEstatistica;
+END
+GO
+
+CREATE OR ALTER TRIGGER trg_EstatisticaTrabalhadorAtendimento
+ON SGA_TRABALHADOR_ATENDIMENTO
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    IF NOT EXISTS (SELECT 1 FROM inserted) AND NOT EXISTS (SELECT 1 FROM deleted)
+        RETURN;
+
+    SELECT
+        y.dia,
+        y.id_trabalhador,
+        SUM(y.sinal) AS consultas,
+        SUM(CASE WHEN y.is_online = 1 THEN y.sinal ELSE 0 END) AS online,
+        SUM(CASE WHEN y.is_online = 0 THEN y.sinal ELSE 0 END) AS presencial
+    INTO #DeltaEstatistica
+    FROM (
+        SELECT x.id_trabalhador, CAST(a.data_inicio AS DATE) AS dia, x.sinal, s.is_online
+        FROM (
+            SELECT id_trabalhador, num_atendimento, 1 AS sinal FROM inserted
+            UNION ALL
+            SELECT id_trabalhador, num_atendimento, -1 FROM deleted
+        ) x
+        JOIN SGA_ATENDIMENTO a ON a.num_atendimento = x.num_atendimento
+        JOIN SGA_SALA s ON s.id_sala = a.id_sala
+        WHERE a.estado != 'cancelado'
+    ) y
+    GROUP BY y.dia, y.id_trabalhador
+    HAVING SUM(y.sinal) != 0
+        OR SUM(CASE WHEN y.is_online = 1 THEN y.sinal ELSE 0 END) != 0
+        OR SUM(CASE WHEN y.is_online = 0 THEN y.sinal ELSE 0 END) != 0;
+
+    IF @@ROWCOUNT > 0
+        EXEC sp_aplicarDeltaEstatistica;
+END
+GO
+
+-- Carga inicial (só se a tabela estiver vazia e o procedimento já existir)
+IF OBJECT_ID('sp_reconstruirEstatisticaDiaria', 'P') IS NOT NULL
+   AND NOT EXISTS (SELECT 1 FROM SGA_ESTATISTICA_DIARIA)
+    EXEC sp_reconstruirEstatisticaDiaria;
+GO
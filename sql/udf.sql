@@ -39,11 +39,12 @@ BEGIN
 END
 GO
 
+-- Leitura das views indexadas de alteracoes.sql (seek em vez de contar a tabela)
 CREATE OR ALTER FUNCTION udf_ContarEquipaAtiva()
 RETURNS INT
 AS
 BEGIN
-    RETURN (SELECT COUNT(*) FROM SGA_TRABALHADOR WHERE ativo = 1);
+    RETURN ISNULL((SELECT CAST(total AS INT) FROM dbo.vw_ContagemTrabalhadores WITH (NOEXPAND) WHERE ativo = 1), 0);
 END
 GO
 
@@ -51,6 +52,55 @@ CREATE OR ALTER FUNCTION udf_ContarPacientesAtivos()
 RETURNS INT
 AS
 BEGIN
-    RETURN (SELECT COUNT(*) FROM SGA_PACIENTE WHERE ativo = 1);
+    RETURN ISNULL((SELECT CAST(total AS INT) FROM dbo.vw_ContagemPacientes WITH (NOEXPAND) WHERE ativo = 1), 0);
 END
-GO
\ No newline at end of file
+GO
+-- Salas físicas ativas livres em [@inicio, @fim[ (sobreposição completa de intervalos).
+-- folga_min = minutos livres antes e depois do intervalo, nesse dia, na sala: ordenar por
+-- folga_min ASC dá a alocação best-fit (encaixa a consulta no buraco mais justo e deixa
+-- blocos longos livres noutras salas).
+-- Consultas nunca passam de um dia: a procura por inícios a partir de @inicio - 1 dia
+-- faz seek em IX_Atendimento_Sala_Inicio (id_sala, data_inicio).
+CREATE OR ALTER FUNCTION udf_SalasLivres
+(
+    @inicio DATETIME2,
+    @fim DATETIME2
+)
+RETURNS TABLE
+AS
+RETURN
+    SELECT
+        s.id_sala,
+        s.nome,
+        s.id_dono,
+        DATEDIFF(MINUTE, ISNULL(Ant.fim, CAST(CAST(@inicio AS DATE) AS DATETIME2)), @inicio)
+          + DATEDIFF(MINUTE, @fim, ISNULL(Prox.inicio, DATEADD(DAY, 1, CAST(CAST(@inicio AS DATE) AS DATETIME2)))) AS folga_min
+    FROM SGA_SALA s
+    OUTER APPLY (
+        SELECT MAX(a.data_fim) AS fim
+        FROM SGA_ATENDIMENTO a
+        WHERE a.id_sala = s.id_sala
+          AND a.estado != 'cancelado'
+          AND a.data_inicio >= CAST(CAST(@inicio AS DATE) AS DATETIME2)
+          AND a.data_inicio < @inicio
+    ) Ant
+    OUTER APPLY (
+        SELECT MIN(a.data_inicio) AS inicio
+        FROM SGA_ATENDIMENTO a
+        WHERE a.id_sala = s.id_sala
+          AND a.estado != 'cancelado'
+          AND a.data_inicio >= @fim
+          AND a.data_inicio < DATEADD(DAY, 1, CAST(CAST(@inicio AS DATE) AS DATETIME2))
+    ) Prox
+    WHERE s.is_online = 0
+      AND s.ativa = 1
+      AND NOT EXISTS (
+          SELECT 1
+          FROM SGA_ATENDIMENTO a
+          WHERE a.id_sala = s.id_sala
+            AND a.estado != 'cancelado'
+            AND a.data_inicio >= DATEADD(DAY, -1, @inicio)
+            AND a.data_inicio < @fim
+            AND a.data_fim > @inicio
+      );
+GO
@@ -0,0 +1,86 @@
+-- =============================================
+-- Verificação de equivalência: sp_ObterHorariosLivres (set-based)
+-- contra a implementação original (grelha WHILE + udf_VerificarColisaoMedico).
+-- Percorre todos os médicos ativos nos próximos @dias dias, para várias durações,
+-- e falha (THROW) se algum slot divergir. Só compara a grelha de 60 minutos,
+-- que é a única suportada pela versão antiga. A versão original não conhecia a
+-- regra dos dias úteis: no legado os sábados e domingos ficam sem slots, como
+-- em sp_ObterHorariosLivres.
+-- =============================================
+SET NOCOUNT ON;
+
+DECLARE @dias INT = 30;
+DECLARE @Duracoes TABLE (duracao INT);
+INSERT INTO @Duracoes VALUES (30), (60), (90), (120);
+
+CREATE TABLE #Legado (id_medico INT, dia DATE, duracao INT, Hora VARCHAR(5));
+CREATE TABLE #Novo (id_medico INT, dia DATE, duracao INT, Hora VARCHAR(5));
+CREATE TABLE #Saida (Hora VARCHAR(5));
+
+DECLARE @id_medico INT, @dia DATE, @duracao INT, @i INT;
+
+DECLARE c CURSOR LOCAL FAST_FORWARD FOR
+    SELECT t.id_trabalhador, d.duracao
+    FROM SGA_TRABALHADOR t CROSS JOIN @Duracoes d
+    WHERE t.ativo = 1;
+
+OPEN c;
+FETCH NEXT FROM c INTO @id_medico, @duracao;
+WHILE @@FETCH_STATUS = 0
+BEGIN
+    SET @i = 0;
+    WHILE @i < @dias
+    BEGIN
+        SET @dia = DATEADD(DAY, @i, CAST(GETDATE() AS DATE));
+
+        -- Versão original
+        INSERT INTO #Legado (id_medico, dia, duracao, Hora)
+        SELECT @id_medico, @dia, @duracao, LEFT(CAST(s.Hora AS VARCHAR), 5)
+        FROM (VALUES ('09:00'), ('10:00'), ('11:00'), ('12:00'),
+                     ('14:00'), ('15:00'), ('16:00'), ('17:00')) s0(h)
+        CROSS APPLY (SELECT CAST(s0.h AS TIME) AS Hora) s
+        WHERE (
+                (s.Hora >= '09:00' AND DATEADD(MINUTE, @duracao, s.Hora) <= '13:00')
+                OR
+                (s.Hora >= '14:00' AND DATEADD(MINUTE, @duracao, s.Hora) <= '18:00')
+              )
+          AND dbo.udf_VerificarColisaoMedico(
+                @id_medico,
+                CAST(CAST(@dia AS VARCHAR) + ' ' + CAST(s.Hora AS VARCHAR) AS DATETIME2),
+                @duracao, NULL) = 0
+          AND DATEDIFF(DAY, '19000101', @dia) % 7 < 5;
+
+        -- Versão set-based
+        DELETE FROM #Saida;
+        INSERT INTO #Saida EXEC sp_ObterHorariosLivres @id_medico, @dia, 0, @duracao, NULL, 60;
+        INSERT INTO #Novo (id_medico, dia, duracao, Hora)
+        SELECT @id_medico, @dia, @duracao, Hora FROM #Saida;
+
+        SET @i += 1;
+    END
+    FETCH NEXT FROM c INTO @id_medico, @duracao;
+END
+CLOSE c;
+DEALLOCATE c;
+
+DECLARE @diferencas INT = (
+    SELECT COUNT(*) FROM (
+        (SELECT * FROM #Legado EXCEPT SELECT * FROM #Novo)
+        UNION ALL
+        (SELECT * FROM #Novo EXCEPT SELECT * FROM #Legado)
+    ) d
+);
+
+IF @diferencas > 0
+BEGIN
+    SELECT 'so_legado' AS origem, * FROM (SELECT * FROM #Legado EXCEPT SELECT * FROM #Novo) x
+    UNION ALL
+    SELECT 'so_novo', * FROM (SELECT * FROM #Novo EXCEPT SELECT * FROM #Legado) y;
+
+    DROP TABLE #Legado, #Novo, #Saida;
+    THROW 50100, 'sp_ObterHorariosLivres diverge da versão original.', 1;
+END
+
+PRINT CONCAT('OK: ', (SELECT COUNT(*) FROM #Novo), ' slots idênticos.');
+DROP TABLE #Legado, #Novo, #Saida;
+GO
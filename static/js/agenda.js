@@ -7,6 +7,7 @@ document.addEventListener('DOMContentLoaded', function () {
 
     const filtroMedico = document.getElementById('filtroMedico');
     const filtroPaciente = document.getElementById('filtroPaciente');
+    const filtroPacienteBusca = document.getElementById('filtroPacienteBusca');
     const btnLimparFiltros = document.getElementById('btnLimparFiltros');
 
     const modalAgendamentoEl = document.getElementById('modalAgendamento');
@@ -33,12 +34,49 @@ document.addEventListener('DOMContentLoaded', function () {
     const btnCancelarRapido = document.getElementById('btnCancelarRapido');
     const btnSalvarRapido = document.getElementById('btnSalvarRapido');
     const selectPacienteModal = document.getElementById('selectPaciente');
+    const pesquisaPacienteModal = document.getElementById('pesquisaPaciente');
 
     // =========================================================
     // 2. CALENDÁRIO
     // =========================================================
     if (!calendarEl) return;
 
+    // Guarda os eventos da janela/filtros atuais; ao refazer o pedido com os mesmos
+    // parâmetros só pede o que mudou (?desde=token). Sem alterações o servidor responde 304.
+    let sync = { chave: null, token: null, eventos: new Map() };
+
+    async function carregarEventos(info) {
+        const params = new URLSearchParams({
+            start: info.startStr,
+            end: info.endStr,
+            filtro_medico: filtroMedico?.value || '',
+            filtro_paciente: filtroPaciente?.value || ''
+        });
+        const chave = params.toString();
+
+        if (sync.chave === chave && sync.token) {
+            const res = await fetch(`/api/eventos?${chave}&desde=${encodeURIComponent(sync.token)}`);
+            if (!res.ok) throw new Error('Erro ao sincronizar eventos');
+            const delta = await res.json();
+            if (!delta.completo) {
+                delta.eventos.forEach(e => sync.eventos.set(e.id, e));
+                delta.removidos.forEach(id => sync.eventos.delete(id));
+                sync.token = delta.token;
+                return [...sync.eventos.values()];
+            }
+        }
+
+        const res = await fetch(`/api/eventos?${chave}`);
+        if (!res.ok) throw new Error('Erro ao carregar eventos');
+        const eventos = await res.json();
+        sync = {
+            chave,
+            token: res.headers.get('X-Sync-Token'),
+            eventos: new Map(eventos.map(e => [e.id, e]))
+        };
+        return eventos;
+    }
+
     const calendar = new FullCalendar.Calendar(calendarEl, {
         locale: 'pt',
         firstDay: 1,
@@ -71,12 +109,8 @@ document.addEventListener('DOMContentLoaded', function () {
             { daysOfWeek: [1, 2, 3, 4, 5], startTime: '14:00', endTime: '18:00' }
         ],
 
-        events: {
-            url: '/api/eventos',
-            extraParams: () => ({
-                filtro_medico: filtroMedico?.value || '',
-                filtro_paciente: filtroPaciente?.value || ''
-            })
+        events(info, success, failure) {
+            carregarEventos(info).then(success).catch(failure);
         },
 
         // 🔹 CLIQUE NO TEXTO DO DIA
@@ -108,61 +142,134 @@ document.addEventListener('DOMContentLoaded', function () {
     calendar.render();
 
     // =========================================================
-    // ATUALIZAÇÃO DINÂMICA DE FILTROS (ADMIN)
+    // ALTERAÇÕES EM TEMPO REAL (SSE)
     // =========================================================
+    // O servidor avisa quando alguém cria/edita/cancela uma consulta visível com
+    // estes filtros; o refetch é incremental (delta / 304).
+    let streamAgenda = null;
+    let refetchPendente = null;
+
+    function agendarRefetch() {
+        clearTimeout(refetchPendente);
+        refetchPendente = setTimeout(() => calendar.refetchEvents(), 300);
+    }
 
-    async function atualizarDropdownPacientes() {
-        if (!filtroPaciente) return;
+    function ligarStreamAgenda() {
+        if (!window.EventSource) return;
+        streamAgenda?.close();
+        const params = new URLSearchParams({
+            filtro_medico: filtroMedico?.value || '',
+            filtro_paciente: filtroPaciente?.value || ''
+        });
+        streamAgenda = new EventSource(`/api/eventos/stream?${params}`);
+        streamAgenda.addEventListener('agenda', agendarRefetch);
+        streamAgenda.addEventListener('reset', agendarRefetch);
+    }
 
-        const medicoId = filtroMedico ? filtroMedico.value : '';
-        const pacienteSelecionadoAntes = filtroPaciente.value;
+    ligarStreamAgenda();
 
-        try {
-            // Chama a nova API que criaste no app.py
-            const res = await fetch(`/api/lista_pacientes?medico_id=${medicoId}`);
-            if (!res.ok) throw new Error('Erro ao buscar pacientes');
+    // O stream só traz o que foi publicado no processo do servidor a que está ligado:
+    // o delta (?desde=, 304 sem alterações) continua a cada minuto, com ou sem stream,
+    // para apanhar as alterações feitas noutros workers
+    setInterval(() => {
+        if (!document.hidden) calendar.refetchEvents();
+    }, 60000);
 
-            const pacientes = await res.json();
+    // =========================================================
+    // ATUALIZAÇÃO DINÂMICA DE FILTROS (ADMIN)
+    // =========================================================
 
-            // Reinicia o dropdown
-            filtroPaciente.innerHTML = '<option value="" selected>Todos os Pacientes</option>';
+    // Pesquisa de pacientes à medida que se escreve (/api/pacientes/pesquisa) numa datalist;
+    // o NIF do paciente escolhido vai para o campo escondido.
+    function ligarPesquisaPacientes(campoTexto, campoNif, lista, parametros, aoMudar) {
+        if (!campoTexto) return null;
+        const opcoes = new Map(); // texto da opção -> NIF
+        let espera = null;
+        let controlador = null;
+
+        function definirNif(nif, silencioso) {
+            campoTexto.setCustomValidity(nif || !campoTexto.required ? '' : 'Escolha um paciente da lista.');
+            if (campoNif.value === nif) return;
+            campoNif.value = nif;
+            if (!silencioso) aoMudar?.();
+        }
 
-            pacientes.forEach(p => {
-                const opt = document.createElement('option');
-                opt.value = p.nif;
-                opt.textContent = p.nome;
+        async function pesquisar(texto) {
+            controlador?.abort();
+            controlador = new AbortController();
+            const params = new URLSearchParams({ q: texto, ...parametros() });
+            try {
+                const res = await fetch(`/api/pacientes/pesquisa?${params}`, { signal: controlador.signal });
+                if (!res.ok) throw new Error('Erro ao pesquisar pacientes');
+                const pacientes = await res.json();
+                lista.innerHTML = '';
+                opcoes.clear();
+                pacientes.forEach(p => {
+                    const rotulo = `${p.nome} (${p.nif})`;
+                    opcoes.set(rotulo, p.nif);
+                    const opt = document.createElement('option');
+                    opt.value = rotulo;
+                    lista.appendChild(opt);
+                });
+            } catch (err) {
+                if (err.name !== 'AbortError') console.error("Erro na pesquisa de pacientes:", err);
+            }
+        }
 
-                // Se o paciente selecionado ainda existir na nova lista, mantém a seleção
-                if (p.nif === pacienteSelecionadoAntes) {
-                    opt.selected = true;
-                }
+        campoTexto.addEventListener('input', () => {
+            // Escolha de uma opção da lista
+            if (opcoes.has(campoTexto.value)) {
+                definirNif(opcoes.get(campoTexto.value));
+                return;
+            }
+            definirNif('');
+            clearTimeout(espera);
+            const texto = campoTexto.value.trim();
+            if (texto) espera = setTimeout(() => pesquisar(texto), 150);
+        });
+        definirNif(campoNif.value, true);
+
+        return {
+            limpar() {
+                campoTexto.value = '';
+                lista.innerHTML = '';
+                opcoes.clear();
+                definirNif('', true);
+            },
+            escolher(nif, nome) {
+                const rotulo = `${nome} (${nif})`;
+                opcoes.set(rotulo, nif);
+                campoTexto.value = rotulo;
+                definirNif(nif);
+            }
+        };
+    }
 
-                filtroPaciente.appendChild(opt);
-            });
-        } catch (err) {
-            console.error("Erro ao atualizar lista de pacientes:", err);
+    // Filtro da agenda: o admin pesquisa entre os pacientes do médico filtrado (ou todos)
+    const pesquisaFiltro = ligarPesquisaPacientes(
+        filtroPacienteBusca, filtroPaciente, document.getElementById('listaFiltroPacientes'),
+        () => ({ medico_id: filtroMedico?.value || '' }),
+        () => {
+            calendar.refetchEvents();
+            ligarStreamAgenda();
         }
-    }
+    );
 
-    // 1. Quando muda o médico: Atualiza calendário E recarrega a lista de pacientes
+    // 1. Quando muda o médico: o paciente filtrado pode não ser dele, por isso limpa-o
     if (filtroMedico) {
         filtroMedico.addEventListener('change', () => {
+            pesquisaFiltro?.limpar();
             calendar.refetchEvents();
-            atualizarDropdownPacientes();
+            ligarStreamAgenda();
         });
     }
 
-    // 2. Quando muda o paciente: Apenas atualiza o calendário
-    filtroPaciente?.addEventListener('change', () => calendar.refetchEvents());
-
-    // 3. Botão Limpar: Limpa filtros e repõe a lista completa de pacientes
+    // 2. Botão Limpar: limpa os dois filtros
     btnLimparFiltros?.addEventListener('click', () => {
         if (filtroMedico) filtroMedico.value = '';
-        if (filtroPaciente) {
-            filtroPaciente.value = '';
-            atualizarDropdownPacientes(); // Volta a mostrar "Todos" se for Admin
-        }
+        pesquisaFiltro?.limpar();
         calendar.refetchEvents();
+        ligarStreamAgenda();
     });
 
     // =========================================================
@@ -201,6 +308,8 @@ document.addEventListener('DOMContentLoaded', function () {
             if (horaFinal) selectHora.value = horaFinal;
         });
 
+        pesquisaModal?.limpar();
+
         // Garantir que o formulário de novo paciente está escondido ao abrir o modal
         if (formRapido) formRapido.classList.add('d-none');
 
@@ -235,6 +344,11 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     }
 
+    // O paciente da marcação é pesquisado no âmbito da sessão (o admin vê todos)
+    const pesquisaModal = ligarPesquisaPacientes(
+        pesquisaPacienteModal, selectPacienteModal, document.getElementById('listaPacientesModal'), () => ({})
+    );
+
     selectMedico?.addEventListener('change', carregarHorariosCriacao);
     selectDuracaoCriar?.addEventListener('change', carregarHorariosCriacao);
     checkOnline?.addEventListener('change', carregarHorariosCriacao);
@@ -346,14 +460,8 @@ document.addEventListener('DOMContentLoaded', function () {
                 const json = await res.json();
 
                 if (res.ok) {
-                    // Sucesso: Adicionar o novo paciente ao dropdown e selecioná-lo
-                    if (selectPacienteModal) {
-                        const opt = document.createElement('option');
-                        opt.value = json.nif; // O valor é o NIF
-                        opt.textContent = `${json.nome} (${json.nif})`;
-                        opt.selected = true;
-                        selectPacienteModal.appendChild(opt);
-                    }
+                    // Sucesso: selecionar o novo paciente no modal
+                    pesquisaModal?.escolher(json.nif, json.nome);
 
                     // Limpar campos e esconder formulário
                     formRapido.classList.add('d-none');
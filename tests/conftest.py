@@ -0,0 +1,63 @@
+"""
+Testes de regressão contra o backend SQLite (DB_BACKEND=sqlite): a app corre no próprio
+processo sobre um ficheiro novo, sem SQL Server nem pyodbc.
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+SENHA = 'teste123'
+NIF_MEDICO = '100000002'
+NIF_PACIENTE = '200000004'
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    os.environ['DB_BACKEND'] = 'sqlite'
+    os.environ['SQLITE_PATH'] = str(tmp_path_factory.mktemp('bd') / 'sga.sqlite3')
+    os.environ['SECRET_KEY'] = 'testes'
+
+    from app import app as aplicacao
+    from autenticacao import gerar_hash_senha
+    from persistence.session import PoolConexoes, definir_pool, get_db_connection
+
+    aplicacao.config['TESTING'] = True
+    aplicacao.secret_key = os.environ['SECRET_KEY']
+    definir_pool(PoolConexoes())
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("EXEC sp_criarFuncionario ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?",
+                   (NIF_MEDICO, 'Médico Teste', '1980-05-01', '912000000', 'medico@teste.pt',
+                    gerar_hash_senha(SENHA), 'colaborador', '12345', 'CONTRATADO', 'Sem termo', None, None))
+    cursor.execute("SELECT id_trabalhador FROM SGA_TRABALHADOR WHERE NIF = ?", (NIF_MEDICO,))
+    id_medico = cursor.fetchone()[0]
+    cursor.execute("INSERT INTO SGA_SALA (nome, is_online, ativa, id_dono) VALUES (?, 0, 1, ?)",
+                   ('Gabinete 1', id_medico))
+    cursor.execute("INSERT INTO SGA_SALA (nome, is_online, ativa, id_dono) VALUES (?, 1, 1, NULL)", ('Online',))
+    cursor.execute("EXEC sp_guardarPessoa ?, ?, ?, ?, ?",
+                   (NIF_PACIENTE, 'Paciente Teste', '1990-02-03', '913000000', None))
+    cursor.execute("EXEC sp_inserirPaciente ?, ?, ?, ?", (NIF_PACIENTE, '2026-01-05', None, id_medico))
+    conn.commit()
+    conn.close()
+
+    yield aplicacao
+    definir_pool(None)
+
+
+@pytest.fixture
+def cliente(app):
+    c = app.test_client()
+    resposta = c.post('/login', data={'nif': NIF_MEDICO, 'senha': SENHA})
+    assert resposta.status_code == 302
+    return c
+
+
+def flashes(cliente):
+    """Mensagens flash pendentes na sessão: [(categoria, mensagem)]."""
+    with cliente.session_transaction() as sessao:
+        return sessao.pop('_flashes', [])
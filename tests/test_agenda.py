@@ -0,0 +1,90 @@
+"""Fluxo da agenda: login -> marcação -> conflito -> edição -> sincronização por delta."""
+from conftest import NIF_MEDICO, NIF_PACIENTE, flashes
+
+JANELA = {'start': '2030-01-07T00:00:00', 'end': '2030-01-14T00:00:00'}
+
+
+def marcar(cliente, data, hora, duracao=50):
+    return cliente.post('/criar_agendamento', data={
+        'nif_paciente': NIF_PACIENTE, 'data': data, 'hora': hora, 'duracao': duracao,
+    })
+
+
+def eventos(cliente, **parametros):
+    return cliente.get('/api/eventos', query_string={**JANELA, **parametros})
+
+
+def test_login(app):
+    c = app.test_client()
+    resposta = c.post('/login', data={'nif': NIF_MEDICO, 'senha': 'errada'})
+    assert resposta.status_code == 200
+    assert 'NIF ou palavra-passe incorretos.' in resposta.get_data(as_text=True)
+
+    assert c.get('/agenda').status_code == 302
+    resposta = c.post('/login', data={'nif': NIF_MEDICO, 'senha': 'teste123'})
+    assert resposta.status_code == 302
+    assert resposta.headers['Location'].endswith('/dashboard')
+    assert c.get('/agenda').status_code == 200
+
+
+def test_horarios_exige_sessao(app, cliente):
+    url = '/api/horarios-disponiveis?medicos=&data=2030-01-07&data_fim=2030-01-11'
+    assert app.test_client().get(url).status_code == 302
+    # O colaborador só recebe a sua agenda, mesmo sem filtrar por médico
+    assert len(cliente.get(url).get_json()) == 1
+
+
+def test_marcacao_e_conflito(cliente):
+    assert marcar(cliente, '2030-01-07', '10:00').status_code == 302
+    assert flashes(cliente) == [('success', 'Consulta agendada com sucesso!')]
+    assert [e['start'] for e in eventos(cliente).get_json()] == ['2030-01-07T10:00:00']
+
+    # Sobreposta à anterior: o médico já está ocupado
+    marcar(cliente, '2030-01-07', '10:30')
+    assert flashes(cliente) == [('danger', 'Erro: Médico ocupado nessa hora.')]
+
+    resposta = cliente.post('/api/agendamentos/lote', json={
+        'nif_paciente': NIF_PACIENTE, 'duracao': 50,
+        'datas': ['2030-01-08T10:00', '2030-01-07T10:15'],
+    })
+    assert resposta.status_code == 409
+    conflitos = resposta.get_json()['conflitos']
+    assert [c['ordem'] for c in conflitos] == [1]
+    # Tudo ou nada: a sessão sem conflito também não foi marcada
+    assert len(eventos(cliente).get_json()) == 1
+
+
+def test_lote_invalido(cliente):
+    base = {'nif_paciente': NIF_PACIENTE, 'duracao': 50, 'data': '2030-01-07', 'hora': '09:00'}
+    for dados in ({**base, 'repeticoes': 10 ** 8},
+                  {**base, 'repeticoes': 3, 'intervalo_dias': 10 ** 9},
+                  {'nif_paciente': NIF_PACIENTE, 'datas': [123]}):
+        assert cliente.post('/api/agendamentos/lote', json=dados).status_code == 400
+    assert all(e['start'] != '2030-01-07T09:00:00' for e in eventos(cliente).get_json())
+
+
+def test_edicao_e_sincronizacao_delta(cliente):
+    marcar(cliente, '2030-01-09', '14:00')
+    assert flashes(cliente)[0][0] == 'success'
+    resposta = eventos(cliente)
+    token = resposta.headers['X-Sync-Token']
+    evento = next(e for e in resposta.get_json() if e['start'] == '2030-01-09T14:00:00')
+
+    # Sem alterações o delta vem vazio
+    delta = eventos(cliente, desde=token).get_json()
+    assert delta['eventos'] == [] and delta['removidos'] == []
+
+    cliente.post('/editar_agendamento', data={
+        'id_atendimento': evento['id'], 'data': '2030-01-09', 'hora': '16:00', 'duracao': 50,
+    })
+    assert flashes(cliente) == [('success', 'Agendamento atualizado com sucesso!')]
+
+    delta = eventos(cliente, desde=token).get_json()
+    assert [(e['id'], e['start'], e['end']) for e in delta['eventos']] == \
+        [(evento['id'], '2030-01-09T16:00:00', '2030-01-09T16:50:00')]
+    assert delta['removidos'] == []
+
+    cliente.get(f"/cancelar_agendamento/{evento['id']}")
+    delta = eventos(cliente, desde=delta['token']).get_json()
+    assert delta['eventos'] == []
+    assert delta['removidos'] == [evento['id']]
@@ -0,0 +1,57 @@
+"""Índices em memória: contagens que não batem com a BD não podem deixar o índice vazio."""
+from datetime import datetime
+
+from persistence import indice_pacientes, pesquisa
+
+
+class CursorDesfasado:
+    """Devolve sempre as mesmas linhas com uma contagem a mais (gravação entre a contagem e as linhas)."""
+
+    def __init__(self, contagem, linhas):
+        self.contagem = contagem
+        self.linhas = linhas
+        self.execucoes = 0
+        self._pendentes = []
+
+    def execute(self, sql, params=()):
+        self.execucoes += 1
+        self._pendentes = list(self.linhas)
+
+    def fetchone(self):
+        return self.contagem
+
+    def nextset(self):
+        return True
+
+    def fetchmany(self, n):
+        linhas, self._pendentes = self._pendentes[:n], self._pendentes[n:]
+        return linhas
+
+    def fetchall(self):
+        return self.fetchmany(len(self._pendentes))
+
+
+def test_relatorios_com_contagem_desfasada(monkeypatch):
+    monkeypatch.setattr(pesquisa, '_indice', pesquisa.IndiceRelatorios())
+    data = datetime(2030, 1, 7)
+    linhas = [(1, 10, None, 5, None, data, 'Ansiedade e insónia'),
+              (2, 11, None, 5, None, data, 'Sono regular')]
+    cursor = CursorDesfasado((3, 7), linhas)
+
+    pesquisa.sincronizar_indice(cursor)
+
+    assert cursor.execucoes == 2
+    assert len(pesquisa._indice) == 2
+    assert [i for i, _ in pesquisa._indice.pesquisar(5, ['ansied'])] == [1]
+
+
+def test_pacientes_com_contagem_desfasada(monkeypatch):
+    monkeypatch.setattr(indice_pacientes, '_indice', indice_pacientes.IndicePacientes())
+    linhas = [(1, 'Ana Silva', '200000001', 1, 7),
+              (2, 'Rui Costa', '200000002', 1, 7)]
+    cursor = CursorDesfasado((3, 2, 9), linhas)
+
+    indice_pacientes.sincronizar_indice_pacientes(cursor)
+
+    assert cursor.execucoes == 2
+    assert [p['nif'] for p in indice_pacientes.pesquisar_pacientes(cursor, 'ana', 7)] == ['200000001']
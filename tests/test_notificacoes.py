@@ -0,0 +1,18 @@
+"""Limite de streams SSE num worker com threads."""
+import pytest
+
+from notificacoes import CentralNotificacoes, FiltroAgenda, LimiteLigacoes, RESERVA_THREADS
+
+
+def test_limite_deixa_threads_livres():
+    central = CentralNotificacoes(max_ligacoes=500)
+    central.limitar_a_threads(4)
+    assert central.max_ligacoes == 4 - RESERVA_THREADS
+
+    filtro = FiltroAgenda(1, 'colaborador')
+    ligacoes = [central.subscrever(filtro) for _ in range(central.max_ligacoes)]
+    with pytest.raises(LimiteLigacoes):
+        central.subscrever(filtro)
+
+    ligacoes[0].close()
+    central.subscrever(filtro).close()
@@ -0,0 +1,67 @@
+"""
+Ponto de entrada WSGI para produção:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+A app é carregada uma vez no master (preload_app) e partilhada pelos workers
+via fork. Nada aqui abre conexões à BD no import: o pool, as caches e os
+índices em memória são por processo e são preparados em cada worker por
+aquecer(), chamado no post_worker_init (ver gunicorn.conf.py), antes de o worker
+aceitar pedidos.
+"""
+import os
+import time
+
+
+def criar_app():
+    """Importa e devolve a app Flask (o import de app.py regista rotas, pool e métricas)."""
+    from app import app as aplicacao
+    if not aplicacao.secret_key:
+        raise RuntimeError("SECRET_KEY não definida (ver .env.sample).")
+    return aplicacao
+
+
+def aquecer():
+    """
+    Prepara o worker: abre as DB_POOL_MIN conexões, carrega a cache de referência
+    (médicos da agenda) e o índice de pesquisa de pacientes, e começa a carregar o
+    de relatórios em segundo plano.
+    Uma falha (ex.: BD indisponível) é registada e o worker arranca na mesma;
+    o que ficou por carregar é carregado no primeiro pedido que precisar.
+    Retorna {passo: ms}.
+    """
+    from persistence.session import get_db_connection, obter_pool
+    from persistence.trabalhadores import medicos_agenda_dropdown
+    from persistence.indice_pacientes import sincronizar_indice_pacientes
+    from persistence.pesquisa import preparar_em_segundo_plano
+
+    tempos = {}
+
+    def passo(nome, funcao):
+        inicio = time.perf_counter()
+        try:
+            funcao()
+        except Exception as e:
+            print(f"[aquecimento] {nome} falhou: {e}")
+        tempos[nome] = round((time.perf_counter() - inicio) * 1000, 1)
+
+    passo('pool', lambda: obter_pool().aquecer())
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        passo('medicos', lambda: medicos_agenda_dropdown(cursor))
+        passo('pacientes', lambda: sincronizar_indice_pacientes(cursor))
+    except Exception as e:
+        print(f"[aquecimento] sem conexão à BD: {e}")
+    finally:
+        if conn is not None:
+            conn.close()
+    # Índice de relatórios numa thread: pode demorar mais do que o timeout do worker
+    passo('relatorios', preparar_em_segundo_plano)
+
+    print(f"[aquecimento] pid={os.getpid()} " + ' '.join(f"{k}={v}ms" for k, v in tempos.items()))
+    return tempos
+
+
+app = criar_app()